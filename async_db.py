@@ -13,7 +13,7 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/4/6 14:21
 # @Desc    : 异步Aiomysql的增删改查封装
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Sequence, Union
 
 import aiomysql
 
@@ -105,3 +105,21 @@ class AsyncMysqlDB:
             async with conn.cursor() as cur:
                 rows = await cur.execute(sql, args)
                 return rows
+
+    async def executemany(self, sql: str, args_list: List[Sequence[Any]]) -> int:
+        """
+        同一条语句按多组参数批量执行，在一个事务中提交；INSERT ... VALUES 语句会被合并为多行写入
+        :param sql: 写入或更新的sql
+        :param args_list: 每次执行的参数列表
+        :return:
+        """
+        async with self.__pool.acquire() as conn:
+            await conn.begin()
+            try:
+                async with conn.cursor() as cur:
+                    rows = await cur.executemany(sql, args_list)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+            return rows
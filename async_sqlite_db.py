@@ -13,7 +13,7 @@
 # @Author  : relakkes@gmail.com
 # @Time    : 2024/4/6 14:21
 # @Desc    : 异步SQLite的增删改查封装
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Sequence, Tuple, Union
 
 import aiosqlite
 
@@ -100,6 +100,18 @@ class AsyncSqliteDB:
                 await conn.commit()
                 return cursor.rowcount
 
+    async def executemany(self, sql: str, args_list: List[Sequence[Any]]) -> int:
+        """
+        同一条语句按多组参数批量执行，在一个事务中提交
+        :param sql: 写入或更新的sql
+        :param args_list: 每次执行的参数列表
+        :return:
+        """
+        async with aiosqlite.connect(self.__db_path) as conn:
+            async with conn.executemany(sql, args_list) as cursor:
+                await conn.commit()
+                return cursor.rowcount
+
     async def executescript(self, sql_script: str) -> None:
         """
         执行SQL脚本，用于初始化数据库表结构
@@ -108,4 +120,24 @@ class AsyncSqliteDB:
         """
         async with aiosqlite.connect(self.__db_path) as conn:
             await conn.executescript(sql_script)
-            await conn.commit()
\ No newline at end of file
+            await conn.commit()
+
+    async def add_missing_columns(self, table_columns: Dict[str, List[Tuple[str, str]]]) -> List[str]:
+        """
+        为已存在的表补上缺少的字段，用于升级老版本创建的数据库文件，表不存在时跳过
+        :param table_columns: 表名 -> [(字段名, 字段定义)]
+        :return: 补上的字段，格式为 表名.字段名
+        """
+        added_columns = []
+        async with aiosqlite.connect(self.__db_path) as conn:
+            for table_name, columns in table_columns.items():
+                async with conn.execute(f"PRAGMA table_info({table_name})") as cursor:
+                    existing_columns = {row[1] for row in await cursor.fetchall()}
+                if not existing_columns:
+                    continue
+                for column_name, column_definition in columns:
+                    if column_name not in existing_columns:
+                        await conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_definition}")
+                        added_columns.append(f"{table_name}.{column_name}")
+            await conn.commit()
+        return added_columns
\ No newline at end of file
@@ -9,7 +9,7 @@
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from playwright.async_api import BrowserContext, BrowserType, Playwright
 
@@ -23,6 +23,21 @@ class AbstractCrawler(ABC):
         """
         pass
 
+    @abstractmethod
+    async def prepare(self, playwright: Playwright):
+        """
+        启动浏览器、登录并创建 API client，start 和常驻服务模式都先调用它
+        :param playwright: playwright实例
+        """
+        pass
+
+    @abstractmethod
+    async def crawl(self):
+        """
+        按当前配置执行一次爬取任务，调用前需先执行 prepare
+        """
+        pass
+
     @abstractmethod
     async def search(self):
         """
@@ -75,6 +90,20 @@ class AbstractLogin(ABC):
 
 
 class AbstractStore(ABC):
+    """
+    子类实现的 store_* 写入方法会自动统计写入条数和耗时（tools/metrics.py），标签取自模块和类名：
+    store.xhs.xhs_store_impl.XhsCsvStoreImplement -> platform=xhs, backend=csv
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        from tools import metrics
+
+        platform, backend = metrics.get_store_labels(cls)
+        for method_name, item_type in metrics.STORE_METHOD_ITEM_TYPES.items():
+            method = cls.__dict__.get(method_name)
+            if method is not None and not getattr(method, "__isabstractmethod__", False):
+                setattr(cls, method_name, metrics.metered_store_method(method, platform, backend, item_type))
 
     @abstractmethod
     async def store_content(self, content_item: Dict):
@@ -90,6 +119,20 @@ class AbstractStore(ABC):
     async def store_creator(self, creator: Dict):
         pass
 
+    async def store_batch(self, method_name: str, items: List[Dict]):
+        """
+        批量写入同一类记录，写入队列（store/write_behind.py）按存储实现和写入方法分组后调用。
+        逐条调用 store_* 方法，文件存储的记录先缓存，整批结束后每个文件只读写一次
+        :param method_name: store_content | store_comment | store_creator ...
+        :param items: 记录列表
+        """
+        from store.store_util import file_write_batch
+
+        method = getattr(self, method_name)
+        async with file_write_batch():
+            for item in items:
+                await method(item)
+
 
 class AbstractStoreImage(ABC):
     # TODO: support all platform
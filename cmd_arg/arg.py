@@ -15,6 +15,22 @@ import config
 from tools.utils import str2bool
 
 
+# 命令行参数名 -> 被覆盖的配置项，shard_launcher 按此把命令行设置传给工作进程
+CMD_ARG_CONFIG_KEYS = {
+    "platform": "PLATFORM",
+    "lt": "LOGIN_TYPE",
+    "type": "CRAWLER_TYPE",
+    "start": "START_PAGE",
+    "keywords": "KEYWORDS",
+    "get_comment": "ENABLE_GET_COMMENTS",
+    "get_sub_comment": "ENABLE_GET_SUB_COMMENTS",
+    "save_data_option": "SAVE_DATA_OPTION",
+    "cookies": "COOKIES",
+    "profile": "ENABLE_PROFILE",
+    "metrics": "ENABLE_METRICS",
+}
+
+
 async def parse_cmd():
     # 读取command arg
     parser = argparse.ArgumentParser(description='Media crawler program. / 媒体爬虫程序')
@@ -36,20 +52,17 @@ async def parse_cmd():
     parser.add_argument('--get_sub_comment', type=str2bool,
                         help=''''Whether to crawl level two comment / 是否爬取二级评论, supported values case insensitive / 支持的值(不区分大小写) ('yes', 'true', 't', 'y', '1', 'no', 'false', 'f', 'n', '0')''', default=config.ENABLE_GET_SUB_COMMENTS)
     parser.add_argument('--save_data_option', type=str,
-                        help='Where to save the data / 数据保存方式 (csv=CSV文件 | db=MySQL数据库 | json=JSON文件 | sqlite=SQLite数据库)', 
-                        choices=['csv', 'db', 'json', 'sqlite'], default=config.SAVE_DATA_OPTION)
+                        help='Where to save the data / 数据保存方式 (csv=CSV文件 | db=MySQL数据库 | json=JSON文件 | sqlite=SQLite数据库 | parquet=Parquet列式文件)', 
+                        choices=['csv', 'db', 'json', 'sqlite', 'parquet'], default=config.SAVE_DATA_OPTION)
     parser.add_argument('--cookies', type=str,
                         help='Cookies used for cookie login type / Cookie登录方式使用的Cookie值', default=config.COOKIES)
+    parser.add_argument('--profile', type=str2bool, nargs='?', const=True,
+                        help='Sample coroutine stacks and write a flame graph and stage summary at exit / 开启性能分析，退出时输出火焰图和各阶段耗时', default=config.ENABLE_PROFILE)
+    parser.add_argument('--metrics', type=str2bool, nargs='?', const=True,
+                        help='Serve Prometheus metrics and write a JSON summary at exit / 开启运行指标，暴露 Prometheus 接口并在退出时保存 JSON 汇总', default=config.ENABLE_METRICS)
 
     args = parser.parse_args()
 
     # override config
-    config.PLATFORM = args.platform
-    config.LOGIN_TYPE = args.lt
-    config.CRAWLER_TYPE = args.type
-    config.START_PAGE = args.start
-    config.KEYWORDS = args.keywords
-    config.ENABLE_GET_COMMENTS = args.get_comment
-    config.ENABLE_GET_SUB_COMMENTS = args.get_sub_comment
-    config.SAVE_DATA_OPTION = args.save_data_option
-    config.COOKIES = args.cookies
+    for arg_name, config_key in CMD_ARG_CONFIG_KEYS.items():
+        setattr(config, config_key, getattr(args, arg_name))
@@ -9,5 +9,42 @@
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。  
 
 
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import ModuleType
+from typing import Any, Dict
+
 from .base_config import *
-from .db_config import *
\ No newline at end of file
+from .db_config import *
+
+# 当前上下文临时覆盖的配置项，常驻爬虫服务中每个任务在自己的协程上下文里覆盖，并发任务之间互不影响
+config_overrides_var: ContextVar[Dict[str, Any]] = ContextVar("config_overrides", default={})
+
+
+@contextmanager
+def override_config(overrides: Dict[str, Any]):
+    """
+    在当前协程上下文中临时覆盖配置项，退出时恢复，期间创建的子任务继承覆盖后的配置
+    Args:
+        overrides: 配置项名称 -> 值
+
+    Returns:
+
+    """
+    token = config_overrides_var.set({**config_overrides_var.get(), **overrides})
+    try:
+        yield
+    finally:
+        config_overrides_var.reset(token)
+
+
+class _ConfigModule(ModuleType):
+    def __getattribute__(self, name: str) -> Any:
+        overrides = config_overrides_var.get()
+        if overrides and name in overrides:
+            return overrides[name]
+        return super().__getattribute__(name)
+
+
+sys.modules[__name__].__class__ = _ConfigModule
\ No newline at end of file
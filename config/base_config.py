@@ -34,6 +34,15 @@ HEADLESS = False
 # 是否保存登录状态
 SAVE_LOGIN_STATE = True
 
+# 是否启用登录态快照，快照在有效期内时启动会跳过 pong 探测和登录流程
+ENABLE_LOGIN_STATE_SNAPSHOT = True
+
+# 登录态快照有效期（秒），超过该时间会重新调用 pong 验证登录态
+LOGIN_STATE_SNAPSHOT_TTL = 1800
+
+# 登录态快照保存目录
+LOGIN_STATE_SNAPSHOT_DIR = "browser_data"
+
 # ==================== CDP (Chrome DevTools Protocol) 配置 ====================
 # 是否启用CDP模式 - 使用用户现有的Chrome/Edge浏览器进行爬取，提供更好的反检测能力
 # 启用后将自动检测并启动用户的Chrome/Edge浏览器，通过CDP协议进行控制
@@ -62,7 +71,7 @@ BROWSER_LAUNCH_TIMEOUT = 30
 AUTO_CLOSE_BROWSER = True
 
 # 数据保存类型选项配置,支持四种类型：csv、db、json、sqlite, 最好保存到DB，有排重的功能。
-SAVE_DATA_OPTION = "json"  # csv or db or json or sqlite
+SAVE_DATA_OPTION = "json"  # csv or db or json or sqlite or parquet
 
 # 用户浏览器缓存的浏览器文件配置
 USER_DATA_DIR = "%s_user_data_dir"  # %s will be replaced by platform name
@@ -108,6 +117,110 @@ FONT_PATH = "./docs/STZHONGS.TTF"
 # 爬取间隔时间
 CRAWLER_MAX_SLEEP_SEC = 2
 
+# 常驻爬虫服务（crawler_server.py）监听地址和端口
+# 服务会为每个平台保持已登录的浏览器上下文，任务通过 HTTP 提交到队列中执行
+# 任务参数只在任务自己的协程上下文中覆盖配置，不同平台的任务并发执行，同一平台的任务共用浏览器上下文、串行执行
+CRAWLER_SERVER_HOST = "127.0.0.1"
+CRAWLER_SERVER_PORT = 8080
+# 常驻爬虫服务同时执行的任务数量
+CRAWLER_SERVER_WORKER_NUM = 2
+# 常驻爬虫服务保留的已结束任务数量，超过后最早结束的任务无法再查询
+CRAWLER_SERVER_MAX_FINISHED_JOBS = 1000
+
+# 多进程分片启动器（shard_launcher.py）的工作进程数量
+# 关键词/帖子ID/创作者ID会被均匀分配给各个工作进程，每个进程有独立的浏览器上下文和代理IP
+SHARD_WORKER_NUM = 2
+
+# 多进程分片运行时当前进程的 worker 序号，由启动器设置，单进程运行时为 None
+CRAWLER_WORKER_ID = None
+
+# 分布式任务队列（task_queue/task_worker.py）
+# memory: 进程内队列，仅单机使用；redis: 多台机器共享同一个队列，连接配置见 db_config.py
+TASK_QUEUE_TYPE = "memory"
+# 队列名称，同名队列的任务会被所有节点共同消费
+TASK_QUEUE_NAME = "default"
+# 任务被取出后在该时间（秒）内未确认完成，会重新回到队列交给其他节点执行
+# 任务执行期间每隔该时间的 1/3 自动延长一次，只有节点异常退出时任务才会超时
+TASK_QUEUE_VISIBILITY_TIMEOUT = 300
+# 单个任务最大尝试次数（执行失败和可见性超时都计入），超过后丢弃
+TASK_QUEUE_MAX_ATTEMPTS = 3
+# redis 队列中已提交任务ID的去重记录在最后一次提交新任务后保留的时间（秒），0 表示永不过期
+# 需要在过期前重新爬取同一批任务时，用 task_worker.py 的 --reseed 参数清空去重记录
+TASK_QUEUE_SEEN_TTL = 7 * 24 * 3600
+# 队列为空时的轮询间隔（秒）
+TASK_QUEUE_POLL_INTERVAL = 5
+
+# HTTP 录制回放（replay/），用于在没有网络的机器上做可复现的端到端基准测试
+# "": 关闭；record: 正常请求并把请求/响应写入 HTTP_REPLAY_DIR/{平台}.jsonl；replay: 只从录制文件返回响应，不访问网络
+HTTP_REPLAY_MODE = ""
+HTTP_REPLAY_DIR = "data/http_replay"
+# 回放时转发到本地回放服务（python -m replay.mock_server）的地址，例如 http://127.0.0.1:8090，为空时在进程内回放
+HTTP_REPLAY_SERVER_URL = ""
+# 匹配录制记录时忽略的 query 参数和 JSON 请求体字段，这些参数是签名、时间戳或随机值，每次请求都不同
+HTTP_REPLAY_IGNORE_PARAMS = ["wts", "w_rid", "a_bogus", "X-Bogus", "msToken", "verifyFp", "fp", "_signature",
+                             "search_id", "__NS_sig3"]
+# 进程内回放时注入的固定延迟、随机附加延迟（毫秒）和错误响应比例
+HTTP_REPLAY_LATENCY_MS = 0
+HTTP_REPLAY_LATENCY_JITTER_MS = 0
+HTTP_REPLAY_ERROR_RATE = 0.0
+
+# 性能分析（python main.py --profile），采样各协程的调用栈，退出时在 PROFILE_OUTPUT_DIR 下生成火焰图折叠栈文件和按阶段汇总的报告
+ENABLE_PROFILE = False
+# 采样间隔（毫秒），越小越精确，分析器本身的开销也越大
+PROFILE_SAMPLE_INTERVAL_MS = 5
+PROFILE_OUTPUT_DIR = "data/profile"
+
+# 事件循环延迟监控，发现同步调用阻塞事件循环超过阈值时告警并记录调用栈，退出时按阻塞点汇总次数和时长
+ENABLE_LOOP_MONITOR = False
+# 事件循环延迟超过该值（毫秒）视为阻塞
+LOOP_LAG_THRESHOLD_MS = 100
+
+# 运行指标：开启后在 http://METRICS_HOST:METRICS_PORT/metrics 暴露 Prometheus 格式的请求数、延迟、风控比例、写入条数等指标，
+# 退出时在 METRICS_OUTPUT_DIR 下保存 JSON 汇总
+ENABLE_METRICS = False
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9464
+METRICS_OUTPUT_DIR = "data/metrics"
+
+# 开启爬二级评论时，抖音、B站同一页一级评论下的回复楼层并发翻页：单个帖子同时翻页的楼层数，以及所有帖子合计的上限。
+# 每个楼层内部仍按 CRAWLER_MAX_SLEEP_SEC 间隔逐页请求，总请求频率约为 SUB_COMMENT_MAX_CONCURRENCY / CRAWLER_MAX_SLEEP_SEC
+SUB_COMMENT_CONCURRENCY_PER_NOTE = 4
+SUB_COMMENT_MAX_CONCURRENCY = 8
+
+# 增量评论模式：爬取评论前查询帖子已入库的最新一级评论，按时间倒序翻页，遇到已入库的评论即停止，
+# 适合每天重复监控同一批帖子。需要 SAVE_DATA_OPTION 为 db 或 sqlite，目前支持 B站 和 知乎（其他平台不支持按时间排序翻页，仍全量爬取）
+# 开启后只会抓取新一级评论楼层下的二级评论
+ENABLE_DELTA_COMMENTS = False
+
+# db、sqlite 存储按记录内容计算指纹（fingerprint 字段），与已入库的记录相同时跳过写库，内容变化时只更新变化的字段（点赞数、评论数等）。
+# 进程内缓存最近写入的记录指纹，同一次运行中重复出现且没有变化的记录连查询也省掉。老版本项目使用了 db（MySQL），需参考 schema/tables.sql 末尾增加 fingerprint 字段；
+# 使用 sqlite 时启动会自动为老版本创建的数据库文件补上 fingerprint 字段
+STORE_FINGERPRINT_CACHE_SIZE = 100000
+
+# 异步写入队列：store_* 只把记录放入队列，后台协程按存储实现和写入方法批量写入，数据库和文件的写入不再阻塞爬取；
+# 队列中超过 STORE_WRITE_QUEUE_SIZE 条记录时爬取协程等待写入，程序正常退出前会写完队列中的记录。
+# 默认关闭，开启前注意：进程崩溃或被强制结束时队列中尚未写入的记录会丢失；
+# 增量评论模式的已入库最新评论和 db、sqlite 存储的指纹比对都查询数据库，队列中尚未写入的记录查不到
+ENABLE_WRITE_BEHIND = False
+STORE_WRITE_QUEUE_SIZE = 1000
+# 后台协程一次最多写入的记录数，同一批中写同一个文件的记录只读写一次文件
+STORE_WRITE_BATCH_SIZE = 200
+
+# parquet 存储：按 schema/tables.sql 的表结构把记录写为 Parquet 列式文件，适合数据分析。
+# 每张表攒够 PARQUET_ROW_GROUP_SIZE 条记录后压缩写为一个 row group，单个文件超过 PARQUET_MAX_FILE_SIZE_MB 后写入下一个文件，
+# 文件在程序退出（crawler_server 为每个任务结束）时才关闭，中途强制结束进程会丢失未关闭的文件
+PARQUET_COMPRESSION = "zstd"  # zstd | snappy | gzip | none
+PARQUET_ROW_GROUP_SIZE = 10000
+PARQUET_MAX_FILE_SIZE_MB = 256
+
+# csv、json 存储的文件压缩和分段：FILE_COMPRESSION 为 gzip 或 zstd 时每个分段是一个流式压缩文件，每次写入后同步刷新
+# （可直接用 zcat / zstdcat 或 pandas 读取，程序退出时写入压缩流结尾）；单个分段超过 FILE_ROTATE_MAX_MB 或 FILE_ROTATE_MAX_RECORDS 条记录后
+# 写入下一个分段，0 表示不限制，每次运行从新的分段开始。开启压缩或分段后 json 改为追加写入 JSON Lines（.jsonl），不再每次读出并重写整个文件，
+# 输出文件旁的 .manifest.json 列出所有分段；此时不生成词云，多进程分片运行时也不合并各进程的输出
+FILE_COMPRESSION = ""  # "" | gzip | zstd
+FILE_ROTATE_MAX_MB = 0
+FILE_ROTATE_MAX_RECORDS = 0
+
 from .bilibili_config import *
 from .xhs_config import *
 from .dy_config import *
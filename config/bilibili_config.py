@@ -45,3 +45,6 @@ CRAWLER_MAX_CONTACTS_COUNT_SINGLENOTES = 100
 
 # 单个视频/帖子最大爬取动态数
 CRAWLER_MAX_DYNAMICS_COUNT_SINGLENOTES = 50
+
+# 粉丝、关注、二级评论等返回总数的分页接口，第一页拿到总数后同时请求的页数，设置为 1 则逐页请求
+BILI_PAGE_CONCURRENCY = 4
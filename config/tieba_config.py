@@ -23,3 +23,9 @@ TIEBA_CREATOR_URL_LIST = [
     "https://tieba.baidu.com/home/main/?id=tb.1.7f139e2e.6CyEwxu3VJruH_-QqpCi6g&fr=frs",
     # ........................
 ]
+
+# 解析评论页使用的进程数量，评论页较大时解析会阻塞事件循环，可以放到进程池中解析，设置为 0 则在当前进程中解析
+TIEBA_PARSE_PROCESS_NUM = 0
+
+# 帖子评论同时请求的页数，帖子详情中已给出回复总页数，多页并发请求后按页码顺序入库，设置为 1 则逐页请求
+TIEBA_COMMENT_PAGE_CONCURRENCY = 4
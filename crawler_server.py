@@ -0,0 +1,325 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 常驻爬虫服务，为每个平台保持已登录的浏览器上下文和 API client，通过 HTTP 接收爬取任务
+import asyncio
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, status
+from playwright.async_api import Playwright, async_playwright
+from pydantic import BaseModel, Field
+
+import config
+import db
+from base.base_crawler import AbstractCrawler
+from main import PLATFORM_ID_LIST_CONFIG, CrawlerFactory
+from store import parquet_store, segmented_output, write_behind
+from tools import utils
+
+
+class CrawlJobRequest(BaseModel):
+    platform: str = Field(title="平台，xhs | dy | ks | bili | wb | tieba | zhihu")
+    crawler_type: str = Field(default="search", title="爬取类型，search | detail | creator")
+    keywords: Optional[str] = Field(default=None, title="关键词，以英文逗号分隔")
+    specified_ids: List[str] = Field(default_factory=list, title="指定帖子ID/URL列表")
+    creator_ids: List[str] = Field(default_factory=list, title="创作者ID/URL列表")
+    start_page: Optional[int] = Field(default=None, title="起始页码")
+    max_notes_count: Optional[int] = Field(default=None, title="爬取帖子数量")
+    get_comment: Optional[bool] = Field(default=None, title="是否爬取一级评论")
+    get_sub_comment: Optional[bool] = Field(default=None, title="是否爬取二级评论")
+
+
+class CrawlJob(BaseModel):
+    job_id: str = Field(title="任务ID")
+    request: CrawlJobRequest = Field(title="任务参数")
+    status: str = Field(default="pending", title="任务状态，pending | running | finished | failed")
+    error: str = Field(default="", title="失败原因")
+    created_ts: int = Field(default=0, title="创建时间")
+    started_ts: int = Field(default=0, title="开始时间")
+    finished_ts: int = Field(default=0, title="结束时间")
+
+
+def make_config_overrides(request: CrawlJobRequest) -> Dict:
+    """
+    把任务参数转换成任务执行期间需要覆盖的配置项
+    Args:
+        request: 任务参数
+
+    Returns:
+
+    """
+    overrides = {"PLATFORM": request.platform, "CRAWLER_TYPE": request.crawler_type}
+    if request.keywords is not None:
+        overrides["KEYWORDS"] = request.keywords
+    if request.start_page is not None:
+        overrides["START_PAGE"] = request.start_page
+    if request.max_notes_count is not None:
+        overrides["CRAWLER_MAX_NOTES_COUNT"] = request.max_notes_count
+    if request.get_comment is not None:
+        overrides["ENABLE_GET_COMMENTS"] = request.get_comment
+    if request.get_sub_comment is not None:
+        overrides["ENABLE_GET_SUB_COMMENTS"] = request.get_sub_comment
+    specified_id_config, creator_id_config = PLATFORM_ID_LIST_CONFIG[request.platform]
+    if request.specified_ids:
+        overrides[specified_id_config] = request.specified_ids
+    if request.creator_ids:
+        overrides[creator_id_config] = request.creator_ids
+    return overrides
+
+
+class CrawlerService:
+    def __init__(
+        self,
+        crawler_factory: Callable[[str], AbstractCrawler] = CrawlerFactory.create_crawler,
+        worker_num: int = config.CRAWLER_SERVER_WORKER_NUM,
+        max_finished_jobs: int = config.CRAWLER_SERVER_MAX_FINISHED_JOBS,
+    ):
+        self.crawler_factory = crawler_factory
+        self.worker_num = max(worker_num, 1)
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: Dict[str, CrawlJob] = {}
+        self.crawlers: Dict[str, AbstractCrawler] = {}
+        self.playwright: Optional[Playwright] = None
+        self._job_queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        # 同一平台共用一个浏览器上下文，任务持有平台锁串行执行
+        self._platform_locks: Dict[str, asyncio.Lock] = {}
+        # 首次使用平台时启动浏览器并登录，避免并发重复创建
+        self._prepare_locks: Dict[str, asyncio.Lock] = {}
+        self._playwright_lock = asyncio.Lock()
+        self._finished_job_ids: Deque[str] = deque()
+        self._running_job_count = 0
+
+    async def startup(self):
+        """
+        初始化数据库并启动任务消费协程
+        Returns:
+
+        """
+        if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
+            await db.init_db()
+        self._job_queue = asyncio.Queue()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.worker_num)]
+        utils.logger.info(f"[CrawlerService.startup] crawler service started with {self.worker_num} workers ...")
+
+    async def shutdown(self):
+        """
+        停止任务消费协程，关闭所有常驻的浏览器上下文
+        Returns:
+
+        """
+        for worker_task in self._worker_tasks:
+            worker_task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        for platform in list(self.crawlers.keys()):
+            await self.close_crawler(platform)
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+        await write_behind.drain()
+        await parquet_store.close_writers()
+        await segmented_output.close_outputs()
+        if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
+            await db.close()
+        utils.logger.info("[CrawlerService.shutdown] crawler service stopped ...")
+
+    def submit(self, request: CrawlJobRequest) -> CrawlJob:
+        """
+        提交爬取任务到队列
+        Args:
+            request: 任务参数
+
+        Returns:
+
+        """
+        job = CrawlJob(job_id=uuid.uuid4().hex, request=request, created_ts=utils.get_unix_timestamp())
+        self.jobs[job.job_id] = job
+        self._job_queue.put_nowait(job)
+        utils.logger.info(f"[CrawlerService.submit] job {job.job_id} submitted, platform: {request.platform}")
+        return job
+
+    def platform_lock(self, platform: str) -> asyncio.Lock:
+        """
+        获取平台的任务锁，使用平台常驻爬虫实例执行任务时需要持有
+        Args:
+            platform: 平台
+
+        Returns:
+
+        """
+        return self._platform_locks.setdefault(platform, asyncio.Lock())
+
+    async def get_crawler(self, platform: str) -> AbstractCrawler:
+        """
+        获取平台常驻的爬虫实例，首次使用时启动浏览器并完成登录
+        登录使用当前上下文的配置：任务中使用任务的配置，预热时使用全局配置
+        Args:
+            platform: 平台
+
+        Returns:
+
+        """
+        lock = self._prepare_locks.setdefault(platform, asyncio.Lock())
+        async with lock:
+            if platform not in self.crawlers:
+                async with self._playwright_lock:
+                    if not self.playwright:
+                        self.playwright = await async_playwright().start()
+                crawler = self.crawler_factory(platform)
+                with config.override_config({"PLATFORM": platform}):
+                    await crawler.prepare(self.playwright)
+                self.crawlers[platform] = crawler
+                utils.logger.info(f"[CrawlerService.get_crawler] {platform} crawler is warm now")
+            return self.crawlers[platform]
+
+    async def close_crawler(self, platform: str):
+        """
+        关闭平台常驻的浏览器上下文，下次任务会重新启动并登录
+        Args:
+            platform: 平台
+
+        Returns:
+
+        """
+        crawler = self.crawlers.pop(platform, None)
+        if not crawler:
+            return
+        try:
+            await crawler.close()
+        except Exception as e:
+            utils.logger.error(f"[CrawlerService.close_crawler] close {platform} crawler error: {e}")
+
+    async def run_job(self, job: CrawlJob):
+        """
+        执行单个爬取任务，任务参数只在本任务的协程上下文中覆盖配置，不影响并发执行的其他任务
+        同一平台的任务等待平台锁串行执行
+        Args:
+            job: 爬取任务
+
+        Returns:
+
+        """
+        platform = job.request.platform
+        async with self.platform_lock(platform):
+            job.status = "running"
+            job.started_ts = utils.get_unix_timestamp()
+            self._running_job_count += 1
+            try:
+                with config.override_config(make_config_overrides(job.request)):
+                    crawler = await self.get_crawler(platform)
+                    await crawler.crawl()
+                    # 任务结束时数据已全部写入
+                    await write_behind.join()
+                    # Parquet 文件和压缩分段在没有其他任务执行时关闭，之后即可完整读取
+                    if self._running_job_count == 1:
+                        await parquet_store.close_writers()
+                        await segmented_output.close_outputs()
+                job.status = "finished"
+            except Exception as e:
+                utils.logger.error(f"[CrawlerService.run_job] job {job.job_id} failed, err: {e}")
+                job.status = "failed"
+                job.error = str(e)
+                # 登录态或浏览器可能已失效，丢弃常驻实例，下次任务重新启动
+                await self.close_crawler(platform)
+            finally:
+                self._running_job_count -= 1
+                job.finished_ts = utils.get_unix_timestamp()
+
+    def _forget_finished_jobs(self, job: CrawlJob):
+        """
+        记录已结束的任务，超过保留数量后删除最早结束的任务
+        Args:
+            job: 已结束的任务
+
+        Returns:
+
+        """
+        self._finished_job_ids.append(job.job_id)
+        while len(self._finished_job_ids) > self.max_finished_jobs:
+            self.jobs.pop(self._finished_job_ids.popleft(), None)
+
+    async def _worker(self):
+        while True:
+            job = await self._job_queue.get()
+            try:
+                await self.run_job(job)
+            finally:
+                self._forget_finished_jobs(job)
+                self._job_queue.task_done()
+
+
+service = CrawlerService()
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await service.startup()
+    yield
+    await service.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def check_platform(platform: str):
+    if platform not in CrawlerFactory.CRAWLERS:
+        raise HTTPException(status_code=400, detail=f"Invalid platform: {platform}")
+
+
+@app.post("/jobs", status_code=status.HTTP_201_CREATED)
+async def submit_job(request: CrawlJobRequest) -> CrawlJob:
+    check_platform(request.platform)
+    if request.crawler_type not in ["search", "detail", "creator"]:
+        raise HTTPException(status_code=400, detail=f"Invalid crawler type: {request.crawler_type}")
+    return service.submit(request)
+
+
+@app.get("/jobs")
+async def list_jobs() -> List[CrawlJob]:
+    return list(service.jobs.values())
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> CrawlJob:
+    job = service.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job Not Found")
+    return job
+
+
+@app.get("/platforms")
+async def list_platforms():
+    return {"platforms": list(service.crawlers.keys())}
+
+
+@app.post("/platforms/{platform}/warmup")
+async def warmup_platform(platform: str):
+    check_platform(platform)
+    await service.get_crawler(platform)
+    return {"status": "ok"}
+
+
+@app.delete("/platforms/{platform}")
+async def close_platform(platform: str):
+    check_platform(platform)
+    # 等待平台正在执行的任务结束后再关闭
+    async with service.platform_lock(platform):
+        await service.close_crawler(platform)
+    return {"status": "ok"}
+
+
+if __name__ == '__main__':
+    uvicorn.run(app, port=config.CRAWLER_SERVER_PORT, host=config.CRAWLER_SERVER_HOST)
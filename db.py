@@ -14,7 +14,8 @@
 # @Time    : 2024/4/6 14:54
 # @Desc    : mediacrawler db 管理
 import asyncio
-from typing import Dict
+import re
+from typing import Dict, List, Tuple
 from urllib.parse import urlparse
 
 import aiofiles
@@ -23,9 +24,15 @@ import aiomysql
 import config
 from async_db import AsyncMysqlDB
 from async_sqlite_db import AsyncSqliteDB
+from store.store_util import clear_fingerprint_cache, get_db_write_stats
 from tools import utils
 from var import db_conn_pool_var, media_crawler_db_var
 
+SQLITE_SCHEMA_PATH = "schema/sqlite_tables.sql"
+SQLITE_CREATE_TABLE_PATTERN = re.compile(r"CREATE TABLE\s+(\w+)\s*\((.*?)\n\);", re.S)
+# 老版本创建的 SQLite 数据库文件中没有、启动时自动补上的字段
+SQLITE_MIGRATED_COLUMNS = ("fingerprint",)
+
 
 async def init_mediacrawler_db():
     """
@@ -55,11 +62,46 @@ async def init_sqlite_db():
 
     """
     async_db_obj = AsyncSqliteDB(config.SQLITE_DB_PATH)
-    
+    await migrate_sqlite_db(async_db_obj)
+
     # 将SQLite数据库对象放到上下文变量中
     media_crawler_db_var.set(async_db_obj)
 
 
+def load_sqlite_migrated_columns(schema_path: str = SQLITE_SCHEMA_PATH) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    从 SQLite 建表语句中找出需要自动补上的字段
+    Args:
+        schema_path: SQLite 建表语句文件
+
+    Returns: 表名 -> [(字段名, 字段定义)]
+
+    """
+    with open(schema_path, "r", encoding="utf-8") as f:
+        schema = f.read()
+    table_columns: Dict[str, List[Tuple[str, str]]] = {}
+    for table_name, table_body in SQLITE_CREATE_TABLE_PATTERN.findall(schema):
+        for line in table_body.splitlines():
+            parts = line.strip().rstrip(",").split(None, 1)
+            if len(parts) == 2 and parts[0] in SQLITE_MIGRATED_COLUMNS:
+                table_columns.setdefault(table_name, []).append((parts[0], parts[1]))
+    return table_columns
+
+
+async def migrate_sqlite_db(async_db_obj: AsyncSqliteDB):
+    """
+    为老版本创建的 SQLite 数据库文件补上后来新增的字段（如 fingerprint），字段已存在时不做修改
+    Args:
+        async_db_obj: SQLite数据库对象
+
+    Returns:
+
+    """
+    added_columns = await async_db_obj.add_missing_columns(load_sqlite_migrated_columns())
+    if added_columns:
+        utils.logger.info(f"[migrate_sqlite_db] added columns to the existing sqlite db: {added_columns}")
+
+
 async def init_db():
     """
     初始化db连接池
@@ -67,6 +109,8 @@ async def init_db():
 
     """
     utils.logger.info("[init_db] start init mediacrawler db connect object")
+    # 进程内的记录指纹缓存只对当前连接的数据库有效
+    clear_fingerprint_cache()
     if config.SAVE_DATA_OPTION == "sqlite":
         await init_sqlite_db()
         utils.logger.info("[init_db] end init sqlite db connect object")
@@ -82,6 +126,7 @@ async def close():
 
     """
     utils.logger.info("[close] close mediacrawler db connection")
+    utils.logger.info(f"[close] db writes (inserted / updated / skipped unchanged) by table: {get_db_write_stats()}")
     if config.SAVE_DATA_OPTION == "sqlite":
         # SQLite数据库连接会在AsyncSqliteDB对象销毁时自动关闭
         utils.logger.info("[close] sqlite db connection will be closed automatically")
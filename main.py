@@ -10,6 +10,7 @@
 
 
 import asyncio
+import importlib
 import sys
 from typing import Optional
 
@@ -17,46 +18,71 @@ import cmd_arg
 import config
 import db
 from base.base_crawler import AbstractCrawler
-from media_platform.bilibili import BilibiliCrawler
-from media_platform.douyin import DouYinCrawler
-from media_platform.kuaishou import KuaishouCrawler
-from media_platform.tieba import TieBaCrawler
-from media_platform.weibo import WeiboCrawler
-from media_platform.xhs import XiaoHongShuCrawler
-from media_platform.zhihu import ZhihuCrawler
 
 
 class CrawlerFactory:
+    # 平台 -> (模块路径, 爬虫类名)，只在创建时导入所选平台，避免启动时加载全部平台的依赖
     CRAWLERS = {
-        "xhs": XiaoHongShuCrawler,
-        "dy": DouYinCrawler,
-        "ks": KuaishouCrawler,
-        "bili": BilibiliCrawler,
-        "wb": WeiboCrawler,
-        "tieba": TieBaCrawler,
-        "zhihu": ZhihuCrawler,
+        "xhs": ("media_platform.xhs", "XiaoHongShuCrawler"),
+        "dy": ("media_platform.douyin", "DouYinCrawler"),
+        "ks": ("media_platform.kuaishou", "KuaishouCrawler"),
+        "bili": ("media_platform.bilibili", "BilibiliCrawler"),
+        "wb": ("media_platform.weibo", "WeiboCrawler"),
+        "tieba": ("media_platform.tieba", "TieBaCrawler"),
+        "zhihu": ("media_platform.zhihu", "ZhihuCrawler"),
     }
 
     @staticmethod
     def create_crawler(platform: str) -> AbstractCrawler:
-        crawler_class = CrawlerFactory.CRAWLERS.get(platform)
-        if not crawler_class:
+        crawler_info = CrawlerFactory.CRAWLERS.get(platform)
+        if not crawler_info:
             raise ValueError(
                 "Invalid Media Platform Currently only supported xhs or dy or ks or bili ..."
             )
+        module_name, class_name = crawler_info
+        crawler_class = getattr(importlib.import_module(module_name), class_name)
         return crawler_class()
 
 
+# 平台 -> (指定帖子ID配置项, 创作者ID配置项)
+PLATFORM_ID_LIST_CONFIG = {
+    "xhs": ("XHS_SPECIFIED_NOTE_URL_LIST", "XHS_CREATOR_ID_LIST"),
+    "dy": ("DY_SPECIFIED_ID_LIST", "DY_CREATOR_ID_LIST"),
+    "ks": ("KS_SPECIFIED_ID_LIST", "KS_CREATOR_ID_LIST"),
+    "bili": ("BILI_SPECIFIED_ID_LIST", "BILI_CREATOR_ID_LIST"),
+    "wb": ("WEIBO_SPECIFIED_ID_LIST", "WEIBO_CREATOR_ID_LIST"),
+    "tieba": ("TIEBA_SPECIFIED_ID_LIST", "TIEBA_CREATOR_URL_LIST"),
+    "zhihu": ("ZHIHU_SPECIFIED_ID_LIST", "ZHIHU_CREATOR_URL_LIST"),
+}
+
+
 crawler: Optional[AbstractCrawler] = None
+profiler = None
+loop_monitor = None
+metrics_server = None
 
 
 async def main():
     # Init crawler
-    global crawler
+    global crawler, profiler, loop_monitor, metrics_server
 
     # parse cmd
     await cmd_arg.parse_cmd()
 
+    if config.ENABLE_PROFILE:
+        from tools.profiler import CoroutineProfiler
+        profiler = CoroutineProfiler(asyncio.get_running_loop(), config.PROFILE_SAMPLE_INTERVAL_MS)
+        profiler.start()
+
+    if config.ENABLE_LOOP_MONITOR:
+        from tools.loop_monitor import LoopLagMonitor
+        loop_monitor = LoopLagMonitor(asyncio.get_running_loop(), config.LOOP_LAG_THRESHOLD_MS)
+        loop_monitor.start()
+
+    if config.ENABLE_METRICS:
+        from tools import metrics
+        metrics_server = metrics.start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+
     # init db
     if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
         await db.init_db()
@@ -66,9 +92,33 @@ async def main():
 
 
 def cleanup():
+    if loop_monitor:
+        loop_monitor.stop()
+        loop_monitor.report()
+    if profiler:
+        from tools import utils
+        profiler.stop()
+        profiler.save(config.PROFILE_OUTPUT_DIR, f"{config.PLATFORM}_{config.CRAWLER_TYPE}_{utils.get_current_timestamp()}")
+    if metrics_server:
+        from tools import metrics, utils
+        metrics_server.shutdown()
+        metrics.save_json_summary(config.METRICS_OUTPUT_DIR,
+                                  f"{config.PLATFORM}_{config.CRAWLER_TYPE}_{utils.get_current_timestamp()}")
     if crawler:
         # asyncio.run(crawler.close())
         pass
+    if config.ENABLE_WRITE_BEHIND:
+        # 写入队列中剩余的记录需要在数据库连接关闭前写完
+        from store import write_behind
+        write_behind.drain_on_shutdown()
+    if config.SAVE_DATA_OPTION == "parquet":
+        # Parquet 文件关闭时才写入文件尾，未关闭的文件无法读取
+        from store import parquet_store
+        asyncio.run(parquet_store.close_writers())
+    if config.SAVE_DATA_OPTION in ["csv", "json"]:
+        # 压缩分段需要写入压缩流结尾
+        from store import segmented_output
+        asyncio.run(segmented_output.close_outputs())
     if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
         asyncio.run(db.close())
 
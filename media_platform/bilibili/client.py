@@ -13,9 +13,10 @@
 # @Time    : 2023/12/2 18:44
 # @Desc    : bilibili 请求客户端
 import asyncio
+import functools
 import json
 import random
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 from urllib.parse import urlencode
 
 import httpx
@@ -23,7 +24,12 @@ from playwright.async_api import BrowserContext, Page
 
 import config
 from base.base_crawler import AbstractApiClient
-from tools import utils
+from replay.transport import create_async_client
+from tools import metrics, utils
+from tools.comment_watermark import CommentWatermark
+from tools.login_state import invalidate_login_state
+from tools.paginator import iter_known_total_pages
+from tools.sub_comment_scheduler import SubCommentScheduler
 
 from .exception import DataFetchError
 from .field import CommentOrderType, SearchOrderType
@@ -31,6 +37,10 @@ from .help import BilibiliSign
 
 
 class BilibiliClient(AbstractApiClient):
+    # 风控拦截的返回码
+    BLOCKED_CODES = (-412, -352)
+    # 账号未登录的返回码
+    NOT_LOGIN_CODE = -101
 
     def __init__(
         self,
@@ -47,19 +57,26 @@ class BilibiliClient(AbstractApiClient):
         self._host = "https://api.bilibili.com"
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
+        self.sub_comment_scheduler = SubCommentScheduler(config.SUB_COMMENT_CONCURRENCY_PER_NOTE,
+                                                         config.SUB_COMMENT_MAX_CONCURRENCY)
 
     async def request(self, method, url, **kwargs) -> Any:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-        try:
-            data: Dict = response.json()
-        except json.JSONDecodeError:
-            utils.logger.error(f"[BilibiliClient.request] Failed to decode JSON from response. status_code: {response.status_code}, response_text: {response.text}")
-            raise DataFetchError(f"Failed to decode JSON, content: {response.text}")
-        if data.get("code") != 0:
-            raise DataFetchError(data.get("message", "unkonw error"))
-        else:
-            return data.get("data", {})
+        with metrics.track_request("bili", url) as tracker:
+            async with create_async_client(proxy=self.proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, **kwargs)
+            try:
+                data: Dict = response.json()
+            except json.JSONDecodeError:
+                utils.logger.error(f"[BilibiliClient.request] Failed to decode JSON from response. status_code: {response.status_code}, response_text: {response.text}")
+                raise DataFetchError(f"Failed to decode JSON, content: {response.text}")
+            if data.get("code") != 0:
+                if data.get("code") in self.BLOCKED_CODES:
+                    tracker.outcome = metrics.OUTCOME_BLOCKED
+                elif data.get("code") == self.NOT_LOGIN_CODE:
+                    invalidate_login_state("bili", data.get("message", "not login"))
+                raise DataFetchError(data.get("message", "unkonw error"))
+            else:
+                return data.get("data", {})
 
     async def pre_request_data(self, req_data: Dict) -> Dict:
         """
@@ -200,8 +217,9 @@ class BilibiliClient(AbstractApiClient):
 
         return await self.get(uri, params, enable_params_sign=True)
 
+    @metrics.metered_media_download("bili")
     async def get_video_media(self, url: str) -> Union[bytes, None]:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
+        async with create_async_client(proxy=self.proxy) as client:
             try:
                 response = await client.request("GET", url, timeout=self.timeout, headers=self.headers)
                 response.raise_for_status()
@@ -230,41 +248,44 @@ class BilibiliClient(AbstractApiClient):
         post_data = {"oid": video_id, "mode": order_mode.value, "type": 1, "ps": 20, "next": next}
         return await self.get(uri, post_data)
 
-    async def get_video_all_comments(
+    async def iter_comments(
         self,
         video_id: str,
         crawl_interval: float = 1.0,
         is_fetch_sub_comments=False,
-        callback: Optional[Callable] = None,
         max_count: int = 10,
-    ):
+        order_mode: CommentOrderType = CommentOrderType.DEFAULT,
+        watermark: Optional[CommentWatermark] = None,
+    ) -> AsyncIterator[List[Dict]]:
         """
-        get video all comments include sub comments
+        逐页获取视频评论，开启二级评论时每页一级评论之后紧跟着各楼层的二级评论（各楼层并发翻页，按楼层顺序产出）；
+        调用方处理完一页后才会请求下一页，内存中只保留当前页
         :param video_id:
         :param crawl_interval:
         :param is_fetch_sub_comments:
-        :param callback:
-        max_count: 一次笔记爬取的最大评论数量
+        :param max_count: 一次笔记爬取的最大一级评论数量
+        :param order_mode: 一级评论排序方式
+        :param watermark: 已入库的最新一级评论，需要配合 CommentOrderType.TIME 使用，翻页到该评论时停止
 
-        :return:
+        :return: 每次产出一页评论
         """
-        result = []
+        comments_count = 0
         is_end = False
         next_page = 0
         max_retries = 3
-        while not is_end and len(result) < max_count:
+        while not is_end and comments_count < max_count:
             comments_res = None
             for attempt in range(max_retries):
                 try:
-                    comments_res = await self.get_video_comments(video_id, CommentOrderType.DEFAULT, next_page)
+                    comments_res = await self.get_video_comments(video_id, order_mode, next_page)
                     break  # Success
                 except DataFetchError as e:
                     if attempt < max_retries - 1:
                         delay = 5 * (2**attempt) + random.uniform(0, 1)
-                        utils.logger.warning(f"[BilibiliClient.get_video_all_comments] Retrying video_id {video_id} in {delay:.2f}s... (Attempt {attempt + 1}/{max_retries})")
+                        utils.logger.warning(f"[BilibiliClient.iter_comments] Retrying video_id {video_id} in {delay:.2f}s... (Attempt {attempt + 1}/{max_retries})")
                         await asyncio.sleep(delay)
                     else:
-                        utils.logger.error(f"[BilibiliClient.get_video_all_comments] Max retries reached for video_id: {video_id}. Skipping comments. Error: {e}")
+                        utils.logger.error(f"[BilibiliClient.iter_comments] Max retries reached for video_id: {video_id}. Skipping comments. Error: {e}")
                         is_end = True
                         break
             if not comments_res:
@@ -272,35 +293,70 @@ class BilibiliClient(AbstractApiClient):
 
             cursor_info: Dict = comments_res.get("cursor")
             if not cursor_info:
-                utils.logger.warning(f"[BilibiliClient.get_video_all_comments] Could not find 'cursor' in response for video_id: {video_id}. Skipping.")
+                utils.logger.warning(f"[BilibiliClient.iter_comments] Could not find 'cursor' in response for video_id: {video_id}. Skipping.")
                 break
 
-            comment_list: List[Dict] = comments_res.get("replies", [])
+            comment_list: List[Dict] = comments_res.get("replies") or []
 
             # 检查 is_end 和 next 是否存在
             if "is_end" not in cursor_info or "next" not in cursor_info:
-                utils.logger.warning(f"[BilibiliClient.get_video_all_comments] 'is_end' or 'next' not in cursor for video_id: {video_id}. Assuming end of comments.")
+                utils.logger.warning(f"[BilibiliClient.iter_comments] 'is_end' or 'next' not in cursor for video_id: {video_id}. Assuming end of comments.")
                 is_end = True
             else:
                 is_end = cursor_info.get("is_end")
                 next_page = cursor_info.get("next")
 
             if not isinstance(is_end, bool):
-                utils.logger.warning(f"[BilibiliClient.get_video_all_comments] 'is_end' is not a boolean for video_id: {video_id}. Assuming end of comments.")
+                utils.logger.warning(f"[BilibiliClient.iter_comments] 'is_end' is not a boolean for video_id: {video_id}. Assuming end of comments.")
                 is_end = True
-            if is_fetch_sub_comments:
-                for comment in comment_list:
-                    comment_id = comment['rpid']
-                    if (comment.get("rcount", 0) > 0):
-                        {await self.get_video_all_level_two_comments(video_id, comment_id, CommentOrderType.DEFAULT, 10, crawl_interval, callback)}
-            if len(result) + len(comment_list) > max_count:
-                comment_list = comment_list[:max_count - len(result)]
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(video_id, comment_list)
+            if watermark:
+                comment_list, reached = watermark.take_new(comment_list, lambda c: c.get("rpid"), lambda c: c.get("ctime"))
+                if reached:
+                    utils.logger.info(f"[BilibiliClient.iter_comments] video_id: {video_id} reached stored comment {watermark}, stop paging")
+                    is_end = True
+                    if not comment_list:
+                        break
+            if comments_count + len(comment_list) > max_count:
+                comment_list = comment_list[:max_count - comments_count]
+            comments_count += len(comment_list)
+            yield comment_list
             await asyncio.sleep(crawl_interval)
             if not is_fetch_sub_comments:
-                result.extend(comment_list)
                 continue
+            # 各回复楼层并发翻页
+            fetchers = [
+                functools.partial(self.get_video_all_level_two_comments, video_id, comment['rpid'],
+                                  CommentOrderType.DEFAULT, 10, crawl_interval)
+                for comment in comment_list if comment.get("rcount", 0) > 0
+            ]
+            for sub_comments in await self.sub_comment_scheduler.run(fetchers):
+                if sub_comments:
+                    yield sub_comments
+
+    async def get_video_all_comments(
+        self,
+        video_id: str,
+        crawl_interval: float = 1.0,
+        is_fetch_sub_comments=False,
+        callback: Optional[Callable] = None,
+        max_count: int = 10,
+    ):
+        """
+        get video all comments include sub comments
+        评论较多时使用 iter_comments 逐页处理，避免所有评论同时保存在内存中
+        :param video_id:
+        :param crawl_interval:
+        :param is_fetch_sub_comments:
+        :param callback:
+        max_count: 一次笔记爬取的最大评论数量
+
+        :return:
+        """
+        result = []
+        async for comment_list in self.iter_comments(video_id, crawl_interval, is_fetch_sub_comments, max_count):
+            if callback:  # 如果有回调函数，就执行回调函数
+                await callback(video_id, comment_list)
+            result.extend(comment_list)
         return result
 
     async def get_video_all_level_two_comments(
@@ -311,7 +367,7 @@ class BilibiliClient(AbstractApiClient):
         ps: int = 10,
         crawl_interval: float = 1.0,
         callback: Optional[Callable] = None,
-    ) -> Dict:
+    ) -> List[Dict]:
         """
         get video all level two comments for a level one comment
         :param video_id: 视频 ID
@@ -320,20 +376,25 @@ class BilibiliClient(AbstractApiClient):
         :param ps: 一页评论数
         :param crawl_interval:
         :param callback:
-        :return:
+        :return: 二级评论列表
         """
 
-        pn = 1
-        while True:
-            result = await self.get_video_level_two_comments(video_id, level_one_comment_id, pn, ps, order_mode)
-            comment_list: List[Dict] = result.get("replies", [])
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(video_id, comment_list)
-            await asyncio.sleep(crawl_interval)
-            if (int(result["page"]["count"]) <= pn * ps):
-                break
-
-            pn += 1
+        all_comments: List[Dict] = []
+        # 第一页返回回复总数后，剩余的页并发请求
+        comment_pages = iter_known_total_pages(
+            lambda pn: self.get_video_level_two_comments(video_id, level_one_comment_id, pn, ps, order_mode),
+            lambda result: int(result["page"]["count"]), page_size=ps,
+            concurrency=config.BILI_PAGE_CONCURRENCY, crawl_interval=crawl_interval,
+        )
+        try:
+            async for _, result in comment_pages:
+                comment_list: List[Dict] = result.get("replies") or []
+                all_comments.extend(comment_list)
+                if callback:  # 如果有回调函数，就执行回调函数
+                    await callback(video_id, comment_list)
+        finally:
+            await comment_pages.aclose()
+        return all_comments
 
     async def get_video_level_two_comments(
         self,
@@ -380,6 +441,25 @@ class BilibiliClient(AbstractApiClient):
         }
         return await self.get(uri, post_data)
 
+    async def iter_creator_posts(self, creator_id: int, crawl_interval: float = 1.0, ps: int = 30) -> AsyncIterator[List[Dict]]:
+        """
+        逐页获取up主的所有视频，调用方处理完一页后才会请求下一页，内存中只保留当前页
+        :param creator_id: 创作者 ID
+        :param crawl_interval: 翻页间隔
+        :param ps: 一页视频数
+
+        :return: 每次产出一页视频
+        """
+        pn = 1
+        while True:
+            result = await self.get_creator_videos(creator_id, pn, ps)
+            yield result["list"]["vlist"]
+            if int(result["page"]["count"]) <= pn * ps:
+                break
+            await asyncio.sleep(crawl_interval)
+            utils.logger.info(f"[BilibiliClient.iter_creator_posts] Sleeping for {crawl_interval} seconds after page {pn}")
+            pn += 1
+
     async def get_creator_info(self, creator_id: int) -> Dict:
         """
         get creator info
@@ -469,20 +549,26 @@ class BilibiliClient(AbstractApiClient):
         """
         creator_id = creator_info["id"]
         result = []
-        pn = config.START_CONTACTS_PAGE
-        while len(result) < max_count:
-            fans_res: Dict = await self.get_creator_fans(creator_id, pn=pn)
-            fans_list: List[Dict] = fans_res.get("list", [])
-
-            pn += 1
-            if len(result) + len(fans_list) > max_count:
-                fans_list = fans_list[:max_count - len(result)]
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(creator_info, fans_list)
-            await asyncio.sleep(crawl_interval)
-            if not fans_list:
-                break
-            result.extend(fans_list)
+        # 第一页返回总数后，剩余的页并发请求
+        fans_pages = iter_known_total_pages(
+            functools.partial(self.get_creator_fans, creator_id), lambda res: res.get("total", 0), page_size=24,
+            first_page=config.START_CONTACTS_PAGE, concurrency=config.BILI_PAGE_CONCURRENCY,
+            crawl_interval=crawl_interval, max_items=max_count,
+        )
+        try:
+            async for _, fans_res in fans_pages:
+                fans_list: List[Dict] = fans_res.get("list") or []
+                if len(result) + len(fans_list) > max_count:
+                    fans_list = fans_list[:max_count - len(result)]
+                if callback:  # 如果有回调函数，就执行回调函数
+                    await callback(creator_info, fans_list)
+                if not fans_list:
+                    break
+                result.extend(fans_list)
+                if len(result) >= max_count:
+                    break
+        finally:
+            await fans_pages.aclose()
         return result
 
     async def get_creator_all_followings(
@@ -503,20 +589,26 @@ class BilibiliClient(AbstractApiClient):
         """
         creator_id = creator_info["id"]
         result = []
-        pn = config.START_CONTACTS_PAGE
-        while len(result) < max_count:
-            followings_res: Dict = await self.get_creator_followings(creator_id, pn=pn)
-            followings_list: List[Dict] = followings_res.get("list", [])
-
-            pn += 1
-            if len(result) + len(followings_list) > max_count:
-                followings_list = followings_list[:max_count - len(result)]
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(creator_info, followings_list)
-            await asyncio.sleep(crawl_interval)
-            if not followings_list:
-                break
-            result.extend(followings_list)
+        # 第一页返回总数后，剩余的页并发请求
+        followings_pages = iter_known_total_pages(
+            functools.partial(self.get_creator_followings, creator_id), lambda res: res.get("total", 0), page_size=24,
+            first_page=config.START_CONTACTS_PAGE, concurrency=config.BILI_PAGE_CONCURRENCY,
+            crawl_interval=crawl_interval, max_items=max_count,
+        )
+        try:
+            async for _, followings_res in followings_pages:
+                followings_list: List[Dict] = followings_res.get("list") or []
+                if len(result) + len(followings_list) > max_count:
+                    followings_list = followings_list[:max_count - len(result)]
+                if callback:  # 如果有回调函数，就执行回调函数
+                    await callback(creator_info, followings_list)
+                if not followings_list:
+                    break
+                result.extend(followings_list)
+                if len(result) >= max_count:
+                    break
+        finally:
+            await followings_pages.aclose()
         return result
 
     async def get_creator_all_dynamics(
@@ -19,7 +19,6 @@ import os
 from asyncio import Task
 from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
-import pandas as pd
 
 from playwright.async_api import (
     BrowserContext,
@@ -36,11 +35,13 @@ from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import bilibili as bilibili_store
 from tools import utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.comment_watermark import delta_comments_enabled
+from tools.login_state import LoginStateManager
 from var import crawler_type_var, source_keyword_var
 
 from .client import BilibiliClient
 from .exception import DataFetchError
-from .field import SearchOrderType
+from .field import CommentOrderType, SearchOrderType
 from .login import BilibiliLogin
 
 
@@ -56,60 +57,83 @@ class BilibiliCrawler(AbstractCrawler):
         self.cdp_manager = None
 
     async def start(self):
+        async with async_playwright() as playwright:
+            await self.prepare(playwright)
+            await self.crawl()
+
+    async def prepare(self, playwright: Playwright):
+        """
+        启动浏览器、完成登录并创建 API client，常驻服务模式下每个平台只需调用一次
+        Args:
+            playwright: playwright 实例
+
+        Returns:
+
+        """
         playwright_proxy_format, httpx_proxy_format = None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(config.IP_PROXY_POOL_COUNT, enable_validate_ip=True)
             ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
             playwright_proxy_format, httpx_proxy_format = utils.format_proxy_info(ip_proxy_info)
 
-        async with async_playwright() as playwright:
-            # 根据配置选择启动模式
-            if config.ENABLE_CDP_MODE:
-                utils.logger.info("[BilibiliCrawler] 使用CDP模式启动浏览器")
-                self.browser_context = await self.launch_browser_with_cdp(
-                    playwright,
-                    playwright_proxy_format,
-                    self.user_agent,
-                    headless=config.CDP_HEADLESS,
-                )
-            else:
-                utils.logger.info("[BilibiliCrawler] 使用标准模式启动浏览器")
-                # Launch a browser context.
-                chromium = playwright.chromium
-                self.browser_context = await self.launch_browser(chromium, None, self.user_agent, headless=config.HEADLESS)
-            # stealth.min.js is a js script to prevent the website from detecting the crawler.
-            await self.browser_context.add_init_script(path="libs/stealth.min.js")
-            self.context_page = await self.browser_context.new_page()
-            await self.context_page.goto(self.index_url)
-
-            # Create a client to interact with the xiaohongshu website.
-            self.bili_client = await self.create_bilibili_client(httpx_proxy_format)
-            if not await self.bili_client.pong():
-                login_obj = BilibiliLogin(
-                    login_type=config.LOGIN_TYPE,
-                    login_phone="",  # your phone number
-                    browser_context=self.browser_context,
-                    context_page=self.context_page,
-                    cookie_str=config.COOKIES,
-                )
-                await login_obj.begin()
-                await self.bili_client.update_cookies(browser_context=self.browser_context)
-
-            crawler_type_var.set(config.CRAWLER_TYPE)
-            if config.CRAWLER_TYPE == "search":
-                await self.search()
-            elif config.CRAWLER_TYPE == "detail":
-                # Get the information and comments of the specified post
-                await self.get_specified_videos(config.BILI_SPECIFIED_ID_LIST)
-            elif config.CRAWLER_TYPE == "creator":
-                if config.CREATOR_MODE:
-                    for creator_id in config.BILI_CREATOR_ID_LIST:
-                        await self.get_creator_videos(int(creator_id))
-                else:
-                    await self.get_all_creator_details(config.BILI_CREATOR_ID_LIST)
+        # 根据配置选择启动模式
+        if config.ENABLE_CDP_MODE:
+            utils.logger.info("[BilibiliCrawler] 使用CDP模式启动浏览器")
+            self.browser_context = await self.launch_browser_with_cdp(
+                playwright,
+                playwright_proxy_format,
+                self.user_agent,
+                headless=config.CDP_HEADLESS,
+            )
+        else:
+            utils.logger.info("[BilibiliCrawler] 使用标准模式启动浏览器")
+            # Launch a browser context.
+            chromium = playwright.chromium
+            self.browser_context = await self.launch_browser(chromium, None, self.user_agent, headless=config.HEADLESS)
+        # stealth.min.js is a js script to prevent the website from detecting the crawler.
+        await self.browser_context.add_init_script(path="libs/stealth.min.js")
+        self.context_page = await self.browser_context.new_page()
+        await self.context_page.goto(self.index_url)
+
+        login_state = LoginStateManager("bili", self.browser_context, self.context_page)
+        session_fresh = await login_state.restore_if_fresh()
+
+        # Create a client to interact with the xiaohongshu website.
+        self.bili_client = await self.create_bilibili_client(httpx_proxy_format)
+        if not session_fresh and not await self.bili_client.pong():
+            login_obj = BilibiliLogin(
+                login_type=config.LOGIN_TYPE,
+                login_phone="",  # your phone number
+                browser_context=self.browser_context,
+                context_page=self.context_page,
+                cookie_str=config.COOKIES,
+            )
+            await login_obj.begin()
+            await self.bili_client.update_cookies(browser_context=self.browser_context)
+        if not session_fresh:
+            await login_state.save()
+
+    async def crawl(self):
+        """
+        按当前 config.CRAWLER_TYPE 执行一次爬取任务，调用前需先执行 prepare
+        Returns:
+
+        """
+        crawler_type_var.set(config.CRAWLER_TYPE)
+        if config.CRAWLER_TYPE == "search":
+            await self.search()
+        elif config.CRAWLER_TYPE == "detail":
+            # Get the information and comments of the specified post
+            await self.get_specified_videos(config.BILI_SPECIFIED_ID_LIST)
+        elif config.CRAWLER_TYPE == "creator":
+            if config.CREATOR_MODE:
+                for creator_id in config.BILI_CREATOR_ID_LIST:
+                    await self.get_creator_videos(int(creator_id))
             else:
-                pass
-            utils.logger.info("[BilibiliCrawler.start] Bilibili Crawler finished ...")
+                await self.get_all_creator_details(config.BILI_CREATOR_ID_LIST)
+        else:
+            pass
+        utils.logger.info("[BilibiliCrawler.crawl] Bilibili Crawler finished ...")
 
     async def search(self):
         """
@@ -221,6 +245,9 @@ class BilibiliCrawler(AbstractCrawler):
         :param daily_limit: if True, strictly limit the number of notes per day and total.
         """
         utils.logger.info(f"[BilibiliCrawler.search_by_keywords_in_time_range] Begin search with daily_limit={daily_limit}")
+        # pandas 仅用于生成日期区间，延迟到按时间范围搜索时再导入
+        import pandas as pd
+
         bili_limit_count = 20
         start_page = config.START_PAGE
 
@@ -330,13 +357,21 @@ class BilibiliCrawler(AbstractCrawler):
                 utils.logger.info(f"[BilibiliCrawler.get_comments] begin get video_id: {video_id} comments ...")
                 await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 utils.logger.info(f"[BilibiliCrawler.get_comments] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after fetching comments for video {video_id}")
-                await self.bili_client.get_video_all_comments(
+                # 增量模式按时间倒序翻页，翻到已入库的评论即停止
+                order_mode, watermark = CommentOrderType.DEFAULT, None
+                if delta_comments_enabled():
+                    order_mode = CommentOrderType.TIME
+                    watermark = await bilibili_store.query_video_comment_watermark(video_id)
+                    utils.logger.info(f"[BilibiliCrawler.get_comments] video_id: {video_id} delta comments since {watermark}")
+                async for comments in self.bili_client.iter_comments(
                     video_id=video_id,
                     crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
                     is_fetch_sub_comments=config.ENABLE_GET_SUB_COMMENTS,
-                    callback=bilibili_store.batch_update_bilibili_video_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
-                )
+                    order_mode=order_mode,
+                    watermark=watermark,
+                ):
+                    await bilibili_store.batch_update_bilibili_video_comments(video_id, comments)
 
             except DataFetchError as ex:
                 utils.logger.error(f"[BilibiliCrawler.get_comments] get video_id: {video_id} comment error: {ex}")
@@ -350,17 +385,8 @@ class BilibiliCrawler(AbstractCrawler):
         get videos for a creator
         :return:
         """
-        ps = 30
-        pn = 1
-        while True:
-            result = await self.bili_client.get_creator_videos(creator_id, pn, ps)
-            video_bvids_list = [video["bvid"] for video in result["list"]["vlist"]]
-            await self.get_specified_videos(video_bvids_list)
-            if int(result["page"]["count"]) <= pn * ps:
-                break
-            await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
-            utils.logger.info(f"[BilibiliCrawler.get_creator_videos] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds after page {pn}")
-            pn += 1
+        async for video_list in self.bili_client.iter_creator_posts(creator_id, config.CRAWLER_MAX_SLEEP_SEC):
+            await self.get_specified_videos([video["bvid"] for video in video_list])
 
     async def get_specified_videos(self, bvids_list: List[str]):
         """
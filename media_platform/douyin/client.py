@@ -10,15 +10,20 @@
 
 import asyncio
 import copy
+import functools
 import json
 import urllib.parse
-from typing import Any, Callable, Dict, Union, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Union, Optional
 
 import httpx
 from playwright.async_api import BrowserContext
 
+import config
 from base.base_crawler import AbstractApiClient
-from tools import utils
+from replay.transport import create_async_client
+from tools import metrics, utils
+from tools.login_state import invalidate_login_state
+from tools.sub_comment_scheduler import SubCommentScheduler
 from var import request_keyword_var
 
 from .exception import *
@@ -43,6 +48,8 @@ class DouYinClient(AbstractApiClient):
         self._host = "https://www.douyin.com"
         self.playwright_page = playwright_page
         self.cookie_dict = cookie_dict
+        self.sub_comment_scheduler = SubCommentScheduler(config.SUB_COMMENT_CONCURRENCY_PER_NOTE,
+                                                         config.SUB_COMMENT_MAX_CONCURRENCY)
 
     async def __process_req_params(
         self,
@@ -95,15 +102,18 @@ class DouYinClient(AbstractApiClient):
         params["a_bogus"] = a_bogus
 
     async def request(self, method, url, **kwargs):
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-        try:
-            if response.text == "" or response.text == "blocked":
-                utils.logger.error(f"request params incrr, response.text: {response.text}")
-                raise Exception("account blocked")
-            return response.json()
-        except Exception as e:
-            raise DataFetchError(f"{e}, {response.text}")
+        with metrics.track_request("dy", url) as tracker:
+            async with create_async_client(proxy=self.proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, **kwargs)
+            try:
+                if response.text == "" or response.text == "blocked":
+                    utils.logger.error(f"request params incrr, response.text: {response.text}")
+                    tracker.outcome = metrics.OUTCOME_BLOCKED
+                    invalidate_login_state("dy", "account blocked")
+                    raise Exception("account blocked")
+                return response.json()
+            except Exception as e:
+                raise DataFetchError(f"{e}, {response.text}")
 
     async def get(self, uri: str, params: Optional[Dict] = None, headers: Optional[Dict] = None):
         """
@@ -215,63 +225,103 @@ class DouYinClient(AbstractApiClient):
         headers["Referer"] = urllib.parse.quote(referer_url, safe=':/')
         return await self.get(uri, params)
 
-    async def get_aweme_all_comments(
+    async def iter_comments(
         self,
         aweme_id: str,
         crawl_interval: float = 1.0,
         is_fetch_sub_comments=False,
-        callback: Optional[Callable] = None,
         max_count: int = 10,
-    ):
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取帖子的所有评论，包括子评论
+        逐页获取帖子的评论，开启子评论时每页一级评论之后紧跟着各楼层的子评论（各楼层并发翻页，按楼层顺序产出）；
+        调用方处理完一页后才会请求下一页，内存中只保留当前页
         :param aweme_id: 帖子ID
         :param crawl_interval: 抓取间隔
         :param is_fetch_sub_comments: 是否抓取子评论
-        :param callback: 回调函数，用于处理抓取到的评论
-        :param max_count: 一次帖子爬取的最大评论数量
-        :return: 评论列表
+        :param max_count: 一次帖子爬取的最大一级评论数量
+        :return: 每次产出一页评论
         """
-        result = []
+        comments_count = 0
         comments_has_more = 1
         comments_cursor = 0
-        while comments_has_more and len(result) < max_count:
+        while comments_has_more and comments_count < max_count:
             comments_res = await self.get_aweme_comments(aweme_id, comments_cursor)
             comments_has_more = comments_res.get("has_more", 0)
             comments_cursor = comments_res.get("cursor", 0)
             comments = comments_res.get("comments", [])
             if not comments:
                 continue
-            if len(result) + len(comments) > max_count:
-                comments = comments[:max_count - len(result)]
-            result.extend(comments)
-            if callback:  # 如果有回调函数，就执行回调函数
-                await callback(aweme_id, comments)
+            if comments_count + len(comments) > max_count:
+                comments = comments[:max_count - comments_count]
+            comments_count += len(comments)
+            yield comments
 
             await asyncio.sleep(crawl_interval)
             if not is_fetch_sub_comments:
                 continue
-            # 获取二级评论
-            for comment in comments:
-                reply_comment_total = comment.get("reply_comment_total")
+            # 获取二级评论，各回复楼层并发翻页
+            fetchers = [
+                functools.partial(self.get_comment_all_sub_comments, aweme_id, comment.get("cid"), crawl_interval)
+                for comment in comments if comment.get("reply_comment_total", 0) > 0
+            ]
+            for sub_comments in await self.sub_comment_scheduler.run(fetchers):
+                if sub_comments:
+                    yield sub_comments
 
-                if reply_comment_total > 0:
-                    comment_id = comment.get("cid")
-                    sub_comments_has_more = 1
-                    sub_comments_cursor = 0
+    async def get_aweme_all_comments(
+        self,
+        aweme_id: str,
+        crawl_interval: float = 1.0,
+        is_fetch_sub_comments=False,
+        callback: Optional[Callable] = None,
+        max_count: int = 10,
+    ):
+        """
+        获取帖子的所有评论，包括子评论，评论较多时使用 iter_comments 逐页处理，避免所有评论同时保存在内存中
+        :param aweme_id: 帖子ID
+        :param crawl_interval: 抓取间隔
+        :param is_fetch_sub_comments: 是否抓取子评论
+        :param callback: 回调函数，用于处理抓取到的评论
+        :param max_count: 一次帖子爬取的最大评论数量
+        :return: 评论列表
+        """
+        result = []
+        async for comments in self.iter_comments(aweme_id, crawl_interval, is_fetch_sub_comments, max_count):
+            if callback:  # 如果有回调函数，就执行回调函数
+                await callback(aweme_id, comments)
+            result.extend(comments)
+        return result
 
-                    while sub_comments_has_more:
-                        sub_comments_res = await self.get_sub_comments(aweme_id, comment_id, sub_comments_cursor)
-                        sub_comments_has_more = sub_comments_res.get("has_more", 0)
-                        sub_comments_cursor = sub_comments_res.get("cursor", 0)
-                        sub_comments = sub_comments_res.get("comments", [])
+    async def get_comment_all_sub_comments(
+        self,
+        aweme_id: str,
+        comment_id: str,
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+    ) -> List[Dict]:
+        """
+        获取一条一级评论下的所有子评论
+        :param aweme_id: 帖子ID
+        :param comment_id: 一级评论ID
+        :param crawl_interval: 抓取间隔
+        :param callback: 回调函数，用于处理抓取到的评论
+        :return: 子评论列表
+        """
+        result = []
+        sub_comments_has_more = 1
+        sub_comments_cursor = 0
+        while sub_comments_has_more:
+            sub_comments_res = await self.get_sub_comments(aweme_id, comment_id, sub_comments_cursor)
+            sub_comments_has_more = sub_comments_res.get("has_more", 0)
+            sub_comments_cursor = sub_comments_res.get("cursor", 0)
+            sub_comments = sub_comments_res.get("comments", [])
 
-                        if not sub_comments:
-                            continue
-                        result.extend(sub_comments)
-                        if callback:  # 如果有回调函数，就执行回调函数
-                            await callback(aweme_id, sub_comments)
-                        await asyncio.sleep(crawl_interval)
+            if not sub_comments:
+                continue
+            result.extend(sub_comments)
+            if callback:  # 如果有回调函数，就执行回调函数
+                await callback(aweme_id, sub_comments)
+            await asyncio.sleep(crawl_interval)
         return result
 
     async def get_user_info(self, sec_user_id: str):
@@ -296,23 +346,33 @@ class DouYinClient(AbstractApiClient):
         }
         return await self.get(uri, params)
 
-    async def get_all_user_aweme_posts(self, sec_user_id: str, callback: Optional[Callable] = None):
+    async def iter_creator_posts(self, sec_user_id: str) -> AsyncIterator[List[Dict]]:
+        """
+        逐页获取用户发布的作品，调用方处理完一页后才会请求下一页，内存中只保留当前页
+        :param sec_user_id: 用户ID
+        :return: 每次产出一页作品
+        """
         posts_has_more = 1
         max_cursor = ""
-        result = []
         while posts_has_more == 1:
             aweme_post_res = await self.get_user_aweme_posts(sec_user_id, max_cursor)
             posts_has_more = aweme_post_res.get("has_more", 0)
             max_cursor = aweme_post_res.get("max_cursor")
             aweme_list = aweme_post_res.get("aweme_list") if aweme_post_res.get("aweme_list") else []
-            utils.logger.info(f"[DouYinClient.get_all_user_aweme_posts] get sec_user_id:{sec_user_id} video len : {len(aweme_list)}")
+            utils.logger.info(f"[DouYinClient.iter_creator_posts] get sec_user_id:{sec_user_id} video len : {len(aweme_list)}")
+            yield aweme_list
+
+    async def get_all_user_aweme_posts(self, sec_user_id: str, callback: Optional[Callable] = None):
+        result = []
+        async for aweme_list in self.iter_creator_posts(sec_user_id):
             if callback:
                 await callback(aweme_list)
             result.extend(aweme_list)
         return result
 
+    @metrics.metered_media_download("dy")
     async def get_aweme_media(self, url: str) -> Union[bytes, None]:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
+        async with create_async_client(proxy=self.proxy) as client:
             try:
                 response = await client.request("GET", url, timeout=self.timeout, follow_redirects=True)
                 response.raise_for_status()
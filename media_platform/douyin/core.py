@@ -28,6 +28,7 @@ from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import douyin as douyin_store
 from tools import utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.login_state import LoginStateManager
 from var import crawler_type_var, source_keyword_var
 
 from .client import DouYinClient
@@ -47,60 +48,84 @@ class DouYinCrawler(AbstractCrawler):
         self.cdp_manager = None
 
     async def start(self) -> None:
+        async with async_playwright() as playwright:
+            await self.prepare(playwright)
+            await self.crawl()
+
+    async def prepare(self, playwright: Playwright) -> None:
+        """
+        启动浏览器、完成登录并创建 API client，常驻服务模式下每个平台只需调用一次
+        Args:
+            playwright: playwright 实例
+
+        Returns:
+
+        """
         playwright_proxy_format, httpx_proxy_format = None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(config.IP_PROXY_POOL_COUNT, enable_validate_ip=True)
             ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
             playwright_proxy_format, httpx_proxy_format = utils.format_proxy_info(ip_proxy_info)
 
-        async with async_playwright() as playwright:
-            # 根据配置选择启动模式
-            if config.ENABLE_CDP_MODE:
-                utils.logger.info("[DouYinCrawler] 使用CDP模式启动浏览器")
-                self.browser_context = await self.launch_browser_with_cdp(
-                    playwright,
-                    playwright_proxy_format,
-                    None,
-                    headless=config.CDP_HEADLESS,
-                )
-            else:
-                utils.logger.info("[DouYinCrawler] 使用标准模式启动浏览器")
-                # Launch a browser context.
-                chromium = playwright.chromium
-                self.browser_context = await self.launch_browser(
-                    chromium,
-                    playwright_proxy_format,
-                    user_agent=None,
-                    headless=config.HEADLESS,
-                )
-            # stealth.min.js is a js script to prevent the website from detecting the crawler.
-            await self.browser_context.add_init_script(path="libs/stealth.min.js")
-            self.context_page = await self.browser_context.new_page()
-            await self.context_page.goto(self.index_url)
-
-            self.dy_client = await self.create_douyin_client(httpx_proxy_format)
-            if not await self.dy_client.pong(browser_context=self.browser_context):
-                login_obj = DouYinLogin(
-                    login_type=config.LOGIN_TYPE,
-                    login_phone="",  # you phone number
-                    browser_context=self.browser_context,
-                    context_page=self.context_page,
-                    cookie_str=config.COOKIES,
-                )
-                await login_obj.begin()
-                await self.dy_client.update_cookies(browser_context=self.browser_context)
-            crawler_type_var.set(config.CRAWLER_TYPE)
-            if config.CRAWLER_TYPE == "search":
-                # Search for notes and retrieve their comment information.
-                await self.search()
-            elif config.CRAWLER_TYPE == "detail":
-                # Get the information and comments of the specified post
-                await self.get_specified_awemes()
-            elif config.CRAWLER_TYPE == "creator":
-                # Get the information and comments of the specified creator
-                await self.get_creators_and_videos()
-
-            utils.logger.info("[DouYinCrawler.start] Douyin Crawler finished ...")
+        # 根据配置选择启动模式
+        if config.ENABLE_CDP_MODE:
+            utils.logger.info("[DouYinCrawler] 使用CDP模式启动浏览器")
+            self.browser_context = await self.launch_browser_with_cdp(
+                playwright,
+                playwright_proxy_format,
+                None,
+                headless=config.CDP_HEADLESS,
+            )
+        else:
+            utils.logger.info("[DouYinCrawler] 使用标准模式启动浏览器")
+            # Launch a browser context.
+            chromium = playwright.chromium
+            self.browser_context = await self.launch_browser(
+                chromium,
+                playwright_proxy_format,
+                user_agent=None,
+                headless=config.HEADLESS,
+            )
+        # stealth.min.js is a js script to prevent the website from detecting the crawler.
+        await self.browser_context.add_init_script(path="libs/stealth.min.js")
+        self.context_page = await self.browser_context.new_page()
+        await self.context_page.goto(self.index_url)
+
+        login_state = LoginStateManager("dy", self.browser_context, self.context_page)
+        session_fresh = await login_state.restore_if_fresh()
+
+        self.dy_client = await self.create_douyin_client(httpx_proxy_format)
+        if not session_fresh and not await self.dy_client.pong(browser_context=self.browser_context):
+            login_obj = DouYinLogin(
+                login_type=config.LOGIN_TYPE,
+                login_phone="",  # you phone number
+                browser_context=self.browser_context,
+                context_page=self.context_page,
+                cookie_str=config.COOKIES,
+            )
+            await login_obj.begin()
+            await self.dy_client.update_cookies(browser_context=self.browser_context)
+        if not session_fresh:
+            await login_state.save()
+
+    async def crawl(self) -> None:
+        """
+        按当前 config.CRAWLER_TYPE 执行一次爬取任务，调用前需先执行 prepare
+        Returns:
+
+        """
+        crawler_type_var.set(config.CRAWLER_TYPE)
+        if config.CRAWLER_TYPE == "search":
+            # Search for notes and retrieve their comment information.
+            await self.search()
+        elif config.CRAWLER_TYPE == "detail":
+            # Get the information and comments of the specified post
+            await self.get_specified_awemes()
+        elif config.CRAWLER_TYPE == "creator":
+            # Get the information and comments of the specified creator
+            await self.get_creators_and_videos()
+
+        utils.logger.info("[DouYinCrawler.crawl] Douyin Crawler finished ...")
 
     async def search(self) -> None:
         utils.logger.info("[DouYinCrawler.search] Begin search douyin keywords")
@@ -199,16 +224,15 @@ class DouYinCrawler(AbstractCrawler):
     async def get_comments(self, aweme_id: str, semaphore: asyncio.Semaphore) -> None:
         async with semaphore:
             try:
-                # 将关键词列表传递给 get_aweme_all_comments 方法
                 # Use fixed crawling interval
                 crawl_interval = config.CRAWLER_MAX_SLEEP_SEC
-                await self.dy_client.get_aweme_all_comments(
+                async for comments in self.dy_client.iter_comments(
                     aweme_id=aweme_id,
                     crawl_interval=crawl_interval,
                     is_fetch_sub_comments=config.ENABLE_GET_SUB_COMMENTS,
-                    callback=douyin_store.batch_update_dy_aweme_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
-                )
+                ):
+                    await douyin_store.batch_update_dy_aweme_comments(aweme_id, comments)
                 # Sleep after fetching comments
                 await asyncio.sleep(crawl_interval)
                 utils.logger.info(f"[DouYinCrawler.get_comments] Sleeping for {crawl_interval} seconds after fetching comments for aweme {aweme_id}")
@@ -226,11 +250,10 @@ class DouYinCrawler(AbstractCrawler):
             if creator_info:
                 await douyin_store.save_creator(user_id, creator=creator_info)
 
-            # Get all video information of the creator
-            all_video_list = await self.dy_client.get_all_user_aweme_posts(sec_user_id=user_id, callback=self.fetch_creator_video_detail)
-
-            video_ids = [video_item.get("aweme_id") for video_item in all_video_list]
-            await self.batch_get_note_comments(video_ids)
+            # Process the creator's videos page by page, only the current page is kept in memory
+            async for video_list in self.dy_client.iter_creator_posts(sec_user_id=user_id):
+                await self.fetch_creator_video_detail(video_list)
+                await self.batch_get_note_comments([video_item.get("aweme_id") for video_item in video_list])
 
     async def fetch_creator_video_detail(self, video_list: List[Dict]):
         """
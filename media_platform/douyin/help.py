@@ -20,7 +20,8 @@ import random
 import execjs
 from playwright.async_api import Page
 
-douyin_sign_obj = execjs.compile(open('libs/douyin.js', encoding='utf-8-sig').read())
+DOUYIN_SIGN_JS = None
+
 
 def get_web_id():
     """
@@ -61,10 +62,15 @@ def get_a_bogus_from_js(url: str, params: str, user_agent: str):
     Returns:
 
     """
+    global DOUYIN_SIGN_JS
+    if not DOUYIN_SIGN_JS:
+        with open("libs/douyin.js", mode="r", encoding="utf-8-sig") as f:
+            DOUYIN_SIGN_JS = execjs.compile(f.read())
+
     sign_js_name = "sign_datail"
     if "/reply" in url:
         sign_js_name = "sign_reply"
-    return douyin_sign_obj.call(sign_js_name, params, user_agent)
+    return DOUYIN_SIGN_JS.call(sign_js_name, params, user_agent)
 
 
 
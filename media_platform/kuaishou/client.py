@@ -12,15 +12,15 @@
 # -*- coding: utf-8 -*-
 import asyncio
 import json
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 from urllib.parse import urlencode
 
-import httpx
 from playwright.async_api import BrowserContext, Page
 
 import config
 from base.base_crawler import AbstractApiClient
-from tools import utils
+from replay.transport import create_async_client
+from tools import metrics, utils
 
 from .exception import DataFetchError
 from .graphql import KuaiShouGraphQL
@@ -45,13 +45,14 @@ class KuaiShouClient(AbstractApiClient):
         self.graphql = KuaiShouGraphQL()
 
     async def request(self, method, url, **kwargs) -> Any:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-        data: Dict = response.json()
-        if data.get("errors"):
-            raise DataFetchError(data.get("errors", "unkonw error"))
-        else:
-            return data.get("data", {})
+        with metrics.track_request("ks", url):
+            async with create_async_client(proxy=self.proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, **kwargs)
+            data: Dict = response.json()
+            if data.get("errors"):
+                raise DataFetchError(data.get("errors", "unkonw error"))
+            else:
+                return data.get("data", {})
 
     async def get(self, uri: str, params=None) -> Dict:
         final_uri = uri
@@ -177,6 +178,36 @@ class KuaiShouClient(AbstractApiClient):
         }
         return await self.post("", post_data)
 
+    async def iter_comments(
+        self,
+        photo_id: str,
+        crawl_interval: float = 1.0,
+        max_count: int = 10,
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        逐页获取视频评论，开启二级评论时每页一级评论之后紧跟着它们的二级评论；
+        调用方处理完一页后才会请求下一页，内存中只保留当前页
+        :param photo_id:
+        :param crawl_interval:
+        :param max_count: 最大一级评论数量
+        :return: 每次产出一页评论
+        """
+        comments_count = 0
+        pcursor = ""
+
+        while pcursor != "no_more" and comments_count < max_count:
+            comments_res = await self.get_video_comments(photo_id, pcursor)
+            vision_commen_list = comments_res.get("visionCommentList", {})
+            pcursor = vision_commen_list.get("pcursor", "")
+            comments = vision_commen_list.get("rootComments", [])
+            if comments_count + len(comments) > max_count:
+                comments = comments[: max_count - comments_count]
+            comments_count += len(comments)
+            yield comments
+            await asyncio.sleep(crawl_interval)
+            async for sub_comments in self.iter_sub_comments(comments, photo_id, crawl_interval):
+                yield sub_comments
+
     async def get_video_all_comments(
         self,
         photo_id: str,
@@ -186,6 +217,7 @@ class KuaiShouClient(AbstractApiClient):
     ):
         """
         get video all comments include sub comments
+        评论较多时使用 iter_comments 逐页处理，避免所有评论同时保存在内存中
         :param photo_id:
         :param crawl_interval:
         :param callback:
@@ -194,53 +226,37 @@ class KuaiShouClient(AbstractApiClient):
         """
 
         result = []
-        pcursor = ""
-
-        while pcursor != "no_more" and len(result) < max_count:
-            comments_res = await self.get_video_comments(photo_id, pcursor)
-            vision_commen_list = comments_res.get("visionCommentList", {})
-            pcursor = vision_commen_list.get("pcursor", "")
-            comments = vision_commen_list.get("rootComments", [])
-            if len(result) + len(comments) > max_count:
-                comments = comments[: max_count - len(result)]
+        async for comments in self.iter_comments(photo_id, crawl_interval, max_count):
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(photo_id, comments)
             result.extend(comments)
-            await asyncio.sleep(crawl_interval)
-            sub_comments = await self.get_comments_all_sub_comments(
-                comments, photo_id, crawl_interval, callback
-            )
-            result.extend(sub_comments)
         return result
 
-    async def get_comments_all_sub_comments(
+    async def iter_sub_comments(
         self,
         comments: List[Dict],
         photo_id,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
-    ) -> List[Dict]:
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取指定一级评论下的所有二级评论, 该方法会一直查找一级评论下的所有二级评论信息
+        逐页获取指定一级评论下的所有二级评论，一级评论中自带的二级评论作为第一页
         Args:
             comments: 评论列表
             photo_id: 视频id
             crawl_interval: 爬取一次评论的延迟单位（秒）
-            callback: 一次评论爬取结束后
-        Returns:
+        Returns: 每次产出一页二级评论
 
         """
         if not config.ENABLE_GET_SUB_COMMENTS:
             utils.logger.info(
-                f"[KuaiShouClient.get_comments_all_sub_comments] Crawling sub_comment mode is not enabled"
+                f"[KuaiShouClient.iter_sub_comments] Crawling sub_comment mode is not enabled"
             )
-            return []
+            return
 
-        result = []
         for comment in comments:
             sub_comments = comment.get("subComments")
-            if sub_comments and callback:
-                await callback(photo_id, sub_comments)
+            if sub_comments:
+                yield sub_comments
 
             sub_comment_pcursor = comment.get("subCommentsPcursor")
             if sub_comment_pcursor == "no_more":
@@ -256,11 +272,31 @@ class KuaiShouClient(AbstractApiClient):
                 vision_sub_comment_list = comments_res.get("visionSubCommentList", {})
                 sub_comment_pcursor = vision_sub_comment_list.get("pcursor", "no_more")
 
-                comments = vision_sub_comment_list.get("subComments", {})
-                if callback:
-                    await callback(photo_id, comments)
+                yield vision_sub_comment_list.get("subComments", [])
                 await asyncio.sleep(crawl_interval)
-                result.extend(comments)
+
+    async def get_comments_all_sub_comments(
+        self,
+        comments: List[Dict],
+        photo_id,
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+    ) -> List[Dict]:
+        """
+        获取指定一级评论下的所有二级评论, 该方法会一直查找一级评论下的所有二级评论信息
+        Args:
+            comments: 评论列表
+            photo_id: 视频id
+            crawl_interval: 爬取一次评论的延迟单位（秒）
+            callback: 一次评论爬取结束后
+        Returns:
+
+        """
+        result = []
+        async for sub_comments in self.iter_sub_comments(comments, photo_id, crawl_interval):
+            if callback:
+                await callback(photo_id, sub_comments)
+            result.extend(sub_comments)
         return result
 
     async def get_creator_info(self, user_id: str) -> Dict:
@@ -272,29 +308,26 @@ class KuaiShouClient(AbstractApiClient):
         visionProfile = await self.get_creator_profile(user_id)
         return visionProfile.get("userProfile")
 
-    async def get_all_videos_by_creator(
+    async def iter_creator_posts(
         self,
         user_id: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
-    ) -> List[Dict]:
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取指定用户下的所有发过的帖子，该方法会一直查找一个用户下的所有帖子信息
+        逐页获取指定用户发过的视频，调用方处理完一页后才会请求下一页，内存中只保留当前页
         Args:
             user_id: 用户ID
             crawl_interval: 爬取一次的延迟单位（秒）
-            callback: 一次分页爬取结束后的更新回调函数
-        Returns:
+        Returns: 每次产出一页视频
 
         """
-        result = []
         pcursor = ""
 
         while pcursor != "no_more":
             videos_res = await self.get_video_by_creater(user_id, pcursor)
             if not videos_res:
                 utils.logger.error(
-                    f"[KuaiShouClient.get_all_videos_by_creator] The current creator may have been banned by ks, so they cannot access the data."
+                    f"[KuaiShouClient.iter_creator_posts] The current creator may have been banned by ks, so they cannot access the data."
                 )
                 break
 
@@ -303,11 +336,30 @@ class KuaiShouClient(AbstractApiClient):
 
             videos = vision_profile_photo_list.get("feeds", [])
             utils.logger.info(
-                f"[KuaiShouClient.get_all_videos_by_creator] got user_id:{user_id} videos len : {len(videos)}"
+                f"[KuaiShouClient.iter_creator_posts] got user_id:{user_id} videos len : {len(videos)}"
             )
+            yield videos
+            await asyncio.sleep(crawl_interval)
+
+    async def get_all_videos_by_creator(
+        self,
+        user_id: str,
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+    ) -> List[Dict]:
+        """
+        获取指定用户下的所有发过的帖子，该方法会一直查找一个用户下的所有帖子信息
+        视频较多时使用 iter_creator_posts 逐页处理，避免所有视频同时保存在内存中
+        Args:
+            user_id: 用户ID
+            crawl_interval: 爬取一次的延迟单位（秒）
+            callback: 一次分页爬取结束后的更新回调函数
+        Returns:
 
+        """
+        result = []
+        async for videos in self.iter_creator_posts(user_id, crawl_interval):
             if callback:
                 await callback(videos)
-            await asyncio.sleep(crawl_interval)
             result.extend(videos)
         return result
@@ -30,6 +30,7 @@ from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import kuaishou as kuaishou_store
 from tools import utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.login_state import LoginStateManager
 from var import comment_tasks_var, crawler_type_var, source_keyword_var
 
 from .client import KuaiShouClient
@@ -49,6 +50,19 @@ class KuaishouCrawler(AbstractCrawler):
         self.cdp_manager = None
 
     async def start(self):
+        async with async_playwright() as playwright:
+            await self.prepare(playwright)
+            await self.crawl()
+
+    async def prepare(self, playwright: Playwright):
+        """
+        启动浏览器、完成登录并创建 API client，常驻服务模式下每个平台只需调用一次
+        Args:
+            playwright: playwright 实例
+
+        Returns:
+
+        """
         playwright_proxy_format, httpx_proxy_format = None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(
@@ -59,57 +73,67 @@ class KuaishouCrawler(AbstractCrawler):
                 ip_proxy_info
             )
 
-        async with async_playwright() as playwright:
-            # 根据配置选择启动模式
-            if config.ENABLE_CDP_MODE:
-                utils.logger.info("[KuaishouCrawler] 使用CDP模式启动浏览器")
-                self.browser_context = await self.launch_browser_with_cdp(
-                    playwright,
-                    playwright_proxy_format,
-                    self.user_agent,
-                    headless=config.CDP_HEADLESS,
-                )
-            else:
-                utils.logger.info("[KuaishouCrawler] 使用标准模式启动浏览器")
-                # Launch a browser context.
-                chromium = playwright.chromium
-                self.browser_context = await self.launch_browser(
-                    chromium, None, self.user_agent, headless=config.HEADLESS
-                )
-            # stealth.min.js is a js script to prevent the website from detecting the crawler.
-            await self.browser_context.add_init_script(path="libs/stealth.min.js")
-            self.context_page = await self.browser_context.new_page()
-            await self.context_page.goto(f"{self.index_url}?isHome=1")
-
-            # Create a client to interact with the kuaishou website.
-            self.ks_client = await self.create_ks_client(httpx_proxy_format)
-            if not await self.ks_client.pong():
-                login_obj = KuaishouLogin(
-                    login_type=config.LOGIN_TYPE,
-                    login_phone=httpx_proxy_format,
-                    browser_context=self.browser_context,
-                    context_page=self.context_page,
-                    cookie_str=config.COOKIES,
-                )
-                await login_obj.begin()
-                await self.ks_client.update_cookies(
-                    browser_context=self.browser_context
-                )
+        # 根据配置选择启动模式
+        if config.ENABLE_CDP_MODE:
+            utils.logger.info("[KuaishouCrawler] 使用CDP模式启动浏览器")
+            self.browser_context = await self.launch_browser_with_cdp(
+                playwright,
+                playwright_proxy_format,
+                self.user_agent,
+                headless=config.CDP_HEADLESS,
+            )
+        else:
+            utils.logger.info("[KuaishouCrawler] 使用标准模式启动浏览器")
+            # Launch a browser context.
+            chromium = playwright.chromium
+            self.browser_context = await self.launch_browser(
+                chromium, None, self.user_agent, headless=config.HEADLESS
+            )
+        # stealth.min.js is a js script to prevent the website from detecting the crawler.
+        await self.browser_context.add_init_script(path="libs/stealth.min.js")
+        self.context_page = await self.browser_context.new_page()
+        await self.context_page.goto(f"{self.index_url}?isHome=1")
+
+        login_state = LoginStateManager("ks", self.browser_context, self.context_page)
+        session_fresh = await login_state.restore_if_fresh()
+
+        # Create a client to interact with the kuaishou website.
+        self.ks_client = await self.create_ks_client(httpx_proxy_format)
+        if not session_fresh and not await self.ks_client.pong():
+            login_obj = KuaishouLogin(
+                login_type=config.LOGIN_TYPE,
+                login_phone=httpx_proxy_format,
+                browser_context=self.browser_context,
+                context_page=self.context_page,
+                cookie_str=config.COOKIES,
+            )
+            await login_obj.begin()
+            await self.ks_client.update_cookies(
+                browser_context=self.browser_context
+            )
+        if not session_fresh:
+            await login_state.save()
+
+    async def crawl(self):
+        """
+        按当前 config.CRAWLER_TYPE 执行一次爬取任务，调用前需先执行 prepare
+        Returns:
 
-            crawler_type_var.set(config.CRAWLER_TYPE)
-            if config.CRAWLER_TYPE == "search":
-                # Search for videos and retrieve their comment information.
-                await self.search()
-            elif config.CRAWLER_TYPE == "detail":
-                # Get the information and comments of the specified post
-                await self.get_specified_videos()
-            elif config.CRAWLER_TYPE == "creator":
-                # Get creator's information and their videos and comments
-                await self.get_creators_and_videos()
-            else:
-                pass
-
-            utils.logger.info("[KuaishouCrawler.start] Kuaishou Crawler finished ...")
+        """
+        crawler_type_var.set(config.CRAWLER_TYPE)
+        if config.CRAWLER_TYPE == "search":
+            # Search for videos and retrieve their comment information.
+            await self.search()
+        elif config.CRAWLER_TYPE == "detail":
+            # Get the information and comments of the specified post
+            await self.get_specified_videos()
+        elif config.CRAWLER_TYPE == "creator":
+            # Get creator's information and their videos and comments
+            await self.get_creators_and_videos()
+        else:
+            pass
+
+        utils.logger.info("[KuaishouCrawler.crawl] Kuaishou Crawler finished ...")
 
     async def search(self):
         utils.logger.info("[KuaishouCrawler.search] Begin search kuaishou keywords")
@@ -249,12 +273,12 @@ class KuaishouCrawler(AbstractCrawler):
                 await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 utils.logger.info(f"[KuaishouCrawler.get_comments] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds before fetching comments for video {video_id}")
                 
-                await self.ks_client.get_video_all_comments(
+                async for comments in self.ks_client.iter_comments(
                     photo_id=video_id,
                     crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
-                    callback=kuaishou_store.batch_update_ks_video_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
-                )
+                ):
+                    await kuaishou_store.batch_update_ks_video_comments(video_id, comments)
             except DataFetchError as ex:
                 utils.logger.error(
                     f"[KuaishouCrawler.get_comments] get video_id: {video_id} comment error: {ex}"
@@ -373,17 +397,15 @@ class KuaishouCrawler(AbstractCrawler):
             if createor_info:
                 await kuaishou_store.save_creator(user_id, creator=createor_info)
 
-            # Get all video information of the creator
-            all_video_list = await self.ks_client.get_all_videos_by_creator(
+            # Process the creator's videos page by page, only the current page is kept in memory
+            async for video_list in self.ks_client.iter_creator_posts(
                 user_id=user_id,
                 crawl_interval=random.random(),
-                callback=self.fetch_creator_video_detail,
-            )
-
-            video_ids = [
-                video_item.get("photo", {}).get("id") for video_item in all_video_list
-            ]
-            await self.batch_get_video_comments(video_ids)
+            ):
+                await self.fetch_creator_video_detail(video_list)
+                await self.batch_get_video_comments(
+                    [video_item.get("photo", {}).get("id") for video_item in video_list]
+                )
 
     async def fetch_creator_video_detail(self, video_list: List[Dict]):
         """
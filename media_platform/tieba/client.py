@@ -9,11 +9,13 @@
 # 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
 
 import asyncio
+import functools
 import json
-from typing import Any, Callable, Dict, List, Optional, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode
 
-import httpx
+from parsel import Selector
 from playwright.async_api import BrowserContext
 from tenacity import RetryError, retry, stop_after_attempt, wait_fixed
 
@@ -21,7 +23,9 @@ import config
 from base.base_crawler import AbstractApiClient
 from model.m_baidu_tieba import TiebaComment, TiebaCreator, TiebaNote
 from proxy.proxy_ip_pool import ProxyIpPool
-from tools import utils
+from replay.transport import create_async_client
+from tools import metrics, utils
+from tools.paginator import iter_pages_in_order
 
 from .field import SearchNoteType, SearchSortType
 from .help import TieBaExtractor
@@ -43,8 +47,36 @@ class BaiduTieBaClient(AbstractApiClient):
         }
         self._host = "https://tieba.baidu.com"
         self._page_extractor = TieBaExtractor()
+        self._parse_executor: Optional[ProcessPoolExecutor] = None
         self.default_ip_proxy = default_ip_proxy
 
+    async def extract_in_pool(self, extract_func: Callable, *args) -> Any:
+        """
+        在进程池中执行页面解析，未开启进程池时直接在当前进程解析
+        Args:
+            extract_func: 提取函数
+            *args: 提取函数的参数
+
+        Returns:
+
+        """
+        if config.TIEBA_PARSE_PROCESS_NUM <= 0:
+            return extract_func(*args)
+        if not self._parse_executor:
+            self._parse_executor = ProcessPoolExecutor(max_workers=config.TIEBA_PARSE_PROCESS_NUM)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._parse_executor, functools.partial(extract_func, *args))
+
+    def close(self) -> None:
+        """
+        关闭页面解析进程池，之后再解析页面时会重新创建
+        Returns:
+
+        """
+        if self._parse_executor:
+            self._parse_executor.shutdown()
+            self._parse_executor = None
+
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
     async def request(self, method, url, return_ori_content=False, proxy=None, **kwargs) -> Union[str, Any]:
         """
@@ -60,22 +92,24 @@ class BaiduTieBaClient(AbstractApiClient):
 
         """
         actual_proxy = proxy if proxy else self.default_ip_proxy
-        async with httpx.AsyncClient(proxy=actual_proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, headers=self.headers, **kwargs)
+        with metrics.track_request("tieba", url) as tracker:
+            async with create_async_client(proxy=actual_proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, headers=self.headers, **kwargs)
 
-        if response.status_code != 200:
-            utils.logger.error(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
-            utils.logger.error(f"Request failed, response: {response.text}")
-            raise Exception(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
+            if response.status_code != 200:
+                utils.logger.error(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
+                utils.logger.error(f"Request failed, response: {response.text}")
+                raise Exception(f"Request failed, method: {method}, url: {url}, status code: {response.status_code}")
 
-        if response.text == "" or response.text == "blocked":
-            utils.logger.error(f"request params incrr, response.text: {response.text}")
-            raise Exception("account blocked")
+            if response.text == "" or response.text == "blocked":
+                utils.logger.error(f"request params incrr, response.text: {response.text}")
+                tracker.outcome = metrics.OUTCOME_BLOCKED
+                raise Exception("account blocked")
 
-        if return_ori_content:
-            return response.text
+            if return_ori_content:
+                return response.text
 
-        return response.json()
+            return response.json()
 
     async def get(self, uri: str, params=None, return_ori_content=False, **kwargs) -> Any:
         """
@@ -195,6 +229,49 @@ class BaiduTieBaClient(AbstractApiClient):
         page_content = await self.get(uri, return_ori_content=True)
         return self._page_extractor.extract_note_detail(page_content)
 
+    async def iter_comments(
+        self,
+        note_detail: TiebaNote,
+        crawl_interval: float = 1.0,
+        max_count: int = 10,
+    ) -> AsyncIterator[List[TiebaComment]]:
+        """
+        逐页获取指定帖子下的评论，开启爬二级评论时每页一级评论之后紧跟着它们的子评论；
+        帖子详情中已经给出了回复总页数，最多提前请求 TIEBA_COMMENT_PAGE_CONCURRENCY 页，内存中只保留这几页
+        Args:
+            note_detail: 帖子详情对象
+            crawl_interval: 爬取一次笔记的延迟单位（秒）
+            max_count: 一次帖子爬取的最大一级评论数量
+        Returns: 每次产出一页评论
+
+        """
+        uri = f"/p/{note_detail.note_id}"
+        comments_count = 0
+
+        async def fetch_comment_page(page: int) -> List[TiebaComment]:
+            page_content = await self.get(uri, params={"pn": page}, return_ori_content=True)
+            return await self.extract_in_pool(
+                self._page_extractor.extract_tieba_note_parment_comments, page_content, note_detail.note_id
+            )
+
+        comment_pages = iter_pages_in_order(
+            range(1, note_detail.total_replay_page + 1), fetch_comment_page,
+            concurrency=config.TIEBA_COMMENT_PAGE_CONCURRENCY, crawl_interval=crawl_interval,
+        )
+        try:
+            async for _, comments in comment_pages:
+                if not comments or comments_count >= max_count:
+                    break
+                if comments_count + len(comments) > max_count:
+                    comments = comments[:max_count - comments_count]
+                comments_count += len(comments)
+                yield comments
+                # 获取所有子评论
+                async for sub_comments in self.iter_sub_comments(comments, crawl_interval=crawl_interval):
+                    yield sub_comments
+        finally:
+            await comment_pages.aclose()
+
     async def get_note_all_comments(
         self,
         note_detail: TiebaNote,
@@ -204,6 +281,7 @@ class BaiduTieBaClient(AbstractApiClient):
     ) -> List[TiebaComment]:
         """
         获取指定帖子下的所有一级评论，该方法会一直查找一个帖子下的所有评论信息
+        评论较多时使用 iter_comments 逐页处理，避免所有评论同时保存在内存中
         Args:
             note_detail: 帖子详情对象
             crawl_interval: 爬取一次笔记的延迟单位（秒）
@@ -212,53 +290,39 @@ class BaiduTieBaClient(AbstractApiClient):
         Returns:
 
         """
-        uri = f"/p/{note_detail.note_id}"
         result: List[TiebaComment] = []
-        current_page = 1
-        while note_detail.total_replay_page >= current_page and len(result) < max_count:
-            params = {
-                "pn": current_page,
-            }
-            page_content = await self.get(uri, params=params, return_ori_content=True)
-            comments = self._page_extractor.extract_tieba_note_parment_comments(page_content, note_id=note_detail.note_id)
-            if not comments:
-                break
-            if len(result) + len(comments) > max_count:
-                comments = comments[:max_count - len(result)]
-            if callback:
-                await callback(note_detail.note_id, comments)
-            result.extend(comments)
-            # 获取所有子评论
-            await self.get_comments_all_sub_comments(comments, crawl_interval=crawl_interval, callback=callback)
-            await asyncio.sleep(crawl_interval)
-            current_page += 1
+        comment_pages = self.iter_comments(note_detail, crawl_interval, max_count)
+        try:
+            async for comments in comment_pages:
+                if callback:
+                    await callback(note_detail.note_id, comments)
+                result.extend(comments)
+        finally:
+            await comment_pages.aclose()
         return result
 
-    async def get_comments_all_sub_comments(
+    async def iter_sub_comments(
         self,
         comments: List[TiebaComment],
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
-    ) -> List[TiebaComment]:
+    ) -> AsyncIterator[List[TiebaComment]]:
         """
-        获取指定评论下的所有子评论
+        逐页获取指定评论下的所有子评论
         Args:
             comments: 评论列表
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后
 
-        Returns:
+        Returns: 每次产出一页子评论
 
         """
         uri = "/p/comment"
         if not config.ENABLE_GET_SUB_COMMENTS:
-            return []
+            return
 
         # # 贴吧获取所有子评论需要登录态
         # if self.headers.get("Cookies") == "" or not self.pong():
         #     raise Exception(f"[BaiduTieBaClient.pong] Cookies is empty, please login first...")
 
-        all_sub_comments: List[TiebaComment] = []
         for parment_comment in comments:
             if parment_comment.sub_comment_count == 0:
                 continue
@@ -273,15 +337,37 @@ class BaiduTieBaClient(AbstractApiClient):
                     "pn": current_page  # 页码
                 }
                 page_content = await self.get(uri, params=params, return_ori_content=True)
-                sub_comments = self._page_extractor.extract_tieba_note_sub_comments(page_content, parent_comment=parment_comment)
+                sub_comments = await self.extract_in_pool(
+                    self._page_extractor.extract_tieba_note_sub_comments, page_content, parment_comment
+                )
 
                 if not sub_comments:
                     break
-                if callback:
-                    await callback(parment_comment.note_id, sub_comments)
-                all_sub_comments.extend(sub_comments)
+                yield sub_comments
                 await asyncio.sleep(crawl_interval)
                 current_page += 1
+
+    async def get_comments_all_sub_comments(
+        self,
+        comments: List[TiebaComment],
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+    ) -> List[TiebaComment]:
+        """
+        获取指定评论下的所有子评论
+        Args:
+            comments: 评论列表
+            crawl_interval: 爬取一次笔记的延迟单位（秒）
+            callback: 一次笔记爬取结束后
+
+        Returns:
+
+        """
+        all_sub_comments: List[TiebaComment] = []
+        async for sub_comments in self.iter_sub_comments(comments, crawl_interval):
+            if callback:
+                await callback(sub_comments[0].note_id, sub_comments)
+            all_sub_comments.extend(sub_comments)
         return all_sub_comments
 
     async def get_notes_by_tieba_name(self, tieba_name: str, page_num: int) -> List[TiebaNote]:
@@ -329,36 +415,30 @@ class BaiduTieBaClient(AbstractApiClient):
         }
         return await self.get(uri, params=params)
 
-    async def get_all_notes_by_creator_user_name(
+    async def iter_creator_posts(
         self,
         user_name: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
         max_note_count: int = 0,
-        creator_page_html_content: str = None,
-    ) -> List[TiebaNote]:
+        creator_page_html_content: Union[str, Selector, None] = None,
+    ) -> AsyncIterator[List[TiebaNote]]:
         """
-        根据创作者用户名获取创作者所有帖子
+        逐页获取创作者的帖子详情，调用方处理完一页后才会请求下一页，内存中只保留当前页
         Args:
             user_name: 创作者用户名
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后的回调函数，是一个awaitable类型的函数
             max_note_count: 帖子最大获取数量，如果为0则获取所有
-            creator_page_html_content: 创作者主页HTML内容
+            creator_page_html_content: 创作者主页HTML内容或已经解析好的 Selector
 
-        Returns:
+        Returns: 每次产出一页帖子
 
         """
         # 百度贴吧比较特殊一些，前10个帖子是直接展示在主页上的，要单独处理，通过API获取不到
-        result: List[TiebaNote] = []
         if creator_page_html_content:
             thread_id_list = (self._page_extractor.extract_tieba_thread_id_list_from_creator_page(creator_page_html_content))
-            utils.logger.info(f"[BaiduTieBaClient.get_all_notes_by_creator] got user_name:{user_name} thread_id_list len : {len(thread_id_list)}")
+            utils.logger.info(f"[BaiduTieBaClient.iter_creator_posts] got user_name:{user_name} thread_id_list len : {len(thread_id_list)}")
             note_detail_task = [self.get_note_by_id(thread_id) for thread_id in thread_id_list]
-            notes = await asyncio.gather(*note_detail_task)
-            if callback:
-                await callback(notes)
-            result.extend(notes)
+            yield await asyncio.gather(*note_detail_task)
 
         notes_has_more = 1
         page_number = 1
@@ -372,14 +452,38 @@ class BaiduTieBaClient(AbstractApiClient):
             notes_data = notes_res.get("data")
             notes_has_more = notes_data.get("has_more")
             notes = notes_data["thread_list"]
-            utils.logger.info(f"[WeiboClient.get_all_notes_by_creator] got user_name:{user_name} notes len : {len(notes)}")
+            utils.logger.info(f"[BaiduTieBaClient.iter_creator_posts] got user_name:{user_name} notes len : {len(notes)}")
 
             note_detail_task = [self.get_note_by_id(note['thread_id']) for note in notes]
-            notes = await asyncio.gather(*note_detail_task)
-            if callback:
-                await callback(notes)
+            yield await asyncio.gather(*note_detail_task)
             await asyncio.sleep(crawl_interval)
-            result.extend(notes)
             page_number += 1
             total_get_count += page_per_count
+
+    async def get_all_notes_by_creator_user_name(
+        self,
+        user_name: str,
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+        max_note_count: int = 0,
+        creator_page_html_content: Union[str, Selector, None] = None,
+    ) -> List[TiebaNote]:
+        """
+        根据创作者用户名获取创作者所有帖子
+        帖子较多时使用 iter_creator_posts 逐页处理，避免所有帖子同时保存在内存中
+        Args:
+            user_name: 创作者用户名
+            crawl_interval: 爬取一次笔记的延迟单位（秒）
+            callback: 一次笔记爬取结束后的回调函数，是一个awaitable类型的函数
+            max_note_count: 帖子最大获取数量，如果为0则获取所有
+            creator_page_html_content: 创作者主页HTML内容
+
+        Returns:
+
+        """
+        result: List[TiebaNote] = []
+        async for notes in self.iter_creator_posts(user_name, crawl_interval, max_note_count, creator_page_html_content):
+            if callback:
+                await callback(notes)
+            result.extend(notes)
         return result
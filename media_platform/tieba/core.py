@@ -34,7 +34,7 @@ from var import crawler_type_var, source_keyword_var
 
 from .client import BaiduTieBaClient
 from .field import SearchNoteType, SearchSortType
-from .help import TieBaExtractor
+from .help import TieBaExtractor, parse_page
 from .login import BaiduTieBaLogin
 
 
@@ -55,11 +55,26 @@ class TieBaCrawler(AbstractCrawler):
         Start the crawler
         Returns:
 
+        """
+        await self.prepare()
+        try:
+            await self.crawl()
+        finally:
+            self.tieba_client.close()
+
+    async def prepare(self, playwright: Optional[Playwright] = None) -> None:
+        """
+        创建 API client，贴吧不依赖浏览器，playwright 参数仅为了与其他平台保持一致
+        Args:
+            playwright: playwright 实例
+
+        Returns:
+
         """
         ip_proxy_pool, httpx_proxy_format = None, None
         if config.ENABLE_IP_PROXY:
             utils.logger.info(
-                "[BaiduTieBaCrawler.start] Begin create ip proxy pool ..."
+                "[BaiduTieBaCrawler.prepare] Begin create ip proxy pool ..."
             )
             ip_proxy_pool = await create_ip_pool(
                 config.IP_PROXY_POOL_COUNT, enable_validate_ip=True
@@ -67,7 +82,7 @@ class TieBaCrawler(AbstractCrawler):
             ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
             _, httpx_proxy_format = utils.format_proxy_info(ip_proxy_info)
             utils.logger.info(
-                f"[BaiduTieBaCrawler.start] Init default ip proxy, value: {httpx_proxy_format}"
+                f"[BaiduTieBaCrawler.prepare] Init default ip proxy, value: {httpx_proxy_format}"
             )
 
         # Create a client to interact with the baidutieba website.
@@ -75,6 +90,13 @@ class TieBaCrawler(AbstractCrawler):
             ip_pool=ip_proxy_pool,
             default_ip_proxy=httpx_proxy_format,
         )
+
+    async def crawl(self) -> None:
+        """
+        按当前 config.CRAWLER_TYPE 执行一次爬取任务，调用前需先执行 prepare
+        Returns:
+
+        """
         crawler_type_var.set(config.CRAWLER_TYPE)
         if config.CRAWLER_TYPE == "search":
             # Search for notes and retrieve their comment information.
@@ -89,7 +111,7 @@ class TieBaCrawler(AbstractCrawler):
         else:
             pass
 
-        utils.logger.info("[BaiduTieBaCrawler.start] Tieba Crawler finished ...")
+        utils.logger.info("[BaiduTieBaCrawler.crawl] Tieba Crawler finished ...")
 
     async def search(self) -> None:
         """
@@ -297,12 +319,17 @@ class TieBaCrawler(AbstractCrawler):
             await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
             utils.logger.info(f"[TieBaCrawler.get_comments_async_task] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds before fetching comments for note {note_detail.note_id}")
             
-            await self.tieba_client.get_note_all_comments(
+            comment_pages = self.tieba_client.iter_comments(
                 note_detail=note_detail,
                 crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
-                callback=tieba_store.batch_update_tieba_note_comments,
                 max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
             )
+            try:
+                async for comments in comment_pages:
+                    await tieba_store.batch_update_tieba_note_comments(note_detail.note_id, comments)
+            finally:
+                # 提前请求的评论页在出错时需要取消
+                await comment_pages.aclose()
 
     async def get_creators_and_notes(self) -> None:
         """
@@ -317,8 +344,10 @@ class TieBaCrawler(AbstractCrawler):
             creator_page_html_content = await self.tieba_client.get_creator_info_by_url(
                 creator_url=creator_url
             )
+            # 主页只解析一次，创作者信息和主页上的帖子列表共用同一个 Selector
+            creator_page = parse_page(creator_page_html_content)
             creator_info: TiebaCreator = self._page_extractor.extract_creator_info(
-                creator_page_html_content
+                creator_page
             )
             if creator_info:
                 utils.logger.info(
@@ -329,18 +358,15 @@ class TieBaCrawler(AbstractCrawler):
 
                 await tieba_store.save_creator(user_info=creator_info)
 
-                # Get all note information of the creator
-                all_notes_list = (
-                    await self.tieba_client.get_all_notes_by_creator_user_name(
-                        user_name=creator_info.user_name,
-                        crawl_interval=0,
-                        callback=tieba_store.batch_update_tieba_notes,
-                        max_note_count=config.CRAWLER_MAX_NOTES_COUNT,
-                        creator_page_html_content=creator_page_html_content,
-                    )
-                )
-
-                await self.batch_get_note_comments(all_notes_list)
+                # Process the creator's notes page by page, only the current page is kept in memory
+                async for notes in self.tieba_client.iter_creator_posts(
+                    user_name=creator_info.user_name,
+                    crawl_interval=0,
+                    max_note_count=config.CRAWLER_MAX_NOTES_COUNT,
+                    creator_page_html_content=creator_page,
+                ):
+                    await tieba_store.batch_update_tieba_notes(notes)
+                    await self.batch_get_note_comments(notes)
 
             else:
                 utils.logger.error(
@@ -425,14 +451,16 @@ class TieBaCrawler(AbstractCrawler):
 
     async def close(self):
         """
-        Close browser context
+        Close browser context and the page parsing process pool
         Returns:
 
         """
+        if getattr(self, "tieba_client", None):
+            self.tieba_client.close()
         # 如果使用CDP模式，需要特殊处理
         if self.cdp_manager:
             await self.cdp_manager.cleanup()
             self.cdp_manager = None
-        else:
+        elif getattr(self, "browser_context", None):
             await self.browser_context.close()
         utils.logger.info("[BaiduTieBaCrawler.close] Browser context closed ...")
@@ -13,9 +13,10 @@
 import html
 import json
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 from urllib.parse import parse_qs, unquote
 
+from lxml import etree
 from parsel import Selector
 
 from constant import baidu_tieba as const
@@ -25,13 +26,126 @@ from tools import utils
 GENDER_MALE = "sex_male"
 GENDER_FEMALE = "sex_female"
 
+# 预编译的 XPath，避免每次调用 Selector.xpath 时重新编译表达式
+# 搜索结果页
+SEARCH_POST_XPATH = etree.XPath("//div[@class='s_post']")
+SEARCH_POST_ID_XPATH = etree.XPath(".//span[@class='p_title']/a/@data-tid")
+SEARCH_POST_TITLE_XPATH = etree.XPath(".//span[@class='p_title']/a/text()")
+SEARCH_POST_DESC_XPATH = etree.XPath(".//div[@class='p_content']/text()")
+SEARCH_POST_URL_XPATH = etree.XPath(".//span[@class='p_title']/a/@href")
+SEARCH_POST_USER_NICKNAME_XPATH = etree.XPath(".//a[starts-with(@href, '/home/main')]/font/text()")
+SEARCH_POST_USER_LINK_XPATH = etree.XPath(".//a[starts-with(@href, '/home/main')]/@href")
+SEARCH_POST_TIEBA_NAME_XPATH = etree.XPath(".//a[@class='p_forum']/font/text()")
+SEARCH_POST_TIEBA_LINK_XPATH = etree.XPath(".//a[@class='p_forum']/@href")
+SEARCH_POST_DATE_XPATH = etree.XPath(".//font[@class='p_green p_date']/text()")
+# 贴吧帖子列表页
+THREAD_LIST_POST_XPATH = etree.XPath("//ul[@id='thread_list']/li")
+THREAD_LIST_TITLE_XPATH = etree.XPath(".//a[@class='j_th_tit ']/text()")
+THREAD_LIST_DESC_XPATH = etree.XPath(".//div[@class='threadlist_abs threadlist_abs_onlyline ']/text()")
+THREAD_LIST_AUTHOR_LINK_XPATH = etree.XPath(".//a[@class='frs-author-name j_user_card ']/@href")
+# 帖子详情页及评论
+TIEBA_NAME_XPATH = etree.XPath("//a[@class='card_title_fname']/text()")
+TIEBA_LINK_XPATH = etree.XPath("//a[@class='card_title_fname']/@href")
+FIRST_FLOOR_XPATH = etree.XPath("//div[@class='p_postlist'][1]")
+ONLY_VIEW_AUTHOR_LINK_XPATH = etree.XPath("//*[@id='lzonly_cntn']/@href")
+THREAD_NUM_INFO_XPATH = etree.XPath("//div[@id='thread_theme_5']//li[@class='l_reply_num']//span[@class='red']")
+TEXT_XPATH = etree.XPath("./text()")
+TITLE_XPATH = etree.XPath("//title/text()")
+DESCRIPTION_XPATH = etree.XPath("//meta[@name='description']/@content")
+POST_TAIL_WRAP_XPATH = etree.XPath(".//div[@class='post-tail-wrap']")
+AUTHOR_LINK_XPATH = etree.XPath(".//a[@class='p_author_face ']/@href")
+AUTHOR_NAME_XPATH = etree.XPath(".//a[@class='p_author_name j_user_card']/text()")
+AUTHOR_AVATAR_XPATH = etree.XPath(".//a[@class='p_author_face ']/img/@src")
+PARENT_COMMENT_XPATH = etree.XPath("//div[@class='l_post l_post_bright j_l_post clearfix  ']")
+SUB_COMMENT_FIRST_XPATH = etree.XPath("//li[@class='lzl_single_post j_lzl_s_p first_no_border']")
+SUB_COMMENT_XPATH = etree.XPath("//li[@class='lzl_single_post j_lzl_s_p ']")
+SUB_COMMENT_USER_XPATH = etree.XPath("./a[@class='j_user_card lzl_p_p']")
+HREF_XPATH = etree.XPath("./@href")
+IMG_SRC_XPATH = etree.XPath("./img/@src")
+SUB_COMMENT_CONTENT_XPATH = etree.XPath(".//span[@class='lzl_content_main']")
+SUB_COMMENT_TIME_XPATH = etree.XPath(".//span[@class='lzl_time']/text()")
+DATA_FIELD_XPATH = etree.XPath("./@data-field")
+# 创作者主页
+CREATOR_THREAD_URL_XPATH = etree.XPath("//ul[@class='new_list clearfix']//div[@class='thread_name']/a[1]/@href")
+CREATOR_USER_LINK_XPATH = etree.XPath("//p[@class='space']/a/@href")
+CREATOR_USERDATA_XPATH = etree.XPath("//div[@class='userinfo_userdata']")
+CREATOR_FOLLOW_FANS_XPATH = etree.XPath("//span[@class='concern_num']")
+CREATOR_NICKNAME_XPATH = etree.XPath("//span[@class='userinfo_username ']/text()")
+CREATOR_AVATAR_XPATH = etree.XPath("//div[@class='userinfo_left_head']//img/@src")
+
+PUB_TIME_PATTERN = re.compile(r'<span class="tail-info">(\d{4}-\d{2}-\d{2} \d{2}:\d{2})</span>')
+IP_PATTERN = re.compile(r'IP属地:(\S+)</span>')
+FOLLOW_FANS_PATTERN = re.compile(r'<span class="concern_num">\(<a[^>]*>(\d+)</a>\)</span>')
+REGISTRATION_DURATION_PATTERN = re.compile(r'<span>吧龄:(\S+)</span>')
+
+
+def parse_page(page_content: Union[str, Selector]) -> Selector:
+    """
+    解析页面，已经解析过的页面直接返回，同一个页面可以在多个提取函数之间共享
+    Args:
+        page_content: 页面内容的HTML字符串或已经解析好的 Selector
+
+    Returns:
+
+    """
+    if isinstance(page_content, Selector):
+        return page_content
+    return Selector(text=page_content)
+
+
+def first_text(xpath: etree.XPath, node: Optional[etree._Element], default: str = "") -> str:
+    """
+    取预编译 XPath 的第一个字符串结果，与 Selector.xpath(...).get(default=...) 的行为一致
+    Args:
+        xpath: 预编译的 XPath
+        node: lxml 节点，为 None 时返回默认值
+        default: 没有结果时的默认值
+
+    Returns:
+
+    """
+    if node is None:
+        return default
+    results = xpath(node)
+    return str(results[0]) if results else default
+
+
+def node_html(node: Union[etree._Element, Selector]) -> str:
+    """
+    把节点序列化成HTML，与 Selector.get() 的行为一致
+    Args:
+        node: lxml 节点或 Selector
+
+    Returns:
+
+    """
+    if isinstance(node, Selector):
+        return node.get()
+    return etree.tostring(node, method="html", encoding="unicode", with_tail=False)
+
+
+def first_html(xpath: etree.XPath, node: etree._Element) -> str:
+    """
+    把预编译 XPath 匹配到的第一个节点序列化成HTML，与 Selector.xpath(...).get(default="") 的行为一致
+    Args:
+        xpath: 预编译的 XPath
+        node: lxml 节点
+
+    Returns:
+
+    """
+    results = xpath(node)
+    if not results:
+        return ""
+    return node_html(results[0])
+
 
 class TieBaExtractor:
     def __init__(self):
         pass
 
     @staticmethod
-    def extract_search_note_list(page_content: str) -> List[TiebaNote]:
+    def extract_search_note_list(page_content: Union[str, Selector]) -> List[TiebaNote]:
         """
         提取贴吧帖子列表，这里提取的关键词搜索结果页的数据，还缺少帖子的回复数和回复页等数据
         Args:
@@ -40,62 +154,54 @@ class TieBaExtractor:
         Returns:
             包含帖子信息的字典列表
         """
-        xpath_selector = "//div[@class='s_post']"
-        post_list = Selector(text=page_content).xpath(xpath_selector)
+        root = parse_page(page_content).root
         result: List[TiebaNote] = []
-        for post in post_list:
-            tieba_note = TiebaNote(note_id=post.xpath(".//span[@class='p_title']/a/@data-tid").get(default='').strip(),
-                                   title=post.xpath(".//span[@class='p_title']/a/text()").get(default='').strip(),
-                                   desc=post.xpath(".//div[@class='p_content']/text()").get(default='').strip(),
-                                   note_url=const.TIEBA_URL + post.xpath(".//span[@class='p_title']/a/@href").get(
-                                       default=''),
-                                   user_nickname=post.xpath(".//a[starts-with(@href, '/home/main')]/font/text()").get(
-                                       default='').strip(), user_link=const.TIEBA_URL + post.xpath(
-                    ".//a[starts-with(@href, '/home/main')]/@href").get(default=''),
-                                   tieba_name=post.xpath(".//a[@class='p_forum']/font/text()").get(default='').strip(),
-                                   tieba_link=const.TIEBA_URL + post.xpath(".//a[@class='p_forum']/@href").get(
-                                       default=''),
-                                   publish_time=post.xpath(".//font[@class='p_green p_date']/text()").get(
-                                       default='').strip(), )
+        for post in SEARCH_POST_XPATH(root):
+            tieba_note = TiebaNote(note_id=first_text(SEARCH_POST_ID_XPATH, post).strip(),
+                                   title=first_text(SEARCH_POST_TITLE_XPATH, post).strip(),
+                                   desc=first_text(SEARCH_POST_DESC_XPATH, post).strip(),
+                                   note_url=const.TIEBA_URL + first_text(SEARCH_POST_URL_XPATH, post),
+                                   user_nickname=first_text(SEARCH_POST_USER_NICKNAME_XPATH, post).strip(),
+                                   user_link=const.TIEBA_URL + first_text(SEARCH_POST_USER_LINK_XPATH, post),
+                                   tieba_name=first_text(SEARCH_POST_TIEBA_NAME_XPATH, post).strip(),
+                                   tieba_link=const.TIEBA_URL + first_text(SEARCH_POST_TIEBA_LINK_XPATH, post),
+                                   publish_time=first_text(SEARCH_POST_DATE_XPATH, post).strip(), )
             result.append(tieba_note)
         return result
 
-    def extract_tieba_note_list(self, page_content: str) -> List[TiebaNote]:
+    def extract_tieba_note_list(self, page_content: Union[str, Selector]) -> List[TiebaNote]:
         """
         提取贴吧帖子列表
         Args:
-            page_content:
+            page_content: 页面内容的HTML字符串，传入已解析的 Selector 时需要已去掉帖子列表外层的注释
 
         Returns:
 
         """
-        page_content = page_content.replace('<!--', "")
-        content_selector = Selector(text=page_content)
-        xpath_selector = "//ul[@id='thread_list']/li"
-        post_list = content_selector.xpath(xpath_selector)
+        if isinstance(page_content, str):
+            page_content = page_content.replace('<!--', "")
+        root = parse_page(page_content).root
+        tieba_name = first_text(TIEBA_NAME_XPATH, root).strip()
+        tieba_link = const.TIEBA_URL + first_text(TIEBA_LINK_XPATH, root)
         result: List[TiebaNote] = []
-        for post_selector in post_list:
-            post_field_value: Dict = self.extract_data_field_value(post_selector)
+        for post in THREAD_LIST_POST_XPATH(root):
+            post_field_value: Dict = self.extract_data_field_value(post)
             if not post_field_value:
                 continue
             note_id = str(post_field_value.get("id"))
             tieba_note = TiebaNote(note_id=note_id,
-                                   title=post_selector.xpath(".//a[@class='j_th_tit ']/text()").get(default='').strip(),
-                                   desc=post_selector.xpath(
-                                       ".//div[@class='threadlist_abs threadlist_abs_onlyline ']/text()").get(
-                                       default='').strip(), note_url=const.TIEBA_URL + f"/p/{note_id}",
-                                   user_link=const.TIEBA_URL + post_selector.xpath(
-                                       ".//a[@class='frs-author-name j_user_card ']/@href").get(default='').strip(),
+                                   title=first_text(THREAD_LIST_TITLE_XPATH, post).strip(),
+                                   desc=first_text(THREAD_LIST_DESC_XPATH, post).strip(),
+                                   note_url=const.TIEBA_URL + f"/p/{note_id}",
+                                   user_link=const.TIEBA_URL + first_text(THREAD_LIST_AUTHOR_LINK_XPATH, post).strip(),
                                    user_nickname=post_field_value.get("authoer_nickname") or post_field_value.get(
                                        "author_name"),
-                                   tieba_name=content_selector.xpath("//a[@class='card_title_fname']/text()").get(
-                                       default='').strip(), tieba_link=const.TIEBA_URL + content_selector.xpath(
-                    "//a[@class='card_title_fname']/@href").get(default=''),
+                                   tieba_name=tieba_name, tieba_link=tieba_link,
                                    total_replay_num=post_field_value.get("reply_num", 0))
             result.append(tieba_note)
         return result
 
-    def extract_note_detail(self, page_content: str) -> TiebaNote:
+    def extract_note_detail(self, page_content: Union[str, Selector]) -> TiebaNote:
         """
         提取贴吧帖子详情
         Args:
@@ -104,35 +210,31 @@ class TieBaExtractor:
         Returns:
 
         """
-        content_selector = Selector(text=page_content)
-        first_floor_selector = content_selector.xpath("//div[@class='p_postlist'][1]")
-        only_view_author_link = content_selector.xpath("//*[@id='lzonly_cntn']/@href").get(default='').strip()
+        root = parse_page(page_content).root
+        first_floor = next(iter(FIRST_FLOOR_XPATH(root)), None)
+        only_view_author_link = first_text(ONLY_VIEW_AUTHOR_LINK_XPATH, root).strip()
         note_id = only_view_author_link.split("?")[0].split("/")[-1]
         # 帖子回复数、回复页数
-        thread_num_infos = content_selector.xpath(
-            "//div[@id='thread_theme_5']//li[@class='l_reply_num']//span[@class='red']")
+        thread_num_infos = THREAD_NUM_INFO_XPATH(root)
         # IP地理位置、发表时间
-        other_info_content = content_selector.xpath(".//div[@class='post-tail-wrap']").get(default="").strip()
+        other_info_content = first_html(POST_TAIL_WRAP_XPATH, root).strip()
         ip_location, publish_time = self.extract_ip_and_pub_time(other_info_content)
-        note = TiebaNote(note_id=note_id, title=content_selector.xpath("//title/text()").get(default='').strip(),
-                         desc=content_selector.xpath("//meta[@name='description']/@content").get(default='').strip(),
+        note = TiebaNote(note_id=note_id, title=first_text(TITLE_XPATH, root).strip(),
+                         desc=first_text(DESCRIPTION_XPATH, root).strip(),
                          note_url=const.TIEBA_URL + f"/p/{note_id}",
-                         user_link=const.TIEBA_URL + first_floor_selector.xpath(
-                             ".//a[@class='p_author_face ']/@href").get(default='').strip(),
-                         user_nickname=first_floor_selector.xpath(
-                             ".//a[@class='p_author_name j_user_card']/text()").get(default='').strip(),
-                         user_avatar=first_floor_selector.xpath(".//a[@class='p_author_face ']/img/@src").get(
-                             default='').strip(),
-                         tieba_name=content_selector.xpath("//a[@class='card_title_fname']/text()").get(
-                             default='').strip(), tieba_link=const.TIEBA_URL + content_selector.xpath(
-                "//a[@class='card_title_fname']/@href").get(default=''), ip_location=ip_location,
+                         user_link=const.TIEBA_URL + first_text(AUTHOR_LINK_XPATH, first_floor).strip(),
+                         user_nickname=first_text(AUTHOR_NAME_XPATH, first_floor).strip(),
+                         user_avatar=first_text(AUTHOR_AVATAR_XPATH, first_floor).strip(),
+                         tieba_name=first_text(TIEBA_NAME_XPATH, root).strip(),
+                         tieba_link=const.TIEBA_URL + first_text(TIEBA_LINK_XPATH, root),
+                         ip_location=ip_location,
                          publish_time=publish_time,
-                         total_replay_num=thread_num_infos[0].xpath("./text()").get(default='').strip(),
-                         total_replay_page=thread_num_infos[1].xpath("./text()").get(default='').strip(), )
+                         total_replay_num=first_text(TEXT_XPATH, thread_num_infos[0]).strip(),
+                         total_replay_page=first_text(TEXT_XPATH, thread_num_infos[1]).strip(), )
         note.title = note.title.replace(f"【{note.tieba_name}】_百度贴吧", "")
         return note
 
-    def extract_tieba_note_parment_comments(self, page_content: str, note_id: str) -> List[TiebaComment]:
+    def extract_tieba_note_parment_comments(self, page_content: Union[str, Selector], note_id: str) -> List[TiebaComment]:
         """
         提取贴吧帖子一级评论
         Args:
@@ -142,34 +244,31 @@ class TieBaExtractor:
         Returns:
 
         """
-        xpath_selector = "//div[@class='l_post l_post_bright j_l_post clearfix  ']"
-        comment_list = Selector(text=page_content).xpath(xpath_selector)
+        root = parse_page(page_content).root
+        # 贴吧名称对整个页面只需要提取一次
+        tieba_name = first_text(TIEBA_NAME_XPATH, root).strip()
         result: List[TiebaComment] = []
-        for comment_selector in comment_list:
-            comment_field_value: Dict = self.extract_data_field_value(comment_selector)
+        for comment_node in PARENT_COMMENT_XPATH(root):
+            comment_field_value: Dict = self.extract_data_field_value(comment_node)
             if not comment_field_value:
                 continue
-            tieba_name = comment_selector.xpath("//a[@class='card_title_fname']/text()").get(default='').strip()
-            other_info_content = comment_selector.xpath(".//div[@class='post-tail-wrap']").get(default="").strip()
+            other_info_content = first_html(POST_TAIL_WRAP_XPATH, comment_node).strip()
             ip_location, publish_time = self.extract_ip_and_pub_time(other_info_content)
             tieba_comment = TiebaComment(comment_id=str(comment_field_value.get("content").get("post_id")),
                                          sub_comment_count=comment_field_value.get("content").get("comment_num"),
                                          content=utils.extract_text_from_html(
                                              comment_field_value.get("content").get("content")),
                                          note_url=const.TIEBA_URL + f"/p/{note_id}",
-                                         user_link=const.TIEBA_URL + comment_selector.xpath(
-                                             ".//a[@class='p_author_face ']/@href").get(default='').strip(),
-                                         user_nickname=comment_selector.xpath(
-                                             ".//a[@class='p_author_name j_user_card']/text()").get(default='').strip(),
-                                         user_avatar=comment_selector.xpath(
-                                             ".//a[@class='p_author_face ']/img/@src").get(default='').strip(),
+                                         user_link=const.TIEBA_URL + first_text(AUTHOR_LINK_XPATH, comment_node).strip(),
+                                         user_nickname=first_text(AUTHOR_NAME_XPATH, comment_node).strip(),
+                                         user_avatar=first_text(AUTHOR_AVATAR_XPATH, comment_node).strip(),
                                          tieba_id=str(comment_field_value.get("content").get("forum_id", "")),
                                          tieba_name=tieba_name, tieba_link=f"https://tieba.baidu.com/f?kw={tieba_name}",
                                          ip_location=ip_location, publish_time=publish_time, note_id=note_id, )
             result.append(tieba_comment)
         return result
 
-    def extract_tieba_note_sub_comments(self, page_content: str, parent_comment: TiebaComment) -> List[TiebaComment]:
+    def extract_tieba_note_sub_comments(self, page_content: Union[str, Selector], parent_comment: TiebaComment) -> List[TiebaComment]:
         """
         提取贴吧帖子二级评论
         Args:
@@ -179,23 +278,22 @@ class TieBaExtractor:
         Returns:
 
         """
-        selector = Selector(page_content)
+        root = parse_page(page_content).root
         comments = []
-        comment_ele_list = selector.xpath("//li[@class='lzl_single_post j_lzl_s_p first_no_border']")
-        comment_ele_list.extend(selector.xpath("//li[@class='lzl_single_post j_lzl_s_p ']"))
+        comment_ele_list = SUB_COMMENT_FIRST_XPATH(root)
+        comment_ele_list.extend(SUB_COMMENT_XPATH(root))
         for comment_ele in comment_ele_list:
             comment_value = self.extract_data_field_value(comment_ele)
             if not comment_value:
                 continue
-            comment_user_a_selector = comment_ele.xpath("./a[@class='j_user_card lzl_p_p']")[0]
-            content = utils.extract_text_from_html(
-                comment_ele.xpath(".//span[@class='lzl_content_main']").get(default=""))
+            comment_user_a = SUB_COMMENT_USER_XPATH(comment_ele)[0]
+            content = utils.extract_text_from_html(first_html(SUB_COMMENT_CONTENT_XPATH, comment_ele))
             comment = TiebaComment(
                 comment_id=str(comment_value.get("spid")), content=content,
-                user_link=comment_user_a_selector.xpath("./@href").get(default=""),
+                user_link=first_text(HREF_XPATH, comment_user_a),
                 user_nickname=comment_value.get("showname"),
-                user_avatar=comment_user_a_selector.xpath("./img/@src").get(default=""),
-                publish_time=comment_ele.xpath(".//span[@class='lzl_time']/text()").get(default="").strip(),
+                user_avatar=first_text(IMG_SRC_XPATH, comment_user_a),
+                publish_time=first_text(SUB_COMMENT_TIME_XPATH, comment_ele).strip(),
                 parent_comment_id=parent_comment.comment_id,
                 note_id=parent_comment.note_id, note_url=parent_comment.note_url,
                 tieba_id=parent_comment.tieba_id, tieba_name=parent_comment.tieba_name,
@@ -204,32 +302,28 @@ class TieBaExtractor:
 
         return comments
 
-    def extract_creator_info(self, html_content: str) -> TiebaCreator:
+    def extract_creator_info(self, html_content: Union[str, Selector]) -> TiebaCreator:
         """
         提取贴吧创作者信息
         Args:
-            html_content:
+            html_content: 创作者主页HTML或已经解析好的 Selector，与 extract_tieba_thread_id_list_from_creator_page 共享
 
         Returns:
 
         """
-        selector = Selector(text=html_content)
-        user_link_selector = selector.xpath("//p[@class='space']/a")
-        user_link: str = user_link_selector.xpath("./@href").get(default='')
+        root = parse_page(html_content).root
+        user_link = first_text(CREATOR_USER_LINK_XPATH, root)
         user_link_params: Dict = parse_qs(unquote(user_link.split("?")[-1]))
         user_name = user_link_params.get("un")[0] if user_link_params.get("un") else ""
         user_id = user_link_params.get("id")[0] if user_link_params.get("id") else ""
-        userinfo_userdata_selector = selector.xpath("//div[@class='userinfo_userdata']")
-        follow_fans_selector = selector.xpath("//span[@class='concern_num']")
+        follow_fans_nodes = CREATOR_FOLLOW_FANS_XPATH(root)
         follows, fans = 0, 0
-        if len(follow_fans_selector) == 2:
-            follows, fans = self.extract_follow_and_fans(follow_fans_selector)
-        user_content = userinfo_userdata_selector.get(default='')
+        if len(follow_fans_nodes) == 2:
+            follows, fans = self.extract_follow_and_fans(follow_fans_nodes)
+        user_content = first_html(CREATOR_USERDATA_XPATH, root)
         return TiebaCreator(user_id=user_id, user_name=user_name,
-                            nickname=selector.xpath(".//span[@class='userinfo_username ']/text()").get(
-                                default='').strip(),
-                            avatar=selector.xpath(".//div[@class='userinfo_left_head']//img/@src").get(
-                                default='').strip(),
+                            nickname=first_text(CREATOR_NICKNAME_XPATH, root).strip(),
+                            avatar=first_text(CREATOR_AVATAR_XPATH, root).strip(),
                             gender=self.extract_gender(user_content),
                             ip_location=self.extract_ip(user_content),
                             follows=follows,
@@ -239,7 +333,7 @@ class TieBaExtractor:
 
     @staticmethod
     def extract_tieba_thread_id_list_from_creator_page(
-        html_content: str
+        html_content: Union[str, Selector]
     ) -> List[str]:
         """
         提取贴吧创作者主页的帖子列表
@@ -249,12 +343,8 @@ class TieBaExtractor:
         Returns:
 
         """
-        selector = Selector(text=html_content)
         thread_id_list = []
-        xpath_selector = (
-            "//ul[@class='new_list clearfix']//div[@class='thread_name']/a[1]/@href"
-        )
-        thread_url_list = selector.xpath(xpath_selector).getall()
+        thread_url_list = CREATOR_THREAD_URL_XPATH(parse_page(html_content).root)
         for thread_url in thread_url_list:
             thread_id = thread_url.split("?")[0].split("/")[-1]
             thread_id_list.append(thread_id)
@@ -269,8 +359,7 @@ class TieBaExtractor:
         Returns:
 
         """
-        pattern_pub_time = re.compile(r'<span class="tail-info">(\d{4}-\d{2}-\d{2} \d{2}:\d{2})</span>')
-        time_match = pattern_pub_time.search(html_content)
+        time_match = PUB_TIME_PATTERN.search(html_content)
         pub_time = time_match.group(1) if time_match else ""
         return self.extract_ip(html_content), pub_time
 
@@ -284,8 +373,7 @@ class TieBaExtractor:
         Returns:
 
         """
-        pattern_ip = re.compile(r'IP属地:(\S+)</span>')
-        ip_match = pattern_ip.search(html_content)
+        ip_match = IP_PATTERN.search(html_content)
         ip = ip_match.group(1) if ip_match else ""
         return ip
 
@@ -306,18 +394,17 @@ class TieBaExtractor:
         return '未知'
 
     @staticmethod
-    def extract_follow_and_fans(selectors: List[Selector]) -> Tuple[str, str]:
+    def extract_follow_and_fans(nodes: List[Union[etree._Element, Selector]]) -> Tuple[str, str]:
         """
         提取关注数和粉丝数
         Args:
-            selectors:
+            nodes: 关注数和粉丝数所在的 lxml 节点或 Selector
 
         Returns:
 
         """
-        pattern = re.compile(r'<span class="concern_num">\(<a[^>]*>(\d+)</a>\)</span>')
-        follow_match = pattern.findall(selectors[0].get())
-        fans_match = pattern.findall(selectors[1].get())
+        follow_match = FOLLOW_FANS_PATTERN.findall(node_html(nodes[0]))
+        fans_match = FOLLOW_FANS_PATTERN.findall(node_html(nodes[1]))
         follows = follow_match[0] if follow_match else 0
         fans = fans_match[0] if fans_match else 0
         return follows, fans
@@ -329,21 +416,22 @@ class TieBaExtractor:
         Returns: 1.9年
 
         """
-        pattern = re.compile(r'<span>吧龄:(\S+)</span>')
-        match = pattern.search(html_content)
+        match = REGISTRATION_DURATION_PATTERN.search(html_content)
         return match.group(1) if match else ""
 
     @staticmethod
-    def extract_data_field_value(selector: Selector) -> Dict:
+    def extract_data_field_value(node: Union[etree._Element, Selector]) -> Dict:
         """
         提取data-field的值
         Args:
-            selector:
+            node: lxml 节点或 Selector
 
         Returns:
 
         """
-        data_field_value = selector.xpath("./@data-field").get(default='').strip()
+        if isinstance(node, Selector):
+            node = node.root
+        data_field_value = first_text(DATA_FIELD_XPATH, node).strip()
         if not data_field_value or data_field_value == "{}":
             return {}
         try:
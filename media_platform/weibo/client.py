@@ -17,7 +17,7 @@ import asyncio
 import copy
 import json
 import re
-from typing import Callable, Dict, List, Optional, Union
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Union
 from urllib.parse import parse_qs, unquote, urlencode
 
 import httpx
@@ -25,7 +25,9 @@ from httpx import Response
 from playwright.async_api import BrowserContext, Page
 
 import config
-from tools import utils
+from replay.transport import create_async_client
+from tools import metrics, utils
+from tools.login_state import invalidate_login_state
 
 from .exception import DataFetchError
 from .field import SearchType
@@ -52,22 +54,27 @@ class WeiboClient:
 
     async def request(self, method, url, **kwargs) -> Union[Response, Dict]:
         enable_return_response = kwargs.pop("return_response", False)
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-
-        if enable_return_response:
-            return response
-
-        data: Dict = response.json()
-        ok_code = data.get("ok")
-        if ok_code == 0:  # response error
-            utils.logger.error(f"[WeiboClient.request] request {method}:{url} err, res:{data}")
-            raise DataFetchError(data.get("msg", "response error"))
-        elif ok_code != 1:  # unknown error
-            utils.logger.error(f"[WeiboClient.request] request {method}:{url} err, res:{data}")
-            raise DataFetchError(data.get("msg", "unknown error"))
-        else:  # response right
-            return data.get("data", {})
+        with metrics.track_request("wb", url):
+            async with create_async_client(proxy=self.proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, **kwargs)
+
+            if enable_return_response:
+                return response
+
+            data: Dict = response.json()
+            ok_code = data.get("ok")
+            if ok_code == 0:  # response error
+                utils.logger.error(f"[WeiboClient.request] request {method}:{url} err, res:{data}")
+                raise DataFetchError(data.get("msg", "response error"))
+            elif ok_code == -100:  # 未登录，返回登录页地址
+                utils.logger.error(f"[WeiboClient.request] request {method}:{url} err, not login, res:{data}")
+                invalidate_login_state("wb", "not login")
+                raise DataFetchError(data.get("msg", "not login"))
+            elif ok_code != 1:  # unknown error
+                utils.logger.error(f"[WeiboClient.request] request {method}:{url} err, res:{data}")
+                raise DataFetchError(data.get("msg", "unknown error"))
+            else:  # response right
+                return data.get("data", {})
 
     async def get(self, uri: str, params=None, headers=None, **kwargs) -> Union[Response, Dict]:
         final_uri = uri
@@ -147,41 +154,80 @@ class WeiboClient:
 
         return await self.get(uri, params, headers=headers)
 
-    async def get_note_all_comments(
+    async def iter_comments(
         self,
         note_id: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
         max_count: int = 10,
-    ):
+    ) -> AsyncIterator[List[Dict]]:
         """
-        get note all comments include sub comments
+        逐页获取帖子评论，开启二级评论时每页一级评论之后紧跟着它们自带的二级评论；
+        调用方处理完一页后才会请求下一页，内存中只保留当前页
         :param note_id:
         :param crawl_interval:
-        :param callback:
-        :param max_count:
-        :return:
+        :param max_count: 最大一级评论数量
+        :return: 每次产出一页评论
         """
-        result = []
+        comments_count = 0
         is_end = False
         max_id = -1
         max_id_type = 0
-        while not is_end and len(result) < max_count:
+        while not is_end and comments_count < max_count:
             comments_res = await self.get_note_comments(note_id, max_id, max_id_type)
             max_id: int = comments_res.get("max_id")
             max_id_type: int = comments_res.get("max_id_type")
             comment_list: List[Dict] = comments_res.get("data", [])
             is_end = max_id == 0
-            if len(result) + len(comment_list) > max_count:
-                comment_list = comment_list[:max_count - len(result)]
+            if comments_count + len(comment_list) > max_count:
+                comment_list = comment_list[:max_count - comments_count]
+            comments_count += len(comment_list)
+            yield comment_list
+            await asyncio.sleep(crawl_interval)
+            for sub_comments in self.iter_sub_comments(comment_list):
+                yield sub_comments
+
+    async def get_note_all_comments(
+        self,
+        note_id: str,
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+        max_count: int = 10,
+    ):
+        """
+        get note all comments include sub comments
+        评论较多时使用 iter_comments 逐页处理，避免所有评论同时保存在内存中
+        :param note_id:
+        :param crawl_interval:
+        :param callback:
+        :param max_count:
+        :return:
+        """
+        result = []
+        async for comment_list in self.iter_comments(note_id, crawl_interval, max_count):
             if callback:  # 如果有回调函数，就执行回调函数
                 await callback(note_id, comment_list)
-            await asyncio.sleep(crawl_interval)
             result.extend(comment_list)
-            sub_comment_result = await self.get_comments_all_sub_comments(note_id, comment_list, callback)
-            result.extend(sub_comment_result)
         return result
 
+    @staticmethod
+    def iter_sub_comments(comment_list: List[Dict]) -> Iterator[List[Dict]]:
+        """
+        逐条产出评论自带的子评论，微博的子评论在一级评论的响应中一并返回，不需要额外请求
+        Args:
+            comment_list:
+
+        Returns: 每次产出一条一级评论的子评论
+
+        """
+        if not config.ENABLE_GET_SUB_COMMENTS:
+            utils.logger.info(f"[WeiboClient.iter_sub_comments] Crawling sub_comment mode is not enabled")
+            return
+
+        for comment in comment_list:
+            sub_comments = comment.get("comments")
+            if sub_comments and isinstance(sub_comments, list):
+                yield sub_comments
+
     @staticmethod
     async def get_comments_all_sub_comments(
         note_id: str,
@@ -198,16 +244,11 @@ class WeiboClient:
         Returns:
 
         """
-        if not config.ENABLE_GET_SUB_COMMENTS:
-            utils.logger.info(f"[WeiboClient.get_comments_all_sub_comments] Crawling sub_comment mode is not enabled")
-            return []
-
         res_sub_comments = []
-        for comment in comment_list:
-            sub_comments = comment.get("comments")
-            if sub_comments and isinstance(sub_comments, list):
+        for sub_comments in WeiboClient.iter_sub_comments(comment_list):
+            if callback:
                 await callback(note_id, sub_comments)
-                res_sub_comments.extend(sub_comments)
+            res_sub_comments.extend(sub_comments)
         return res_sub_comments
 
     async def get_note_info_by_id(self, note_id: str) -> Dict:
@@ -217,7 +258,7 @@ class WeiboClient:
         :return:
         """
         url = f"{self._host}/detail/{note_id}"
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
+        async with create_async_client(proxy=self.proxy) as client:
             response = await client.request("GET", url, timeout=self.timeout, headers=self.headers)
             if response.status_code != 200:
                 raise DataFetchError(f"get weibo detail err: {response.text}")
@@ -232,6 +273,7 @@ class WeiboClient:
                 utils.logger.info(f"[WeiboClient.get_note_info_by_id] 未找到$render_data的值")
                 return dict()
 
+    @metrics.metered_media_download("wb")
     async def get_note_image(self, image_url: str) -> bytes:
         image_url = image_url[8:]  # 去掉 https://
         sub_url = image_url.split("/")
@@ -247,7 +289,7 @@ class WeiboClient:
         # 由于微博图片是通过 i1.wp.com 来访问的，所以需要拼接一下
         final_uri = (f"{self._image_agent_host}"
                      f"{image_url}")
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
+        async with create_async_client(proxy=self.proxy) as client:
             try:
                 response = await client.request("GET", final_uri, timeout=self.timeout)
                 response.raise_for_status()
@@ -337,25 +379,22 @@ class WeiboClient:
         }
         return await self.get(uri, params)
 
-    async def get_all_notes_by_creator_id(
+    async def iter_creator_posts(
         self,
         creator_id: str,
         container_id: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
-    ) -> List[Dict]:
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取指定用户下的所有发过的帖子，该方法会一直查找一个用户下的所有帖子信息
+        逐页获取指定用户发过的帖子，调用方处理完一页后才会请求下一页，内存中只保留当前页
         Args:
             creator_id:
             container_id:
             crawl_interval:
-            callback:
 
-        Returns:
+        Returns: 每次产出一页帖子
 
         """
-        result = []
         notes_has_more = True
         since_id = ""
         crawler_total_count = 0
@@ -366,16 +405,38 @@ class WeiboClient:
                 break
             since_id = notes_res.get("cardlistInfo", {}).get("since_id", "0")
             if "cards" not in notes_res:
-                utils.logger.info(f"[WeiboClient.get_all_notes_by_creator] No 'notes' key found in response: {notes_res}")
+                utils.logger.info(f"[WeiboClient.iter_creator_posts] No 'notes' key found in response: {notes_res}")
                 break
 
             notes = notes_res["cards"]
-            utils.logger.info(f"[WeiboClient.get_all_notes_by_creator] got user_id:{creator_id} notes len : {len(notes)}")
-            notes = [note for note in notes if note.get("card_type") == 9]
-            if callback:
-                await callback(notes)
+            utils.logger.info(f"[WeiboClient.iter_creator_posts] got user_id:{creator_id} notes len : {len(notes)}")
+            yield [note for note in notes if note.get("card_type") == 9]
             await asyncio.sleep(crawl_interval)
-            result.extend(notes)
             crawler_total_count += 10
             notes_has_more = notes_res.get("cardlistInfo", {}).get("total", 0) > crawler_total_count
+
+    async def get_all_notes_by_creator_id(
+        self,
+        creator_id: str,
+        container_id: str,
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+    ) -> List[Dict]:
+        """
+        获取指定用户下的所有发过的帖子，该方法会一直查找一个用户下的所有帖子信息
+        帖子较多时使用 iter_creator_posts 逐页处理，避免所有帖子同时保存在内存中
+        Args:
+            creator_id:
+            container_id:
+            crawl_interval:
+            callback:
+
+        Returns:
+
+        """
+        result = []
+        async for notes in self.iter_creator_posts(creator_id, container_id, crawl_interval):
+            if callback:
+                await callback(notes)
+            result.extend(notes)
         return result
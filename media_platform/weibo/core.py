@@ -33,6 +33,7 @@ from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import weibo as weibo_store
 from tools import utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.login_state import LoginStateManager
 from var import crawler_type_var, source_keyword_var
 
 from .client import WeiboClient
@@ -56,63 +57,86 @@ class WeiboCrawler(AbstractCrawler):
         self.cdp_manager = None
 
     async def start(self):
+        async with async_playwright() as playwright:
+            await self.prepare(playwright)
+            await self.crawl()
+
+    async def prepare(self, playwright: Playwright):
+        """
+        启动浏览器、完成登录并创建 API client，常驻服务模式下每个平台只需调用一次
+        Args:
+            playwright: playwright 实例
+
+        Returns:
+
+        """
         playwright_proxy_format, httpx_proxy_format = None, None
         if config.ENABLE_IP_PROXY:
             ip_proxy_pool = await create_ip_pool(config.IP_PROXY_POOL_COUNT, enable_validate_ip=True)
             ip_proxy_info: IpInfoModel = await ip_proxy_pool.get_proxy()
             playwright_proxy_format, httpx_proxy_format = utils.format_proxy_info(ip_proxy_info)
 
-        async with async_playwright() as playwright:
-            # 根据配置选择启动模式
-            if config.ENABLE_CDP_MODE:
-                utils.logger.info("[WeiboCrawler] 使用CDP模式启动浏览器")
-                self.browser_context = await self.launch_browser_with_cdp(
-                    playwright,
-                    playwright_proxy_format,
-                    self.mobile_user_agent,
-                    headless=config.CDP_HEADLESS,
-                )
-            else:
-                utils.logger.info("[WeiboCrawler] 使用标准模式启动浏览器")
-                # Launch a browser context.
-                chromium = playwright.chromium
-                self.browser_context = await self.launch_browser(chromium, None, self.mobile_user_agent, headless=config.HEADLESS)
-            # stealth.min.js is a js script to prevent the website from detecting the crawler.
-            await self.browser_context.add_init_script(path="libs/stealth.min.js")
-            self.context_page = await self.browser_context.new_page()
+        # 根据配置选择启动模式
+        if config.ENABLE_CDP_MODE:
+            utils.logger.info("[WeiboCrawler] 使用CDP模式启动浏览器")
+            self.browser_context = await self.launch_browser_with_cdp(
+                playwright,
+                playwright_proxy_format,
+                self.mobile_user_agent,
+                headless=config.CDP_HEADLESS,
+            )
+        else:
+            utils.logger.info("[WeiboCrawler] 使用标准模式启动浏览器")
+            # Launch a browser context.
+            chromium = playwright.chromium
+            self.browser_context = await self.launch_browser(chromium, None, self.mobile_user_agent, headless=config.HEADLESS)
+        # stealth.min.js is a js script to prevent the website from detecting the crawler.
+        await self.browser_context.add_init_script(path="libs/stealth.min.js")
+        self.context_page = await self.browser_context.new_page()
+        await self.context_page.goto(self.mobile_index_url)
+
+        login_state = LoginStateManager("wb", self.browser_context, self.context_page)
+        session_fresh = await login_state.restore_if_fresh()
+
+        # Create a client to interact with the xiaohongshu website.
+        self.wb_client = await self.create_weibo_client(httpx_proxy_format)
+        if not session_fresh and not await self.wb_client.pong():
+            login_obj = WeiboLogin(
+                login_type=config.LOGIN_TYPE,
+                login_phone="",  # your phone number
+                browser_context=self.browser_context,
+                context_page=self.context_page,
+                cookie_str=config.COOKIES,
+            )
+            await login_obj.begin()
+
+            # 登录成功后重定向到手机端的网站，再更新手机端登录成功的cookie
+            utils.logger.info("[WeiboCrawler.prepare] redirect weibo mobile homepage and update cookies on mobile platform")
             await self.context_page.goto(self.mobile_index_url)
+            await asyncio.sleep(2)
+            await self.wb_client.update_cookies(browser_context=self.browser_context)
+        if not session_fresh:
+            await login_state.save()
 
-            # Create a client to interact with the xiaohongshu website.
-            self.wb_client = await self.create_weibo_client(httpx_proxy_format)
-            if not await self.wb_client.pong():
-                login_obj = WeiboLogin(
-                    login_type=config.LOGIN_TYPE,
-                    login_phone="",  # your phone number
-                    browser_context=self.browser_context,
-                    context_page=self.context_page,
-                    cookie_str=config.COOKIES,
-                )
-                await login_obj.begin()
-
-                # 登录成功后重定向到手机端的网站，再更新手机端登录成功的cookie
-                utils.logger.info("[WeiboCrawler.start] redirect weibo mobile homepage and update cookies on mobile platform")
-                await self.context_page.goto(self.mobile_index_url)
-                await asyncio.sleep(2)
-                await self.wb_client.update_cookies(browser_context=self.browser_context)
-
-            crawler_type_var.set(config.CRAWLER_TYPE)
-            if config.CRAWLER_TYPE == "search":
-                # Search for video and retrieve their comment information.
-                await self.search()
-            elif config.CRAWLER_TYPE == "detail":
-                # Get the information and comments of the specified post
-                await self.get_specified_notes()
-            elif config.CRAWLER_TYPE == "creator":
-                # Get creator's information and their notes and comments
-                await self.get_creators_and_notes()
-            else:
-                pass
-            utils.logger.info("[WeiboCrawler.start] Weibo Crawler finished ...")
+    async def crawl(self):
+        """
+        按当前 config.CRAWLER_TYPE 执行一次爬取任务，调用前需先执行 prepare
+        Returns:
+
+        """
+        crawler_type_var.set(config.CRAWLER_TYPE)
+        if config.CRAWLER_TYPE == "search":
+            # Search for video and retrieve their comment information.
+            await self.search()
+        elif config.CRAWLER_TYPE == "detail":
+            # Get the information and comments of the specified post
+            await self.get_specified_notes()
+        elif config.CRAWLER_TYPE == "creator":
+            # Get creator's information and their notes and comments
+            await self.get_creators_and_notes()
+        else:
+            pass
+        utils.logger.info("[WeiboCrawler.crawl] Weibo Crawler finished ...")
 
     async def search(self):
         """
@@ -236,12 +260,12 @@ class WeiboCrawler(AbstractCrawler):
                 await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
                 utils.logger.info(f"[WeiboCrawler.get_note_comments] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds before fetching comments for note {note_id}")
                 
-                await self.wb_client.get_note_all_comments(
+                async for comments in self.wb_client.iter_comments(
                     note_id=note_id,
                     crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,  # Use fixed interval instead of random
-                    callback=weibo_store.batch_update_weibo_note_comments,
                     max_count=config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES,
-                )
+                ):
+                    await weibo_store.batch_update_weibo_note_comments(note_id, comments)
             except DataFetchError as ex:
                 utils.logger.error(f"[WeiboCrawler.get_note_comments] get note_id: {note_id} comment error: {ex}")
             except Exception as e:
@@ -287,16 +311,15 @@ class WeiboCrawler(AbstractCrawler):
                     raise DataFetchError("Get creator info error")
                 await weibo_store.save_creator(user_id, user_info=createor_info)
 
-                # Get all note information of the creator
-                all_notes_list = await self.wb_client.get_all_notes_by_creator_id(
+                # Process the creator's notes page by page, only the current page is kept in memory
+                async for notes in self.wb_client.iter_creator_posts(
                     creator_id=user_id,
                     container_id=createor_info_res.get("lfid_container_id"),
                     crawl_interval=0,
-                    callback=weibo_store.batch_update_weibo_notes,
-                )
-
-                note_ids = [note_item.get("mblog", {}).get("id") for note_item in all_notes_list if note_item.get("mblog", {}).get("id")]
-                await self.batch_get_notes_comments(note_ids)
+                ):
+                    await weibo_store.batch_update_weibo_notes(notes)
+                    note_ids = [note_item.get("mblog", {}).get("id") for note_item in notes if note_item.get("mblog", {}).get("id")]
+                    await self.batch_get_notes_comments(note_ids)
 
             else:
                 utils.logger.error(f"[WeiboCrawler.get_creators_and_notes] get creator info error, creator_id:{user_id}")
@@ -11,7 +11,7 @@
 import asyncio
 import json
 import re
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode
 
 import httpx
@@ -20,7 +20,9 @@ from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_result
 
 import config
 from base.base_crawler import AbstractApiClient
-from tools import utils
+from replay.transport import create_async_client
+from tools import metrics, utils
+from tools.login_state import invalidate_login_state
 from html import unescape
 
 from .exception import DataFetchError, IPBlockError
@@ -47,6 +49,7 @@ class XiaoHongShuClient(AbstractApiClient):
         self._domain = "https://www.xiaohongshu.com"
         self.IP_ERROR_STR = "网络连接异常，请检查网络设置或重启试试"
         self.IP_ERROR_CODE = 300012
+        self.SESSION_EXPIRED_CODE = -100
         self.NOTE_ABNORMAL_STR = "笔记状态异常，请稍后查看"
         self.NOTE_ABNORMAL_CODE = -510001
         self.playwright_page = playwright_page
@@ -97,26 +100,32 @@ class XiaoHongShuClient(AbstractApiClient):
         """
         # return response.text
         return_response = kwargs.pop("return_response", False)
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-
-        if response.status_code == 471 or response.status_code == 461:
-            # someday someone maybe will bypass captcha
-            verify_type = response.headers["Verifytype"]
-            verify_uuid = response.headers["Verifyuuid"]
-            msg = f"出现验证码，请求失败，Verifytype: {verify_type}，Verifyuuid: {verify_uuid}, Response: {response}"
-            utils.logger.error(msg)
-            raise Exception(msg)
-
-        if return_response:
-            return response.text
-        data: Dict = response.json()
-        if data["success"]:
-            return data.get("data", data.get("success", {}))
-        elif data["code"] == self.IP_ERROR_CODE:
-            raise IPBlockError(self.IP_ERROR_STR)
-        else:
-            raise DataFetchError(data.get("msg", None))
+        with metrics.track_request("xhs", url) as tracker:
+            async with create_async_client(proxy=self.proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, **kwargs)
+
+            if response.status_code == 471 or response.status_code == 461:
+                # someday someone maybe will bypass captcha
+                verify_type = response.headers["Verifytype"]
+                verify_uuid = response.headers["Verifyuuid"]
+                msg = f"出现验证码，请求失败，Verifytype: {verify_type}，Verifyuuid: {verify_uuid}, Response: {response}"
+                utils.logger.error(msg)
+                tracker.outcome = metrics.OUTCOME_CAPTCHA
+                invalidate_login_state("xhs", "captcha")
+                raise Exception(msg)
+
+            if return_response:
+                return response.text
+            data: Dict = response.json()
+            if data["success"]:
+                return data.get("data", data.get("success", {}))
+            elif data["code"] == self.IP_ERROR_CODE:
+                tracker.outcome = metrics.OUTCOME_BLOCKED
+                raise IPBlockError(self.IP_ERROR_STR)
+            else:
+                if data["code"] == self.SESSION_EXPIRED_CODE:
+                    invalidate_login_state("xhs", data.get("msg", "session expired"))
+                raise DataFetchError(data.get("msg", None))
 
     async def get(self, uri: str, params=None) -> Dict:
         """
@@ -156,8 +165,9 @@ class XiaoHongShuClient(AbstractApiClient):
             **kwargs,
         )
 
+    @metrics.metered_media_download("xhs")
     async def get_note_media(self, url: str) -> Union[bytes, None]:
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
+        async with create_async_client(proxy=self.proxy) as client:
             try:
                 response = await client.request("GET", url, timeout=self.timeout)
                 response.raise_for_status()
@@ -336,29 +346,29 @@ class XiaoHongShuClient(AbstractApiClient):
         }
         return await self.get(uri, params)
 
-    async def get_note_all_comments(
+    async def iter_comments(
         self,
         note_id: str,
         xsec_token: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
         max_count: int = 10,
-    ) -> List[Dict]:
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取指定笔记下的所有一级评论，该方法会一直查找一个帖子下的所有评论信息
+        逐页获取指定笔记下的评论，开启爬二级评论时每页一级评论之后紧跟着它们的二级评论；
+        调用方处理完一页后才会请求下一页，内存中只保留当前页
         Args:
             note_id: 笔记ID
             xsec_token: 验证token
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后
-            max_count: 一次笔记爬取的最大评论数量
-        Returns:
+            max_count: 一次笔记爬取的最大一级评论数量
+
+        Returns: 每次产出一页评论
 
         """
-        result = []
+        comments_count = 0
         comments_has_more = True
         comments_cursor = ""
-        while comments_has_more and len(result) < max_count:
+        while comments_has_more and comments_count < max_count:
             comments_res = await self.get_note_comments(
                 note_id=note_id, xsec_token=xsec_token, cursor=comments_cursor
             )
@@ -366,55 +376,72 @@ class XiaoHongShuClient(AbstractApiClient):
             comments_cursor = comments_res.get("cursor", "")
             if "comments" not in comments_res:
                 utils.logger.info(
-                    f"[XiaoHongShuClient.get_note_all_comments] No 'comments' key found in response: {comments_res}"
+                    f"[XiaoHongShuClient.iter_comments] No 'comments' key found in response: {comments_res}"
                 )
                 break
             comments = comments_res["comments"]
-            if len(result) + len(comments) > max_count:
-                comments = comments[: max_count - len(result)]
+            if comments_count + len(comments) > max_count:
+                comments = comments[: max_count - comments_count]
+            comments_count += len(comments)
+            yield comments
+            await asyncio.sleep(crawl_interval)
+            async for sub_comments in self.iter_sub_comments(comments, xsec_token, crawl_interval):
+                yield sub_comments
+
+    async def get_note_all_comments(
+        self,
+        note_id: str,
+        xsec_token: str,
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+        max_count: int = 10,
+    ) -> List[Dict]:
+        """
+        获取指定笔记下的所有一级评论，该方法会一直查找一个帖子下的所有评论信息
+        评论较多时使用 iter_comments 逐页处理，避免所有评论同时保存在内存中
+        Args:
+            note_id: 笔记ID
+            xsec_token: 验证token
+            crawl_interval: 爬取一次笔记的延迟单位（秒）
+            callback: 一次笔记爬取结束后
+            max_count: 一次笔记爬取的最大评论数量
+        Returns:
+
+        """
+        result = []
+        async for comments in self.iter_comments(note_id, xsec_token, crawl_interval, max_count):
             if callback:
                 await callback(note_id, comments)
-            await asyncio.sleep(crawl_interval)
             result.extend(comments)
-            sub_comments = await self.get_comments_all_sub_comments(
-                comments=comments,
-                xsec_token=xsec_token,
-                crawl_interval=crawl_interval,
-                callback=callback,
-            )
-            result.extend(sub_comments)
         return result
 
-    async def get_comments_all_sub_comments(
+    async def iter_sub_comments(
         self,
         comments: List[Dict],
         xsec_token: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
-    ) -> List[Dict]:
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取指定一级评论下的所有二级评论, 该方法会一直查找一级评论下的所有二级评论信息
+        逐页获取指定一级评论下的所有二级评论，一级评论中自带的二级评论作为第一页
         Args:
             comments: 评论列表
             xsec_token: 验证token
             crawl_interval: 爬取一次评论的延迟单位（秒）
-            callback: 一次评论爬取结束后
 
-        Returns:
+        Returns: 每次产出一页二级评论
 
         """
         if not config.ENABLE_GET_SUB_COMMENTS:
             utils.logger.info(
-                f"[XiaoHongShuCrawler.get_comments_all_sub_comments] Crawling sub_comment mode is not enabled"
+                f"[XiaoHongShuCrawler.iter_sub_comments] Crawling sub_comment mode is not enabled"
             )
-            return []
+            return
 
-        result = []
         for comment in comments:
             note_id = comment.get("note_id")
             sub_comments = comment.get("sub_comments")
-            if sub_comments and callback:
-                await callback(note_id, sub_comments)
+            if sub_comments:
+                yield sub_comments
 
             sub_comment_has_more = comment.get("sub_comment_has_more")
             if not sub_comment_has_more:
@@ -434,21 +461,42 @@ class XiaoHongShuClient(AbstractApiClient):
 
                 if comments_res is None:
                     utils.logger.info(
-                        f"[XiaoHongShuClient.get_comments_all_sub_comments] No response found for note_id: {note_id}"
+                        f"[XiaoHongShuClient.iter_sub_comments] No response found for note_id: {note_id}"
                     )
                     continue
                 sub_comment_has_more = comments_res.get("has_more", False)
                 sub_comment_cursor = comments_res.get("cursor", "")
                 if "comments" not in comments_res:
                     utils.logger.info(
-                        f"[XiaoHongShuClient.get_comments_all_sub_comments] No 'comments' key found in response: {comments_res}"
+                        f"[XiaoHongShuClient.iter_sub_comments] No 'comments' key found in response: {comments_res}"
                     )
                     break
-                comments = comments_res["comments"]
-                if callback:
-                    await callback(note_id, comments)
+                yield comments_res["comments"]
                 await asyncio.sleep(crawl_interval)
-                result.extend(comments)
+
+    async def get_comments_all_sub_comments(
+        self,
+        comments: List[Dict],
+        xsec_token: str,
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+    ) -> List[Dict]:
+        """
+        获取指定一级评论下的所有二级评论, 该方法会一直查找一级评论下的所有二级评论信息
+        Args:
+            comments: 评论列表
+            xsec_token: 验证token
+            crawl_interval: 爬取一次评论的延迟单位（秒）
+            callback: 一次评论爬取结束后
+
+        Returns:
+
+        """
+        result = []
+        async for sub_comments in self.iter_sub_comments(comments, xsec_token, crawl_interval):
+            if callback and sub_comments:
+                await callback(sub_comments[0].get("note_id"), sub_comments)
+            result.extend(sub_comments)
         return result
 
     async def get_creator_info(self, user_id: str) -> Dict:
@@ -488,26 +536,27 @@ class XiaoHongShuClient(AbstractApiClient):
         }
         return await self.get(uri, data)
 
-    async def get_all_notes_by_creator(
+    async def iter_creator_posts(
         self,
         user_id: str,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
-    ) -> List[Dict]:
+        max_count: Optional[int] = None,
+    ) -> AsyncIterator[List[Dict]]:
         """
-        获取指定用户下的所有发过的帖子，该方法会一直查找一个用户下的所有帖子信息
+        逐页获取指定用户发过的帖子，调用方处理完一页后才会请求下一页，内存中只保留当前页
         Args:
             user_id: 用户ID
             crawl_interval: 爬取一次的延迟单位（秒）
-            callback: 一次分页爬取结束后的更新回调函数
+            max_count: 最多获取的帖子数量，默认为 CRAWLER_MAX_NOTES_COUNT
 
-        Returns:
+        Returns: 每次产出一页帖子
 
         """
-        result = []
+        max_count = config.CRAWLER_MAX_NOTES_COUNT if max_count is None else max_count
+        notes_count = 0
         notes_has_more = True
         notes_cursor = ""
-        while notes_has_more and len(result) < config.CRAWLER_MAX_NOTES_COUNT:
+        while notes_has_more and notes_count < max_count:
             notes_res = await self.get_notes_by_creator(user_id, notes_cursor)
             if not notes_res:
                 utils.logger.error(
@@ -519,29 +568,46 @@ class XiaoHongShuClient(AbstractApiClient):
             notes_cursor = notes_res.get("cursor", "")
             if "notes" not in notes_res:
                 utils.logger.info(
-                    f"[XiaoHongShuClient.get_all_notes_by_creator] No 'notes' key found in response: {notes_res}"
+                    f"[XiaoHongShuClient.iter_creator_posts] No 'notes' key found in response: {notes_res}"
                 )
                 break
 
             notes = notes_res["notes"]
             utils.logger.info(
-                f"[XiaoHongShuClient.get_all_notes_by_creator] got user_id:{user_id} notes len : {len(notes)}"
+                f"[XiaoHongShuClient.iter_creator_posts] got user_id:{user_id} notes len : {len(notes)}"
             )
 
-            remaining = config.CRAWLER_MAX_NOTES_COUNT - len(result)
-            if remaining <= 0:
-                break
-
-            notes_to_add = notes[:remaining]
-            if callback:
-                await callback(notes_to_add)
-
-            result.extend(notes_to_add)
+            notes_to_add = notes[:max_count - notes_count]
+            notes_count += len(notes_to_add)
+            yield notes_to_add
             await asyncio.sleep(crawl_interval)
 
         utils.logger.info(
-            f"[XiaoHongShuClient.get_all_notes_by_creator] Finished getting notes for user {user_id}, total: {len(result)}"
+            f"[XiaoHongShuClient.iter_creator_posts] Finished getting notes for user {user_id}, total: {notes_count}"
         )
+
+    async def get_all_notes_by_creator(
+        self,
+        user_id: str,
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+    ) -> List[Dict]:
+        """
+        获取指定用户下的所有发过的帖子，该方法会一直查找一个用户下的所有帖子信息
+        帖子较多时使用 iter_creator_posts 逐页处理，避免所有帖子同时保存在内存中
+        Args:
+            user_id: 用户ID
+            crawl_interval: 爬取一次的延迟单位（秒）
+            callback: 一次分页爬取结束后的更新回调函数
+
+        Returns:
+
+        """
+        result = []
+        async for notes in self.iter_creator_posts(user_id, crawl_interval):
+            if callback:
+                await callback(notes)
+            result.extend(notes)
         return result
 
     async def get_note_short_url(self, note_id: str) -> Dict:
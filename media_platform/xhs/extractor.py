@@ -14,15 +14,86 @@ from typing import Dict, Optional
 
 import humps
 
+INITIAL_STATE_PREFIX = "window.__INITIAL_STATE__="
+SCRIPT_END_TAG = "</script>"
+# JS 对象中作为值出现的 undefined，前一个字符还需要是 : , [ 之一
+JS_UNDEFINED_VALUE_PATTERN = re.compile(r"undefined(?=[,}\]])")
+
+
+def count_unescaped_quotes(text: str) -> int:
+    """统计未被反斜杠转义的双引号数量
+
+    引号前有 k 个连续反斜杠时，它在 \\"、\\\\"、... 中共被统计 k 次，
+    交替加减后 k 为奇数时恰好抵消一次，全程只用 str.count，不需要逐字符扫描
+    """
+    count = text.count('"')
+    backslashes, sign = 1, -1
+    while True:
+        escaped_count = text.count("\\" * backslashes + '"')
+        if not escaped_count:
+            return count
+        count += sign * escaped_count
+        backslashes, sign = backslashes + 1, -sign
+
+
+def replace_js_undefined(state: str, undefined_value: str) -> str:
+    """把字符串外作为值出现的 undefined 替换成合法的 JSON 值，字符串中的 undefined 保持不变
+
+    Args:
+        state (str): window.__INITIAL_STATE__ 的 JS 对象字面量
+        undefined_value (str): 替换成的 JSON 值
+
+    Returns:
+        str: 可以被 json 解析的字符串
+    """
+    parts = []
+    last_end = quote_count = 0
+    for match in JS_UNDEFINED_VALUE_PATTERN.finditer(state):
+        start = match.start()
+        if state[start - 1] not in ":,[":
+            continue
+        segment = state[last_end:start]
+        quote_count += count_unescaped_quotes(segment)
+        parts.append(segment)
+        # 之前未转义的引号数量为奇数说明位于字符串中
+        parts.append("undefined" if quote_count % 2 else undefined_value)
+        last_end = match.end()
+    parts.append(state[last_end:])
+    return "".join(parts)
+
+
+def extract_initial_state(html: str, undefined_value: str = "null") -> Optional[Dict]:
+    """从html中定位并解析 window.__INITIAL_STATE__
+
+    Args:
+        html (str): html字符串
+        undefined_value (str): 字符串外的 undefined 替换成的 JSON 值
+
+    Returns:
+        Dict: 未转换 key 风格的 state 字典
+    """
+    start = html.find(INITIAL_STATE_PREFIX)
+    if start == -1:
+        return None
+    start += len(INITIAL_STATE_PREFIX)
+    end = html.find(SCRIPT_END_TAG, start)
+    if end == -1:
+        return None
+    state = html[start:end].rstrip().rstrip(";")
+    if "undefined" in state:
+        state = replace_js_undefined(state, undefined_value)
+    return json.loads(state, strict=False)
+
 
 class XiaoHongShuExtractor:
     def __init__(self):
         pass
 
     def extract_note_detail_from_html(self, note_id: str, html: str) -> Optional[Dict]:
-        """从html中提取笔记详情
+        """从html中提取笔记详情，只对目标笔记做 key 风格转换
 
         Args:
+            note_id (str): 笔记ID
             html (str): html字符串
 
         Returns:
@@ -32,13 +103,13 @@ class XiaoHongShuExtractor:
             # 这种情况要么是出了验证码了，要么是笔记不存在
             return None
 
-        state = re.findall(r"window.__INITIAL_STATE__=({.*})</script>", html)[
-            0
-        ].replace("undefined", '""')
-        if state != "{}":
-            note_dict = humps.decamelize(json.loads(state))
-            return note_dict["note"]["note_detail_map"][note_id]["note"]
-        return None
+        state = extract_initial_state(html, undefined_value='""')
+        if not state:
+            return None
+        note_detail = state.get("note", {}).get("noteDetailMap", {}).get(note_id)
+        if not note_detail or not note_detail.get("note"):
+            return None
+        return humps.decamelize(note_detail["note"])
 
     def extract_creator_info_from_html(self, html: str) -> Optional[Dict]:
         """从html中提取用户信息
@@ -49,12 +120,7 @@ class XiaoHongShuExtractor:
         Returns:
             Dict: 用户信息字典
         """
-        match = re.search(
-            r"<script>window.__INITIAL_STATE__=(.+)<\/script>", html, re.M
-        )
-        if match is None:
-            return None
-        info = json.loads(match.group(1).replace(":undefined", ":null"), strict=False)
+        info = extract_initial_state(html)
         if info is None:
             return None
         return info.get("user").get("userPageData")
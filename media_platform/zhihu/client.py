@@ -11,7 +11,7 @@
 # -*- coding: utf-8 -*-
 import asyncio
 import json
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
 from urllib.parse import urlencode
 
 import httpx
@@ -23,7 +23,10 @@ import config
 from base.base_crawler import AbstractApiClient
 from constant import zhihu as zhihu_constant
 from model.m_zhihu import ZhihuComment, ZhihuContent, ZhihuCreator
-from tools import utils
+from replay.transport import create_async_client
+from tools import metrics, utils
+from tools.comment_watermark import CommentWatermark
+from tools.login_state import invalidate_login_state
 
 from .exception import DataFetchError, ForbiddenError
 from .field import SearchSort, SearchTime, SearchType
@@ -79,29 +82,33 @@ class ZhiHuClient(AbstractApiClient):
         # return response.text
         return_response = kwargs.pop('return_response', False)
 
-        async with httpx.AsyncClient(proxy=self.proxy) as client:
-            response = await client.request(method, url, timeout=self.timeout, **kwargs)
-
-        if response.status_code != 200:
-            utils.logger.error(f"[ZhiHuClient.request] Requset Url: {url}, Request error: {response.text}")
-            if response.status_code == 403:
-                raise ForbiddenError(response.text)
-            elif response.status_code == 404:  # 如果一个content没有评论也是404
-                return {}
-
-            raise DataFetchError(response.text)
-
-        if return_response:
-            return response.text
-        try:
-            data: Dict = response.json()
-            if data.get("error"):
-                utils.logger.error(f"[ZhiHuClient.request] Request error: {data}")
-                raise DataFetchError(data.get("error", {}).get("message"))
-            return data
-        except json.JSONDecodeError:
-            utils.logger.error(f"[ZhiHuClient.request] Request error: {response.text}")
-            raise DataFetchError(response.text)
+        with metrics.track_request("zhihu", url) as tracker:
+            async with create_async_client(proxy=self.proxy) as client:
+                response = await client.request(method, url, timeout=self.timeout, **kwargs)
+
+            if response.status_code != 200:
+                utils.logger.error(f"[ZhiHuClient.request] Requset Url: {url}, Request error: {response.text}")
+                if response.status_code == 401:
+                    invalidate_login_state("zhihu", "unauthorized")
+                elif response.status_code == 403:
+                    tracker.outcome = metrics.OUTCOME_BLOCKED
+                    raise ForbiddenError(response.text)
+                elif response.status_code == 404:  # 如果一个content没有评论也是404
+                    return {}
+
+                raise DataFetchError(response.text)
+
+            if return_response:
+                return response.text
+            try:
+                data: Dict = response.json()
+                if data.get("error"):
+                    utils.logger.error(f"[ZhiHuClient.request] Request error: {data}")
+                    raise DataFetchError(data.get("error", {}).get("message"))
+                return data
+            except json.JSONDecodeError:
+                utils.logger.error(f"[ZhiHuClient.request] Request error: {response.text}")
+                raise DataFetchError(response.text)
 
     async def get(self, uri: str, params=None, **kwargs) -> Union[Response, Dict, str]:
         """
@@ -261,68 +268,93 @@ class ZhiHuClient(AbstractApiClient):
         }
         return await self.get(uri, params)
 
-    async def get_note_all_comments(
+    async def iter_comments(
         self,
         content: ZhihuContent,
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
-    ) -> List[ZhihuComment]:
+        order_by: str = "score",
+        watermark: Optional[CommentWatermark] = None,
+    ) -> AsyncIterator[List[ZhihuComment]]:
         """
-        获取指定帖子下的所有一级评论，该方法会一直查找一个帖子下的所有评论信息
+        逐页获取指定帖子下的评论，开启爬二级评论时每页一级评论之后紧跟着它们的子评论；
+        调用方处理完一页后才会请求下一页，内存中只保留当前页
         Args:
             content: 内容详情对象(问题｜文章｜视频)
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后
+            order_by: 一级评论排序方式，score 按热度，ts 按时间倒序
+            watermark: 已入库的最新一级评论，需要配合 order_by="ts" 使用，翻页到该评论时停止
 
-        Returns:
+        Returns: 每次产出一页评论
 
         """
-        result: List[ZhihuComment] = []
         is_end: bool = False
         offset: str = ""
         limit: int = 10
         while not is_end:
-            root_comment_res = await self.get_root_comments(content.content_id, content.content_type, offset, limit)
+            root_comment_res = await self.get_root_comments(content.content_id, content.content_type, offset, limit, order_by)
             if not root_comment_res:
                 break
             paging_info = root_comment_res.get("paging", {})
             is_end = paging_info.get("is_end")
             offset = self._extractor.extract_offset(paging_info)
             comments = self._extractor.extract_comments(content, root_comment_res.get("data"))
+            if watermark and comments:
+                comments, reached = watermark.take_new(comments, lambda c: c.comment_id, lambda c: c.publish_time)
+                if reached:
+                    utils.logger.info(f"[ZhiHuClient.iter_comments] content_id: {content.content_id} reached stored comment {watermark}, stop paging")
+                    is_end = True
 
             if not comments:
                 break
 
+            yield comments
+            async for sub_comments in self.iter_sub_comments(content, comments, crawl_interval=crawl_interval):
+                yield sub_comments
+            await asyncio.sleep(crawl_interval)
+
+    async def get_note_all_comments(
+        self,
+        content: ZhihuContent,
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+    ) -> List[ZhihuComment]:
+        """
+        获取指定帖子下的所有一级评论，该方法会一直查找一个帖子下的所有评论信息
+        评论较多时使用 iter_comments 逐页处理，避免所有评论同时保存在内存中
+        Args:
+            content: 内容详情对象(问题｜文章｜视频)
+            crawl_interval: 爬取一次笔记的延迟单位（秒）
+            callback: 一次笔记爬取结束后
+
+        Returns:
+
+        """
+        result: List[ZhihuComment] = []
+        async for comments in self.iter_comments(content, crawl_interval):
             if callback:
                 await callback(comments)
-
             result.extend(comments)
-            await self.get_comments_all_sub_comments(content, comments, crawl_interval=crawl_interval, callback=callback)
-            await asyncio.sleep(crawl_interval)
         return result
 
-    async def get_comments_all_sub_comments(
+    async def iter_sub_comments(
         self,
         content: ZhihuContent,
         comments: List[ZhihuComment],
         crawl_interval: float = 1.0,
-        callback: Optional[Callable] = None,
-    ) -> List[ZhihuComment]:
+    ) -> AsyncIterator[List[ZhihuComment]]:
         """
-        获取指定评论下的所有子评论
+        逐页获取指定评论下的所有子评论
         Args:
             content: 内容详情对象(问题｜文章｜视频)
             comments: 评论列表
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后
 
-        Returns:
+        Returns: 每次产出一页子评论
 
         """
         if not config.ENABLE_GET_SUB_COMMENTS:
-            return []
+            return
 
-        all_sub_comments: List[ZhihuComment] = []
         for parment_comment in comments:
             if parment_comment.sub_comment_count == 0:
                 continue
@@ -342,11 +374,32 @@ class ZhiHuClient(AbstractApiClient):
                 if not sub_comments:
                     break
 
-                if callback:
-                    await callback(sub_comments)
-
-                all_sub_comments.extend(sub_comments)
+                yield sub_comments
                 await asyncio.sleep(crawl_interval)
+
+    async def get_comments_all_sub_comments(
+        self,
+        content: ZhihuContent,
+        comments: List[ZhihuComment],
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+    ) -> List[ZhihuComment]:
+        """
+        获取指定评论下的所有子评论
+        Args:
+            content: 内容详情对象(问题｜文章｜视频)
+            comments: 评论列表
+            crawl_interval: 爬取一次笔记的延迟单位（秒）
+            callback: 一次笔记爬取结束后
+
+        Returns:
+
+        """
+        all_sub_comments: List[ZhihuComment] = []
+        async for sub_comments in self.iter_sub_comments(content, comments, crawl_interval):
+            if callback:
+                await callback(sub_comments)
+            all_sub_comments.extend(sub_comments)
         return all_sub_comments
 
     async def get_creator_info(self, url_token: str) -> Optional[ZhihuCreator]:
@@ -425,36 +478,79 @@ class ZhiHuClient(AbstractApiClient):
         }
         return await self.get(uri, params)
 
-    async def get_all_anwser_by_creator(self, creator: ZhihuCreator, crawl_interval: float = 1.0, callback: Optional[Callable] = None) -> List[ZhihuContent]:
+    async def iter_creator_posts(
+        self,
+        creator: ZhihuCreator,
+        crawl_interval: float = 1.0,
+        content_type: str = "answer",
+    ) -> AsyncIterator[List[ZhihuContent]]:
         """
-        获取创作者的所有回答
+        逐页获取创作者的回答、文章或视频，调用方处理完一页后才会请求下一页，内存中只保留当前页
         Args:
             creator: 创作者信息
             crawl_interval: 爬取一次笔记的延迟单位（秒）
-            callback: 一次笔记爬取结束后
+            content_type: answer | article | zvideo
 
-        Returns:
+        Returns: 每次产出一页内容
 
         """
-        all_contents: List[ZhihuContent] = []
+        fetch_page = {
+            "answer": self.get_creator_answers,
+            "article": self.get_creator_articles,
+            "zvideo": self.get_creator_videos,
+        }[content_type]
         is_end: bool = False
         offset: int = 0
         limit: int = 20
         while not is_end:
-            res = await self.get_creator_answers(creator.url_token, offset, limit)
+            res = await fetch_page(creator.url_token, offset, limit)
             if not res:
                 break
-            utils.logger.info(f"[ZhiHuClient.get_all_anwser_by_creator] Get creator {creator.url_token} answers: {res}")
+            utils.logger.info(f"[ZhiHuClient.iter_creator_posts] Get creator {creator.url_token} {content_type}: {res}")
             paging_info = res.get("paging", {})
             is_end = paging_info.get("is_end")
-            contents = self._extractor.extract_content_list_from_creator(res.get("data"))
+            yield self._extractor.extract_content_list_from_creator(res.get("data"))
+            offset += limit
+            await asyncio.sleep(crawl_interval)
+
+    async def get_all_creator_contents(
+        self,
+        creator: ZhihuCreator,
+        crawl_interval: float = 1.0,
+        callback: Optional[Callable] = None,
+        content_type: str = "answer",
+    ) -> List[ZhihuContent]:
+        """
+        获取创作者的所有回答、文章或视频，内容较多时使用 iter_creator_posts 逐页处理，避免所有内容同时保存在内存中
+        Args:
+            creator: 创作者信息
+            crawl_interval: 爬取一次笔记的延迟单位（秒）
+            callback: 一次笔记爬取结束后
+            content_type: answer | article | zvideo
+
+        Returns:
+
+        """
+        all_contents: List[ZhihuContent] = []
+        async for contents in self.iter_creator_posts(creator, crawl_interval, content_type):
             if callback:
                 await callback(contents)
             all_contents.extend(contents)
-            offset += limit
-            await asyncio.sleep(crawl_interval)
         return all_contents
 
+    async def get_all_anwser_by_creator(self, creator: ZhihuCreator, crawl_interval: float = 1.0, callback: Optional[Callable] = None) -> List[ZhihuContent]:
+        """
+        获取创作者的所有回答
+        Args:
+            creator: 创作者信息
+            crawl_interval: 爬取一次笔记的延迟单位（秒）
+            callback: 一次笔记爬取结束后
+
+        Returns:
+
+        """
+        return await self.get_all_creator_contents(creator, crawl_interval, callback, "answer")
+
     async def get_all_articles_by_creator(
         self,
         creator: ZhihuCreator,
@@ -471,23 +567,7 @@ class ZhiHuClient(AbstractApiClient):
         Returns:
 
         """
-        all_contents: List[ZhihuContent] = []
-        is_end: bool = False
-        offset: int = 0
-        limit: int = 20
-        while not is_end:
-            res = await self.get_creator_articles(creator.url_token, offset, limit)
-            if not res:
-                break
-            paging_info = res.get("paging", {})
-            is_end = paging_info.get("is_end")
-            contents = self._extractor.extract_content_list_from_creator(res.get("data"))
-            if callback:
-                await callback(contents)
-            all_contents.extend(contents)
-            offset += limit
-            await asyncio.sleep(crawl_interval)
-        return all_contents
+        return await self.get_all_creator_contents(creator, crawl_interval, callback, "article")
 
     async def get_all_videos_by_creator(
         self,
@@ -505,23 +585,7 @@ class ZhiHuClient(AbstractApiClient):
         Returns:
 
         """
-        all_contents: List[ZhihuContent] = []
-        is_end: bool = False
-        offset: int = 0
-        limit: int = 20
-        while not is_end:
-            res = await self.get_creator_videos(creator.url_token, offset, limit)
-            if not res:
-                break
-            paging_info = res.get("paging", {})
-            is_end = paging_info.get("is_end")
-            contents = self._extractor.extract_content_list_from_creator(res.get("data"))
-            if callback:
-                await callback(contents)
-            all_contents.extend(contents)
-            offset += limit
-            await asyncio.sleep(crawl_interval)
-        return all_contents
+        return await self.get_all_creator_contents(creator, crawl_interval, callback, "zvideo")
 
     async def get_answer_info(
         self,
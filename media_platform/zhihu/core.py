@@ -32,6 +32,8 @@ from proxy.proxy_ip_pool import IpInfoModel, create_ip_pool
 from store import zhihu as zhihu_store
 from tools import utils
 from tools.cdp_browser import CDPBrowserManager
+from tools.comment_watermark import delta_comments_enabled
+from tools.login_state import LoginStateManager
 from var import crawler_type_var, source_keyword_var
 
 from .client import ZhiHuClient
@@ -54,8 +56,16 @@ class ZhihuCrawler(AbstractCrawler):
         self.cdp_manager = None
 
     async def start(self) -> None:
+        async with async_playwright() as playwright:
+            await self.prepare(playwright)
+            await self.crawl()
+
+    async def prepare(self, playwright: Playwright) -> None:
         """
-        Start the crawler
+        启动浏览器、完成登录并创建 API client，常驻服务模式下每个平台只需调用一次
+        Args:
+            playwright: playwright 实例
+
         Returns:
 
         """
@@ -69,68 +79,78 @@ class ZhihuCrawler(AbstractCrawler):
                 ip_proxy_info
             )
 
-        async with async_playwright() as playwright:
-            # 根据配置选择启动模式
-            if config.ENABLE_CDP_MODE:
-                utils.logger.info("[ZhihuCrawler] 使用CDP模式启动浏览器")
-                self.browser_context = await self.launch_browser_with_cdp(
-                    playwright,
-                    playwright_proxy_format,
-                    self.user_agent,
-                    headless=config.CDP_HEADLESS,
-                )
-            else:
-                utils.logger.info("[ZhihuCrawler] 使用标准模式启动浏览器")
-                # Launch a browser context.
-                chromium = playwright.chromium
-                self.browser_context = await self.launch_browser(
-                    chromium, None, self.user_agent, headless=config.HEADLESS
-                )
-            # stealth.min.js is a js script to prevent the website from detecting the crawler.
-            await self.browser_context.add_init_script(path="libs/stealth.min.js")
-
-            self.context_page = await self.browser_context.new_page()
-            await self.context_page.goto(self.index_url, wait_until="domcontentloaded")
-
-            # Create a client to interact with the zhihu website.
-            self.zhihu_client = await self.create_zhihu_client(httpx_proxy_format)
-            if not await self.zhihu_client.pong():
-                login_obj = ZhiHuLogin(
-                    login_type=config.LOGIN_TYPE,
-                    login_phone="",  # input your phone number
-                    browser_context=self.browser_context,
-                    context_page=self.context_page,
-                    cookie_str=config.COOKIES,
-                )
-                await login_obj.begin()
-                await self.zhihu_client.update_cookies(
-                    browser_context=self.browser_context
-                )
-
-            # 知乎的搜索接口需要打开搜索页面之后cookies才能访问API，单独的首页不行
-            utils.logger.info(
-                "[ZhihuCrawler.start] Zhihu跳转到搜索页面获取搜索页面的Cookies，该过程需要5秒左右"
+        # 根据配置选择启动模式
+        if config.ENABLE_CDP_MODE:
+            utils.logger.info("[ZhihuCrawler] 使用CDP模式启动浏览器")
+            self.browser_context = await self.launch_browser_with_cdp(
+                playwright,
+                playwright_proxy_format,
+                self.user_agent,
+                headless=config.CDP_HEADLESS,
+            )
+        else:
+            utils.logger.info("[ZhihuCrawler] 使用标准模式启动浏览器")
+            # Launch a browser context.
+            chromium = playwright.chromium
+            self.browser_context = await self.launch_browser(
+                chromium, None, self.user_agent, headless=config.HEADLESS
+            )
+        # stealth.min.js is a js script to prevent the website from detecting the crawler.
+        await self.browser_context.add_init_script(path="libs/stealth.min.js")
+
+        self.context_page = await self.browser_context.new_page()
+        await self.context_page.goto(self.index_url, wait_until="domcontentloaded")
+
+        login_state = LoginStateManager("zhihu", self.browser_context, self.context_page)
+        session_fresh = await login_state.restore_if_fresh()
+
+        # Create a client to interact with the zhihu website.
+        self.zhihu_client = await self.create_zhihu_client(httpx_proxy_format)
+        if not session_fresh and not await self.zhihu_client.pong():
+            login_obj = ZhiHuLogin(
+                login_type=config.LOGIN_TYPE,
+                login_phone="",  # input your phone number
+                browser_context=self.browser_context,
+                context_page=self.context_page,
+                cookie_str=config.COOKIES,
             )
-            await self.context_page.goto(
-                f"{self.index_url}/search?q=python&search_source=Guess&utm_content=search_hot&type=content"
+            await login_obj.begin()
+            await self.zhihu_client.update_cookies(
+                browser_context=self.browser_context
             )
-            await asyncio.sleep(5)
-            await self.zhihu_client.update_cookies(browser_context=self.browser_context)
-
-            crawler_type_var.set(config.CRAWLER_TYPE)
-            if config.CRAWLER_TYPE == "search":
-                # Search for notes and retrieve their comment information.
-                await self.search()
-            elif config.CRAWLER_TYPE == "detail":
-                # Get the information and comments of the specified post
-                await self.get_specified_notes()
-            elif config.CRAWLER_TYPE == "creator":
-                # Get creator's information and their notes and comments
-                await self.get_creators_and_notes()
-            else:
-                pass
-
-            utils.logger.info("[ZhihuCrawler.start] Zhihu Crawler finished ...")
+        if not session_fresh:
+            await login_state.save()
+
+        # 知乎的搜索接口需要打开搜索页面之后cookies才能访问API，单独的首页不行
+        utils.logger.info(
+            "[ZhihuCrawler.prepare] Zhihu跳转到搜索页面获取搜索页面的Cookies，该过程需要5秒左右"
+        )
+        await self.context_page.goto(
+            f"{self.index_url}/search?q=python&search_source=Guess&utm_content=search_hot&type=content"
+        )
+        await asyncio.sleep(5)
+        await self.zhihu_client.update_cookies(browser_context=self.browser_context)
+
+    async def crawl(self) -> None:
+        """
+        按当前 config.CRAWLER_TYPE 执行一次爬取任务，调用前需先执行 prepare
+        Returns:
+
+        """
+        crawler_type_var.set(config.CRAWLER_TYPE)
+        if config.CRAWLER_TYPE == "search":
+            # Search for notes and retrieve their comment information.
+            await self.search()
+        elif config.CRAWLER_TYPE == "detail":
+            # Get the information and comments of the specified post
+            await self.get_specified_notes()
+        elif config.CRAWLER_TYPE == "creator":
+            # Get creator's information and their notes and comments
+            await self.get_creators_and_notes()
+        else:
+            pass
+
+        utils.logger.info("[ZhihuCrawler.crawl] Zhihu Crawler finished ...")
 
     async def search(self) -> None:
         """Search for notes and retrieve their comment information."""
@@ -228,11 +248,19 @@ class ZhihuCrawler(AbstractCrawler):
             await asyncio.sleep(config.CRAWLER_MAX_SLEEP_SEC)
             utils.logger.info(f"[ZhihuCrawler.get_comments] Sleeping for {config.CRAWLER_MAX_SLEEP_SEC} seconds before fetching comments for content {content_item.content_id}")
             
-            await self.zhihu_client.get_note_all_comments(
+            # 增量模式按时间倒序翻页，翻到已入库的评论即停止
+            order_by, watermark = "score", None
+            if delta_comments_enabled():
+                order_by = "ts"
+                watermark = await zhihu_store.query_content_comment_watermark(content_item.content_id)
+                utils.logger.info(f"[ZhihuCrawler.get_comments] content_id: {content_item.content_id} delta comments since {watermark}")
+            async for comments in self.zhihu_client.iter_comments(
                 content=content_item,
                 crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
-                callback=zhihu_store.batch_update_zhihu_note_comments,
-            )
+                order_by=order_by,
+                watermark=watermark,
+            ):
+                await zhihu_store.batch_update_zhihu_note_comments(comments)
 
     async def get_creators_and_notes(self) -> None:
         """
@@ -263,31 +291,16 @@ class ZhihuCrawler(AbstractCrawler):
             )
             await zhihu_store.save_creator(creator=createor_info)
 
-            # 默认只提取回答信息，如果需要文章和视频，把下面的注释打开即可
-
-            # Get all anwser information of the creator
-            all_content_list = await self.zhihu_client.get_all_anwser_by_creator(
+            # 默认只提取回答信息，如果需要文章和视频，把 content_type 改为 article 或 zvideo 即可
+            # Process the creator's contents page by page, only the current page is kept in memory
+            async for contents in self.zhihu_client.iter_creator_posts(
                 creator=createor_info,
                 crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
-                callback=zhihu_store.batch_update_zhihu_contents,
-            )
-
-            # Get all articles of the creator's contents
-            # all_content_list = await self.zhihu_client.get_all_articles_by_creator(
-            #     creator=createor_info,
-            #     crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
-            #     callback=zhihu_store.batch_update_zhihu_contents
-            # )
-
-            # Get all videos of the creator's contents
-            # all_content_list = await self.zhihu_client.get_all_videos_by_creator(
-            #     creator=createor_info,
-            #     crawl_interval=config.CRAWLER_MAX_SLEEP_SEC,
-            #     callback=zhihu_store.batch_update_zhihu_contents
-            # )
-
-            # Get all comments of the creator's contents
-            await self.batch_get_content_comments(all_content_list)
+                content_type="answer",
+            ):
+                await zhihu_store.batch_update_zhihu_contents(contents)
+                # Get all comments of the creator's contents
+                await self.batch_get_content_comments(contents)
 
     async def get_note_detail(
         self, full_note_url: str, semaphore: asyncio.Semaphore
@@ -23,7 +23,7 @@ from proxy.providers import (
     new_kuai_daili_proxy,
     new_wandou_http_proxy,
 )
-from tools import utils
+from tools import metrics, utils
 
 from .base_proxy import ProxyProvider
 from .types import IpInfoModel, ProviderNameEnum
@@ -53,7 +53,9 @@ class ProxyIpPool:
         Returns:
 
         """
-        self.proxy_list = await self.ip_provider.get_proxy(self.ip_pool_count)
+        with metrics.track_proxy_fetch(config.IP_PROXY_PROVIDER_NAME) as fetched:
+            self.proxy_list = await self.ip_provider.get_proxy(self.ip_pool_count)
+            fetched.extend(self.proxy_list)
 
     async def _is_valid_proxy(self, proxy: IpInfoModel) -> bool:
         """
@@ -0,0 +1,168 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 录制文件，每行一个 JSON 格式的请求/响应对
+import base64
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import aiofiles
+import httpx
+
+# 响应体在录制时已经解压，这些头部回放时会与实际内容不一致，录制时丢弃
+DROP_RESPONSE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def encode_content(content: bytes) -> Tuple[str, str]:
+    """
+    文本内容原样保存便于人工查看和修改，二进制内容（图片、视频）使用 base64
+    Args:
+        content: 响应体
+
+    Returns: (保存的内容, 编码方式)
+
+    """
+    try:
+        return content.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        return base64.b64encode(content).decode("ascii"), "base64"
+
+
+def decode_content(text: str, encoding: str) -> bytes:
+    if encoding == "base64":
+        return base64.b64decode(text)
+    return text.encode("utf-8")
+
+
+class Cassette:
+    """
+    请求/响应录制文件
+    相同指纹的请求（例如翻页时参数相同的重试）按录制顺序依次回放，回放完后重复最后一条
+    """
+
+    def __init__(self, path: str, ignore_params: Iterable[str] = ()):
+        """
+        :param path: 录制文件路径（jsonl）
+        :param ignore_params: 生成请求指纹时忽略的 query 参数和 JSON 请求体字段，例如签名、时间戳
+        """
+        self.path = path
+        self.ignore_params = set(ignore_params)
+        self._entries: Dict[str, List[Dict]] = {}
+        self._play_index: Dict[str, int] = {}
+        self.play_count = 0
+        self._dir_created = False
+        self.load()
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def load(self):
+        """
+        从磁盘加载录制文件
+        :return:
+        """
+        self._entries.clear()
+        self.rewind()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry: Dict = json.loads(line)
+                self._entries.setdefault(entry["key"], []).append(entry)
+
+    def rewind(self) -> int:
+        """
+        重置回放进度，用于同一个录制文件的多轮基准测试
+        :return: 上次重置后回放的请求数
+        """
+        play_count = self.play_count
+        self._play_index.clear()
+        self.play_count = 0
+        return play_count
+
+    def request_key(self, method: str, url: str, content: bytes = b"") -> str:
+        """
+        生成请求指纹：方法 + host + path + 排序后的 query + 规范化后的请求体，忽略会随时间变化的参数
+        :param method: 请求方法
+        :param url: 请求地址
+        :param content: 请求体
+        :return:
+        """
+        request_url = httpx.URL(url)
+        params = sorted(
+            (name, value) for name, value in request_url.params.multi_items() if name not in self.ignore_params
+        )
+        body = ""
+        if content:
+            try:
+                data = json.loads(content)
+            except ValueError:
+                data = None
+            if isinstance(data, dict):
+                data = {name: value for name, value in data.items() if name not in self.ignore_params}
+                body = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+            else:
+                body = hashlib.sha1(content).hexdigest()
+        canonical = f"{method.upper()} {request_url.host}{request_url.path}?{urlencode(params)} {body}"
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+    async def record(self, method: str, url: str, request_content: bytes, status_code: int,
+                     headers: List[Tuple[str, str]], content: bytes) -> Dict:
+        """
+        追加一条录制记录，立即异步写入磁盘，不阻塞事件循环，进程中途退出时已录制的内容不会丢失
+        :param method: 请求方法
+        :param url: 请求地址
+        :param request_content: 请求体
+        :param status_code: 响应状态码
+        :param headers: 响应头
+        :param content: 解压后的响应体
+        :return:
+        """
+        text, encoding = encode_content(content)
+        entry = {
+            "key": self.request_key(method, url, request_content),
+            "method": method.upper(),
+            "url": url,
+            "status_code": status_code,
+            "headers": [[name, value] for name, value in headers if name.lower() not in DROP_RESPONSE_HEADERS],
+            "content": text,
+            "content_encoding": encoding,
+        }
+        if not self._dir_created:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._dir_created = True
+        # 整行一次写入，并发录制时各行不会交错
+        async with aiofiles.open(self.path, "ab") as f:
+            await f.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+        self._entries.setdefault(entry["key"], []).append(entry)
+        return entry
+
+    def play(self, method: str, url: str, request_content: bytes = b"") -> Optional[Dict]:
+        """
+        查找请求对应的录制记录
+        :param method: 请求方法
+        :param url: 请求地址
+        :param request_content: 请求体
+        :return: 录制记录，没有录制过该请求时返回 None
+        """
+        key = self.request_key(method, url, request_content)
+        entries = self._entries.get(key)
+        if not entries:
+            return None
+        index = self._play_index.get(key, 0)
+        self._play_index[key] = index + 1
+        self.play_count += 1
+        return entries[min(index, len(entries) - 1)]
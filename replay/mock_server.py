@@ -0,0 +1,95 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 本地回放服务，按录制文件返回响应，支持注入延迟和错误
+# 使用方式：
+#   python -m replay.mock_server --cassette data/http_replay/xhs.jsonl --latency_ms 200 --error_rate 0.05
+#   爬虫配置 HTTP_REPLAY_MODE = "replay"，HTTP_REPLAY_SERVER_URL = "http://127.0.0.1:8090"
+import argparse
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+import config
+
+from .cassette import Cassette, decode_content
+from .transport import REPLAY_ORIGIN_HEADER, FaultInjector
+
+REPLAY_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"]
+
+
+def create_app(cassette: Cassette, fault_injector: FaultInjector) -> FastAPI:
+    """
+    创建回放服务
+    Args:
+        cassette: 录制文件
+        fault_injector: 延迟和错误注入
+
+    Returns:
+
+    """
+    app = FastAPI(title="MediaCrawler replay server")
+
+    @app.post("/_replay/rewind")
+    async def rewind():
+        return {"entries": len(cassette), "played": cassette.rewind()}
+
+    @app.api_route("/{path:path}", methods=REPLAY_METHODS)
+    async def replay(request: Request):
+        origin = request.headers.get(REPLAY_ORIGIN_HEADER)
+        if not origin:
+            return Response(status_code=400, content=f"missing {REPLAY_ORIGIN_HEADER} header")
+        url = f"{origin}{request.url.path}"
+        if request.url.query:
+            url = f"{url}?{request.url.query}"
+
+        await fault_injector.delay()
+        if fault_injector.should_fail():
+            return Response(status_code=fault_injector.error_status_code, content=b"injected error")
+        entry = cassette.play(request.method, url, await request.body())
+        if entry is None:
+            return Response(status_code=404, content=f"replay miss: {request.method} {url}")
+        return Response(
+            status_code=entry["status_code"],
+            headers=dict(entry["headers"]),
+            content=decode_content(entry["content"], entry["content_encoding"]),
+        )
+
+    return app
+
+
+def parse_server_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='HTTP replay server. / 本地回放服务')
+    parser.add_argument('--cassette', type=str, required=True, help='Recorded jsonl file / 录制文件路径')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency_ms', type=int, default=config.HTTP_REPLAY_LATENCY_MS,
+                        help='Latency added to every response / 每个响应的固定延迟（毫秒）')
+    parser.add_argument('--latency_jitter_ms', type=int, default=config.HTTP_REPLAY_LATENCY_JITTER_MS,
+                        help='Random extra latency / 随机附加延迟上限（毫秒）')
+    parser.add_argument('--error_rate', type=float, default=config.HTTP_REPLAY_ERROR_RATE,
+                        help='Ratio of responses replaced by an error / 注入错误响应的比例')
+    parser.add_argument('--error_status_code', type=int, default=503,
+                        help='Status code of injected errors / 注入错误的状态码')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed / 随机种子')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_server_args()
+    cassette = Cassette(args.cassette, config.HTTP_REPLAY_IGNORE_PARAMS)
+    fault_injector = FaultInjector(args.latency_ms, args.latency_jitter_ms, args.error_rate,
+                                   args.error_status_code, args.seed)
+    uvicorn.run(create_app(cassette, fault_injector), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
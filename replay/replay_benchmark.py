@@ -0,0 +1,157 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 基于录制文件的端到端爬取基准测试，不启动浏览器、不访问网络
+# 使用方式：
+#   1. 录制：HTTP_REPLAY_MODE = "record"，正常执行 python main.py --platform xhs --type search
+#   2. 回放：python -m replay.replay_benchmark --platform xhs --rounds 5
+#      加 --server_url http://127.0.0.1:8090 时请求经由本地回放服务（python -m replay.mock_server）
+#      或合成数据的模拟平台服务（python -m replay.synthetic_server，支持 xhs | bili | dy | ks）
+import argparse
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+import config
+from base.base_crawler import AbstractCrawler
+from main import CrawlerFactory
+from tools import utils
+from tools.benchmark import BenchmarkResult, run_benchmark
+
+from .transport import get_cassette, get_cassette_path
+
+# 回放时的 localStorage，b 站签名需要 wbi_img_urls，签名参数匹配录制记录时会被忽略，取值不影响回放
+REPLAY_LOCAL_STORAGE = {
+    "b1": "",
+    "wbi_img_urls": "https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png-"
+                    "https://i0.hdslb.com/bfs/wbi/4932caff0ff746eab6f01bf08b70ac45.png",
+}
+# 小红书 window._webmsxyw 的返回值，x-s-common 的计算要求 X-t + X-s + b1 不少于 57 个字符
+REPLAY_XHS_ENCRYPT_PARAMS = {"X-s": "XYW_" + "0" * 60, "X-t": 1700000000000}
+# 抖音 a_bogus 签名需要 User-Agent
+REPLAY_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
+
+
+class ReplayPage:
+    """
+    代替 playwright Page 供 API 客户端签名使用，回放时不需要启动浏览器
+    """
+
+    def __init__(self, local_storage: Optional[Dict] = None):
+        self.local_storage = local_storage if local_storage is not None else dict(REPLAY_LOCAL_STORAGE)
+
+    async def evaluate(self, expression: str, arg: Any = None) -> Dict:
+        if "localStorage" in expression:
+            return self.local_storage
+        if "_webmsxyw" in expression:
+            return dict(REPLAY_XHS_ENCRYPT_PARAMS)
+        return {}
+
+
+def create_replay_crawler(platform: str) -> Tuple[AbstractCrawler, Callable[[], Awaitable[None]]]:
+    """
+    创建不依赖浏览器的爬虫对象
+    Args:
+        platform: 平台，目前支持 xhs | bili | dy | ks
+
+    Returns: (爬虫对象, 要执行的搜索方法)
+
+    """
+    crawler = CrawlerFactory.create_crawler(platform)
+    if platform == "xhs":
+        from media_platform.xhs.client import XiaoHongShuClient
+        crawler.xhs_client = XiaoHongShuClient(headers={}, playwright_page=ReplayPage(), cookie_dict={})
+        return crawler, crawler.search
+    if platform == "bili":
+        from media_platform.bilibili.client import BilibiliClient
+        crawler.bili_client = BilibiliClient(headers={}, playwright_page=ReplayPage(), cookie_dict={})
+        return crawler, crawler.search_by_keywords
+    if platform == "dy":
+        from media_platform.douyin.client import DouYinClient
+        headers = {"User-Agent": REPLAY_USER_AGENT, "Origin": "https://www.douyin.com/",
+                   "Referer": "https://www.douyin.com/"}
+        crawler.dy_client = DouYinClient(headers=headers, playwright_page=ReplayPage(), cookie_dict={})
+        return crawler, crawler.search
+    if platform == "ks":
+        from media_platform.kuaishou.client import KuaiShouClient
+        crawler.ks_client = KuaiShouClient(headers={}, playwright_page=ReplayPage(), cookie_dict={})
+        return crawler, crawler.search
+    raise ValueError(f"Unsupported replay benchmark platform: {platform}")
+
+
+def rewind() -> int:
+    """
+    重置回放进度
+    :return: 上次重置后回放的请求数
+    """
+    if config.HTTP_REPLAY_SERVER_URL:
+        response = httpx.post(f"{config.HTTP_REPLAY_SERVER_URL}/_replay/rewind")
+        response.raise_for_status()
+        return response.json()["played"]
+    return get_cassette(get_cassette_path(config.PLATFORM)).rewind()
+
+
+def run_replay_benchmark(platform: str, rounds: int = 5) -> BenchmarkResult:
+    """
+    用录制文件多次执行完整的关键词搜索流程，统计每秒回放的请求数
+    Args:
+        platform: 平台
+        rounds: 计时轮数
+
+    Returns:
+
+    """
+    config.PLATFORM = platform
+    config.CRAWLER_TYPE = "search"
+    config.HTTP_REPLAY_MODE = "replay"
+    crawler, crawl_func = create_replay_crawler(platform)
+    loop = asyncio.new_event_loop()
+
+    def run_round():
+        rewind()
+        loop.run_until_complete(crawl_func())
+
+    try:
+        # 先跑一轮统计请求数，同时作为预热
+        run_round()
+        requests_per_round = rewind()
+        if not requests_per_round:
+            raise ValueError(f"No request matched the recorded responses of {platform}, record a crawl first")
+        return run_benchmark(f"replay.{platform}.search", run_round, requests_per_round, rounds=rounds, warmup=0)
+    finally:
+        loop.close()
+
+
+def parse_benchmark_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Offline end-to-end crawl benchmark. / 基于录制文件的端到端基准测试')
+    parser.add_argument('--platform', type=str, choices=['xhs', 'bili', 'dy', 'ks'], default=config.PLATFORM)
+    parser.add_argument('--keywords', type=str, default=config.KEYWORDS,
+                        help='Must match the recorded crawl / 需要与录制时的关键词一致')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--server_url', type=str, default=config.HTTP_REPLAY_SERVER_URL,
+                        help='Replay through the local replay server / 经由本地回放服务回放')
+    parser.add_argument('--sleep_sec', type=float, default=0,
+                        help='Sleep between pages, 0 measures the crawler itself / 翻页间隔，默认为 0')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_benchmark_args()
+    config.KEYWORDS = args.keywords
+    config.HTTP_REPLAY_SERVER_URL = args.server_url
+    config.CRAWLER_MAX_SLEEP_SEC = args.sleep_sec
+    result = run_replay_benchmark(args.platform, args.rounds)
+    utils.logger.info(f"[replay_benchmark] {result.summary().replace('items/sec', 'requests/sec')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,393 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 合成数据的本地模拟平台服务，模拟小红书/B站/抖音/快手的搜索、详情、评论接口
+# 用于压测客户端、存储和代理切换的吞吐上限，数据规模和封禁响应比例均可配置
+# 使用方式：
+#   python -m replay.synthetic_server --notes_per_keyword 200 --comments_per_note 100 --ip_block_rate 0.01
+#   爬虫配置 HTTP_REPLAY_MODE = "replay"，HTTP_REPLAY_SERVER_URL = "http://127.0.0.1:8091"
+#   压测：python -m replay.replay_benchmark --platform dy --server_url http://127.0.0.1:8091
+import argparse
+import copy
+import hashlib
+import json
+import random
+import uuid
+from collections import Counter
+from typing import Callable, Dict, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+from .transport import REPLAY_ORIGIN_HEADER, FaultInjector
+
+# 原始请求 host -> 平台
+PLATFORM_HOSTS = {
+    "edith.xiaohongshu.com": "xhs",
+    "api.bilibili.com": "bili",
+    "www.douyin.com": "dy",
+    "www.kuaishou.com": "ks",
+}
+# 平台 -> 字段结构模板所在目录
+PLATFORM_TEMPLATE_DIRS = {"xhs": "xhs", "bili": "bilibili", "dy": "douyin", "ks": "kuaishou"}
+
+BLOCK_CAPTCHA = "captcha"
+BLOCK_IP = "ip_block"
+
+
+class SyntheticConfig(BaseModel):
+    notes_per_keyword: int = Field(default=100, title="每个关键词的搜索结果总数")
+    comments_per_note: int = Field(default=50, title="每条内容的一级评论数")
+    sub_comments_per_comment: int = Field(default=10, title="每条一级评论的二级评论数")
+    captcha_rate: float = Field(default=0.0, title="返回验证码（小红书 461）的比例，仅小红书")
+    ip_block_rate: float = Field(default=0.0, title="返回 IP 封禁的比例：小红书 300012，抖音 blocked，B站 -412，快手 errors")
+    latency_ms: int = Field(default=0, title="每个响应的固定延迟（毫秒）")
+    latency_jitter_ms: int = Field(default=0, title="随机附加延迟上限（毫秒）")
+    seed: int = Field(default=0, title="随机种子")
+
+
+def stable_int(*parts) -> int:
+    """同样的输入总是生成同样的 ID，多轮压测之间数据保持一致"""
+    return int(hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:15], 16)
+
+
+def stable_hex(*parts, length: int = 24) -> str:
+    return hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:length]
+
+
+def paginate(total: int, offset: int, size: int) -> Tuple[range, bool]:
+    """
+    计算分页范围
+    :param total: 总条数
+    :param offset: 起始位置
+    :param size: 每页条数
+    :return: (当前页的下标范围, 是否还有下一页)
+    """
+    start = max(offset, 0)
+    end = min(start + max(size, 0), total)
+    return range(start, max(start, end)), end < total
+
+
+def to_int(value, default: int = 0) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def load_templates(platform: str) -> Dict:
+    with open(f"media_platform/{PLATFORM_TEMPLATE_DIRS[platform]}/test_data/api_payloads.json", "r",
+              encoding="utf-8") as f:
+        return json.load(f)
+
+
+class SyntheticPlatformServer:
+    """
+    按请求参数即时生成数据，ID 由关键词和下标决定；字段结构来自各平台 test_data 下的接口样例
+    """
+
+    def __init__(self, synthetic_config: SyntheticConfig):
+        self.config = synthetic_config
+        self._random = random.Random(synthetic_config.seed)
+        self._fault_injector = FaultInjector(synthetic_config.latency_ms, synthetic_config.latency_jitter_ms,
+                                             seed=synthetic_config.seed)
+        self._templates = {platform: load_templates(platform) for platform in PLATFORM_TEMPLATE_DIRS}
+        self._handlers: Dict[str, Callable[[str, Dict, Dict], Response]] = {
+            "xhs": self.handle_xhs,
+            "bili": self.handle_bili,
+            "dy": self.handle_dy,
+            "ks": self.handle_ks,
+        }
+        self.stats: Counter = Counter()
+        self.request_count = 0
+
+    def template(self, platform: str, name: str) -> Dict:
+        return copy.deepcopy(self._templates[platform][name])
+
+    def block_kind(self, platform: str) -> Optional[str]:
+        value = self._random.random()
+        if platform == "xhs" and value < self.config.captcha_rate:
+            return BLOCK_CAPTCHA
+        if value < self.config.captcha_rate + self.config.ip_block_rate:
+            return BLOCK_IP
+        return None
+
+    async def handle(self, platform: str, path: str, params: Dict, body: bytes) -> Response:
+        """
+        处理一次请求
+        Args:
+            platform: 平台
+            path: 请求路径
+            params: query 参数
+            body: 请求体
+
+        Returns:
+
+        """
+        self.request_count += 1
+        await self._fault_injector.delay()
+        block_kind = self.block_kind(platform)
+        if block_kind:
+            self.stats[f"{platform}:{block_kind}"] += 1
+            return self.block_response(platform, block_kind)
+        data: Dict = {}
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                data = {}
+        endpoint = data.get("operationName", path) if platform == "ks" else path
+        self.stats[f"{platform}:{endpoint}"] += 1
+        return self._handlers[platform](path, params, data)
+
+    @staticmethod
+    def block_response(platform: str, block_kind: str) -> Response:
+        if block_kind == BLOCK_CAPTCHA:
+            return Response(status_code=461, headers={"Verifytype": "102", "Verifyuuid": str(uuid.uuid4())})
+        if platform == "xhs":
+            return JSONResponse({"success": False, "code": 300012, "msg": "网络连接异常，请检查网络设置或重启试试"})
+        if platform == "dy":
+            return Response(content="blocked")
+        if platform == "bili":
+            return JSONResponse({"code": -412, "message": "请求被拦截", "data": None})
+        return JSONResponse({"errors": [{"message": "请求过于频繁，请稍后再试"}], "data": None})
+
+    # ---------------- 小红书 ----------------
+    def xhs_note(self, note_id: str) -> Dict:
+        note = self.template("xhs", "note")
+        note.update(note_id=note_id, title=f"合成笔记 {note_id[-6:]}", xsec_token="synthetic")
+        note["interact_info"]["comment_count"] = str(self.config.comments_per_note)
+        return note
+
+    def xhs_comment(self, note_id: str, comment_id: str, sub_comment_count: int) -> Dict:
+        comment = self.template("xhs", "comment")
+        comment.update(id=comment_id, note_id=note_id, content=f"合成评论 {comment_id}",
+                       sub_comment_count=str(sub_comment_count), sub_comment_has_more=sub_comment_count > 0,
+                       sub_comment_cursor="", sub_comments=[])
+        return comment
+
+    def handle_xhs(self, path: str, params: Dict, data: Dict) -> Response:
+        if path == "/api/sns/web/v1/search/notes":
+            page, page_size = to_int(data.get("page"), 1), to_int(data.get("page_size"), 20)
+            indexes, has_more = paginate(self.config.notes_per_keyword, (page - 1) * page_size, page_size)
+            items = [{"id": stable_hex("xhs", data.get("keyword"), i), "model_type": "note",
+                      "xsec_source": "pc_search", "xsec_token": "synthetic"} for i in indexes]
+            result = {"has_more": has_more, "items": items}
+        elif path == "/api/sns/web/v1/feed":
+            result = {"items": [{"id": data.get("source_note_id"), "model_type": "note",
+                                 "note_card": self.xhs_note(data.get("source_note_id", ""))}]}
+        elif path == "/api/sns/web/v2/comment/page":
+            note_id = params.get("note_id", "")
+            indexes, has_more = paginate(self.config.comments_per_note, to_int(params.get("cursor")), 10)
+            comments = [self.xhs_comment(note_id, f"{note_id}-{i}", self.config.sub_comments_per_comment)
+                        for i in indexes]
+            result = {"comments": comments, "cursor": str(indexes.stop), "has_more": has_more}
+        elif path == "/api/sns/web/v2/comment/sub/page":
+            note_id, root_comment_id = params.get("note_id", ""), params.get("root_comment_id", "")
+            indexes, has_more = paginate(self.config.sub_comments_per_comment, to_int(params.get("cursor")),
+                                         to_int(params.get("num"), 10))
+            comments = [self.xhs_comment(note_id, f"{root_comment_id}-{i}", 0) for i in indexes]
+            result = {"comments": comments, "cursor": str(indexes.stop), "has_more": has_more}
+        else:
+            return JSONResponse({"success": False, "code": -1, "msg": f"unsupported path {path}"}, status_code=404)
+        return JSONResponse({"success": True, "code": 0, "data": result})
+
+    # ---------------- B站 ----------------
+    def bili_video(self, aid: int) -> Dict:
+        video = self.template("bili", "video")
+        video["View"].update(aid=aid, bvid=f"BV{stable_hex('bili', aid, length=10)}", title=f"合成视频 {aid}")
+        video["View"]["stat"].update(aid=aid, reply=self.config.comments_per_note)
+        return video
+
+    def bili_comment(self, aid: int, rpid: int, root: int, rcount: int) -> Dict:
+        comment = self.template("bili", "comment")
+        comment.update(rpid=rpid, oid=aid, root=root, parent=root, rcount=rcount, replies=[])
+        comment["content"]["message"] = f"合成评论 {rpid}"
+        return comment
+
+    def handle_bili(self, path: str, params: Dict, data: Dict) -> Response:
+        if path == "/x/web-interface/wbi/search/type":
+            page, page_size = to_int(params.get("page"), 1), to_int(params.get("page_size"), 20)
+            indexes, _ = paginate(self.config.notes_per_keyword, (page - 1) * page_size, page_size)
+            keyword = params.get("keyword")
+            videos = [{"type": "video", "aid": stable_int("bili", keyword, i) % 10 ** 9,
+                       "title": f"合成视频 {keyword} {i}"} for i in indexes]
+            result = {"page": page, "pagesize": page_size, "numResults": self.config.notes_per_keyword,
+                      "result": videos}
+        elif path == "/x/web-interface/view/detail":
+            result = self.bili_video(to_int(params.get("aid")))
+        elif path == "/x/v2/reply/wbi/main":
+            aid, next_page, page_size = to_int(params.get("oid")), to_int(params.get("next")), to_int(params.get("ps"), 20)
+            indexes, has_more = paginate(self.config.comments_per_note, next_page * page_size, page_size)
+            replies = [self.bili_comment(aid, aid * 10 ** 6 + i, 0, self.config.sub_comments_per_comment)
+                       for i in indexes]
+            result = {"cursor": {"is_end": not has_more, "next": next_page + 1}, "replies": replies}
+        elif path == "/x/v2/reply/reply":
+            aid, root = to_int(params.get("oid")), to_int(params.get("root"))
+            page, page_size = to_int(params.get("pn"), 1), to_int(params.get("ps"), 10)
+            indexes, _ = paginate(self.config.sub_comments_per_comment, (page - 1) * page_size, page_size)
+            replies = [self.bili_comment(aid, root * 1000 + i, root, 0) for i in indexes]
+            result = {"page": {"count": self.config.sub_comments_per_comment, "num": page, "size": page_size},
+                      "replies": replies}
+        elif path == "/x/web-interface/nav":
+            result = {"isLogin": True, "wbi_img": {
+                "img_url": "https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png",
+                "sub_url": "https://i0.hdslb.com/bfs/wbi/4932caff0ff746eab6f01bf08b70ac45.png"}}
+        else:
+            return JSONResponse({"code": -404, "message": f"unsupported path {path}"}, status_code=404)
+        return JSONResponse({"code": 0, "message": "0", "data": result})
+
+    # ---------------- 抖音 ----------------
+    def dy_aweme(self, aweme_id: str) -> Dict:
+        aweme = self.template("dy", "aweme")
+        aweme.update(aweme_id=aweme_id, desc=f"合成视频 {aweme_id}")
+        aweme["statistics"]["comment_count"] = self.config.comments_per_note
+        return aweme
+
+    def dy_comment(self, aweme_id: str, cid: str, reply_id: str, reply_total: int) -> Dict:
+        comment = self.template("dy", "comment")
+        comment.update(cid=cid, aweme_id=aweme_id, text=f"合成评论 {cid}", reply_id=reply_id,
+                       reply_comment_total=reply_total)
+        return comment
+
+    def handle_dy(self, path: str, params: Dict, data: Dict) -> Response:
+        if path == "/aweme/v1/web/general/search/single/":
+            offset, count = to_int(params.get("offset")), to_int(params.get("count"), 15)
+            indexes, has_more = paginate(self.config.notes_per_keyword, offset, count)
+            keyword = params.get("keyword")
+            result = {"status_code": 0, "has_more": int(has_more), "cursor": indexes.stop,
+                      "extra": {"logid": stable_hex("dy", keyword, length=32)},
+                      "data": [{"type": 1, "aweme_info": self.dy_aweme(str(stable_int("dy", keyword, i)))}
+                               for i in indexes]}
+        elif path == "/aweme/v1/web/aweme/detail/":
+            result = {"status_code": 0, "aweme_detail": self.dy_aweme(params.get("aweme_id", ""))}
+        elif path == "/aweme/v1/web/comment/list/":
+            aweme_id = params.get("aweme_id", "")
+            indexes, has_more = paginate(self.config.comments_per_note, to_int(params.get("cursor")),
+                                         to_int(params.get("count"), 20))
+            result = {"status_code": 0, "has_more": int(has_more), "cursor": indexes.stop,
+                      "comments": [self.dy_comment(aweme_id, f"{aweme_id}{i:06d}", "0",
+                                                   self.config.sub_comments_per_comment) for i in indexes]}
+        elif path == "/aweme/v1/web/comment/list/reply/":
+            aweme_id, comment_id = params.get("item_id", ""), params.get("comment_id", "")
+            indexes, has_more = paginate(self.config.sub_comments_per_comment, to_int(params.get("cursor")),
+                                         to_int(params.get("count"), 20))
+            result = {"status_code": 0, "has_more": int(has_more), "cursor": indexes.stop,
+                      "comments": [self.dy_comment(aweme_id, f"{comment_id}{i:04d}", comment_id, 0)
+                                   for i in indexes]}
+        else:
+            return JSONResponse({"status_code": 404, "status_msg": f"unsupported path {path}"}, status_code=404)
+        return JSONResponse(result)
+
+    # ---------------- 快手 ----------------
+    def ks_video(self, photo_id: str) -> Dict:
+        video = self.template("ks", "video")
+        video["photo"].update(id=photo_id, caption=f"合成视频 {photo_id}")
+        return video
+
+    def ks_comment(self, comment_id: str, sub_comment_count: int) -> Dict:
+        comment = self.template("ks", "comment")
+        comment.update(commentId=comment_id, content=f"合成评论 {comment_id}", subCommentCount=sub_comment_count,
+                       subCommentsPcursor="" if sub_comment_count else "no_more", subComments=[])
+        return comment
+
+    @staticmethod
+    def ks_pcursor(indexes: range, has_more: bool) -> str:
+        return str(indexes.stop) if has_more else "no_more"
+
+    def handle_ks(self, path: str, params: Dict, data: Dict) -> Response:
+        operation_name = data.get("operationName")
+        variables: Dict = data.get("variables") or {}
+        if operation_name == "visionSearchPhoto":
+            # 快手搜索的 pcursor 是页码
+            page = to_int(variables.get("pcursor"), 1)
+            indexes, has_more = paginate(self.config.notes_per_keyword, (page - 1) * 20, 20)
+            keyword = variables.get("keyword")
+            result = {"visionSearchPhoto": {
+                "result": 1, "pcursor": str(page + 1) if has_more else "no_more",
+                "searchSessionId": stable_hex("ks", keyword, length=32),
+                "feeds": [self.ks_video(f"3x{stable_hex('ks', keyword, i, length=13)}") for i in indexes],
+            }}
+        elif operation_name == "visionVideoDetail":
+            result = {"visionVideoDetail": dict(self.ks_video(variables.get("photoId", "")), status=1)}
+        elif operation_name == "commentListQuery":
+            photo_id = variables.get("photoId", "")
+            indexes, has_more = paginate(self.config.comments_per_note, to_int(variables.get("pcursor")), 20)
+            result = {"visionCommentList": {
+                "commentCount": self.config.comments_per_note, "pcursor": self.ks_pcursor(indexes, has_more),
+                "rootComments": [self.ks_comment(f"{photo_id}-{i}", self.config.sub_comments_per_comment)
+                                 for i in indexes],
+            }}
+        elif operation_name == "visionSubCommentList":
+            root_comment_id = variables.get("rootCommentId", "")
+            indexes, has_more = paginate(self.config.sub_comments_per_comment, to_int(variables.get("pcursor")), 10)
+            result = {"visionSubCommentList": {
+                "pcursor": self.ks_pcursor(indexes, has_more),
+                "subComments": [self.ks_comment(f"{root_comment_id}-{i}", 0) for i in indexes],
+            }}
+        else:
+            return JSONResponse({"errors": [{"message": f"unsupported operation {operation_name}"}], "data": None})
+        return JSONResponse({"data": result})
+
+
+def create_app(synthetic_config: SyntheticConfig) -> FastAPI:
+    """
+    创建模拟平台服务，请求由 replay.transport.RedirectTransport 转发而来，通过请求头中的原始 host 区分平台
+    Args:
+        synthetic_config: 数据规模和封禁比例配置
+
+    Returns:
+
+    """
+    app = FastAPI(title="MediaCrawler synthetic platform server")
+    server = SyntheticPlatformServer(synthetic_config)
+    app.state.synthetic_server = server
+
+    @app.post("/_replay/rewind")
+    async def rewind():
+        # 与回放服务保持同样的接口，replay_benchmark 用它统计每轮请求数
+        request_count, server.request_count = server.request_count, 0
+        return {"entries": 0, "played": request_count}
+
+    @app.get("/_synthetic/stats")
+    async def stats():
+        return dict(server.stats)
+
+    @app.api_route("/{path:path}", methods=["GET", "POST"])
+    async def synthetic(request: Request):
+        origin = request.headers.get(REPLAY_ORIGIN_HEADER, "")
+        platform = PLATFORM_HOSTS.get(origin.split("://")[-1])
+        if not platform:
+            return Response(status_code=400, content=f"unsupported origin: {origin}")
+        return await server.handle(platform, request.url.path, dict(request.query_params), await request.body())
+
+    return app
+
+
+def parse_server_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Synthetic platform server. / 合成数据的模拟平台服务')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8091)
+    for name, field in SyntheticConfig.model_fields.items():
+        parser.add_argument(f'--{name}', type=field.annotation, default=field.default, help=field.title)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_server_args()
+    synthetic_config = SyntheticConfig(**{name: getattr(args, name) for name in SyntheticConfig.model_fields})
+    uvicorn.run(create_app(synthetic_config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == '__main__':
+    main()
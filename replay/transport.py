@@ -0,0 +1,182 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : httpx transport 钩子，录制模式下把请求/响应写入磁盘，回放模式下不访问网络
+import asyncio
+import os
+import random
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+import config
+
+from .cassette import Cassette, decode_content
+
+# 转发到本地 mock server 时，用该请求头告诉服务端原始请求的 scheme://host
+REPLAY_ORIGIN_HEADER = "X-Replay-Origin"
+
+_cassettes: Dict[str, Cassette] = {}
+_fault_injectors: Dict[Tuple, "FaultInjector"] = {}
+
+
+class ReplayMissError(httpx.TransportError):
+    """回放模式下请求没有对应的录制记录，与断网时的异常类型保持一致"""
+
+
+class FaultInjector:
+    """
+    回放时注入的延迟和错误，使用固定随机种子保证多次基准测试结果可复现
+    """
+
+    def __init__(self, latency_ms: int = 0, latency_jitter_ms: int = 0, error_rate: float = 0.0,
+                 error_status_code: int = 503, seed: Optional[int] = 0):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.error_status_code = error_status_code
+        self._random = random.Random(seed)
+
+    async def delay(self):
+        latency_ms = self.latency_ms
+        if self.latency_jitter_ms:
+            latency_ms += self._random.uniform(0, self.latency_jitter_ms)
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and self._random.random() < self.error_rate
+
+
+def build_response(entry: Dict, request: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        status_code=entry["status_code"],
+        headers=entry["headers"],
+        content=decode_content(entry["content"], entry["content_encoding"]),
+        request=request,
+    )
+
+
+class RecordTransport(httpx.AsyncBaseTransport):
+    """
+    正常发送请求，并把请求/响应追加到录制文件
+    """
+
+    def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport):
+        self._cassette = cassette
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request_content = await request.aread()
+        response = await self._transport.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        entry = await self._cassette.record(
+            request.method, str(request.url), request_content, response.status_code,
+            response.headers.multi_items(), content,
+        )
+        return build_response(entry, request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    从录制文件中返回响应，不访问网络
+    """
+
+    def __init__(self, cassette: Cassette, fault_injector: FaultInjector):
+        self._cassette = cassette
+        self._fault_injector = fault_injector
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self._fault_injector.delay()
+        if self._fault_injector.should_fail():
+            return httpx.Response(self._fault_injector.error_status_code, content=b"injected error", request=request)
+        entry = self._cassette.play(request.method, str(request.url), await request.aread())
+        if entry is None:
+            raise ReplayMissError(f"No recorded response for {request.method} {request.url}", request=request)
+        return build_response(entry, request)
+
+
+class RedirectTransport(httpx.AsyncBaseTransport):
+    """
+    把请求转发到本地 mock server（replay/mock_server.py），用于在真实的网络栈上压测并发和限速
+    """
+
+    def __init__(self, server_url: str, transport: httpx.AsyncBaseTransport):
+        self._server_url = httpx.URL(server_url)
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        headers = request.headers.copy()
+        del headers["host"]
+        headers[REPLAY_ORIGIN_HEADER] = f"{request.url.scheme}://{request.url.netloc.decode('ascii')}"
+        redirect_request = httpx.Request(
+            request.method,
+            request.url.copy_with(scheme=self._server_url.scheme, host=self._server_url.host,
+                                  port=self._server_url.port),
+            headers=headers,
+            content=await request.aread(),
+            extensions=request.extensions,
+        )
+        return await self._transport.handle_async_request(redirect_request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def get_cassette_path(platform: str) -> str:
+    return os.path.join(config.HTTP_REPLAY_DIR, f"{platform}.jsonl")
+
+
+def get_cassette(path: str) -> Cassette:
+    """
+    同一个录制文件在进程内共享一个对象，保证每次请求新建的 httpx 客户端共用回放进度
+    :param path: 录制文件路径
+    :return:
+    """
+    if path not in _cassettes:
+        _cassettes[path] = Cassette(path, config.HTTP_REPLAY_IGNORE_PARAMS)
+    return _cassettes[path]
+
+
+def get_fault_injector() -> FaultInjector:
+    fault_key = (config.HTTP_REPLAY_LATENCY_MS, config.HTTP_REPLAY_LATENCY_JITTER_MS, config.HTTP_REPLAY_ERROR_RATE)
+    if fault_key not in _fault_injectors:
+        _fault_injectors[fault_key] = FaultInjector(*fault_key)
+    return _fault_injectors[fault_key]
+
+
+def create_async_client(proxy: Optional[str] = None, **kwargs) -> httpx.AsyncClient:
+    """
+    各平台 API 客户端统一通过该函数创建 httpx 客户端，根据 config.HTTP_REPLAY_MODE 替换底层 transport
+    Args:
+        proxy: 代理地址，回放模式下不访问网络，忽略代理
+        **kwargs: 其他 httpx.AsyncClient 参数
+
+    Returns:
+
+    """
+    if config.HTTP_REPLAY_MODE == "record":
+        transport = RecordTransport(get_cassette(get_cassette_path(config.PLATFORM)),
+                                    httpx.AsyncHTTPTransport(proxy=proxy))
+        return httpx.AsyncClient(transport=transport, **kwargs)
+    if config.HTTP_REPLAY_MODE == "replay":
+        if config.HTTP_REPLAY_SERVER_URL:
+            transport = RedirectTransport(config.HTTP_REPLAY_SERVER_URL, httpx.AsyncHTTPTransport())
+        else:
+            transport = ReplayTransport(get_cassette(get_cassette_path(config.PLATFORM)), get_fault_injector())
+        return httpx.AsyncClient(transport=transport, **kwargs)
+    return httpx.AsyncClient(proxy=proxy, **kwargs)
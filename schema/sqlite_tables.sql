@@ -27,7 +27,8 @@ CREATE TABLE bilibili_video (
     video_comment TEXT DEFAULT NULL,
     video_url TEXT DEFAULT NULL,
     video_cover_url TEXT DEFAULT NULL,
-    source_keyword TEXT DEFAULT ''
+    source_keyword TEXT DEFAULT '',
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_bilibili_vi_video_i_31c36e ON bilibili_video(video_id);
@@ -52,11 +53,13 @@ CREATE TABLE bilibili_video_comment (
     create_time INTEGER NOT NULL,
     sub_comment_count TEXT NOT NULL,
     parent_comment_id TEXT DEFAULT NULL,
-    like_count TEXT NOT NULL DEFAULT '0'
+    like_count TEXT NOT NULL DEFAULT '0',
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_bilibili_vi_comment_41c34e ON bilibili_video_comment(comment_id);
 CREATE INDEX idx_bilibili_vi_video_i_f22873 ON bilibili_video_comment(video_id);
+CREATE INDEX idx_bilibili_vi_video_ctime ON bilibili_video_comment(video_id, create_time);
 
 -- ----------------------------
 -- Table structure for bilibili_up_info
@@ -74,7 +77,8 @@ CREATE TABLE bilibili_up_info (
     total_fans INTEGER DEFAULT NULL,
     total_liked INTEGER DEFAULT NULL,
     user_rank INTEGER DEFAULT NULL,
-    is_official INTEGER DEFAULT NULL
+    is_official INTEGER DEFAULT NULL,
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_bilibili_vi_user_123456 ON bilibili_up_info(user_id);
@@ -116,7 +120,8 @@ CREATE TABLE bilibili_up_dynamic (
     total_forwards INTEGER DEFAULT NULL,
     total_liked INTEGER DEFAULT NULL,
     add_ts INTEGER NOT NULL,
-    last_modify_ts INTEGER NOT NULL
+    last_modify_ts INTEGER NOT NULL,
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_bilibili_up_dynamic_dynamic_id ON bilibili_up_dynamic(dynamic_id);
@@ -151,7 +156,8 @@ CREATE TABLE douyin_aweme (
     video_download_url TEXT DEFAULT NULL,
     music_download_url TEXT DEFAULT NULL,
     note_download_url TEXT DEFAULT NULL,
-    source_keyword TEXT DEFAULT ''
+    source_keyword TEXT DEFAULT '',
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_douyin_awem_aweme_i_6f7bc6 ON douyin_aweme(aweme_id);
@@ -180,7 +186,8 @@ CREATE TABLE douyin_aweme_comment (
     sub_comment_count TEXT NOT NULL,
     parent_comment_id TEXT DEFAULT NULL,
     like_count TEXT NOT NULL DEFAULT '0',
-    pictures TEXT NOT NULL DEFAULT ''
+    pictures TEXT NOT NULL DEFAULT '',
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_douyin_awem_comment_fcd7e4 ON douyin_aweme_comment(comment_id);
@@ -203,7 +210,8 @@ CREATE TABLE dy_creator (
     follows TEXT DEFAULT NULL,
     fans TEXT DEFAULT NULL,
     interaction TEXT DEFAULT NULL,
-    videos_count TEXT DEFAULT NULL
+    videos_count TEXT DEFAULT NULL,
+    fingerprint TEXT DEFAULT NULL
 );
 
 -- ----------------------------
@@ -227,7 +235,8 @@ CREATE TABLE kuaishou_video (
     video_url TEXT DEFAULT NULL,
     video_cover_url TEXT DEFAULT NULL,
     video_play_url TEXT DEFAULT NULL,
-    source_keyword TEXT DEFAULT ''
+    source_keyword TEXT DEFAULT '',
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_kuaishou_vi_video_i_c5c6a6 ON kuaishou_video(video_id);
@@ -248,7 +257,8 @@ CREATE TABLE kuaishou_video_comment (
     video_id TEXT NOT NULL,
     content TEXT,
     create_time INTEGER NOT NULL,
-    sub_comment_count TEXT NOT NULL
+    sub_comment_count TEXT NOT NULL,
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_kuaishou_vi_comment_ed48fa ON kuaishou_video_comment(comment_id);
@@ -276,7 +286,8 @@ CREATE TABLE weibo_note (
     comments_count TEXT DEFAULT NULL,
     shared_count TEXT DEFAULT NULL,
     note_url TEXT DEFAULT NULL,
-    source_keyword TEXT DEFAULT ''
+    source_keyword TEXT DEFAULT '',
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_weibo_note_note_id_f95b1a ON weibo_note(note_id);
@@ -304,7 +315,8 @@ CREATE TABLE weibo_note_comment (
     create_date_time TEXT NOT NULL,
     comment_like_count TEXT NOT NULL,
     sub_comment_count TEXT NOT NULL,
-    parent_comment_id TEXT DEFAULT NULL
+    parent_comment_id TEXT DEFAULT NULL,
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_weibo_note__comment_c7611c ON weibo_note_comment(comment_id);
@@ -327,7 +339,8 @@ CREATE TABLE weibo_creator (
     gender TEXT DEFAULT NULL,
     follows TEXT DEFAULT NULL,
     fans TEXT DEFAULT NULL,
-    tag_list TEXT
+    tag_list TEXT,
+    fingerprint TEXT DEFAULT NULL
 );
 
 -- ----------------------------
@@ -347,7 +360,8 @@ CREATE TABLE xhs_creator (
     follows TEXT DEFAULT NULL,
     fans TEXT DEFAULT NULL,
     interaction TEXT DEFAULT NULL,
-    tag_list TEXT
+    tag_list TEXT,
+    fingerprint TEXT DEFAULT NULL
 );
 
 -- ----------------------------
@@ -377,7 +391,8 @@ CREATE TABLE xhs_note (
     tag_list TEXT,
     note_url TEXT DEFAULT NULL,
     source_keyword TEXT DEFAULT '',
-    xsec_token TEXT DEFAULT NULL
+    xsec_token TEXT DEFAULT NULL,
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_xhs_note_note_id_209457 ON xhs_note(note_id);
@@ -402,7 +417,8 @@ CREATE TABLE xhs_note_comment (
     sub_comment_count INTEGER NOT NULL,
     pictures TEXT DEFAULT NULL,
     parent_comment_id TEXT DEFAULT NULL,
-    like_count TEXT DEFAULT NULL
+    like_count TEXT DEFAULT NULL,
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_xhs_note_co_comment_8e8349 ON xhs_note_comment(comment_id);
@@ -430,7 +446,8 @@ CREATE TABLE tieba_note (
     ip_location TEXT DEFAULT '',
     add_ts INTEGER NOT NULL,
     last_modify_ts INTEGER NOT NULL,
-    source_keyword TEXT DEFAULT ''
+    source_keyword TEXT DEFAULT '',
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_tieba_note_note_id ON tieba_note(note_id);
@@ -457,7 +474,8 @@ CREATE TABLE tieba_comment (
     note_id TEXT NOT NULL,
     note_url TEXT NOT NULL,
     add_ts INTEGER NOT NULL,
-    last_modify_ts INTEGER NOT NULL
+    last_modify_ts INTEGER NOT NULL,
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_tieba_comment_comment_id ON tieba_comment(comment_id);
@@ -480,7 +498,8 @@ CREATE TABLE tieba_creator (
     gender TEXT DEFAULT NULL,
     follows TEXT DEFAULT NULL,
     fans TEXT DEFAULT NULL,
-    registration_duration TEXT DEFAULT NULL
+    registration_duration TEXT DEFAULT NULL,
+    fingerprint TEXT DEFAULT NULL
 );
 
 -- ----------------------------
@@ -507,7 +526,8 @@ CREATE TABLE zhihu_content (
     user_avatar TEXT NOT NULL,
     user_url_token TEXT NOT NULL,
     add_ts INTEGER NOT NULL,
-    last_modify_ts INTEGER NOT NULL
+    last_modify_ts INTEGER NOT NULL,
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_zhihu_content_content_id ON zhihu_content(content_id);
@@ -534,12 +554,14 @@ CREATE TABLE zhihu_comment (
     user_nickname TEXT NOT NULL,
     user_avatar TEXT NOT NULL,
     add_ts INTEGER NOT NULL,
-    last_modify_ts INTEGER NOT NULL
+    last_modify_ts INTEGER NOT NULL,
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE INDEX idx_zhihu_comment_comment_id ON zhihu_comment(comment_id);
 CREATE INDEX idx_zhihu_comment_content_id ON zhihu_comment(content_id);
 CREATE INDEX idx_zhihu_comment_publish_time ON zhihu_comment(publish_time);
+CREATE INDEX idx_zhihu_comment_content_ptime ON zhihu_comment(content_id, publish_time);
 
 -- ----------------------------
 -- Table structure for zhihu_creator
@@ -563,7 +585,8 @@ CREATE TABLE zhihu_creator (
     column_count INTEGER NOT NULL DEFAULT 0,
     get_voteup_count INTEGER NOT NULL DEFAULT 0,
     add_ts INTEGER NOT NULL,
-    last_modify_ts INTEGER NOT NULL
+    last_modify_ts INTEGER NOT NULL,
+    fingerprint TEXT DEFAULT NULL
 );
 
 CREATE UNIQUE INDEX idx_zhihu_creator_user_id ON zhihu_creator(user_id);
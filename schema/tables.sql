@@ -595,3 +595,30 @@ alter table douyin_aweme_comment add column `like_count` varchar(255) NOT NULL D
 alter table xhs_note add column xsec_token varchar(50) default null comment '签名算法';
 alter table douyin_aweme_comment add column `pictures` varchar(500) NOT NULL DEFAULT '' COMMENT '评论图片列表';
 alter table bilibili_video_comment add column `like_count` varchar(255) NOT NULL DEFAULT '0' COMMENT '点赞数';
+
+-- 增量评论模式按帖子查询已入库的最新一级评论
+alter table bilibili_video_comment add index `idx_bilibili_vi_video_ctime` (`video_id`, `create_time`);
+alter table zhihu_comment add index `idx_zhihu_comment_content_ptime` (`content_id`, `publish_time`);
+
+-- 记录内容指纹，数据库存储据此跳过没有变化的记录
+alter table bilibili_video add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table bilibili_video_comment add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table bilibili_up_info add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table bilibili_up_dynamic add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table douyin_aweme add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table douyin_aweme_comment add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table dy_creator add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table kuaishou_video add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table kuaishou_video_comment add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table weibo_note add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table weibo_note_comment add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table weibo_creator add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table xhs_creator add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table xhs_note add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table xhs_note_comment add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table tieba_note add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table tieba_comment add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table tieba_creator add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table zhihu_content add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table zhihu_comment add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
+alter table zhihu_creator add column `fingerprint` varchar(32) DEFAULT NULL COMMENT '记录内容指纹';
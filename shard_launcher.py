@@ -0,0 +1,275 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 多进程分片启动器，把关键词/帖子ID/创作者ID分配给多个工作进程并行爬取，结束后合并输出文件
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Collection, Dict, List, Optional
+
+import cmd_arg
+import config
+import db
+from main import PLATFORM_ID_LIST_CONFIG, CrawlerFactory
+from store import parquet_store, segmented_output, write_behind
+from tools import utils
+
+# 传递给工作进程的配置项（spawn 模式下子进程不会继承父进程中被命令行覆盖的配置），与 cmd_arg 覆盖的配置项保持一致
+WORKER_CONFIG_KEYS = list(cmd_arg.CMD_ARG_CONFIG_KEYS.values())
+
+WORKER_FILE_PATTERN = re.compile(r"^(?:(\d+)_)?(.+)_worker(\d+)\.(csv|json)$")
+
+
+def get_shard_config_key(platform: str, crawler_type: str) -> str:
+    """
+    获取需要分片的配置项
+    Args:
+        platform: 平台
+        crawler_type: 爬取类型
+
+    Returns:
+
+    """
+    specified_id_config, creator_id_config = PLATFORM_ID_LIST_CONFIG[platform]
+    if crawler_type == "search":
+        return "KEYWORDS"
+    if crawler_type == "detail":
+        return specified_id_config
+    return creator_id_config
+
+
+def split_shards(items: List[Any], worker_num: int) -> List[List[Any]]:
+    """
+    按轮询方式把任务均匀分配给各个工作进程，空分片会被丢弃
+    Args:
+        items: 关键词/帖子ID/创作者ID列表
+        worker_num: 工作进程数量
+
+    Returns:
+
+    """
+    shards = [items[i::worker_num] for i in range(max(worker_num, 1))]
+    return [shard for shard in shards if shard]
+
+
+def prepare_worker_user_data_dir(platform: str, worker_id: int) -> str:
+    """
+    为工作进程准备独立的浏览器用户数据目录，首次运行时复制主目录以复用登录态
+    Args:
+        platform: 平台
+        worker_id: worker 序号
+
+    Returns: 工作进程使用的 USER_DATA_DIR 配置
+
+    """
+    worker_user_data_dir = f"{config.USER_DATA_DIR}_worker{worker_id}"
+    source_dir = os.path.join(os.getcwd(), "browser_data", config.USER_DATA_DIR % platform)
+    target_dir = os.path.join(os.getcwd(), "browser_data", worker_user_data_dir % platform)
+    if os.path.isdir(source_dir) and not os.path.exists(target_dir):
+        shutil.copytree(source_dir, target_dir, symlinks=True, ignore=shutil.ignore_patterns("Singleton*"))
+    return worker_user_data_dir
+
+
+async def run_crawler():
+    profiler = None
+    if config.ENABLE_PROFILE:
+        from tools.profiler import CoroutineProfiler
+        profiler = CoroutineProfiler(asyncio.get_running_loop(), config.PROFILE_SAMPLE_INTERVAL_MS)
+        profiler.start()
+    metrics_server = None
+    if config.ENABLE_METRICS:
+        from tools import metrics
+        # 每个工作进程的指标是独立的，各自监听 METRICS_PORT + worker 序号（METRICS_PORT 为 0 时随机端口）
+        port = config.METRICS_PORT + config.CRAWLER_WORKER_ID if config.METRICS_PORT else 0
+        metrics_server = metrics.start_metrics_server(config.METRICS_HOST, port)
+    if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
+        await db.init_db()
+    try:
+        crawler = CrawlerFactory.create_crawler(platform=config.PLATFORM)
+        await crawler.start()
+    finally:
+        await write_behind.drain()
+        await parquet_store.close_writers()
+        await segmented_output.close_outputs()
+        if config.SAVE_DATA_OPTION in ["db", "sqlite"]:
+            await db.close()
+        if profiler:
+            profiler.stop()
+            profiler.save(config.PROFILE_OUTPUT_DIR, get_worker_output_name())
+        if metrics_server:
+            from tools import metrics
+            metrics_server.shutdown()
+            metrics.save_json_summary(config.METRICS_OUTPUT_DIR, get_worker_output_name())
+
+
+def get_worker_output_name() -> str:
+    """工作进程的性能分析、指标汇总文件名，带上 worker 序号避免多个进程互相覆盖"""
+    return f"{config.PLATFORM}_{config.CRAWLER_TYPE}_worker{config.CRAWLER_WORKER_ID}_{utils.get_current_timestamp()}"
+
+
+def run_worker(worker_id: int, worker_config: Dict[str, Any]):
+    """
+    工作进程入口，应用分片后的配置并运行一次完整的爬虫
+    Args:
+        worker_id: worker 序号
+        worker_config: 该进程使用的配置项
+
+    Returns:
+
+    """
+    for key, value in worker_config.items():
+        setattr(config, key, value)
+    config.CRAWLER_WORKER_ID = worker_id
+    utils.logger.info(f"[shard_launcher.run_worker] worker {worker_id} start, pid: {os.getpid()}")
+    asyncio.run(run_crawler())
+
+
+def merge_worker_files(data_dir: str = "data", worker_ids: Optional[Collection[int]] = None,
+                       since: Optional[float] = None) -> List[str]:
+    """
+    合并各工作进程输出的 csv/json 文件，合并后删除 worker 文件；
+    同一个目录中可能留有之前运行（或中途崩溃的运行）的 worker 文件，只合并本次启动的进程写入的文件
+    Args:
+        data_dir: 数据保存目录
+        worker_ids: 本次启动的 worker 序号，为 None 时不按序号过滤
+        since: 本次启动的时间戳，之前修改过的 worker 文件不合并，为 None 时不按时间过滤
+
+    Returns: 合并后的文件列表
+
+    """
+    groups: Dict[str, List[str]] = defaultdict(list)
+    file_counts: Dict[str, List[int]] = defaultdict(list)
+    for root, _, file_names in os.walk(data_dir):
+        for file_name in file_names:
+            match = WORKER_FILE_PATTERN.match(file_name)
+            if not match:
+                continue
+            file_count, base_name, worker_id, ext = match.groups()
+            file_path = os.path.join(root, file_name)
+            if worker_ids is not None and int(worker_id) not in worker_ids:
+                continue
+            if since is not None and os.path.getmtime(file_path) < since:
+                continue
+            group_key = os.path.join(root, f"{base_name}.{ext}")
+            groups[group_key].append(file_path)
+            if file_count:
+                file_counts[group_key].append(int(file_count))
+
+    merged_files = []
+    for group_key, worker_files in groups.items():
+        worker_files.sort()
+        root, merged_name = os.path.split(group_key)
+        if file_counts[group_key]:
+            merged_name = f"{min(file_counts[group_key])}_{merged_name}"
+        merged_file = os.path.join(root, merged_name)
+        if merged_file.endswith(".json"):
+            merge_json_files(worker_files, merged_file)
+        else:
+            merge_csv_files(worker_files, merged_file)
+        for worker_file in worker_files:
+            os.remove(worker_file)
+        merged_files.append(merged_file)
+        utils.logger.info(f"[shard_launcher.merge_worker_files] merged {len(worker_files)} files into {merged_file}")
+    return merged_files
+
+
+def merge_json_files(worker_files: List[str], merged_file: str):
+    save_data = []
+    if os.path.exists(merged_file):
+        with open(merged_file, "r", encoding="utf-8") as f:
+            save_data = json.load(f)
+    for worker_file in worker_files:
+        with open(worker_file, "r", encoding="utf-8") as f:
+            save_data.extend(json.load(f))
+    with open(merged_file, "w", encoding="utf-8") as f:
+        f.write(json.dumps(save_data, ensure_ascii=False, indent=4))
+
+
+def merge_csv_files(worker_files: List[str], merged_file: str):
+    header_written = os.path.exists(merged_file) and os.path.getsize(merged_file) > 0
+    with open(merged_file, "a+", encoding="utf-8-sig", newline="") as out:
+        writer = csv.writer(out)
+        for worker_file in worker_files:
+            with open(worker_file, "r", encoding="utf-8-sig", newline="") as f:
+                reader = csv.reader(f)
+                header: Optional[List[str]] = next(reader, None)
+                if header and not header_written:
+                    writer.writerow(header)
+                    header_written = True
+                writer.writerows(reader)
+
+
+def launch(worker_num: int, merge: bool = True) -> int:
+    """
+    按当前配置分片并启动工作进程，等待全部结束后合并输出
+    Args:
+        worker_num: 工作进程数量
+        merge: 是否合并 csv/json 输出
+
+    Returns: 失败的工作进程数量
+
+    """
+    shard_key = get_shard_config_key(config.PLATFORM, config.CRAWLER_TYPE)
+    items = getattr(config, shard_key)
+    if shard_key == "KEYWORDS":
+        items = [keyword for keyword in items.split(",") if keyword]
+    shards = split_shards(list(items), worker_num)
+
+    # 文件修改时间使用粗粒度时钟，可能略早于 time.time()，按秒取整
+    launch_ts = int(time.time())
+    base_config = {key: getattr(config, key) for key in WORKER_CONFIG_KEYS}
+    processes = []
+    for worker_id, shard in enumerate(shards):
+        worker_config = dict(base_config)
+        worker_config[shard_key] = ",".join(shard) if shard_key == "KEYWORDS" else shard
+        worker_config["USER_DATA_DIR"] = prepare_worker_user_data_dir(config.PLATFORM, worker_id)
+        process = multiprocessing.Process(target=run_worker, args=(worker_id, worker_config))
+        process.start()
+        processes.append(process)
+        utils.logger.info(f"[shard_launcher.launch] worker {worker_id} started with {len(shard)} items: {shard}")
+
+    failed = 0
+    for worker_id, process in enumerate(processes):
+        process.join()
+        if process.exitcode != 0:
+            failed += 1
+            utils.logger.error(f"[shard_launcher.launch] worker {worker_id} exit with code {process.exitcode}")
+
+    # 分段输出的各进程文件由各自的 manifest 记录，不合并
+    if merge and config.SAVE_DATA_OPTION in ["csv", "json"] and not segmented_output.segmented_output_enabled():
+        merge_worker_files(worker_ids=range(len(shards)), since=launch_ts)
+    return failed
+
+
+def parse_launcher_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Multi-process shard launcher. / 多进程分片启动器', add_help=False)
+    parser.add_argument('--workers', type=int,
+                        help='Number of worker processes / 工作进程数量', default=config.SHARD_WORKER_NUM)
+    parser.add_argument('--no_merge', action='store_true',
+                        help='Keep per-worker csv/json files without merging / 不合并各进程的输出文件')
+    args, remaining = parser.parse_known_args()
+    # 其余参数交给 cmd_arg 解析，与 main.py 的命令行参数保持一致
+    sys.argv = sys.argv[:1] + remaining
+    return args
+
+
+if __name__ == '__main__':
+    launcher_args = parse_launcher_args()
+    asyncio.run(cmd_arg.parse_cmd())
+    sys.exit(1 if launch(launcher_args.workers, merge=not launcher_args.no_merge) else 0)
@@ -13,9 +13,11 @@
 # @Time    : 2024/1/14 19:34
 # @Desc    :
 
-from typing import List
+from typing import List, Optional
 
 import config
+from store.write_behind import wrap_store
+from tools.comment_watermark import CommentWatermark
 from var import source_keyword_var
 
 from .bilibili_store_impl import *
@@ -28,14 +30,15 @@ class BiliStoreFactory:
         "db": BiliDbStoreImplement,
         "json": BiliJsonStoreImplement,
         "sqlite": BiliSqliteStoreImplement,
+        "parquet": BiliParquetStoreImplement,
     }
 
     @staticmethod
     def create_store() -> AbstractStore:
         store_class = BiliStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[BiliStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+            raise ValueError("[BiliStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
+        return wrap_store(store_class())
 
 
 async def update_bilibili_video(video_item: Dict):
@@ -120,6 +123,20 @@ async def update_bilibili_video_comment(video_id: str, comment_item: Dict):
     await BiliStoreFactory.create_store().store_comment(comment_item=save_comment_item)
 
 
+async def query_video_comment_watermark(video_id: str) -> Optional[CommentWatermark]:
+    """
+    增量评论模式下查询视频已入库的最新一级评论，仅支持 db 和 sqlite 存储
+    Args:
+        video_id:
+
+    Returns: 没有入库评论时返回 None
+
+    """
+    from .bilibili_store_sql import query_latest_comment_by_video_id
+    row: Dict = await query_latest_comment_by_video_id(str(video_id))
+    return CommentWatermark.from_row(row, "comment_id", "create_time")
+
+
 async def store_video(aid, video_content, extension_file_name):
     """
     video video storage implementation
@@ -85,6 +85,24 @@ async def query_comment_by_comment_id(comment_id: str) -> Dict:
     return dict()
 
 
+async def query_latest_comment_by_video_id(video_id: str) -> Dict:
+    """
+    查询视频已入库的发布时间最新的一级评论，走 (video_id, create_time) 索引
+    Args:
+        video_id:
+
+    Returns:
+
+    """
+    async_db_conn: Union[AsyncMysqlDB, AsyncSqliteDB] = media_crawler_db_var.get()
+    sql: str = (f"select comment_id, create_time from bilibili_video_comment where video_id = '{video_id}' "
+                f"and parent_comment_id = '0' order by create_time desc limit 1")
+    rows: List[Dict] = await async_db_conn.query(sql)
+    if len(rows) > 0:
+        return rows[0]
+    return dict()
+
+
 async def add_new_comment(comment_item: Dict) -> int:
     """
     新增一条评论记录
@@ -15,6 +15,7 @@
 from typing import List
 
 import config
+from store.write_behind import wrap_store
 from var import source_keyword_var
 
 from .douyin_store_impl import *
@@ -27,14 +28,15 @@ class DouyinStoreFactory:
         "db": DouyinDbStoreImplement,
         "json": DouyinJsonStoreImplement,
         "sqlite": DouyinSqliteStoreImplement,
+        "parquet": DouyinParquetStoreImplement,
     }
 
     @staticmethod
     def create_store() -> AbstractStore:
         store_class = DouyinStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[DouyinStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+            raise ValueError("[DouyinStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
+        return wrap_store(store_class())
 
 
 def _extract_note_image_list(aweme_detail: Dict) -> List[str]:
@@ -16,6 +16,7 @@
 from typing import List
 
 import config
+from store.write_behind import wrap_store
 from var import source_keyword_var
 
 from .kuaishou_store_impl import *
@@ -26,7 +27,8 @@ class KuaishouStoreFactory:
         "csv": KuaishouCsvStoreImplement,
         "db": KuaishouDbStoreImplement,
         "json": KuaishouJsonStoreImplement,
-        "sqlite": KuaishouSqliteStoreImplement
+        "sqlite": KuaishouSqliteStoreImplement,
+        "parquet": KuaishouParquetStoreImplement
     }
 
     @staticmethod
@@ -34,8 +36,8 @@ class KuaishouStoreFactory:
         store_class = KuaishouStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
             raise ValueError(
-                "[KuaishouStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+                "[KuaishouStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
+        return wrap_store(store_class())
 
 
 async def update_kuaishou_video(video_item: Dict):
@@ -0,0 +1,283 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : Parquet 列式存储，按 schema/tables.sql 的表结构把记录缓存为列，攒够一个 row group 后压缩写入，
+# 文件超过大小上限后滚动到下一个文件；文件在 close_writers 后才完整可读，退出前必须调用
+import asyncio
+import functools
+import glob
+import json
+import os
+import pathlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from store.store_util import get_file_name_suffix
+from tools import utils
+from var import crawler_type_var
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "schema", "tables.sql")
+
+# 数据库内部使用的列，不导出
+EXCLUDED_COLUMNS = frozenset({"id", "fingerprint"})
+INTEGER_COLUMN_TYPES = frozenset({"tinyint", "smallint", "mediumint", "int", "integer", "bigint"})
+NON_COLUMN_KEYWORDS = frozenset({"primary", "key", "unique", "index", "constraint", "fulltext"})
+
+CREATE_TABLE_PATTERN = re.compile(r"create\s+table\s+`?(\w+)`?\s*\((.*?)\)\s*engine", re.I | re.S)
+COLUMN_PATTERN = re.compile(r"^\s*`?(\w+)`?\s+(\w+)", re.M)
+ADD_COLUMN_PATTERN = re.compile(r"alter\s+table\s+`?(\w+)`?\s+add\s+column\s+`?(\w+)`?\s+(\w+)", re.I)
+
+
+@functools.lru_cache(maxsize=None)
+def load_table_columns(schema_path: str = SCHEMA_PATH) -> Dict[str, List[Tuple[str, bool]]]:
+    """
+    解析 MySQL 建表语句（含后续 alter table add column），得到各表的导出列
+    Args:
+        schema_path: 建表 SQL 文件
+
+    Returns: 表名 -> [(列名, 是否整数列)]
+
+    """
+    with open(schema_path, "r", encoding="utf-8") as f:
+        sql = f.read()
+    tables: Dict[str, List[Tuple[str, bool]]] = {}
+
+    def add_column(table_name: str, column_name: str, column_type: str):
+        columns = tables.setdefault(table_name, [])
+        if column_name in EXCLUDED_COLUMNS or any(name == column_name for name, _ in columns):
+            return
+        columns.append((column_name, column_type.lower() in INTEGER_COLUMN_TYPES))
+
+    for table_name, body in CREATE_TABLE_PATTERN.findall(sql):
+        tables[table_name] = []
+        for column_name, column_type in COLUMN_PATTERN.findall(body):
+            if column_name.lower() not in NON_COLUMN_KEYWORDS:
+                add_column(table_name, column_name, column_type)
+    for table_name, column_name, column_type in ADD_COLUMN_PATTERN.findall(sql):
+        add_column(table_name, column_name, column_type)
+    return tables
+
+
+@functools.lru_cache(maxsize=None)
+def get_arrow_schema(table_name: str):
+    """
+    表对应的 Arrow schema，整数列为 int64，其余为 string
+    Args:
+        table_name: 表名
+
+    Returns: pyarrow.Schema
+
+    """
+    import pyarrow as pa
+
+    return pa.schema([
+        pa.field(column_name, pa.int64() if is_integer else pa.string())
+        for column_name, is_integer in load_table_columns()[table_name]
+    ])
+
+
+def coerce_column_value(value: Any, is_integer: bool) -> Any:
+    """
+    把记录中的值转换为表中列的类型：整数列转为 int（空值或无法转换时为 None），其余列转为字符串
+    Args:
+        value: 记录中的值
+        is_integer: 是否整数列
+
+    Returns:
+
+    """
+    return _to_int(value) if is_integer else _to_str(value)
+
+
+def _to_int(value: Any) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_str(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class ParquetTableWriter:
+    """
+    一张表的 Parquet 写入器：add 在事件循环中把记录追加到列缓存，write_row_group / close 在写入线程中执行
+    """
+
+    def __init__(self, file_prefix: str, table_name: str):
+        """
+        :param file_prefix: 数据文件路径前缀，文件名为 {file_prefix}_part{序号}.parquet
+        :param table_name: schema/tables.sql 中的表名
+        """
+        self.file_prefix = file_prefix
+        self.table_name = table_name
+        self.columns = load_table_columns()[table_name]
+        self.column_names = {column_name for column_name, _ in self.columns}
+        self.buffer = self._new_buffer()
+        self.buffered_rows = 0
+        self.rows_written = 0
+        self.files: List[str] = []
+        self._file_name: Optional[str] = None
+        self._writer = None
+        self._dropped_fields_warned = False
+
+    def _new_buffer(self) -> Dict[str, List]:
+        return {column_name: [] for column_name, _ in self.columns}
+
+    def add(self, item: Dict):
+        """
+        记录按表结构转换后追加到列缓存，表中没有的字段丢弃，缺少的列为空
+        Args:
+            item: 记录
+
+        Returns:
+
+        """
+        if not self._dropped_fields_warned and not self.column_names.issuperset(item):
+            self._dropped_fields_warned = True
+            utils.logger.warning(
+                f"[ParquetTableWriter.add] fields not in table {self.table_name} are dropped: "
+                f"{sorted(set(item) - self.column_names)}"
+            )
+        for column_name, is_integer in self.columns:
+            value = item.get(column_name)
+            self.buffer[column_name].append(coerce_column_value(value, is_integer))
+        self.buffered_rows += 1
+
+    def take_buffer(self) -> Optional[Dict[str, List]]:
+        """取出列缓存交给写入线程，缓存为空时返回 None"""
+        if not self.buffered_rows:
+            return None
+        columns, self.buffer, self.buffered_rows = self.buffer, self._new_buffer(), 0
+        return columns
+
+    def write_row_group(self, columns: Dict[str, List]):
+        """
+        把一批列数据写为一个 row group，文件超过 PARQUET_MAX_FILE_SIZE_MB 后关闭，下一批写入新文件
+        Args:
+            columns: take_buffer 取出的列数据
+
+        Returns:
+
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pydict(columns, schema=get_arrow_schema(self.table_name))
+        if self._writer is None:
+            self._file_name = _allocate_file_name(self.file_prefix)
+            self._writer = pq.ParquetWriter(self._file_name, table.schema, compression=config.PARQUET_COMPRESSION)
+            self.files.append(self._file_name)
+        self._writer.write_table(table, row_group_size=table.num_rows)
+        self.rows_written += table.num_rows
+        if os.path.getsize(self._file_name) >= config.PARQUET_MAX_FILE_SIZE_MB * 1024 * 1024:
+            self.close_file()
+
+    def close_file(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def close(self, columns: Optional[Dict[str, List]]):
+        """写入剩余的列数据并关闭文件"""
+        if columns:
+            self.write_row_group(columns)
+        self.close_file()
+
+
+# (保存目录, 表名, 爬取类型) -> 写入器
+_writers: Dict[Tuple[str, str, str], ParquetTableWriter] = {}
+# 文件路径前缀 -> 下一个文件序号，只在写入线程中访问
+_next_file_parts: Dict[str, int] = {}
+# 所有写入在同一个线程中按提交顺序执行，row group 不会乱序，也不会与关闭文件同时进行
+_write_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _allocate_file_name(file_prefix: str) -> str:
+    if file_prefix not in _next_file_parts:
+        # 同一天多次运行时接着已有的文件编号，不覆盖之前的输出
+        _next_file_parts[file_prefix] = len(glob.glob(f"{glob.escape(file_prefix)}_part*.parquet"))
+    part = _next_file_parts[file_prefix]
+    _next_file_parts[file_prefix] += 1
+    return f"{file_prefix}_part{part:04d}.parquet"
+
+
+def _get_write_executor() -> ThreadPoolExecutor:
+    global _write_executor
+    if _write_executor is None:
+        _write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parquet_writer")
+    return _write_executor
+
+
+def get_table_writer(store_path: str, table_name: str) -> ParquetTableWriter:
+    """
+    获取当前爬取类型下该表的写入器，首次使用时创建
+    Args:
+        store_path: 数据保存目录
+        table_name: 表名
+
+    Returns:
+
+    """
+    crawler_type = crawler_type_var.get()
+    key = (store_path, table_name, crawler_type)
+    if key not in _writers:
+        pathlib.Path(store_path).mkdir(parents=True, exist_ok=True)
+        file_prefix = f"{store_path}/{crawler_type}_{table_name}_{utils.get_current_date()}{get_file_name_suffix()}"
+        _writers[key] = ParquetTableWriter(file_prefix, table_name)
+    return _writers[key]
+
+
+async def write_parquet_row(store_path: str, table_name: str, item: Dict):
+    """
+    写入一条记录，列缓存达到 PARQUET_ROW_GROUP_SIZE 条时在写入线程中压缩写出，写出期间调用方等待
+    Args:
+        store_path: 数据保存目录
+        table_name: 表名
+        item: 记录
+
+    Returns:
+
+    """
+    writer = get_table_writer(store_path, table_name)
+    if "add_ts" not in item:
+        # 与数据库存储一样记录入库时间
+        item = dict(item, add_ts=utils.get_current_timestamp())
+    writer.add(item)
+    if writer.buffered_rows >= config.PARQUET_ROW_GROUP_SIZE:
+        columns = writer.take_buffer()
+        await asyncio.get_running_loop().run_in_executor(_get_write_executor(), writer.write_row_group, columns)
+
+
+async def close_writers():
+    """
+    写出所有列缓存并关闭文件，之后写入的记录进入新的文件；程序退出或一次爬取任务结束时调用
+    Returns:
+
+    """
+    writers = list(_writers.values())
+    _writers.clear()
+    loop = asyncio.get_running_loop()
+    for writer in writers:
+        await loop.run_in_executor(_get_write_executor(), writer.close, writer.take_buffer())
+        utils.logger.info(
+            f"[parquet_store.close_writers] table {writer.table_name}: {writer.rows_written} rows "
+            f"written to {len(writer.files)} files, {writer.files}"
+        )
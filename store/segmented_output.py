@@ -0,0 +1,227 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : CSV/JSONL 分段输出，一个输出文件按大小或条数切分为多个分段，每个分段是一个 gzip / zstd 压缩流，
+# 每次写入后同步刷新，已写入的数据随时可以解压；文件旁的 .manifest.json 记录所有分段，退出前调用 close_outputs 写入压缩流结尾
+import asyncio
+import json
+import os
+import zlib
+from typing import Callable, Dict, List, Optional
+
+import aiofiles
+
+import config
+from tools import utils
+
+COMPRESSION_SUFFIXES = {"": "", "none": "", "gzip": ".gz", "zstd": ".zst"}
+
+# 把一段记录编码为文本，第二个参数表示是否为新分段的开头（CSV 需要写表头）
+RowsEncoder = Callable[[List[Dict], bool], str]
+
+
+def segmented_output_enabled() -> bool:
+    """是否开启了 CSV/JSON 输出的压缩或分段"""
+    return (config.FILE_COMPRESSION not in ("", "none") or config.FILE_ROTATE_MAX_MB > 0
+            or config.FILE_ROTATE_MAX_RECORDS > 0)
+
+
+class StreamCompressor:
+    """
+    一个分段的流式压缩器，前后写入共用压缩上下文，压缩率与一次性压缩整个文件接近
+    """
+
+    def __init__(self, compression: str):
+        """
+        :param compression: gzip | zstd
+        """
+        if compression == "gzip":
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            self._flush_mode = zlib.Z_SYNC_FLUSH
+        else:
+            import zstandard
+
+            self._compressor = zstandard.ZstdCompressor().compressobj()
+            self._flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+    def compress(self, data: bytes) -> bytes:
+        """压缩并同步刷新，返回的数据写入文件后即可被解压读取"""
+        return self._compressor.compress(data) + self._compressor.flush(self._flush_mode)
+
+    def finish(self) -> bytes:
+        """压缩流结尾，之后不能再写入"""
+        return self._compressor.flush()
+
+
+class SegmentedOutput:
+    """
+    一个逻辑输出文件的分段状态，写入和关闭都需要持有 lock
+    """
+
+    def __init__(self, file_name: str):
+        """
+        :param file_name: 不分段时的输出文件名，分段文件为 {文件名}.{序号}{扩展名}{压缩后缀}
+        """
+        self.base_name, self.ext = os.path.splitext(file_name)
+        self.manifest_file = f"{self.base_name}.manifest.json"
+        self.manifest: Dict = {"format": self.ext.lstrip("."), "records": 0, "segments": []}
+        # 当前分段的压缩器，不压缩时为 None
+        self._compressor: Optional[StreamCompressor] = None
+        self.lock = asyncio.Lock()
+        if os.path.exists(self.manifest_file):
+            # 同名输出（如同一天多次运行）接着已有分段的序号写
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            segments = self.manifest["segments"]
+            if segments and not segments[-1]["closed"] and os.path.exists(self.segment_path(segments[-1])):
+                # 上次运行没有正常关闭时 manifest 中的大小不是最新的
+                segments[-1]["bytes"] = os.path.getsize(self.segment_path(segments[-1]))
+
+    @property
+    def current_segment(self) -> Optional[Dict]:
+        segments = self.manifest["segments"]
+        if not segments:
+            return None
+        segment = segments[-1]
+        if segment["closed"] or segment["compression"] != config.FILE_COMPRESSION:
+            return None
+        if segment["compression"] and self._compressor is None:
+            # 上次运行留下的压缩流无法接着写，写入新的分段
+            return None
+        if config.FILE_ROTATE_MAX_RECORDS > 0 and segment["records"] >= config.FILE_ROTATE_MAX_RECORDS:
+            return None
+        if config.FILE_ROTATE_MAX_MB > 0 and segment["bytes"] >= config.FILE_ROTATE_MAX_MB * 1024 * 1024:
+            return None
+        return segment
+
+    def segment_path(self, segment: Dict) -> str:
+        return os.path.join(os.path.dirname(self.base_name), segment["file"])
+
+    async def new_segment(self) -> Dict:
+        await self.close_segment()
+        suffix = COMPRESSION_SUFFIXES[config.FILE_COMPRESSION]
+        segment_index = len(self.manifest["segments"])
+        segment = {
+            "file": f"{os.path.basename(self.base_name)}.{segment_index:05d}{self.ext}{suffix}",
+            "compression": config.FILE_COMPRESSION,
+            "records": 0,
+            "bytes": 0,
+            "closed": False,
+        }
+        self.manifest["segments"].append(segment)
+        if segment["compression"]:
+            self._compressor = StreamCompressor(segment["compression"])
+        return segment
+
+    async def close_segment(self):
+        """写入当前分段的压缩流结尾并标记为已关闭"""
+        segments = self.manifest["segments"]
+        if not segments or segments[-1]["closed"]:
+            return
+        segment = segments[-1]
+        if self._compressor is not None:
+            await self._append(segment, self._compressor.finish())
+            self._compressor = None
+        elif segment["compression"]:
+            # 上次运行没有关闭的压缩分段无法补写结尾，保持未关闭状态：解压时会提示文件不完整，但已写入的数据可以读出
+            return
+        segment["closed"] = True
+
+    async def _append(self, segment: Dict, data: bytes):
+        async with aiofiles.open(self.segment_path(segment), "ab") as f:
+            await f.write(data)
+        segment["bytes"] += len(data)
+
+    async def write(self, save_items: List[Dict], encode_rows: RowsEncoder):
+        """
+        写入多条记录，按 FILE_ROTATE_MAX_RECORDS 拆分到多个分段；超过 FILE_ROTATE_MAX_MB 的分段在下次写入时切换
+        Args:
+            save_items: 记录列表
+            encode_rows: 编码函数
+
+        Returns:
+
+        """
+        segments_created = False
+        while save_items:
+            segment = self.current_segment
+            if segment is None:
+                segment = await self.new_segment()
+                segments_created = True
+            chunk_size = len(save_items)
+            if config.FILE_ROTATE_MAX_RECORDS > 0:
+                chunk_size = min(chunk_size, config.FILE_ROTATE_MAX_RECORDS - segment["records"])
+            chunk, save_items = save_items[:chunk_size], save_items[chunk_size:]
+            data = encode_rows(chunk, segment["records"] == 0).encode("utf-8")
+            await self._append(segment, self._compressor.compress(data) if self._compressor else data)
+            segment["records"] += len(chunk)
+            self.manifest["records"] += len(chunk)
+        # 每次写入都重写 manifest 的开销与写数据相当，只在分段变化时保存，记录数和大小在关闭时更新
+        if segments_created:
+            await self.save_manifest()
+
+    async def close(self):
+        await self.close_segment()
+        await self.save_manifest()
+
+    async def save_manifest(self):
+        # 先写临时文件再替换，读取方不会读到写了一半的 manifest
+        tmp_file = f"{self.manifest_file}.tmp"
+        async with aiofiles.open(tmp_file, "w", encoding="utf-8") as f:
+            await f.write(json.dumps(self.manifest, ensure_ascii=False, indent=2))
+        os.replace(tmp_file, self.manifest_file)
+
+
+# 输出文件名 -> 分段状态
+_outputs: Dict[str, SegmentedOutput] = {}
+_wordcloud_warned = False
+
+
+async def write_segmented_rows(file_name: str, save_items: List[Dict], encode_rows: RowsEncoder):
+    """
+    以分段方式写入一个输出文件
+    Args:
+        file_name: 不分段时的输出文件名
+        save_items: 记录列表
+        encode_rows: 编码函数
+
+    Returns:
+
+    """
+    if file_name not in _outputs:
+        _outputs[file_name] = SegmentedOutput(file_name)
+    output = _outputs[file_name]
+    async with output.lock:
+        await output.write(save_items, encode_rows)
+
+
+async def close_outputs():
+    """
+    写入所有分段的压缩流结尾并更新 manifest，程序退出或一次爬取任务结束时调用
+    Returns:
+
+    """
+    outputs = list(_outputs.values())
+    _outputs.clear()
+    for output in outputs:
+        async with output.lock:
+            await output.close()
+
+
+def warn_wordcloud_unsupported():
+    """分段输出时 JSON 不再保存全部记录，无法生成词云，打印一次警告"""
+    global _wordcloud_warned
+    if not _wordcloud_warned:
+        _wordcloud_warned = True
+        utils.logger.warning(
+            "[segmented_output.warn_wordcloud_unsupported] word cloud is skipped when FILE_COMPRESSION or "
+            "FILE_ROTATE_* is enabled"
+        )
@@ -0,0 +1,396 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 各平台存储实现共用的工具函数
+import asyncio
+import csv
+import functools
+import hashlib
+import io
+import json
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiofiles
+
+import config
+from store.segmented_output import segmented_output_enabled, warn_wordcloud_unsupported, write_segmented_rows
+from tools import metrics, utils
+
+_store_locks: Dict[str, asyncio.Lock] = {}
+
+
+@functools.lru_cache(maxsize=None)
+def calculate_number_of_files(file_store_path: str) -> int:
+    """计算数据保存文件的前部分排序数字，支持每次运行代码不写到同一个文件中
+    同一个目录在一次运行中只扫描一次，结果在首次使用时计算并缓存
+    Args:
+        file_store_path;
+    Returns:
+        file nums
+    """
+    if not os.path.exists(file_store_path):
+        return 1
+    try:
+        return max([int(file_name.split("_")[0])for file_name in os.listdir(file_store_path)])+1
+    except ValueError:
+        return 1
+
+
+def get_store_lock(file_store_path: str) -> asyncio.Lock:
+    """获取存储目录对应的写文件锁，首次使用时创建，避免在导入时绑定事件循环
+    Args:
+        file_store_path: 数据保存目录
+    Returns:
+        asyncio.Lock
+    """
+    if file_store_path not in _store_locks:
+        _store_locks[file_store_path] = asyncio.Lock()
+    return _store_locks[file_store_path]
+
+
+def get_file_name_suffix() -> str:
+    """多进程分片运行时在数据文件名后加上 worker 序号，避免多个进程同时写同一个文件
+    Returns:
+        文件名后缀，单进程运行时为空字符串
+    """
+    if config.CRAWLER_WORKER_ID is None:
+        return ""
+    return f"_worker{config.CRAWLER_WORKER_ID}"
+
+
+# 不参与指纹计算的字段：入库时间、修改时间和指纹本身
+FINGERPRINT_EXCLUDED_FIELDS = frozenset({"id", "add_ts", "last_modify_ts", "fingerprint"})
+
+DB_WRITE_INSERTED = "inserted"
+DB_WRITE_UPDATED = "updated"
+DB_WRITE_SKIPPED = "skipped"
+
+# (表名, 记录ID) -> 最近一次写入或查到的指纹，最近使用的排在最后
+_fingerprint_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+
+
+def compute_fingerprint(item: Dict) -> str:
+    """计算记录内容的指纹，字段顺序和 add_ts、last_modify_ts 不影响结果
+    Args:
+        item: 待入库的记录
+    Returns:
+        32 位 md5 十六进制字符串
+    """
+    content = "\x1f".join(f"{key}\x1e{item[key]}" for key in sorted(item) if key not in FINGERPRINT_EXCLUDED_FIELDS)
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+def get_changed_fields(item: Dict, stored_row: Dict) -> Dict:
+    """对比待入库记录和已入库记录，返回值发生变化的字段
+    数据库返回的类型可能与待入库的不同（如点赞数 int 与 str），统一转成字符串比较
+    Args:
+        item: 待入库的记录
+        stored_row: 已入库的记录
+    Returns:
+        变化的字段，不含指纹和时间戳字段
+    """
+    return {
+        key: value for key, value in item.items()
+        if key not in FINGERPRINT_EXCLUDED_FIELDS and str(value) != str(stored_row.get(key))
+    }
+
+
+def _remember_fingerprint(cache_key: Tuple[str, str], fingerprint: str):
+    _fingerprint_cache[cache_key] = fingerprint
+    _fingerprint_cache.move_to_end(cache_key)
+    if len(_fingerprint_cache) > config.STORE_FINGERPRINT_CACHE_SIZE:
+        _fingerprint_cache.popitem(last=False)
+
+
+def clear_fingerprint_cache():
+    _fingerprint_cache.clear()
+
+
+async def upsert_db_row(
+    table_name: str,
+    key: Any,
+    item: Dict,
+    query_row: Callable[[Any], Awaitable[Dict]],
+    add_row: Callable[[Dict], Awaitable[int]],
+    update_row: Callable[[Any, Dict], Awaitable[int]],
+) -> str:
+    """数据库存储写入一条记录，记录内容没有变化时跳过写库，变化时只更新变化的字段
+    先查进程内的指纹缓存，命中且指纹相同时连查询也省掉；再与已入库记录的 fingerprint 字段对比，
+    老数据没有指纹时逐字段对比，内容相同只补写指纹
+    Args:
+        table_name: 表名，用于指纹缓存和写入统计
+        key: 记录ID
+        item: 待入库的记录，会写入 fingerprint 和 add_ts 字段
+        query_row: 按记录ID查询已入库记录
+        add_row: 新增记录
+        update_row: 按记录ID更新记录
+    Returns:
+        inserted | updated | skipped
+    """
+    fingerprint = compute_fingerprint(item)
+    item["fingerprint"] = fingerprint
+    cache_key = (table_name, str(key))
+    if _fingerprint_cache.get(cache_key) == fingerprint:
+        outcome = DB_WRITE_SKIPPED
+    else:
+        stored_row: Dict = await query_row(key)
+        if not stored_row:
+            item["add_ts"] = utils.get_current_timestamp()
+            await add_row(item)
+            outcome = DB_WRITE_INSERTED
+        elif stored_row.get("fingerprint") == fingerprint:
+            outcome = DB_WRITE_SKIPPED
+        else:
+            changed_fields = get_changed_fields(item, stored_row)
+            if changed_fields:
+                changed_fields["last_modify_ts"] = item.get("last_modify_ts", utils.get_current_timestamp())
+                outcome = DB_WRITE_UPDATED
+            else:
+                outcome = DB_WRITE_SKIPPED
+            changed_fields["fingerprint"] = fingerprint
+            await update_row(key, changed_fields)
+        _remember_fingerprint(cache_key, fingerprint)
+    metrics.store_db_writes_total.inc(table=table_name, outcome=outcome)
+    return outcome
+
+
+# 批量写入时按记录ID查询指纹，每条查询最多带的ID数量
+DB_KEY_QUERY_CHUNK_SIZE = 500
+
+# SQL 参数占位符
+MYSQL_PLACEHOLDER = "%s"
+SQLITE_PLACEHOLDER = "?"
+
+
+def group_by_columns(rows: List[Dict]) -> Dict[Tuple[str, ...], List[Dict]]:
+    """按字段集合分组，同一组的记录可以用同一条语句批量执行"""
+    groups: Dict[Tuple[str, ...], List[Dict]] = {}
+    for row in rows:
+        groups.setdefault(tuple(row), []).append(row)
+    return groups
+
+
+async def query_db_fingerprints(async_db_conn, placeholder: str, table_name: str, key_column: str,
+                                keys: List[str]) -> Dict[str, Optional[str]]:
+    """按记录ID批量查询已入库记录的指纹
+    Args:
+        async_db_conn: AsyncMysqlDB 或 AsyncSqliteDB
+        placeholder: SQL 参数占位符
+        table_name: 表名
+        key_column: 记录ID字段
+        keys: 记录ID列表
+    Returns:
+        已入库的记录ID -> 指纹，老数据没有指纹时为 None
+    """
+    fingerprints: Dict[str, Optional[str]] = {}
+    for start in range(0, len(keys), DB_KEY_QUERY_CHUNK_SIZE):
+        values = keys[start:start + DB_KEY_QUERY_CHUNK_SIZE]
+        sql = (f"SELECT `{key_column}`, `fingerprint` FROM `{table_name}` "
+               f"WHERE `{key_column}` IN ({', '.join([placeholder] * len(values))})")
+        for stored_row in await async_db_conn.query(sql, *values):
+            fingerprints[str(stored_row[key_column])] = stored_row.get("fingerprint")
+    return fingerprints
+
+
+async def upsert_db_rows(
+    table_name: str,
+    key_column: str,
+    items: List[Dict],
+    placeholder: str,
+    insertable: Optional[Callable[[Dict], bool]] = None,
+) -> Dict[str, int]:
+    """数据库存储批量写入一组记录，与 upsert_db_row 一样按指纹跳过没有变化的记录
+    整批只查询一次指纹，新增和更新的记录按字段集合分组后各用一条语句 executemany 写入；
+    变化的记录（包括没有指纹的老数据）更新除记录ID和 add_ts 以外的全部字段，同一批中的重复记录以最后一条为准
+    Args:
+        table_name: 表名
+        key_column: 记录ID字段
+        items: 待入库的记录，会写入 fingerprint 和 add_ts 字段
+        placeholder: SQL 参数占位符，MySQL 为 MYSQL_PLACEHOLDER，SQLite 为 SQLITE_PLACEHOLDER
+        insertable: 新记录是否需要入库，为空时全部入库
+    Returns:
+        新增、更新、跳过的条数
+    """
+    from var import media_crawler_db_var
+
+    latest_items: Dict[str, Dict] = {}
+    for item in items:
+        item["fingerprint"] = compute_fingerprint(item)
+        latest_items[str(item.get(key_column))] = item
+    # 进程内的指纹缓存命中且指纹相同时连查询也省掉
+    pending_items = {
+        key: item for key, item in latest_items.items()
+        if _fingerprint_cache.get((table_name, key)) != item["fingerprint"]
+    }
+    async_db_conn = media_crawler_db_var.get()
+    stored_fingerprints = await query_db_fingerprints(async_db_conn, placeholder, table_name, key_column,
+                                                      list(pending_items))
+    new_items, changed_items, written_keys = [], [], []
+    now = utils.get_current_timestamp()
+    for key, item in pending_items.items():
+        if key in stored_fingerprints:
+            if stored_fingerprints[key] != item["fingerprint"]:
+                changed_items.append(item)
+        elif insertable is None or insertable(item):
+            item["add_ts"] = now
+            new_items.append(item)
+        else:
+            continue
+        written_keys.append(key)
+    for columns, column_items in group_by_columns(new_items).items():
+        sql = (f"INSERT INTO `{table_name}` ({', '.join(f'`{column}`' for column in columns)}) "
+               f"VALUES ({', '.join([placeholder] * len(columns))})")
+        await async_db_conn.executemany(sql, [[item[column] for column in columns] for item in column_items])
+    for columns, column_items in group_by_columns(changed_items).items():
+        update_columns = [column for column in columns if column not in (key_column, "add_ts")]
+        sql = (f"UPDATE `{table_name}` SET {', '.join(f'`{column}` = {placeholder}' for column in update_columns)} "
+               f"WHERE `{key_column}` = {placeholder}")
+        await async_db_conn.executemany(
+            sql, [[item[column] for column in update_columns] + [item[key_column]] for item in column_items]
+        )
+    for key in written_keys:
+        _remember_fingerprint((table_name, key), pending_items[key]["fingerprint"])
+    outcomes = {
+        DB_WRITE_INSERTED: len(new_items),
+        DB_WRITE_UPDATED: len(changed_items),
+        DB_WRITE_SKIPPED: len(items) - len(new_items) - len(changed_items),
+    }
+    for outcome, count in outcomes.items():
+        metrics.store_db_writes_total.inc(count, table=table_name, outcome=outcome)
+    return outcomes
+
+
+def get_db_write_stats() -> Dict[str, Dict[str, int]]:
+    """按表统计数据库存储的新增、更新和跳过条数
+    Returns:
+        eg: {"xhs_note": {"inserted": 10, "updated": 2, "skipped": 30}}
+    """
+    stats: Dict[str, Dict[str, int]] = {}
+    for item in metrics.store_db_writes_total.dump():
+        stats.setdefault(item["table"], {})[item["outcome"]] = int(item["value"])
+    return stats
+
+
+# 批量写入一组记录，参数为同一个文件的多条记录
+RowsWriter = Callable[[List[Dict]], Awaitable[None]]
+
+
+class FileWriteBatch:
+    """
+    store_batch 期间各条记录写文件前先缓存在这里，整批结束后每个文件只打开、读写一次
+    """
+
+    def __init__(self):
+        # 文件名 -> (待写入的记录, 写入函数)，按第一次出现的顺序写入
+        self.files: Dict[str, Tuple[List[Dict], RowsWriter]] = {}
+
+    def add(self, file_name: str, save_item: Dict, write_rows: RowsWriter):
+        if file_name not in self.files:
+            self.files[file_name] = ([], write_rows)
+        self.files[file_name][0].append(save_item)
+
+    async def flush(self):
+        files, self.files = self.files, {}
+        for save_items, write_rows in files.values():
+            await write_rows(save_items)
+
+
+_file_write_batch_var: ContextVar[Optional[FileWriteBatch]] = ContextVar("file_write_batch", default=None)
+
+
+@asynccontextmanager
+async def file_write_batch() -> AsyncIterator[FileWriteBatch]:
+    """在该上下文中通过 write_rows_to_file 写入的记录先缓存，退出时按文件批量写入"""
+    batch = FileWriteBatch()
+    token = _file_write_batch_var.set(batch)
+    try:
+        yield batch
+    finally:
+        _file_write_batch_var.reset(token)
+        await batch.flush()
+
+
+async def write_rows_to_file(file_name: str, save_item: Dict, write_rows: RowsWriter):
+    """写入一条记录，在 file_write_batch 中时先缓存，整批结束后与同一文件的其他记录一起写入
+    Args:
+        file_name: 数据文件名
+        save_item: 记录
+        write_rows: 把多条记录写入该文件的函数
+    """
+    batch = _file_write_batch_var.get()
+    if batch is None:
+        await write_rows([save_item])
+    else:
+        batch.add(file_name, save_item, write_rows)
+
+
+def encode_csv_rows(save_items: List[Dict], write_header: bool) -> str:
+    """把多条记录编码为 CSV 文本，write_header 时在开头加上 BOM 和表头"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if write_header:
+        buffer.write("\ufeff")
+        writer.writerow(save_items[0].keys())
+    writer.writerows(save_item.values() for save_item in save_items)
+    return buffer.getvalue()
+
+
+def encode_jsonl_rows(save_items: List[Dict], write_header: bool) -> str:
+    """把多条记录编码为 JSON Lines 文本"""
+    return "".join(json.dumps(save_item, ensure_ascii=False) + "\n" for save_item in save_items)
+
+
+async def write_csv_rows(file_name: str, save_items: List[Dict]):
+    """向 CSV 文件追加多条记录，文件为空时先写表头；开启压缩或分段时写入分段文件
+    Args:
+        file_name: CSV 文件名
+        save_items: 记录列表
+    """
+    if segmented_output_enabled():
+        await write_segmented_rows(file_name, save_items, encode_csv_rows)
+        return
+    async with aiofiles.open(file_name, mode='a+', encoding="utf-8-sig", newline="") as f:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if await f.tell() == 0:
+            writer.writerow(save_items[0].keys())
+        writer.writerows(save_item.values() for save_item in save_items)
+        await f.write(buffer.getvalue())
+
+
+async def write_json_rows(file_name: str, save_items: List[Dict],
+                          indent: Optional[int] = None) -> Optional[List[Dict]]:
+    """向 JSON 数组文件追加多条记录，调用方需要持有该文件的写锁；
+    开启压缩或分段时改为追加写入 JSON Lines（.jsonl）分段文件，不再读出并重写整个文件
+    Args:
+        file_name: JSON 文件名
+        save_items: 记录列表
+        indent: json.dumps 的缩进
+    Returns:
+        文件中的全部记录，分段写入时为 None
+    """
+    if segmented_output_enabled():
+        if config.ENABLE_GET_WORDCLOUD:
+            warn_wordcloud_unsupported()
+        await write_segmented_rows(f"{os.path.splitext(file_name)[0]}.jsonl", save_items, encode_jsonl_rows)
+        return None
+    save_data = []
+    if os.path.exists(file_name):
+        async with aiofiles.open(file_name, 'r', encoding='utf-8') as file:
+            save_data = json.loads(await file.read())
+    save_data.extend(save_items)
+    async with aiofiles.open(file_name, 'w', encoding='utf-8') as file:
+        await file.write(json.dumps(save_data, ensure_ascii=False, indent=indent))
+    return save_data
@@ -13,6 +13,7 @@
 from typing import List
 
 from model.m_baidu_tieba import TiebaComment, TiebaCreator, TiebaNote
+from store.write_behind import wrap_store
 from var import source_keyword_var
 
 from . import tieba_store_impl
@@ -24,7 +25,8 @@ class TieBaStoreFactory:
         "csv": TieBaCsvStoreImplement,
         "db": TieBaDbStoreImplement,
         "json": TieBaJsonStoreImplement,
-        "sqlite": TieBaSqliteStoreImplement
+        "sqlite": TieBaSqliteStoreImplement,
+        "parquet": TieBaParquetStoreImplement
     }
 
     @staticmethod
@@ -32,8 +34,8 @@ class TieBaStoreFactory:
         store_class = TieBaStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
             raise ValueError(
-                "[TieBaStoreFactory.create_store] Invalid save option only supported csv or db or json ...")
-        return store_class()
+                "[TieBaStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
+        return wrap_store(store_class())
 
 
 async def batch_update_tieba_notes(note_list: List[TiebaNote]):
@@ -16,6 +16,7 @@
 import re
 from typing import List
 
+from store.write_behind import wrap_store
 from var import source_keyword_var
 
 from .weibo_store_media import *
@@ -28,14 +29,15 @@ class WeibostoreFactory:
         "db": WeiboDbStoreImplement,
         "json": WeiboJsonStoreImplement,
         "sqlite": WeiboSqliteStoreImplement,
+        "parquet": WeiboParquetStoreImplement,
     }
 
     @staticmethod
     def create_store() -> AbstractStore:
         store_class = WeibostoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[WeibotoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+            raise ValueError("[WeibotoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
+        return wrap_store(store_class())
 
 
 async def batch_update_weibo_notes(note_list: List[Dict]):
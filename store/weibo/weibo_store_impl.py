@@ -14,38 +14,35 @@
 # @Time    : 2024/1/14 21:35
 # @Desc    : 微博存储实现类
 import asyncio
-import csv
-import json
-import os
+import functools
 import pathlib
-from typing import Dict
-
-import aiofiles
+from typing import Dict, List
 
 import config
 from base.base_crawler import AbstractStore
+from store.parquet_store import write_parquet_row
+from store.store_util import (MYSQL_PLACEHOLDER, SQLITE_PLACEHOLDER,
+                              calculate_number_of_files, get_file_name_suffix,
+                              get_store_lock, upsert_db_row, upsert_db_rows,
+                              write_csv_rows, write_json_rows,
+                              write_rows_to_file)
 from tools import utils, words
 from var import crawler_type_var
 
-
-def calculate_number_of_files(file_store_path: str) -> int:
-    """计算数据保存文件的前部分排序数字，支持每次运行代码不写到同一个文件中
-    Args:
-        file_store_path;
-    Returns:
-        file nums
-    """
-    if not os.path.exists(file_store_path):
-        return 1
-    try:
-        return max([int(file_name.split("_")[0]) for file_name in os.listdir(file_store_path)]) + 1
-    except ValueError:
-        return 1
+# 数据库存储的 store_* 写入方法 -> (表名, 记录ID字段)，store_batch 按表批量写入
+WEIBO_DB_TABLES = {
+    "store_content": ("weibo_note", "note_id"),
+    "store_comment": ("weibo_note_comment", "comment_id"),
+    "store_creator": ("weibo_creator", "user_id"),
+}
 
 
 class WeiboCsvStoreImplement(AbstractStore):
     csv_store_path: str = "data/weibo"
-    file_count: int = calculate_number_of_files(csv_store_path)
+
+    @property
+    def file_count(self) -> int:
+        return calculate_number_of_files(self.csv_store_path)
 
     def make_save_file_name(self, store_type: str) -> str:
         """
@@ -57,7 +54,7 @@ class WeiboCsvStoreImplement(AbstractStore):
 
         """
 
-        return f"{self.csv_store_path}/{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}.csv"
+        return f"{self.csv_store_path}/{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}{get_file_name_suffix()}.csv"
 
     async def save_data_to_csv(self, save_item: Dict, store_type: str):
         """
@@ -71,11 +68,7 @@ class WeiboCsvStoreImplement(AbstractStore):
         """
         pathlib.Path(self.csv_store_path).mkdir(parents=True, exist_ok=True)
         save_file_name = self.make_save_file_name(store_type=store_type)
-        async with aiofiles.open(save_file_name, mode='a+', encoding="utf-8-sig", newline="") as f:
-            writer = csv.writer(f)
-            if await f.tell() == 0:
-                await writer.writerow(save_item.keys())
-            await writer.writerow(save_item.values())
+        await write_rows_to_file(save_file_name, save_item, functools.partial(write_csv_rows, save_file_name))
 
     async def store_content(self, content_item: Dict):
         """
@@ -127,12 +120,8 @@ class WeiboDbStoreImplement(AbstractStore):
                                       query_content_by_content_id,
                                       update_content_by_content_id)
         note_id = content_item.get("note_id")
-        note_detail: Dict = await query_content_by_content_id(content_id=note_id)
-        if not note_detail:
-            content_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_content(content_item)
-        else:
-            await update_content_by_content_id(note_id, content_item=content_item)
+        await upsert_db_row("weibo_note", note_id, content_item, query_content_by_content_id,
+                            add_new_content, update_content_by_content_id)
 
     async def store_comment(self, comment_item: Dict):
         """
@@ -147,12 +136,8 @@ class WeiboDbStoreImplement(AbstractStore):
                                       query_comment_by_comment_id,
                                       update_comment_by_comment_id)
         comment_id = comment_item.get("comment_id")
-        comment_detail: Dict = await query_comment_by_comment_id(comment_id=comment_id)
-        if not comment_detail:
-            comment_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_comment(comment_item)
-        else:
-            await update_comment_by_comment_id(comment_id, comment_item=comment_item)
+        await upsert_db_row("weibo_note_comment", comment_id, comment_item, query_comment_by_comment_id,
+                            add_new_comment, update_comment_by_comment_id)
 
     async def store_creator(self, creator: Dict):
         """
@@ -168,20 +153,40 @@ class WeiboDbStoreImplement(AbstractStore):
                                       query_creator_by_user_id,
                                       update_creator_by_user_id)
         user_id = creator.get("user_id")
-        user_detail: Dict = await query_creator_by_user_id(user_id)
-        if not user_detail:
-            creator["add_ts"] = utils.get_current_timestamp()
-            await add_new_creator(creator)
-        else:
-            await update_creator_by_user_id(user_id, creator)
+        await upsert_db_row("weibo_creator", user_id, creator, query_creator_by_user_id,
+                            add_new_creator, update_creator_by_user_id)
+
+    async def store_batch(self, method_name: str, items: List[Dict]):
+        """
+        Weibo batch DB storage implementation, one fingerprint query and one executemany per table
+        Args:
+            method_name: store_content | store_comment | store_creator
+            items: item dict list
+
+        Returns:
+
+        """
+        if method_name not in WEIBO_DB_TABLES:
+            return await super().store_batch(method_name, items)
+        table_name, key_column = WEIBO_DB_TABLES[method_name]
+        await upsert_db_rows(table_name, key_column, items, MYSQL_PLACEHOLDER)
 
 
 class WeiboJsonStoreImplement(AbstractStore):
     json_store_path: str = "data/weibo/json"
     words_store_path: str = "data/weibo/words"
-    lock = asyncio.Lock()
-    file_count: int = calculate_number_of_files(json_store_path)
-    WordCloud = words.AsyncWordCloudGenerator()
+
+    @property
+    def file_count(self) -> int:
+        return calculate_number_of_files(self.json_store_path)
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        return get_store_lock(self.json_store_path)
+
+    @property
+    def WordCloud(self) -> words.AsyncWordCloudGenerator:
+        return words.get_word_cloud_generator()
 
     def make_save_file_name(self, store_type: str) -> (str, str):
         """
@@ -194,8 +199,8 @@ class WeiboJsonStoreImplement(AbstractStore):
         """
 
         return (
-            f"{self.json_store_path}/{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}.json",
-            f"{self.words_store_path}/{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}"
+            f"{self.json_store_path}/{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}{get_file_name_suffix()}.json",
+            f"{self.words_store_path}/{crawler_type_var.get()}_{store_type}_{utils.get_current_date()}{get_file_name_suffix()}"
         )
 
     async def save_data_to_json(self, save_item: Dict, store_type: str):
@@ -211,22 +216,17 @@ class WeiboJsonStoreImplement(AbstractStore):
         pathlib.Path(self.json_store_path).mkdir(parents=True, exist_ok=True)
         pathlib.Path(self.words_store_path).mkdir(parents=True, exist_ok=True)
         save_file_name, words_file_name_prefix = self.make_save_file_name(store_type=store_type)
-        save_data = []
 
-        async with self.lock:
-            if os.path.exists(save_file_name):
-                async with aiofiles.open(save_file_name, 'r', encoding='utf-8') as file:
-                    save_data = json.loads(await file.read())
+        async def write_rows(save_items: List[Dict]):
+            async with self.lock:
+                save_data = await write_json_rows(save_file_name, save_items)
+                if save_data is not None and config.ENABLE_GET_COMMENTS and config.ENABLE_GET_WORDCLOUD:
+                    try:
+                        await self.WordCloud.generate_word_frequency_and_cloud(save_data, words_file_name_prefix)
+                    except:
+                        pass
 
-            save_data.append(save_item)
-            async with aiofiles.open(save_file_name, 'w', encoding='utf-8') as file:
-                await file.write(json.dumps(save_data, ensure_ascii=False))
-
-            if config.ENABLE_GET_COMMENTS and config.ENABLE_GET_WORDCLOUD:
-                try:
-                    await self.WordCloud.generate_word_frequency_and_cloud(save_data, words_file_name_prefix)
-                except:
-                    pass
+        await write_rows_to_file(save_file_name, save_item, write_rows)
 
     async def store_content(self, content_item: Dict):
         """
@@ -277,12 +277,8 @@ class WeiboSqliteStoreImplement(AbstractStore):
                                       query_content_by_content_id,
                                       update_content_by_content_id)
         note_id = content_item.get("note_id")
-        note_detail: Dict = await query_content_by_content_id(content_id=note_id)
-        if not note_detail:
-            content_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_content(content_item)
-        else:
-            await update_content_by_content_id(note_id, content_item=content_item)
+        await upsert_db_row("weibo_note", note_id, content_item, query_content_by_content_id,
+                            add_new_content, update_content_by_content_id)
 
     async def store_comment(self, comment_item: Dict):
         """
@@ -297,12 +293,8 @@ class WeiboSqliteStoreImplement(AbstractStore):
                                       query_comment_by_comment_id,
                                       update_comment_by_comment_id)
         comment_id = comment_item.get("comment_id")
-        comment_detail: Dict = await query_comment_by_comment_id(comment_id=comment_id)
-        if not comment_detail:
-            comment_item["add_ts"] = utils.get_current_timestamp()
-            await add_new_comment(comment_item)
-        else:
-            await update_comment_by_comment_id(comment_id, comment_item=comment_item)
+        await upsert_db_row("weibo_note_comment", comment_id, comment_item, query_comment_by_comment_id,
+                            add_new_comment, update_comment_by_comment_id)
 
     async def store_creator(self, creator: Dict):
         """
@@ -318,9 +310,57 @@ class WeiboSqliteStoreImplement(AbstractStore):
                                       query_creator_by_user_id,
                                       update_creator_by_user_id)
         user_id = creator.get("user_id")
-        user_detail: Dict = await query_creator_by_user_id(user_id)
-        if not user_detail:
-            creator["add_ts"] = utils.get_current_timestamp()
-            await add_new_creator(creator)
-        else:
-            await update_creator_by_user_id(user_id, creator)
+        await upsert_db_row("weibo_creator", user_id, creator, query_creator_by_user_id,
+                            add_new_creator, update_creator_by_user_id)
+
+    async def store_batch(self, method_name: str, items: List[Dict]):
+        """
+        Weibo batch SQLite storage implementation, one fingerprint query and one executemany per table
+        Args:
+            method_name: store_content | store_comment | store_creator
+            items: item dict list
+
+        Returns:
+
+        """
+        if method_name not in WEIBO_DB_TABLES:
+            return await super().store_batch(method_name, items)
+        table_name, key_column = WEIBO_DB_TABLES[method_name]
+        await upsert_db_rows(table_name, key_column, items, SQLITE_PLACEHOLDER)
+
+
+class WeiboParquetStoreImplement(AbstractStore):
+    parquet_store_path: str = "data/weibo/parquet"
+
+    async def store_content(self, content_item: Dict):
+        """
+        Weibo content Parquet storage implementation
+        Args:
+            content_item: content item dict
+
+        Returns:
+
+        """
+        await write_parquet_row(self.parquet_store_path, "weibo_note", content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        """
+        Weibo comment Parquet storage implementation
+        Args:
+            comment_item: comment item dict
+
+        Returns:
+
+        """
+        await write_parquet_row(self.parquet_store_path, "weibo_note_comment", comment_item)
+
+    async def store_creator(self, creator: Dict):
+        """
+        Weibo creator Parquet storage implementation
+        Args:
+            creator: creator item dict
+
+        Returns:
+
+        """
+        await write_parquet_row(self.parquet_store_path, "weibo_creator", creator)
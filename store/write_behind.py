@@ -0,0 +1,206 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 异步写入队列，爬虫调用 store_* 时只把记录放入有界队列，后台协程按存储实现和写入方法分组批量写入，
+# 数据库和文件的写入与网络请求并行；队列满时 store_* 等待，退出前必须调用 drain 写完队列中的记录
+import asyncio
+import contextvars
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import config
+from base.base_crawler import AbstractStore
+from tools import metrics, utils
+from var import crawler_type_var
+
+
+class PendingWrite(NamedTuple):
+    store: AbstractStore
+    method_name: str
+    item: Dict
+    # 文件存储的文件名取决于入队时的爬取类型
+    crawler_type: Optional[str]
+
+
+class WriteBehindStore:
+    """
+    存储实现的代理，store_* 写入方法改为放入写入队列，其他属性直接访问被代理的存储实现
+    """
+
+    def __init__(self, store: AbstractStore, pipeline: "WriteBehindPipeline"):
+        self._store = store
+        self._pipeline = pipeline
+
+    def __getattr__(self, name: str) -> Any:
+        if name not in metrics.STORE_METHOD_ITEM_TYPES:
+            return getattr(self._store, name)
+
+        async def enqueue(*args, **kwargs):
+            # 写入方法只有一个记录参数，调用方可能按位置或按参数名（content_item=、creator= ...）传入
+            item = args[0] if args else next(iter(kwargs.values()))
+            await self._pipeline.put(self._store, name, item)
+
+        return enqueue
+
+
+class WriteBehindPipeline:
+    """
+    写入队列，每个进程一个，后台写入协程在第一次入队时启动
+    """
+
+    def __init__(self, max_size: int, batch_size: int):
+        """
+        :param max_size: 队列中最多等待写入的记录数，超过后 store_* 等待写入协程腾出空间
+        :param batch_size: 写入协程一次最多取出的记录数
+        """
+        self.max_size = max(max_size, 1)
+        self.batch_size = max(batch_size, 1)
+        self.failed_rows = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def wrap(self, store: AbstractStore) -> WriteBehindStore:
+        return WriteBehindStore(store, self)
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 队列和写入协程绑定创建时的事件循环，换了事件循环（如测试）后重新创建
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._writer_task = None
+        if self._writer_task is None or self._writer_task.done():
+            # 写入协程在空的上下文中创建，不继承首次写入的爬虫任务覆盖的配置
+            self._writer_task = contextvars.Context().run(loop.create_task, self._run())
+
+    async def put(self, store: AbstractStore, method_name: str, item: Dict):
+        """
+        记录放入写入队列，队列满时等待
+        Args:
+            store: 存储实现
+            method_name: store_content | store_comment ...
+            item: 记录
+
+        Returns:
+
+        """
+        self._ensure_started()
+        await self._queue.put(PendingWrite(store, method_name, item, crawler_type_var.get(None)))
+
+    async def _run(self):
+        while True:
+            batch: List[PendingWrite] = [await self._queue.get()]
+            # 上一批写入期间积累的记录一起写入
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_batch(self, batch: List[PendingWrite]):
+        """
+        按存储实现、写入方法和爬取类型分组，每组调用一次 store_batch，组间保持第一条记录的入队顺序
+        """
+        groups: Dict[Tuple[type, str, Optional[str]], Tuple[AbstractStore, List[Dict]]] = {}
+        for pending in batch:
+            key = (type(pending.store), pending.method_name, pending.crawler_type)
+            if key not in groups:
+                groups[key] = (pending.store, [])
+            groups[key][1].append(pending.item)
+        for (store_class, method_name, crawler_type), (store, items) in groups.items():
+            token = crawler_type_var.set(crawler_type)
+            try:
+                await store.store_batch(method_name, items)
+            except Exception as e:
+                # 写入失败不影响爬取，与同步写入时一样记录错误日志
+                self.failed_rows += len(items)
+                utils.logger.error(
+                    f"[WriteBehindPipeline._write_batch] {store_class.__name__}.{method_name} failed to write "
+                    f"{len(items)} rows, err: {e}"
+                )
+            finally:
+                crawler_type_var.reset(token)
+
+    @property
+    def pending_rows(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def join(self):
+        """等待队列中已有的记录全部写入"""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+
+    async def drain(self):
+        """写完队列中的记录并停止写入协程，退出前调用"""
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+        pending_rows = self.pending_rows
+        await self._queue.join()
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            await asyncio.gather(self._writer_task, return_exceptions=True)
+            self._writer_task = None
+        utils.logger.info(
+            f"[WriteBehindPipeline.drain] write-behind queue drained, {pending_rows} rows flushed on shutdown, "
+            f"{self.failed_rows} rows failed in total"
+        )
+
+
+_pipeline: Optional[WriteBehindPipeline] = None
+
+
+def get_pipeline() -> WriteBehindPipeline:
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = WriteBehindPipeline(config.STORE_WRITE_QUEUE_SIZE, config.STORE_WRITE_BATCH_SIZE)
+    return _pipeline
+
+
+def wrap_store(store: AbstractStore):
+    """
+    各平台存储工厂创建存储实现后调用，开启 ENABLE_WRITE_BEHIND 时返回写入队列代理
+    Args:
+        store: 存储实现
+
+    Returns:
+
+    """
+    if not config.ENABLE_WRITE_BEHIND:
+        return store
+    return get_pipeline().wrap(store)
+
+
+async def join():
+    """等待已入队的记录全部写入，写入队列未启用时直接返回"""
+    if _pipeline is not None:
+        await _pipeline.join()
+
+
+async def drain():
+    """写完队列中的记录并停止写入协程，写入队列未启用时直接返回"""
+    if _pipeline is not None:
+        await _pipeline.drain()
+
+
+def drain_on_shutdown():
+    """
+    main.cleanup 在事件循环停止后调用：回到写入队列所在的事件循环写完剩余记录，事件循环已关闭时记录丢失的条数
+    Returns:
+
+    """
+    if _pipeline is None or _pipeline._loop is None:
+        return
+    if _pipeline._loop.is_closed():
+        utils.logger.error(f"[write_behind.drain_on_shutdown] event loop closed, {_pipeline.pending_rows} rows lost")
+        return
+    _pipeline._loop.run_until_complete(_pipeline.drain())
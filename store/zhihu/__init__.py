@@ -10,16 +10,19 @@
 
 
 # -*- coding: utf-8 -*-
-from typing import List
+from typing import Dict, List, Optional
 
 import config
 from base.base_crawler import AbstractStore
 from model.m_zhihu import ZhihuComment, ZhihuContent, ZhihuCreator
+from store.write_behind import wrap_store
 from store.zhihu.zhihu_store_impl import (ZhihuCsvStoreImplement,
                                           ZhihuDbStoreImplement,
                                           ZhihuJsonStoreImplement,
+                                          ZhihuParquetStoreImplement,
                                           ZhihuSqliteStoreImplement)
 from tools import utils
+from tools.comment_watermark import CommentWatermark
 from var import source_keyword_var
 
 
@@ -28,15 +31,16 @@ class ZhihuStoreFactory:
         "csv": ZhihuCsvStoreImplement,
         "db": ZhihuDbStoreImplement,
         "json": ZhihuJsonStoreImplement,
-        "sqlite": ZhihuSqliteStoreImplement
+        "sqlite": ZhihuSqliteStoreImplement,
+        "parquet": ZhihuParquetStoreImplement
     }
 
     @staticmethod
     def create_store() -> AbstractStore:
         store_class = ZhihuStoreFactory.STORES.get(config.SAVE_DATA_OPTION)
         if not store_class:
-            raise ValueError("[ZhihuStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite ...")
-        return store_class()
+            raise ValueError("[ZhihuStoreFactory.create_store] Invalid save option only supported csv or db or json or sqlite or parquet ...")
+        return wrap_store(store_class())
 
 async def batch_update_zhihu_contents(contents: List[ZhihuContent]):
     """
@@ -101,6 +105,20 @@ async def update_zhihu_content_comment(comment_item: ZhihuComment):
     await ZhihuStoreFactory.create_store().store_comment(local_db_item)
 
 
+async def query_content_comment_watermark(content_id: str) -> Optional[CommentWatermark]:
+    """
+    增量评论模式下查询内容已入库的最新一级评论，仅支持 db 和 sqlite 存储
+    Args:
+        content_id:
+
+    Returns: 没有入库评论时返回 None
+
+    """
+    from .zhihu_store_sql import query_latest_comment_by_content_id
+    row: Dict = await query_latest_comment_by_content_id(content_id)
+    return CommentWatermark.from_row(row, "comment_id", "publish_time")
+
+
 async def save_creator(creator: ZhihuCreator):
     """
     保存知乎创作者信息
@@ -81,6 +81,25 @@ async def query_comment_by_comment_id(comment_id: str) -> Dict:
     return dict()
 
 
+async def query_latest_comment_by_content_id(content_id: str) -> Dict:
+    """
+    查询内容已入库的发布时间最新的一级评论，走 (content_id, publish_time) 索引；
+    publish_time 是定长的秒级时间戳字符串，按字符串排序与按时间排序一致
+    Args:
+        content_id:
+
+    Returns:
+
+    """
+    async_db_conn: Union[AsyncMysqlDB, AsyncSqliteDB] = media_crawler_db_var.get()
+    sql: str = (f"select comment_id, publish_time from zhihu_comment where content_id = '{content_id}' "
+                f"and (parent_comment_id is null or parent_comment_id in ('', '0')) order by publish_time desc limit 1")
+    rows: List[Dict] = await async_db_conn.query(sql)
+    if len(rows) > 0:
+        return rows[0]
+    return dict()
+
+
 async def add_new_comment(comment_item: Dict) -> int:
     """
     新增一条评论记录
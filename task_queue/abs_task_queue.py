@@ -0,0 +1,139 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 爬取任务队列抽象类
+import hashlib
+import json
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+from pydantic import BaseModel, Field
+
+# 任务类型
+TASK_TYPE_SEARCH_PAGE = "search_page"  # 关键词搜索的某一页
+TASK_TYPE_NOTE_DETAIL = "note_detail"  # 指定帖子详情（含评论）
+TASK_TYPE_COMMENT_CURSOR = "comment_cursor"  # 帖子一级评论的某一页（游标）
+TASK_TYPE_CREATOR_PAGE = "creator_page"  # 创作者主页
+TASK_TYPES = [TASK_TYPE_SEARCH_PAGE, TASK_TYPE_NOTE_DETAIL, TASK_TYPE_COMMENT_CURSOR, TASK_TYPE_CREATOR_PAGE]
+
+
+def make_task_id(platform: str, task_type: str, payload: Dict) -> str:
+    """
+    根据任务内容生成幂等的任务ID，同一个任务重复提交只会执行一次
+    :param platform: 平台
+    :param task_type: 任务类型
+    :param payload: 任务参数
+    :return:
+    """
+    raw = json.dumps([platform, task_type, payload], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class CrawlTask(BaseModel):
+    task_id: str = Field(default="", title="任务ID，为空时根据任务内容生成")
+    platform: str = Field(title="平台")
+    task_type: str = Field(title="任务类型")
+    payload: Dict = Field(default_factory=dict, title="任务参数")
+    attempts: int = Field(default=0, title="已尝试次数")
+    lease_id: str = Field(default="", title="取出任务时分配的租约ID，确认、延长和重试任务时校验，不随任务内容保存")
+
+    def model_post_init(self, __context) -> None:
+        if not self.task_id:
+            self.task_id = make_task_id(self.platform, self.task_type, self.payload)
+
+    def dump_body(self) -> str:
+        """
+        序列化为队列中保存的任务内容，不包含租约ID
+        :return:
+        """
+        return self.model_dump_json(exclude={"lease_id"})
+
+
+class AbstractTaskQueue(ABC):
+
+    @abstractmethod
+    def put(self, task: CrawlTask) -> bool:
+        """
+        提交任务，任务ID已经提交过时忽略
+        这是一个抽象方法。子类必须实现这个方法。
+        :param task: 任务
+        :return: 是否为新任务
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, visibility_timeout: int, max_attempts: int) -> Optional[CrawlTask]:
+        """
+        取出一个任务并分配新的租约，任务在可见性超时时间内未确认会重新回到队列
+        超时也计入尝试次数，达到最大尝试次数的超时任务直接丢弃
+        这是一个抽象方法。子类必须实现这个方法。
+        :param visibility_timeout: 可见性超时时间（秒）
+        :param max_attempts: 最大尝试次数
+        :return:
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def ack(self, task: CrawlTask) -> bool:
+        """
+        确认任务已完成，任务超时重新入队但还没有被其他节点取出时同样从队列中移除
+        这是一个抽象方法。子类必须实现这个方法。
+        :param task: get 返回的任务
+        :return: 租约仍然有效时返回 True，任务已被其他节点取出时忽略并返回 False
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def nack(self, task: CrawlTask, max_attempts: int) -> bool:
+        """
+        任务执行失败，未超过最大尝试次数时立即重新入队，否则丢弃
+        这是一个抽象方法。子类必须实现这个方法。
+        :param task: get 返回的任务
+        :param max_attempts: 最大尝试次数
+        :return: 租约仍然有效时返回 True，任务已被其他节点取出时忽略并返回 False
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def extend(self, task: CrawlTask, visibility_timeout: int) -> bool:
+        """
+        延长任务的可见性超时时间，执行时间较长的任务定期调用，避免执行期间被交给其他节点
+        这是一个抽象方法。子类必须实现这个方法。
+        :param task: get 返回的任务
+        :param visibility_timeout: 从现在起的可见性超时时间（秒）
+        :return: 租约仍然有效时返回 True
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def reset_seen(self) -> None:
+        """
+        清空已提交任务ID的去重记录，之后可以重新提交已完成的任务，仍在队列中的任务继续去重
+        这是一个抽象方法。子类必须实现这个方法。
+        :return:
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def size(self) -> int:
+        """
+        等待执行的任务数量
+        :return:
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def in_flight(self) -> int:
+        """
+        已被取出但还未确认的任务数量
+        :return:
+        """
+        raise NotImplementedError
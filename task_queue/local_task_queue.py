@@ -0,0 +1,132 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 进程内任务队列，未部署 Redis 时的单机实现
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, Optional, Set
+
+from task_queue.abs_task_queue import AbstractTaskQueue, CrawlTask
+
+
+class LocalTaskQueue(AbstractTaskQueue):
+
+    def __init__(self, queue_name: str = "default"):
+        """
+        初始化进程内任务队列
+        :param queue_name: 队列名称
+        """
+        self.queue_name = queue_name
+        self._pending: Deque[str] = deque()
+        self._tasks: Dict[str, CrawlTask] = {}
+        self._in_flight: Dict[str, float] = {}
+        # 任务ID -> 最近一次取出时分配的租约ID
+        self._leases: Dict[str, str] = {}
+        self._seen: Set[str] = set()
+
+    def put(self, task: CrawlTask) -> bool:
+        if task.task_id in self._seen:
+            return False
+        self._seen.add(task.task_id)
+        self._tasks[task.task_id] = task.model_copy(update={"lease_id": ""})
+        self._pending.append(task.task_id)
+        return True
+
+    def get(self, visibility_timeout: int, max_attempts: int) -> Optional[CrawlTask]:
+        self._requeue_expired(max_attempts)
+        while self._pending:
+            task_id = self._pending.popleft()
+            # 已确认或已丢弃的任务不再执行
+            if task_id not in self._tasks:
+                continue
+            lease_id = uuid.uuid4().hex
+            self._in_flight[task_id] = time.time() + visibility_timeout
+            self._leases[task_id] = lease_id
+            return self._tasks[task_id].model_copy(update={"lease_id": lease_id})
+        return None
+
+    def ack(self, task: CrawlTask) -> bool:
+        if not self._is_owner(task):
+            return False
+        self._remove_from_queue(task.task_id)
+        self._tasks.pop(task.task_id, None)
+        return True
+
+    def nack(self, task: CrawlTask, max_attempts: int) -> bool:
+        if not self._is_owner(task):
+            return False
+        self._remove_from_queue(task.task_id)
+        stored_task = self._tasks.get(task.task_id)
+        if not stored_task:
+            return True
+        stored_task.attempts += 1
+        if stored_task.attempts >= max_attempts:
+            self._tasks.pop(task.task_id)
+            return True
+        self._pending.append(task.task_id)
+        return True
+
+    def extend(self, task: CrawlTask, visibility_timeout: int) -> bool:
+        if not self._is_owner(task) or task.task_id not in self._tasks:
+            return False
+        # 已超时重新入队但还没有被其他节点取出时，重新放回处理中
+        if task.task_id in self._pending:
+            self._pending.remove(task.task_id)
+        self._in_flight[task.task_id] = time.time() + visibility_timeout
+        return True
+
+    def reset_seen(self) -> None:
+        self._seen = set(self._tasks)
+
+    def size(self) -> int:
+        return len(self._pending)
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def _is_owner(self, task: CrawlTask) -> bool:
+        """
+        任务最近一次是否由该租约取出，超时后被其他节点取出时租约已更换
+        :param task: get 返回的任务
+        :return:
+        """
+        return bool(task.lease_id) and self._leases.get(task.task_id) == task.lease_id
+
+    def _remove_from_queue(self, task_id: str):
+        """
+        把任务从处理中和等待队列中移除，并作废租约
+        :param task_id: 任务ID
+        :return:
+        """
+        self._in_flight.pop(task_id, None)
+        self._leases.pop(task_id, None)
+        if task_id in self._pending:
+            self._pending.remove(task_id)
+
+    def _requeue_expired(self, max_attempts: int):
+        """
+        可见性超时的任务计入一次尝试后重新回到队列，达到最大尝试次数时丢弃
+        租约保留到任务被再次取出，原节点在此之前仍可以确认任务
+        :param max_attempts: 最大尝试次数
+        :return:
+        """
+        now = time.time()
+        for task_id, deadline in list(self._in_flight.items()):
+            if deadline <= now:
+                del self._in_flight[task_id]
+                task = self._tasks[task_id]
+                task.attempts += 1
+                if task.attempts >= max_attempts:
+                    self._tasks.pop(task_id)
+                    self._leases.pop(task_id, None)
+                    continue
+                self._pending.append(task_id)
@@ -0,0 +1,202 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 基于 Redis 的分布式任务队列，多台机器可以共同消费同一个队列
+import time
+import uuid
+from typing import Optional
+
+from redis import Redis
+
+import config
+from cache.redis_cache import RedisCache
+from task_queue.abs_task_queue import AbstractTaskQueue, CrawlTask
+
+# 以下脚本的 KEYS 顺序统一为 pending, inflight, tasks, leases（PUT/RESET_SEEN 除外）
+
+# 去重和入队在同一个脚本中完成，避免登记了任务ID但任务没有入队
+PUT_TASK_SCRIPT = """
+if redis.call('SADD', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+if tonumber(ARGV[3]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('LPUSH', KEYS[3], ARGV[1])
+return 1
+"""
+
+# 取出任务、登记处理中并分配租约，跳过已确认或已丢弃（没有任务内容）的任务ID
+GET_TASK_SCRIPT = """
+while true do
+    local task_id = redis.call('RPOP', KEYS[1])
+    if not task_id then
+        return nil
+    end
+    local value = redis.call('HGET', KEYS[3], task_id)
+    if value then
+        redis.call('ZADD', KEYS[2], ARGV[1], task_id)
+        redis.call('HSET', KEYS[4], task_id, ARGV[2])
+        return value
+    end
+end
+"""
+
+# 租约有效时确认任务：从处理中和等待队列中移除并删除任务内容
+ACK_TASK_SCRIPT = """
+if redis.call('HGET', KEYS[4], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('LREM', KEYS[1], 0, ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[4], ARGV[1])
+return 1
+"""
+
+# 租约有效时任务计入一次失败，未达到最大尝试次数时重新入队，否则丢弃
+NACK_TASK_SCRIPT = """
+if redis.call('HGET', KEYS[4], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('LREM', KEYS[1], 0, ARGV[1])
+redis.call('HDEL', KEYS[4], ARGV[1])
+local value = redis.call('HGET', KEYS[3], ARGV[1])
+if not value then
+    return 1
+end
+local task = cjson.decode(value)
+task['attempts'] = (task['attempts'] or 0) + 1
+if task['attempts'] >= tonumber(ARGV[3]) then
+    redis.call('HDEL', KEYS[3], ARGV[1])
+else
+    redis.call('HSET', KEYS[3], ARGV[1], cjson.encode(task))
+    redis.call('LPUSH', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+# 租约有效时延长可见性超时，已超时重新入队但还没有被其他节点取出的任务重新放回处理中
+EXTEND_TASK_SCRIPT = """
+if redis.call('HGET', KEYS[4], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+if redis.call('HEXISTS', KEYS[3], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('LREM', KEYS[1], 0, ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+return 1
+"""
+
+# 把可见性超时的任务计入一次尝试后重新放回等待队列，达到最大尝试次数时丢弃
+# 租约保留到任务被再次取出，原节点在此之前仍可以确认任务
+REQUEUE_EXPIRED_SCRIPT = """
+local task_ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, task_id in ipairs(task_ids) do
+    redis.call('ZREM', KEYS[2], task_id)
+    local value = redis.call('HGET', KEYS[3], task_id)
+    if value then
+        local task = cjson.decode(value)
+        task['attempts'] = (task['attempts'] or 0) + 1
+        if task['attempts'] >= tonumber(ARGV[2]) then
+            redis.call('HDEL', KEYS[3], task_id)
+            redis.call('HDEL', KEYS[4], task_id)
+        else
+            redis.call('HSET', KEYS[3], task_id, cjson.encode(task))
+            redis.call('LPUSH', KEYS[1], task_id)
+        end
+    end
+end
+return #task_ids
+"""
+
+# 清空去重记录，仍在队列中的任务ID重新登记
+RESET_SEEN_SCRIPT = """
+redis.call('DEL', KEYS[1])
+local task_ids = redis.call('HKEYS', KEYS[2])
+for _, task_id in ipairs(task_ids) do
+    redis.call('SADD', KEYS[1], task_id)
+end
+if #task_ids > 0 and tonumber(ARGV[1]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return #task_ids
+"""
+
+
+class RedisTaskQueue(AbstractTaskQueue):
+
+    def __init__(self, queue_name: str = "default") -> None:
+        """
+        初始化 Redis 任务队列
+        key 说明：
+            {prefix}:pending  等待执行的任务ID列表
+            {prefix}:inflight 处理中的任务ID，score 为可见性超时的截止时间
+            {prefix}:tasks    任务ID -> 任务内容
+            {prefix}:leases   任务ID -> 最近一次取出时分配的租约ID
+            {prefix}:seen     已提交过的任务ID，用于幂等去重，最后一次提交新任务 TASK_QUEUE_SEEN_TTL 秒后过期
+        :param queue_name: 队列名称
+        """
+        self.queue_name = queue_name
+        self.seen_ttl = config.TASK_QUEUE_SEEN_TTL
+        self._redis_client: Redis = RedisCache._connet_redis()
+        prefix = f"media_crawler:task_queue:{queue_name}"
+        self._pending_key = f"{prefix}:pending"
+        self._inflight_key = f"{prefix}:inflight"
+        self._tasks_key = f"{prefix}:tasks"
+        self._leases_key = f"{prefix}:leases"
+        self._seen_key = f"{prefix}:seen"
+        self._queue_keys = [self._pending_key, self._inflight_key, self._tasks_key, self._leases_key]
+        self._put_task_script = self._redis_client.register_script(PUT_TASK_SCRIPT)
+        self._get_task_script = self._redis_client.register_script(GET_TASK_SCRIPT)
+        self._ack_task_script = self._redis_client.register_script(ACK_TASK_SCRIPT)
+        self._nack_task_script = self._redis_client.register_script(NACK_TASK_SCRIPT)
+        self._extend_task_script = self._redis_client.register_script(EXTEND_TASK_SCRIPT)
+        self._requeue_expired_script = self._redis_client.register_script(REQUEUE_EXPIRED_SCRIPT)
+        self._reset_seen_script = self._redis_client.register_script(RESET_SEEN_SCRIPT)
+
+    def put(self, task: CrawlTask) -> bool:
+        return bool(self._put_task_script(
+            keys=[self._seen_key, self._tasks_key, self._pending_key],
+            args=[task.task_id, task.dump_body(), self.seen_ttl],
+        ))
+
+    def get(self, visibility_timeout: int, max_attempts: int) -> Optional[CrawlTask]:
+        now = time.time()
+        self._requeue_expired_script(keys=self._queue_keys, args=[now, max_attempts])
+        lease_id = uuid.uuid4().hex
+        value = self._get_task_script(keys=self._queue_keys, args=[now + visibility_timeout, lease_id])
+        if value is None:
+            return None
+        return CrawlTask.model_validate_json(value).model_copy(update={"lease_id": lease_id})
+
+    def ack(self, task: CrawlTask) -> bool:
+        return bool(self._ack_task_script(keys=self._queue_keys, args=[task.task_id, task.lease_id]))
+
+    def nack(self, task: CrawlTask, max_attempts: int) -> bool:
+        return bool(self._nack_task_script(keys=self._queue_keys, args=[task.task_id, task.lease_id, max_attempts]))
+
+    def extend(self, task: CrawlTask, visibility_timeout: int) -> bool:
+        return bool(self._extend_task_script(
+            keys=self._queue_keys, args=[task.task_id, task.lease_id, time.time() + visibility_timeout],
+        ))
+
+    def reset_seen(self) -> None:
+        self._reset_seen_script(keys=[self._seen_key, self._tasks_key], args=[self.seen_ttl])
+
+    def size(self) -> int:
+        return self._redis_client.llen(self._pending_key)
+
+    def in_flight(self) -> int:
+        return self._redis_client.zcard(self._inflight_key)
@@ -0,0 +1,35 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    :
+
+
+class TaskQueueFactory:
+    """
+    任务队列工厂类
+    """
+
+    @staticmethod
+    def create_task_queue(queue_type: str, queue_name: str = "default"):
+        """
+        创建任务队列对象
+        :param queue_type: 队列类型，memory | redis
+        :param queue_name: 队列名称，同名的 redis 队列在多台机器之间共享
+        :return:
+        """
+        if queue_type == 'memory':
+            from .local_task_queue import LocalTaskQueue
+            return LocalTaskQueue(queue_name)
+        elif queue_type == 'redis':
+            from .redis_task_queue import RedisTaskQueue
+            return RedisTaskQueue(queue_name)
+        else:
+            raise ValueError(f'Unknown task queue type: {queue_type}')
@@ -0,0 +1,391 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 任务队列消费节点，把一次爬取拆分成搜索页/帖子详情/评论游标/创作者主页等任务，多台机器共同消费同一个队列
+import argparse
+import asyncio
+import sys
+from typing import (Any, Awaitable, Callable, Dict, List, NamedTuple, Optional,
+                    Tuple)
+
+import cmd_arg
+import config
+from base.base_crawler import AbstractCrawler
+from crawler_server import CrawlerService, CrawlJob, CrawlJobRequest
+from main import PLATFORM_ID_LIST_CONFIG
+from store import write_behind
+from task_queue.abs_task_queue import (TASK_TYPE_COMMENT_CURSOR,
+                                       TASK_TYPE_CREATOR_PAGE,
+                                       TASK_TYPE_NOTE_DETAIL,
+                                       TASK_TYPE_SEARCH_PAGE,
+                                       AbstractTaskQueue, CrawlTask)
+from task_queue.task_queue_factory import TaskQueueFactory
+from tools import utils
+from var import crawler_type_var
+
+# 各平台搜索接口每页返回的帖子数量，与各平台 crawler 中的 limit_count 保持一致
+SEARCH_PAGE_SIZE = {
+    "xhs": 20,
+    "dy": 10,
+    "ks": 20,
+    "bili": 20,
+    "wb": 10,
+    "tieba": 10,
+    "zhihu": 20,
+}
+
+
+async def crawl_xhs_comment_page(crawler: AbstractCrawler, payload: Dict, limit: int) -> Tuple[int, Optional[Any]]:
+    """
+    爬取并保存小红书帖子的一页一级评论
+    Args:
+        crawler: 已登录的小红书爬虫
+        payload: 评论游标任务参数，包含 note_id, xsec_token, cursor
+        limit: 本页最多保存的评论数量
+
+    Returns: 保存的评论数量，下一页游标（没有下一页时为 None）
+
+    """
+    import store.xhs as xhs_store
+
+    comments_res = await crawler.xhs_client.get_note_comments(
+        note_id=payload["note_id"], xsec_token=payload.get("xsec_token", ""), cursor=payload.get("cursor", "")
+    )
+    comments = comments_res.get("comments", [])[:limit]
+    await xhs_store.batch_update_xhs_note_comments(payload["note_id"], comments)
+    next_cursor = comments_res.get("cursor", "")
+    return len(comments), next_cursor if comments_res.get("has_more", False) and next_cursor else None
+
+
+async def crawl_dy_comment_page(crawler: AbstractCrawler, payload: Dict, limit: int) -> Tuple[int, Optional[Any]]:
+    """
+    爬取并保存抖音视频的一页一级评论
+    Args:
+        crawler: 已登录的抖音爬虫
+        payload: 评论游标任务参数，包含 note_id, cursor
+        limit: 本页最多保存的评论数量
+
+    Returns: 保存的评论数量，下一页游标（没有下一页时为 None）
+
+    """
+    import store.douyin as douyin_store
+
+    comments_res = await crawler.dy_client.get_aweme_comments(payload["note_id"], payload.get("cursor", 0))
+    comments = (comments_res.get("comments") or [])[:limit]
+    await douyin_store.batch_update_dy_aweme_comments(payload["note_id"], comments)
+    return len(comments), comments_res.get("cursor") if comments_res.get("has_more", 0) else None
+
+
+async def crawl_ks_comment_page(crawler: AbstractCrawler, payload: Dict, limit: int) -> Tuple[int, Optional[Any]]:
+    """
+    爬取并保存快手视频的一页一级评论
+    Args:
+        crawler: 已登录的快手爬虫
+        payload: 评论游标任务参数，包含 note_id, cursor
+        limit: 本页最多保存的评论数量
+
+    Returns: 保存的评论数量，下一页游标（没有下一页时为 None）
+
+    """
+    import store.kuaishou as kuaishou_store
+
+    comments_res = await crawler.ks_client.get_video_comments(payload["note_id"], payload.get("cursor", ""))
+    vision_comment_list = comments_res.get("visionCommentList", {})
+    comments = vision_comment_list.get("rootComments", [])[:limit]
+    await kuaishou_store.batch_update_ks_video_comments(payload["note_id"], comments)
+    pcursor = vision_comment_list.get("pcursor", "")
+    return len(comments), pcursor if pcursor and pcursor != "no_more" else None
+
+
+def make_xhs_comment_payload(specified_id: str) -> Dict:
+    """
+    小红书评论接口需要帖子ID和 xsec_token，从帖子URL中解析
+    Args:
+        specified_id: 帖子URL
+
+    Returns:
+
+    """
+    from media_platform.xhs.help import parse_note_info_from_note_url
+
+    note_url_info = parse_note_info_from_note_url(specified_id)
+    return {"note_id": note_url_info.note_id, "xsec_token": note_url_info.xsec_token}
+
+
+class CommentCursorPlatform(NamedTuple):
+    # 帖子ID/URL -> 第一页评论游标任务的参数
+    make_payload: Callable[[str], Dict]
+    # 爬取并保存一页评论
+    crawl_page: Callable[[AbstractCrawler, Dict, int], Awaitable[Tuple[int, Optional[Any]]]]
+
+
+# 评论接口按游标分页的平台，详情模式下一级评论按页拆分成评论游标任务
+COMMENT_CURSOR_PLATFORMS: Dict[str, CommentCursorPlatform] = {
+    "xhs": CommentCursorPlatform(make_xhs_comment_payload, crawl_xhs_comment_page),
+    "dy": CommentCursorPlatform(lambda specified_id: {"note_id": specified_id}, crawl_dy_comment_page),
+    "ks": CommentCursorPlatform(lambda specified_id: {"note_id": specified_id}, crawl_ks_comment_page),
+}
+
+
+async def handle_comment_cursor(queue: AbstractTaskQueue, crawler: AbstractCrawler, task: CrawlTask):
+    """
+    爬取帖子的一页一级评论，还有下一页且未达到单帖评论数量上限时把下一页游标作为新任务提交
+    Args:
+        queue: 任务队列
+        crawler: 已登录的平台爬虫
+        task: 评论游标任务，payload 包含 note_id, cursor, fetched_count 以及平台需要的其他参数
+
+    Returns:
+
+    """
+    fetched_count = task.payload.get("fetched_count", 0)
+    crawler_type_var.set("detail")
+    stored_count, next_cursor = await COMMENT_CURSOR_PLATFORMS[task.platform].crawl_page(
+        crawler, task.payload, max(config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES - fetched_count, 0)
+    )
+    fetched_count += stored_count
+    if next_cursor is not None and fetched_count < config.CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES:
+        queue.put(CrawlTask(
+            platform=task.platform,
+            task_type=TASK_TYPE_COMMENT_CURSOR,
+            payload={**task.payload, "cursor": next_cursor, "fetched_count": fetched_count},
+        ))
+
+
+def task_to_job_request(task: CrawlTask) -> CrawlJobRequest:
+    """
+    把搜索页/帖子详情/创作者主页任务转换成爬虫服务的任务参数
+    Args:
+        task: 爬取任务
+
+    Returns:
+
+    """
+    payload = task.payload
+    if task.task_type == TASK_TYPE_SEARCH_PAGE:
+        # 爬取数量小于每页数量时，各平台 crawler 会按一页处理，因此这里只会爬取 page 这一页
+        return CrawlJobRequest(
+            platform=task.platform,
+            crawler_type="search",
+            keywords=payload["keyword"],
+            start_page=payload["page"],
+            max_notes_count=1,
+        )
+    if task.task_type == TASK_TYPE_NOTE_DETAIL:
+        return CrawlJobRequest(
+            platform=task.platform,
+            crawler_type="detail",
+            specified_ids=[payload["specified_id"]],
+            get_comment=payload.get("get_comment"),
+        )
+    if task.task_type == TASK_TYPE_CREATOR_PAGE:
+        return CrawlJobRequest(platform=task.platform, crawler_type="creator", creator_ids=[payload["creator_id"]])
+    raise ValueError(f"Unknown task type: {task.task_type}")
+
+
+def build_seed_tasks(platform: str, crawler_type: str) -> List[CrawlTask]:
+    """
+    按当前配置生成初始任务，搜索模式按关键词和页码拆分，详情/创作者模式按ID拆分，
+    评论接口按游标分页的平台在详情模式下把一级评论拆分成评论游标任务，从第一页开始逐页提交
+    Args:
+        platform: 平台
+        crawler_type: 爬取类型
+
+    Returns:
+
+    """
+    specified_id_config, creator_id_config = PLATFORM_ID_LIST_CONFIG[platform]
+    if crawler_type == "search":
+        page_size = SEARCH_PAGE_SIZE[platform]
+        page_num = max(config.CRAWLER_MAX_NOTES_COUNT // page_size, 1)
+        return [
+            CrawlTask(platform=platform, task_type=TASK_TYPE_SEARCH_PAGE, payload={"keyword": keyword, "page": page})
+            for keyword in config.KEYWORDS.split(",") if keyword
+            for page in range(config.START_PAGE, config.START_PAGE + page_num)
+        ]
+    if crawler_type == "detail":
+        specified_ids = getattr(config, specified_id_config)
+        if not (config.ENABLE_GET_COMMENTS and platform in COMMENT_CURSOR_PLATFORMS):
+            return [
+                CrawlTask(platform=platform, task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": specified_id})
+                for specified_id in specified_ids
+            ]
+        make_payload = COMMENT_CURSOR_PLATFORMS[platform].make_payload
+        return [
+            CrawlTask(
+                platform=platform,
+                task_type=TASK_TYPE_NOTE_DETAIL,
+                payload={"specified_id": specified_id, "get_comment": False},
+            )
+            for specified_id in specified_ids
+        ] + [
+            CrawlTask(platform=platform, task_type=TASK_TYPE_COMMENT_CURSOR, payload=make_payload(specified_id))
+            for specified_id in specified_ids
+        ]
+    return [
+        CrawlTask(platform=platform, task_type=TASK_TYPE_CREATOR_PAGE, payload={"creator_id": creator_id})
+        for creator_id in getattr(config, creator_id_config)
+    ]
+
+
+def seed(queue: AbstractTaskQueue, tasks: List[CrawlTask]) -> int:
+    """
+    提交初始任务，已经提交过的任务会被忽略
+    Args:
+        queue: 任务队列
+        tasks: 任务列表
+
+    Returns: 新提交的任务数量
+
+    """
+    new_task_count = sum(1 for task in tasks if queue.put(task))
+    utils.logger.info(f"[task_worker.seed] {new_task_count} new tasks submitted, {len(tasks) - new_task_count} duplicated")
+    return new_task_count
+
+
+class TaskWorker:
+    def __init__(
+        self,
+        queue: AbstractTaskQueue,
+        service: CrawlerService,
+        visibility_timeout: int = config.TASK_QUEUE_VISIBILITY_TIMEOUT,
+        max_attempts: int = config.TASK_QUEUE_MAX_ATTEMPTS,
+        poll_interval: float = config.TASK_QUEUE_POLL_INTERVAL,
+    ):
+        self.queue = queue
+        self.service = service
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+
+    async def run_task(self, task: CrawlTask) -> bool:
+        """
+        执行单个任务
+        Args:
+            task: 爬取任务
+
+        Returns: 是否执行成功
+
+        """
+        heartbeat_task = asyncio.create_task(self.heartbeat(task))
+        try:
+            if task.task_type == TASK_TYPE_COMMENT_CURSOR:
+                return await self.run_comment_cursor_task(task)
+            job = CrawlJob(job_id=task.task_id, request=task_to_job_request(task), created_ts=utils.get_unix_timestamp())
+            await self.service.run_job(job)
+            return job.status == "finished"
+        finally:
+            heartbeat_task.cancel()
+
+    async def run_comment_cursor_task(self, task: CrawlTask) -> bool:
+        """
+        执行评论游标任务，直接使用平台常驻的爬虫实例请求一页评论
+        Args:
+            task: 评论游标任务
+
+        Returns: 是否执行成功
+
+        """
+        if task.platform not in COMMENT_CURSOR_PLATFORMS:
+            utils.logger.error(f"[TaskWorker.run_comment_cursor_task] comment cursor task is not supported for {task.platform}")
+            return False
+        try:
+            async with self.service.platform_lock(task.platform):
+                crawler = await self.service.get_crawler(task.platform)
+                await handle_comment_cursor(self.queue, crawler, task)
+                await write_behind.join()
+            return True
+        except Exception as e:
+            utils.logger.error(f"[TaskWorker.run_comment_cursor_task] task {task.task_id} failed, err: {e}")
+            await self.service.close_crawler(task.platform)
+            return False
+
+    async def heartbeat(self, task: CrawlTask):
+        """
+        任务执行期间定期延长可见性超时，避免耗时较长的任务被其他节点重复取出
+        Args:
+            task: 正在执行的任务
+
+        Returns:
+
+        """
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            if not self.queue.extend(task, self.visibility_timeout):
+                utils.logger.warning(f"[TaskWorker.heartbeat] task {task.task_id} is no longer owned by this worker")
+                return
+
+    async def run(self, exit_when_empty: bool = False, max_tasks: Optional[int] = None) -> int:
+        """
+        循环从队列中取出任务执行，成功后确认，失败后重新入队
+        Args:
+            exit_when_empty: 队列为空且没有处理中的任务时退出
+            max_tasks: 最多执行的任务数量
+
+        Returns: 执行的任务数量
+
+        """
+        task_count = 0
+        while max_tasks is None or task_count < max_tasks:
+            task = self.queue.get(self.visibility_timeout, self.max_attempts)
+            if not task:
+                if exit_when_empty and self.queue.in_flight() == 0:
+                    break
+                await asyncio.sleep(self.poll_interval)
+                continue
+            utils.logger.info(f"[TaskWorker.run] begin task {task.task_id}, type: {task.task_type}, payload: {task.payload}")
+            task_count += 1
+            if await self.run_task(task):
+                acked = self.queue.ack(task)
+            else:
+                acked = self.queue.nack(task, self.max_attempts)
+            if not acked:
+                utils.logger.warning(f"[TaskWorker.run] task {task.task_id} was taken by another worker after timeout")
+        return task_count
+
+
+def parse_worker_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Distributed crawl task worker. / 分布式任务队列消费节点', add_help=False)
+    parser.add_argument('--mode', type=str, choices=['seed', 'worker', 'all'],
+                        help='seed: submit tasks only, worker: consume tasks only, all: both / 只提交任务、只消费任务或两者都执行',
+                        default='all')
+    parser.add_argument('--exit_when_empty', action='store_true',
+                        help='Exit when the queue is drained / 队列为空时退出')
+    parser.add_argument('--reseed', action='store_true',
+                        help='Forget previously submitted task ids before seeding / 提交任务前清空去重记录，重新爬取已完成的任务')
+    args, remaining = parser.parse_known_args()
+    # 其余参数交给 cmd_arg 解析，与 main.py 的命令行参数保持一致
+    sys.argv = sys.argv[:1] + remaining
+    return args
+
+
+async def main():
+    worker_args = parse_worker_args()
+    await cmd_arg.parse_cmd()
+    queue = TaskQueueFactory.create_task_queue(config.TASK_QUEUE_TYPE, config.TASK_QUEUE_NAME)
+    if worker_args.mode in ["seed", "all"]:
+        if worker_args.reseed:
+            queue.reset_seen()
+        seed(queue, build_seed_tasks(config.PLATFORM, config.CRAWLER_TYPE))
+    if worker_args.mode == "seed":
+        return
+
+    service = CrawlerService()
+    await service.startup()
+    try:
+        exit_when_empty = worker_args.exit_when_empty or config.TASK_QUEUE_TYPE == "memory"
+        await TaskWorker(queue, service).run(exit_when_empty=exit_when_empty)
+    finally:
+        await service.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import config
+from async_sqlite_db import AsyncSqliteDB
+from media_platform.bilibili.client import BilibiliClient
+from media_platform.bilibili.field import CommentOrderType
+from store import bilibili as bilibili_store
+from store import write_behind
+from tools import comment_watermark
+from tools.comment_watermark import CommentWatermark
+from var import media_crawler_db_var
+
+
+def make_reply(rpid: int, ctime: int, parent: int = 0):
+    return {"rpid": rpid, "ctime": ctime, "parent": parent, "rcount": 0, "like": 0,
+            "content": {"message": f"reply {rpid}"}, "member": {"mid": "1", "uname": "user"}}
+
+
+class TestCommentWatermark(unittest.TestCase):
+
+    def test_take_new(self):
+        watermark = CommentWatermark("3", 300)
+        comments = [make_reply(5, 500), make_reply(4, 300), make_reply(3, 300), make_reply(2, 200)]
+        new_comments, reached = watermark.take_new(comments, lambda c: c["rpid"], lambda c: c["ctime"])
+        self.assertTrue(reached)
+        self.assertEqual([c["rpid"] for c in new_comments], [5, 4])
+
+    def test_take_new_stops_at_older_comment(self):
+        # 水位评论被删除时，遇到更早发布的评论也会停止
+        watermark = CommentWatermark("3", 300)
+        new_comments, reached = watermark.take_new([make_reply(5, 500), make_reply(2, 200)],
+                                                   lambda c: c["rpid"], lambda c: c["ctime"])
+        self.assertTrue(reached)
+        self.assertEqual([c["rpid"] for c in new_comments], [5])
+
+    def test_take_new_whole_page(self):
+        watermark = CommentWatermark("3", 300)
+        new_comments, reached = watermark.take_new([make_reply(6, 600), make_reply(5, 500)],
+                                                   lambda c: c["rpid"], lambda c: c["ctime"])
+        self.assertFalse(reached)
+        self.assertEqual(len(new_comments), 2)
+
+    def test_delta_comments_enabled(self):
+        with mock.patch.object(config, "ENABLE_DELTA_COMMENTS", True), \
+                mock.patch.object(config, "SAVE_DATA_OPTION", "sqlite"):
+            self.assertTrue(comment_watermark.delta_comments_enabled())
+        with mock.patch.object(config, "ENABLE_DELTA_COMMENTS", True), \
+                mock.patch.object(config, "SAVE_DATA_OPTION", "json"):
+            self.assertFalse(comment_watermark.delta_comments_enabled())
+        with mock.patch.object(config, "ENABLE_DELTA_COMMENTS", False), \
+                mock.patch.object(config, "SAVE_DATA_OPTION", "sqlite"):
+            self.assertFalse(comment_watermark.delta_comments_enabled())
+
+
+class TestBilibiliDeltaComments(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        async_db_obj = AsyncSqliteDB(os.path.join(self.temp_dir.name, "delta.db"))
+        with open("schema/sqlite_tables.sql", "r", encoding="utf-8") as f:
+            await async_db_obj.executescript(f.read())
+        self.db_token = media_crawler_db_var.set(async_db_obj)
+        self.save_option = mock.patch.object(config, "SAVE_DATA_OPTION", "sqlite")
+        self.save_option.start()
+
+    async def asyncTearDown(self):
+        self.save_option.stop()
+        media_crawler_db_var.reset(self.db_token)
+        self.temp_dir.cleanup()
+
+    async def test_query_watermark(self):
+        self.assertIsNone(await bilibili_store.query_video_comment_watermark("100"))
+        await bilibili_store.batch_update_bilibili_video_comments("100", [
+            make_reply(1, 100), make_reply(3, 300), make_reply(2, 200),
+            # 二级评论比一级评论新，不影响水位
+            make_reply(9, 900, parent=3),
+        ])
+        await bilibili_store.batch_update_bilibili_video_comments("200", [make_reply(7, 700)])
+        await write_behind.join()
+        watermark = await bilibili_store.query_video_comment_watermark("100")
+        self.assertEqual((watermark.comment_id, watermark.create_time), ("3", 300))
+
+    async def test_iter_comments_stops_at_watermark(self):
+        client = BilibiliClient(headers={}, playwright_page=None, cookie_dict={})
+        pages = {
+            0: {"cursor": {"is_end": False, "next": 2}, "replies": [make_reply(6, 600), make_reply(5, 500)]},
+            2: {"cursor": {"is_end": False, "next": 3}, "replies": [make_reply(4, 400), make_reply(3, 300)]},
+            3: {"cursor": {"is_end": False, "next": 4}, "replies": [make_reply(2, 200), make_reply(1, 100)]},
+        }
+
+        async def get_video_comments(video_id, order_mode, next_page):
+            return pages[next_page]
+
+        with mock.patch.object(client, "get_video_comments", side_effect=get_video_comments) as mock_get:
+            comment_pages = [page async for page in client.iter_comments(
+                "100", crawl_interval=0, max_count=100, order_mode=CommentOrderType.TIME,
+                watermark=CommentWatermark("3", 300))]
+        self.assertEqual([[c["rpid"] for c in page] for page in comment_pages], [[6, 5], [4]])
+        self.assertEqual([call.args[2] for call in mock_get.call_args_list], [0, 2])
+        self.assertEqual(mock_get.call_args_list[0].args[1], CommentOrderType.TIME)
+
+
+if __name__ == '__main__':
+    unittest.main()
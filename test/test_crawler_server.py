@@ -0,0 +1,110 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import asyncio
+from typing import List
+from unittest import IsolatedAsyncioTestCase
+
+import config
+from crawler_server import CrawlerService, CrawlJobRequest
+
+
+class FakeCrawler:
+    prepare_count = 0
+    running_count = 0
+    max_running_count = 0
+
+    def __init__(self):
+        self.crawled_keywords: List[str] = []
+        self.prepare_keywords = ""
+        self.running_count = 0
+
+    async def prepare(self, playwright):
+        FakeCrawler.prepare_count += 1
+        self.prepare_keywords = config.KEYWORDS
+
+    async def crawl(self):
+        if config.KEYWORDS == "boom":
+            raise Exception("account blocked")
+        FakeCrawler.running_count += 1
+        FakeCrawler.max_running_count = max(FakeCrawler.max_running_count, FakeCrawler.running_count)
+        self.running_count += 1
+        if self.running_count > 1:
+            raise Exception("crawler is shared by concurrent jobs")
+        await asyncio.sleep(0.02)
+        self.crawled_keywords.append(config.KEYWORDS)
+        self.running_count -= 1
+        FakeCrawler.running_count -= 1
+
+    async def close(self):
+        pass
+
+
+class TestCrawlerService(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        FakeCrawler.prepare_count = 0
+        FakeCrawler.running_count = 0
+        FakeCrawler.max_running_count = 0
+        self.service = CrawlerService(crawler_factory=lambda platform: FakeCrawler(), worker_num=2, max_finished_jobs=3)
+        await self.service.startup()
+
+    async def asyncTearDown(self):
+        await self.service.shutdown()
+
+    async def test_jobs_reuse_warm_crawler(self):
+        origin_keywords = config.KEYWORDS
+        job1 = self.service.submit(CrawlJobRequest(platform="xhs", keywords="python"))
+        job2 = self.service.submit(CrawlJobRequest(platform="xhs", keywords="golang"))
+        await self.service._job_queue.join()
+
+        self.assertEqual(job1.status, "finished")
+        self.assertEqual(job2.status, "finished")
+        self.assertEqual(FakeCrawler.prepare_count, 1)
+        self.assertEqual(self.service.crawlers["xhs"].crawled_keywords, ["python", "golang"])
+        self.assertEqual(config.KEYWORDS, origin_keywords)
+
+    async def test_failed_job_drops_warm_crawler(self):
+        job = self.service.submit(CrawlJobRequest(platform="dy", keywords="boom"))
+        await self.service._job_queue.join()
+
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "account blocked")
+        self.assertNotIn("dy", self.service.crawlers)
+
+
+    async def test_platforms_run_concurrently_with_own_config(self):
+        origin_keywords = config.KEYWORDS
+        xhs_job = self.service.submit(CrawlJobRequest(platform="xhs", keywords="python"))
+        dy_job = self.service.submit(CrawlJobRequest(platform="dy", keywords="golang"))
+        await self.service._job_queue.join()
+
+        self.assertEqual([xhs_job.status, dy_job.status], ["finished", "finished"])
+        self.assertEqual(FakeCrawler.max_running_count, 2)
+        self.assertEqual(self.service.crawlers["xhs"].crawled_keywords, ["python"])
+        self.assertEqual(self.service.crawlers["dy"].crawled_keywords, ["golang"])
+        self.assertEqual(config.KEYWORDS, origin_keywords)
+
+    async def test_warmup_uses_global_config(self):
+        job = self.service.submit(CrawlJobRequest(platform="xhs", keywords="python"))
+        await asyncio.sleep(0.01)
+        # 预热发生在其他平台任务执行期间，不使用该任务覆盖的配置
+        crawler = await self.service.get_crawler("dy")
+        await self.service._job_queue.join()
+
+        self.assertEqual(job.status, "finished")
+        self.assertEqual(crawler.prepare_keywords, config.KEYWORDS)
+
+    async def test_finished_jobs_are_bounded(self):
+        jobs = [self.service.submit(CrawlJobRequest(platform="xhs", keywords=str(i))) for i in range(5)]
+        await self.service._job_queue.join()
+
+        self.assertEqual(list(self.service.jobs), [job.job_id for job in jobs[2:]])
@@ -0,0 +1,121 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase, mock
+
+import config
+from async_sqlite_db import AsyncSqliteDB
+from store import segmented_output, store_util
+from store.store_util import DB_WRITE_INSERTED, DB_WRITE_SKIPPED, DB_WRITE_UPDATED, calculate_number_of_files
+from store.xhs.xhs_store_impl import XhsCsvStoreImplement, XhsDbStoreImplement, XhsJsonStoreImplement
+from tools.data_importer import find_data_files, run_import
+from var import crawler_type_var, media_crawler_db_var
+
+
+def make_note(index: int, liked_count: str = "10"):
+    return {"note_id": f"n{index}", "user_id": "u1", "title": f"标题{index}", "liked_count": liked_count,
+            "time": 1716539874000 + index, "last_update_time": 1716539874000, "last_modify_ts": 1716539874000}
+
+
+def make_comment(index: int):
+    return {"comment_id": f"c{index}", "note_id": "n0", "user_id": "u2", "content": f"评论{index}",
+            "create_time": 1716539874000 + index, "sub_comment_count": "1", "like_count": 3,
+            "last_modify_ts": 1716539874000, "not_in_table": "x"}
+
+
+class TestDataImporter(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.temp_dir.name, "xhs")
+        self.sqlite_path = os.path.join(self.temp_dir.name, "import.db")
+        calculate_number_of_files.cache_clear()
+        segmented_output._outputs.clear()
+        store_util.clear_fingerprint_cache()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        store_util.clear_fingerprint_cache()
+
+    async def save_files(self):
+        """用 CSV / JSON 存储写出数据文件：笔记写 CSV，评论写 JSON 和 zstd 压缩的 JSONL 分段"""
+        crawler_type_var.set("search")
+        with mock.patch.object(XhsCsvStoreImplement, "csv_store_path", self.data_dir), \
+                mock.patch.object(XhsJsonStoreImplement, "json_store_path", os.path.join(self.data_dir, "json")), \
+                mock.patch.object(config, "ENABLE_GET_WORDCLOUD", False):
+            os.makedirs(os.path.join(self.data_dir, "json"))
+            await XhsCsvStoreImplement().store_batch("store_content", [make_note(index) for index in range(3)])
+            await XhsJsonStoreImplement().store_batch("store_comment", [make_comment(index) for index in range(4)])
+            with mock.patch.object(config, "FILE_COMPRESSION", "zstd"):
+                # 与 JSON 文件中重复的评论 c3 以后写入的为准
+                await XhsJsonStoreImplement().store_batch("store_comment", [make_comment(index) for index in range(3, 6)])
+                await segmented_output.close_outputs()
+
+    async def import_files(self, workers: int = 2):
+        return await run_import("xhs", "sqlite", self.data_dir, self.sqlite_path, workers=workers, batch_size=2)
+
+    async def test_find_data_files(self):
+        await self.save_files()
+        file_names = sorted(os.path.basename(data_file.path) for data_file in find_data_files(self.data_dir, "xhs"))
+        # manifest 不是数据文件
+        self.assertEqual(len(file_names), 3)
+        self.assertTrue(file_names[0].startswith("1_search_contents_"))
+        self.assertTrue(file_names[1].endswith(".00000.jsonl.zst"))
+        self.assertTrue(file_names[2].endswith(".json"))
+
+    async def test_import_and_reimport(self):
+        await self.save_files()
+        progress = await self.import_files()
+        self.assertEqual(progress.files, 3)
+        self.assertEqual(progress.outcomes, {DB_WRITE_INSERTED: 9, DB_WRITE_UPDATED: 0, DB_WRITE_SKIPPED: 1})
+        db = AsyncSqliteDB(self.sqlite_path)
+        notes = await db.query("select * from xhs_note order by note_id")
+        self.assertEqual([note["note_id"] for note in notes], ["n0", "n1", "n2"])
+        # CSV 中的字符串按表结构转为整数
+        self.assertEqual(notes[0]["time"], 1716539874000)
+        self.assertGreater(notes[0]["add_ts"], 0)
+        comments = await db.query("select comment_id, like_count, fingerprint from xhs_note_comment order by comment_id")
+        self.assertEqual([comment["comment_id"] for comment in comments], [f"c{index}" for index in range(6)])
+        self.assertEqual(comments[0]["like_count"], "3")
+        self.assertTrue(all(comment["fingerprint"] for comment in comments))
+
+        # 再次导入时内容没有变化的记录全部跳过
+        progress = await self.import_files(workers=1)
+        self.assertEqual(progress.outcomes, {DB_WRITE_INSERTED: 0, DB_WRITE_UPDATED: 0, DB_WRITE_SKIPPED: 10})
+
+    async def test_fingerprint_matches_db_store(self):
+        await self.save_files()
+        await self.import_files()
+        db = AsyncSqliteDB(self.sqlite_path)
+        token = media_crawler_db_var.set(db)
+        try:
+            store = XhsDbStoreImplement()
+            # 导入的记录与数据库存储写入的指纹相同，之后爬取到相同内容时跳过
+            self.assertEqual(await store_util.upsert_db_row(
+                "xhs_note", "n1", make_note(1), *self.note_sql()), DB_WRITE_SKIPPED)
+            await store.store_content(make_note(1, liked_count="99"))
+        finally:
+            media_crawler_db_var.reset(token)
+        note = await db.get_first("select liked_count from xhs_note where note_id = ?", "n1")
+        self.assertEqual(note["liked_count"], "99")
+
+        # 文件中的旧内容重新导入时覆盖数据库中的记录
+        progress = await self.import_files()
+        self.assertEqual(progress.outcomes[DB_WRITE_UPDATED], 1)
+        note = await db.get_first("select liked_count from xhs_note where note_id = ?", "n1")
+        self.assertEqual(note["liked_count"], "10")
+
+    @staticmethod
+    def note_sql():
+        from store.xhs import xhs_store_sql as sql
+        return sql.query_content_by_content_id, sql.add_new_content, sql.update_content_by_content_id
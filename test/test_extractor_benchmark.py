@@ -0,0 +1,61 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# 只检查基准测试本身是否正确，计时和基线对比请运行 python -m tools.benchmark
+import asyncio
+import unittest
+
+from tools.benchmark import (BASELINE_PATH, IMPORT_BENCHMARKS,
+                             REFERENCE_BENCHMARKS, BenchmarkResult,
+                             MemoryStore, build_benchmark_cases,
+                             find_regressions, load_baseline,
+                             patch_store_factories)
+
+
+def make_result(name: str, items_per_sec: float, peak_bytes_per_item: float) -> BenchmarkResult:
+    return BenchmarkResult(name=name, items=1, rounds=1, seconds_per_round=1 / items_per_sec,
+                           items_per_sec=items_per_sec, peak_bytes_per_item=peak_bytes_per_item)
+
+
+class TestExtractorBenchmark(unittest.TestCase):
+
+    def test_benchmark_cases(self):
+        loop = asyncio.new_event_loop()
+        memory_store = MemoryStore()
+        try:
+            with patch_store_factories(memory_store):
+                cases = build_benchmark_cases(memory_store, loop)
+                for case in cases:
+                    with self.subTest(case.name):
+                        # 提取函数有结果，store 映射函数写入了数据
+                        self.assertTrue(case.func())
+                        self.assertGreater(case.items, 0)
+        finally:
+            loop.close()
+        names = [case.name for case in cases]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertEqual(set(load_baseline(BASELINE_PATH)["results"]),
+                         set(names) - REFERENCE_BENCHMARKS | set(IMPORT_BENCHMARKS))
+
+    def test_find_regressions(self):
+        baseline = {
+            "calibration_seconds": 0.1,
+            "results": {
+                "fast": {"items_per_sec": 1000, "peak_bytes_per_item": 4096},
+                "slow": {"items_per_sec": 1000, "peak_bytes_per_item": 4096},
+            },
+        }
+        results = [make_result("fast", 600, 4096), make_result("slow", 400, 8192), make_result("new", 1, 1)]
+        regressions = find_regressions(results, baseline, calibration_seconds=0.1)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(regression.startswith("slow: ") for regression in regressions))
+        # 本机比基线机器慢一倍时，吞吐量按校准耗时换算后不算回退
+        self.assertEqual(find_regressions([make_result("slow", 400, 4096)], baseline, calibration_seconds=0.2), [])
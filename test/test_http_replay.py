@@ -0,0 +1,217 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from typing import Dict, List
+from unittest import mock
+
+import httpx
+from fastapi.testclient import TestClient
+
+import config
+import store.xhs as xhs_store
+from base.base_crawler import AbstractStore
+from replay import transport as replay_transport
+from replay.cassette import Cassette
+from replay.mock_server import create_app
+from replay.replay_benchmark import create_replay_crawler
+from replay.transport import (REPLAY_ORIGIN_HEADER, FaultInjector,
+                              RecordTransport, RedirectTransport,
+                              ReplayMissError, ReplayTransport)
+
+XHS_HOST = "https://edith.xiaohongshu.com"
+
+
+def load_xhs_note() -> Dict:
+    with open("media_platform/xhs/test_data/api_payloads.json", "r", encoding="utf-8") as f:
+        return json.load(f)["note"]
+
+
+def xhs_upstream(request: httpx.Request) -> httpx.Response:
+    """模拟小红书接口：两页搜索结果，每页两条笔记"""
+    body = json.loads(request.content)
+    if request.url.path == "/api/sns/web/v1/search/notes":
+        page = body["page"]
+        items = [{"id": f"note_{page}_{i}", "model_type": "note", "xsec_source": "pc_search",
+                  "xsec_token": f"token_{page}_{i}"} for i in range(2)]
+        return httpx.Response(200, json={"success": True, "data": {"has_more": True, "items": items}})
+    if request.url.path == "/api/sns/web/v1/feed":
+        note_card = dict(load_xhs_note(), note_id=body["source_note_id"])
+        return httpx.Response(200, json={"success": True, "data": {"items": [{"note_card": note_card}]}})
+    return httpx.Response(404)
+
+
+class MemoryStore(AbstractStore):
+
+    def __init__(self):
+        self.contents: List[Dict] = []
+
+    async def store_content(self, content_item: Dict):
+        self.contents.append(content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        pass
+
+    async def store_creator(self, creator: Dict):
+        pass
+
+
+class TestCassette(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "xhs.jsonl")
+
+    async def asyncTearDown(self):
+        self.temp_dir.cleanup()
+
+    async def test_request_key_ignores_volatile_params(self):
+        cassette = Cassette(self.path, ["w_rid", "wts", "search_id"])
+        self.assertEqual(
+            cassette.request_key("GET", "https://api.bilibili.com/x/web?b=2&a=1&w_rid=x&wts=1"),
+            cassette.request_key("get", "https://api.bilibili.com/x/web?a=1&b=2&w_rid=y&wts=2"),
+        )
+        self.assertEqual(
+            cassette.request_key("POST", XHS_HOST + "/search", b'{"keyword":"k","search_id":"1"}'),
+            cassette.request_key("POST", XHS_HOST + "/search", b'{"search_id":"2","keyword":"k"}'),
+        )
+        self.assertNotEqual(
+            cassette.request_key("POST", XHS_HOST + "/search", b'{"keyword":"k","page":1}'),
+            cassette.request_key("POST", XHS_HOST + "/search", b'{"keyword":"k","page":2}'),
+        )
+
+    async def test_record_and_play(self):
+        cassette = Cassette(self.path)
+        await cassette.record("GET", XHS_HOST + "/a", b"", 200, [("Content-Encoding", "gzip")], b"first")
+        await cassette.record("GET", XHS_HOST + "/a", b"", 200, [], b"second")
+        await cassette.record("GET", XHS_HOST + "/image", b"", 200, [], b"\xff\xd8\xff")
+
+        # 重新从磁盘加载，相同请求按录制顺序回放，回放完后重复最后一条
+        cassette = Cassette(self.path)
+        self.assertEqual(len(cassette), 3)
+        self.assertEqual(cassette.play("GET", XHS_HOST + "/a")["content"], "first")
+        self.assertEqual(cassette.play("GET", XHS_HOST + "/a")["content"], "second")
+        self.assertEqual(cassette.play("GET", XHS_HOST + "/a")["content"], "second")
+        self.assertEqual(cassette.play("GET", XHS_HOST + "/image")["content_encoding"], "base64")
+        self.assertIsNone(cassette.play("GET", XHS_HOST + "/b"))
+        self.assertEqual(cassette.rewind(), 4)
+        self.assertEqual(cassette.play("GET", XHS_HOST + "/a")["headers"], [])
+
+
+class TestReplayTransport(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cassette = Cassette(os.path.join(self.temp_dir.name, "xhs.jsonl"), ["search_id"])
+
+    async def asyncTearDown(self):
+        self.temp_dir.cleanup()
+
+    async def test_record_then_replay(self):
+        async with httpx.AsyncClient(transport=RecordTransport(self.cassette, httpx.MockTransport(xhs_upstream))) as client:
+            recorded = await client.post(XHS_HOST + "/api/sns/web/v1/search/notes", json={"page": 1, "search_id": "a"})
+        async with httpx.AsyncClient(transport=ReplayTransport(self.cassette, FaultInjector())) as client:
+            replayed = await client.post(XHS_HOST + "/api/sns/web/v1/search/notes", json={"page": 1, "search_id": "b"})
+            with self.assertRaises(ReplayMissError):
+                await client.post(XHS_HOST + "/api/sns/web/v1/search/notes", json={"page": 3})
+        self.assertEqual(replayed.json(), recorded.json())
+
+    async def test_fault_injection(self):
+        await self.cassette.record("GET", XHS_HOST + "/a", b"", 200, [], b"ok")
+        fault_injector = FaultInjector(latency_ms=1, error_rate=0.5, error_status_code=461)
+        async with httpx.AsyncClient(transport=ReplayTransport(self.cassette, fault_injector)) as client:
+            status_codes = [(await client.get(XHS_HOST + "/a")).status_code for _ in range(40)]
+        self.assertIn(461, status_codes)
+        self.assertIn(200, status_codes)
+
+    async def test_redirect_to_mock_server(self):
+        await self.cassette.record("GET", XHS_HOST + "/a?x=1", b"", 200, [("Content-Type", "application/json")], b'{"x":1}')
+        app = create_app(self.cassette, FaultInjector())
+        redirect_transport = RedirectTransport("http://replay.local", httpx.ASGITransport(app=app))
+        async with httpx.AsyncClient(transport=redirect_transport) as client:
+            response = await client.get(XHS_HOST + "/a", params={"x": 1})
+            miss_response = await client.get(XHS_HOST + "/b")
+        self.assertEqual(response.json(), {"x": 1})
+        self.assertEqual(miss_response.status_code, 404)
+
+
+class TestMockServer(unittest.TestCase):
+
+    def test_replay_and_rewind(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cassette = Cassette(os.path.join(temp_dir, "xhs.jsonl"))
+            asyncio.run(cassette.record("POST", XHS_HOST + "/api", b'{"page":1}', 200, [], b'{"success":true}'))
+            client = TestClient(create_app(cassette, FaultInjector()))
+            response = client.post("/api", content=b'{"page":1}', headers={REPLAY_ORIGIN_HEADER: XHS_HOST})
+            self.assertEqual(response.json(), {"success": True})
+            self.assertEqual(client.post("/api").status_code, 400)
+            self.assertEqual(client.post("/_replay/rewind").json(), {"entries": 1, "played": 1})
+
+            client = TestClient(create_app(cassette, FaultInjector(error_rate=1, error_status_code=503)))
+            response = client.post("/api", content=b'{"page":1}', headers={REPLAY_ORIGIN_HEADER: XHS_HOST})
+            self.assertEqual(response.status_code, 503)
+
+
+class TestOfflineCrawl(unittest.IsolatedAsyncioTestCase):
+    """录制一次完整的小红书关键词搜索，然后在不访问网络的情况下回放，结果应当一致"""
+
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.origin_config = {name: getattr(config, name) for name in [
+            "PLATFORM", "KEYWORDS", "CRAWLER_MAX_NOTES_COUNT", "CRAWLER_MAX_SLEEP_SEC", "ENABLE_GET_COMMENTS",
+            "ENABLE_GET_MEIDAS", "HTTP_REPLAY_MODE", "HTTP_REPLAY_DIR", "HTTP_REPLAY_SERVER_URL",
+        ]}
+        config.PLATFORM = "xhs"
+        config.KEYWORDS = "编程"
+        config.CRAWLER_MAX_NOTES_COUNT = 40
+        config.CRAWLER_MAX_SLEEP_SEC = 0
+        config.ENABLE_GET_COMMENTS = False
+        config.ENABLE_GET_MEIDAS = False
+        config.HTTP_REPLAY_DIR = self.temp_dir.name
+        config.HTTP_REPLAY_SERVER_URL = ""
+        self.memory_store = MemoryStore()
+        self.store_patcher = mock.patch.object(xhs_store.XhsStoreFactory, "create_store", return_value=self.memory_store)
+        self.store_patcher.start()
+
+    async def asyncTearDown(self):
+        self.store_patcher.stop()
+        for name, value in self.origin_config.items():
+            setattr(config, name, value)
+        replay_transport._cassettes.clear()
+        self.temp_dir.cleanup()
+
+    async def crawl(self) -> List[Dict]:
+        self.memory_store.contents.clear()
+        crawler, crawl_func = create_replay_crawler("xhs")
+        await crawl_func()
+        # last_modify_ts 是入库时间，不参与比较
+        return [dict(content, last_modify_ts=0) for content in self.memory_store.contents]
+
+    async def test_record_and_replay_search(self):
+        def create_recording_client(proxy=None, **kwargs):
+            cassette = replay_transport.get_cassette(replay_transport.get_cassette_path("xhs"))
+            return httpx.AsyncClient(transport=RecordTransport(cassette, httpx.MockTransport(xhs_upstream)), **kwargs)
+
+        config.HTTP_REPLAY_MODE = "record"
+        with mock.patch("media_platform.xhs.client.create_async_client", create_recording_client):
+            recorded_notes = await self.crawl()
+        self.assertEqual(len(recorded_notes), 4)
+
+        # 回放时使用新的录制文件对象，只依赖磁盘上的内容
+        replay_transport._cassettes.clear()
+        config.HTTP_REPLAY_MODE = "replay"
+        replayed_notes = await self.crawl()
+        self.assertEqual(replayed_notes, recorded_notes)
+        self.assertEqual(replay_transport.get_cassette(replay_transport.get_cassette_path("xhs")).rewind(), 6)
@@ -0,0 +1,44 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 启动导入测试，基于 python -X importtime 检查启动时不加载重量级依赖和未选择的平台
+# 导入耗时与机器相关，由 python -m tools.benchmark 按校准耗时换算后与基线对比（startup.import_main）
+import unittest
+
+from tools.benchmark import import_time
+
+HEAVY_MODULES = ["pandas", "cv2", "matplotlib", "wordcloud", "jieba", "pyarrow"]
+PLATFORM_MODULES = [
+    "media_platform.xhs.core",
+    "media_platform.douyin.core",
+    "media_platform.kuaishou.core",
+    "media_platform.bilibili.core",
+    "media_platform.weibo.core",
+    "media_platform.tieba.core",
+    "media_platform.zhihu.core",
+]
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_main_import_skips_platforms(self):
+        # import main 只导入 CLI 与配置，不应加载任何平台
+        cumulative = import_time("import main")
+        for module_name in HEAVY_MODULES + PLATFORM_MODULES:
+            self.assertNotIn(module_name, cumulative)
+
+    def test_create_crawler_imports_selected_platform_only(self):
+        cumulative = import_time("import main; main.CrawlerFactory.create_crawler('xhs')")
+        self.assertIn("media_platform.xhs.core", cumulative)
+        for module_name in PLATFORM_MODULES[1:]:
+            self.assertNotIn(module_name, cumulative)
+        for module_name in HEAVY_MODULES:
+            self.assertNotIn(module_name, cumulative)
@@ -0,0 +1,97 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from typing import Dict, List
+from unittest import IsolatedAsyncioTestCase
+
+import config
+from tools import utils
+from tools.login_state import LoginStateManager, LoginStateSnapshot, invalidate_login_state
+
+
+class FakeBrowserContext:
+    def __init__(self, cookies: List[Dict]):
+        self._cookies = cookies
+
+    async def cookies(self) -> List[Dict]:
+        return list(self._cookies)
+
+    async def add_cookies(self, cookies: List[Dict]):
+        names = {cookie["name"] for cookie in self._cookies}
+        self._cookies.extend(cookie for cookie in cookies if cookie["name"] not in names)
+
+
+class FakePage:
+    def __init__(self, local_storage: Dict):
+        self.local_storage = local_storage
+
+    async def evaluate(self, expression: str) -> Dict:
+        return self.local_storage
+
+
+class TestLoginState(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self._snapshot_dir = config.LOGIN_STATE_SNAPSHOT_DIR
+        config.LOGIN_STATE_SNAPSHOT_DIR = self.tmp_dir.name
+        self.cookies = [
+            {"name": "web_session", "value": "session-1", "domain": ".xiaohongshu.com", "path": "/", "expires": -1},
+            {"name": "a1", "value": "a1-value", "domain": ".xiaohongshu.com", "path": "/", "expires": -1},
+        ]
+
+    def tearDown(self):
+        config.LOGIN_STATE_SNAPSHOT_DIR = self._snapshot_dir
+        self.tmp_dir.cleanup()
+
+    def test_snapshot_expired(self):
+        snapshot = LoginStateSnapshot(platform="xhs", verified_ts=1000)
+        self.assertFalse(snapshot.is_expired(ttl=60, now=1060))
+        self.assertTrue(snapshot.is_expired(ttl=60, now=1061))
+
+    async def test_restore_after_save(self):
+        manager = LoginStateManager("xhs", FakeBrowserContext(self.cookies), FakePage({"b1": "x"}))
+        self.assertFalse(await manager.restore_if_fresh())
+        await manager.save()
+        self.assertTrue(os.path.exists(manager.snapshot_path))
+        self.assertTrue(await manager.restore_if_fresh())
+
+    async def test_restore_cookies_into_empty_context(self):
+        await LoginStateManager("xhs", FakeBrowserContext(self.cookies), FakePage({})).save()
+        browser_context = FakeBrowserContext([])
+        manager = LoginStateManager("xhs", browser_context, FakePage({}))
+        self.assertTrue(await manager.restore_if_fresh())
+        self.assertIn("web_session", {cookie["name"] for cookie in await browser_context.cookies()})
+
+    async def test_changed_session_is_not_fresh(self):
+        await LoginStateManager("xhs", FakeBrowserContext(self.cookies), FakePage({})).save()
+        changed_cookies = [dict(self.cookies[0], value="session-2")]
+        manager = LoginStateManager("xhs", FakeBrowserContext(changed_cookies), FakePage({}))
+        self.assertFalse(await manager.restore_if_fresh())
+
+    async def test_expired_snapshot_is_not_fresh(self):
+        manager = LoginStateManager("xhs", FakeBrowserContext(self.cookies), FakePage({}))
+        await manager.save()
+        snapshot = manager.load()
+        snapshot.verified_ts = utils.get_unix_timestamp() - config.LOGIN_STATE_SNAPSHOT_TTL - 1
+        with open(manager.snapshot_path, "w", encoding="utf-8") as f:
+            f.write(snapshot.model_dump_json())
+        self.assertFalse(await manager.restore_if_fresh())
+
+    async def test_invalidated_snapshot_is_not_restored(self):
+        manager = LoginStateManager("xhs", FakeBrowserContext(self.cookies), FakePage({}))
+        await manager.save()
+        invalidate_login_state("xhs", "captcha")
+        self.assertFalse(os.path.exists(manager.snapshot_path))
+        self.assertFalse(await manager.restore_if_fresh())
+        # 快照已删除时再次调用不报错
+        invalidate_login_state("xhs", "captcha")
@@ -0,0 +1,51 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+import unittest
+
+from tools import utils
+from tools.loop_monitor import LoopLagMonitor
+
+
+def blocking_sign():
+    time.sleep(0.2)
+
+
+class TestLoopLagMonitor(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        utils.logger.disabled = True
+        self.monitor = LoopLagMonitor(asyncio.get_running_loop(), threshold_ms=50, interval_ms=10)
+        self.monitor.start()
+
+    async def asyncTearDown(self):
+        self.monitor.stop()
+        utils.logger.disabled = False
+
+    async def test_non_blocking_awaits(self):
+        await asyncio.sleep(0.2)
+        self.assertGreater(self.monitor.beats, 5)
+        self.assertEqual(self.monitor.offenders(), [])
+
+    async def test_capture_blocking_call(self):
+        for _ in range(2):
+            blocking_sign()
+            await asyncio.sleep(0.05)
+        offenders = self.monitor.offenders()
+        self.assertEqual(len(offenders), 1)
+        stack, count, seconds = offenders[0]
+        self.assertEqual(count, 2)
+        self.assertGreaterEqual(seconds, 0.3)
+        self.assertIn("blocking_sign", stack[-1])
+        self.assertIn("test/test_loop_monitor.py", stack[-1])
+        self.assertIn("blocking_sign", self.monitor.format_report())
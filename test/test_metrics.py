@@ -0,0 +1,109 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import json
+import unittest
+import urllib.request
+from typing import Dict
+
+from base.base_crawler import AbstractStore
+from tools import metrics, utils
+
+
+class MemoryStore(AbstractStore):
+
+    async def store_content(self, content_item: Dict):
+        pass
+
+    async def store_comment(self, comment_item: Dict):
+        raise ValueError("write failed")
+
+    async def store_creator(self, creator: Dict):
+        pass
+
+
+class TestMetrics(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        metrics.registry.reset()
+        utils.logger.disabled = True
+
+    def tearDown(self):
+        utils.logger.disabled = False
+
+    def test_normalize_endpoint(self):
+        self.assertEqual(metrics.normalize_endpoint("https://www.zhihu.com/api/v4/answers/123456/root_comments?limit=10"),
+                         "/api/v4/answers/{id}/root_comments")
+        self.assertEqual(metrics.normalize_endpoint("https://www.xiaohongshu.com/explore/64b95d01000000000c034587"),
+                         "/explore/{id}")
+        self.assertEqual(metrics.normalize_endpoint("/api/sns/web/v1/search/notes"), "/api/sns/web/v1/search/notes")
+
+    def test_histogram_quantile(self):
+        for value in [0.001] * 98 + [3, 4]:
+            metrics.http_request_duration_seconds.observe(value, platform="xhs", endpoint="/feed")
+        self.assertEqual(metrics.http_request_duration_seconds.count(platform="xhs", endpoint="/feed"), 100)
+        self.assertLessEqual(metrics.http_request_duration_seconds.quantile(0.5, platform="xhs", endpoint="/feed"), 0.005)
+        self.assertGreater(metrics.http_request_duration_seconds.quantile(0.99, platform="xhs", endpoint="/feed"), 2.5)
+        text = metrics.registry.render_prometheus()
+        self.assertIn('mediacrawler_http_request_duration_seconds_bucket{platform="xhs",endpoint="/feed",le="+Inf"} 100', text)
+        self.assertIn('mediacrawler_http_request_duration_seconds_count{platform="xhs",endpoint="/feed"} 100', text)
+
+    def test_track_request_outcome(self):
+        with metrics.track_request("dy", "https://www.douyin.com/aweme/v1/web/aweme/detail/"):
+            pass
+        with self.assertRaises(ValueError):
+            with metrics.track_request("dy", "https://www.douyin.com/aweme/v1/web/aweme/detail/"):
+                raise ValueError()
+        with self.assertRaises(ValueError):
+            with metrics.track_request("dy", "https://www.douyin.com/aweme/v1/web/aweme/detail/") as tracker:
+                tracker.outcome = metrics.OUTCOME_BLOCKED
+                raise ValueError()
+        for outcome in [metrics.OUTCOME_OK, metrics.OUTCOME_ERROR, metrics.OUTCOME_BLOCKED]:
+            self.assertEqual(metrics.http_requests_total.get(
+                platform="dy", endpoint="/aweme/v1/web/aweme/detail/", outcome=outcome), 1)
+        summary = metrics.summarize(metrics.registry.dump())["dy"]
+        self.assertEqual(summary["requests"], 3)
+        self.assertAlmostEqual(summary["block_rate"], 0.3333)
+
+    async def test_store_methods_metered(self):
+        store = MemoryStore()
+        await store.store_content({})
+        await store.store_content({})
+        with self.assertRaises(ValueError):
+            await store.store_comment({})
+        self.assertEqual(metrics.store_rows_total.get(platform="other", backend="MemoryStore", item_type="contents"), 2)
+        self.assertEqual(metrics.store_errors_total.get(platform="other", backend="MemoryStore", item_type="comments"), 1)
+
+    async def test_media_download(self):
+        @metrics.metered_media_download("xhs")
+        async def download(content):
+            return content
+
+        await download(b"12345")
+        await download(None)
+        self.assertEqual(metrics.media_downloads_total.get(platform="xhs", outcome=metrics.OUTCOME_OK), 1)
+        self.assertEqual(metrics.media_downloads_total.get(platform="xhs", outcome=metrics.OUTCOME_ERROR), 1)
+        self.assertEqual(metrics.media_download_bytes_total.get(platform="xhs"), 5)
+
+    def test_metrics_server(self):
+        metrics.http_requests_total.inc(platform="bili", endpoint="/x/web-interface/view", outcome="ok")
+        server = metrics.start_metrics_server("127.0.0.1", 0)
+        try:
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+            with urllib.request.urlopen(f"{base_url}/metrics") as response:
+                text = response.read().decode("utf-8")
+            self.assertIn('mediacrawler_http_requests_total{platform="bili",endpoint="/x/web-interface/view",outcome="ok"} 1', text)
+            with urllib.request.urlopen(f"{base_url}/metrics.json") as response:
+                data = json.loads(response.read())
+            self.assertEqual(data["summary"]["bili"]["requests"], 1)
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,82 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+import unittest
+
+from tools.paginator import iter_known_total_pages, iter_pages_in_order
+
+
+class TestIterPagesInOrder(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.running = 0
+        self.max_running = 0
+        self.fetched = []
+
+    async def fetch_page(self, page: int):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self.fetched.append(page)
+        # 页码越小耗时越长，验证产出顺序不受完成顺序影响
+        await asyncio.sleep(0.05 / page)
+        self.running -= 1
+        return f"page-{page}"
+
+    async def test_order_and_concurrency(self):
+        start = time.perf_counter()
+        results = [item async for item in iter_pages_in_order(range(1, 13), self.fetch_page, concurrency=4,
+                                                                crawl_interval=0)]
+        self.assertEqual(results, [(page, f"page-{page}") for page in range(1, 13)])
+        self.assertEqual(self.max_running, 4)
+        # 逐页请求约需 0.05 * (1 + 1/2 + ... + 1/12) ≈ 0.16s
+        self.assertLess(time.perf_counter() - start, 0.12)
+
+    async def test_pacing(self):
+        start = time.perf_counter()
+        async for _ in iter_pages_in_order(range(1, 5), self.fetch_page, concurrency=2, crawl_interval=0.1):
+            pass
+        # 4 页、每 0.1 秒最多发起 2 次请求，最后一次请求在 0.15 秒后发起
+        self.assertGreaterEqual(time.perf_counter() - start, 0.15)
+
+    async def test_early_exit_cancels_pending(self):
+        pages = iter_pages_in_order(range(1, 101), self.fetch_page, concurrency=3, crawl_interval=0)
+        async for page, _ in pages:
+            if page == 2:
+                break
+        await pages.aclose()
+        self.assertEqual(self.running, 0)
+        self.assertLessEqual(len(self.fetched), 5)
+
+
+class TestIterKnownTotalPages(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.requested = []
+
+    async def fetch_page(self, page: int):
+        self.requested.append(page)
+        await asyncio.sleep(0.01)
+        return {"total": 45, "list": list(range((page - 1) * 10, min(page * 10, 45)))}
+
+    async def collect(self, **kwargs):
+        pages = iter_known_total_pages(self.fetch_page, lambda res: res["total"], page_size=10, concurrency=3,
+                                       crawl_interval=0, **kwargs)
+        return [page async for page, _ in pages]
+
+    async def test_all_pages(self):
+        self.assertEqual(await self.collect(), [1, 2, 3, 4, 5])
+        self.assertEqual(sorted(self.requested), [1, 2, 3, 4, 5])
+
+    async def test_first_page_and_max_items(self):
+        self.assertEqual(await self.collect(first_page=2, max_items=15), [2, 3])
+        self.assertEqual(sorted(self.requested), [2, 3])
@@ -0,0 +1,92 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase, mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import config
+from store import parquet_store
+from store.parquet_store import load_table_columns
+from store.xhs import XhsStoreFactory
+from store.xhs.xhs_store_impl import XhsParquetStoreImplement
+from var import crawler_type_var
+
+
+def make_comment(index: int):
+    return {"comment_id": str(index), "note_id": "n1", "content": f"comment {index}", "create_time": 1716539874000 + index,
+            "sub_comment_count": "3", "like_count": 12, "parent_comment_id": 0, "pictures": "",
+            "last_modify_ts": 1716539874000, "not_in_table": "x"}
+
+
+class TestParquetStore(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_load_table_columns(self):
+        columns = dict(load_table_columns()["xhs_note_comment"])
+        self.assertNotIn("id", columns)
+        self.assertNotIn("fingerprint", columns)
+        # alter table add column 增加的列
+        self.assertFalse(columns["parent_comment_id"])
+        self.assertFalse(columns["like_count"])
+        self.assertTrue(columns["create_time"])
+        self.assertTrue(columns["add_ts"])
+
+    def test_factory(self):
+        with mock.patch.object(config, "SAVE_DATA_OPTION", "parquet"), \
+                mock.patch.object(config, "ENABLE_WRITE_BEHIND", False):
+            self.assertIsInstance(XhsStoreFactory.create_store(), XhsParquetStoreImplement)
+
+    async def test_row_groups_and_rolling(self):
+        crawler_type_var.set("search")
+        store = XhsParquetStoreImplement()
+        store.parquet_store_path = self.temp_dir.name
+        with mock.patch.object(config, "PARQUET_ROW_GROUP_SIZE", 2), \
+                mock.patch.object(config, "PARQUET_MAX_FILE_SIZE_MB", 0):
+            for index in range(5):
+                await store.store_comment(make_comment(index))
+            await parquet_store.close_writers()
+        file_names = sorted(os.listdir(self.temp_dir.name))
+        # 每个 row group 后文件都超过大小上限，5 条记录写为 2 + 2 + 1 三个文件
+        self.assertEqual(len(file_names), 3)
+        self.assertTrue(file_names[0].startswith("search_xhs_note_comment_"))
+        self.assertTrue(file_names[0].endswith("_part0000.parquet"))
+        table = pa.concat_tables([pq.read_table(os.path.join(self.temp_dir.name, name)) for name in file_names])
+        self.assertEqual(table.num_rows, 5)
+        self.assertNotIn("not_in_table", table.column_names)
+        self.assertEqual(table.schema.field("create_time").type, pa.int64())
+        rows = table.to_pylist()
+        self.assertEqual([row["comment_id"] for row in rows], ["0", "1", "2", "3", "4"])
+        self.assertEqual((rows[0]["like_count"], rows[0]["parent_comment_id"]), ("12", "0"))
+        self.assertIsNone(rows[0]["ip_location"])
+        self.assertGreater(rows[0]["add_ts"], 0)
+
+    async def test_new_run_does_not_overwrite(self):
+        crawler_type_var.set("search")
+        store = XhsParquetStoreImplement()
+        store.parquet_store_path = self.temp_dir.name
+        for _ in range(2):
+            await store.store_comment(make_comment(0))
+            await parquet_store.close_writers()
+        file_names = sorted(os.listdir(self.temp_dir.name))
+        self.assertEqual([name[-len("_part0000.parquet"):] for name in file_names],
+                         ["_part0000.parquet", "_part0001.parquet"])
+        with pq.ParquetFile(os.path.join(self.temp_dir.name, file_names[0])) as parquet_file:
+            self.assertEqual(parquet_file.metadata.row_group(0).column(0).compression,
+                             config.PARQUET_COMPRESSION.upper())
@@ -0,0 +1,83 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import httpx
+
+from tools import utils
+from tools.profiler import (STAGE_HTTP, STAGE_PARSING, STAGE_SIGNING,
+                            STAGE_SLEEP, STAGE_STORAGE, CoroutineProfiler)
+
+
+async def slow_handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"items": list(range(10))})
+
+
+async def parse_pages():
+    payload = json.dumps({"items": [{"id": i, "text": "x" * 50} for i in range(2000)]})
+    deadline = time.perf_counter() + 0.3
+    while time.perf_counter() < deadline:
+        json.loads(payload)
+        await asyncio.sleep(0)
+
+
+async def wait_between_pages():
+    await asyncio.sleep(0.3)
+
+
+class TestCoroutineProfiler(unittest.IsolatedAsyncioTestCase):
+
+    def test_classify(self):
+        profiler = CoroutineProfiler(asyncio.new_event_loop())
+        self.assertEqual(profiler.classify(("main.py:main", "asyncio/tasks.py:sleep")), STAGE_SLEEP)
+        self.assertEqual(profiler.classify(("main.py:main", "media_platform/xhs/client.py:_pre_headers",
+                                            "playwright/async_api/_generated.py:evaluate")), STAGE_SIGNING)
+        self.assertEqual(profiler.classify(("main.py:main", "store/xhs/__init__.py:update_xhs_note",
+                                            "json/encoder.py:encode")), STAGE_STORAGE)
+        self.assertEqual(profiler.classify(("main.py:main", "media_platform/xhs/client.py:request",
+                                            "httpx/_client.py:send")), STAGE_HTTP)
+        self.assertEqual(profiler.classify(("main.py:main", "media_platform/xhs/extractor.py:extract")),
+                         STAGE_PARSING)
+
+    async def test_profile_stages(self):
+        utils.logger.disabled = True
+        self.addCleanup(setattr, utils.logger, "disabled", False)
+        profiler = CoroutineProfiler(asyncio.get_running_loop(), interval_ms=2)
+        profiler.start()
+        await asyncio.gather(parse_pages(), wait_between_pages())
+        profiler.stop()
+
+        self.assertGreater(profiler.samples, 20)
+        self.assertGreater(profiler.task_stages[STAGE_SLEEP], 0)
+        self.assertGreater(profiler.task_stages[STAGE_PARSING], 0)
+        self.assertGreater(profiler.loop_stages[STAGE_PARSING], 0)
+        self.assertTrue(any("test/test_profiler.py:parse_pages" in frame_name
+                            for frame_name, _, _ in profiler.function_summary()))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            folded_path, summary_path = profiler.save(temp_dir, "test")
+            with open(folded_path, "r", encoding="utf-8") as f:
+                folded_lines = f.read().splitlines()
+            with open(summary_path, "r", encoding="utf-8") as f:
+                summary = f.read()
+        for line in folded_lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertTrue(count.isdigit())
+            self.assertNotIn(" ", stack.split(";")[0])
+        self.assertTrue(any(line.startswith(f"{STAGE_SLEEP};") and "wait_between_pages" in line
+                            for line in folded_lines))
+        self.assertIn("== coroutines (time summed over all tasks) ==", summary)
@@ -0,0 +1,113 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase, mock
+
+import zstandard
+
+import config
+from store import segmented_output
+from store.store_util import calculate_number_of_files, write_json_rows
+from store.xhs.xhs_store_impl import XhsCsvStoreImplement
+from var import crawler_type_var
+
+
+def make_note(index: int):
+    return {"note_id": str(index), "title": f"标题{index}"}
+
+
+class TestSegmentedOutput(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        calculate_number_of_files.cache_clear()
+        segmented_output._outputs.clear()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def load_manifest(self, suffix: str):
+        manifest_files = [name for name in os.listdir(self.temp_dir.name) if name.endswith(suffix)]
+        self.assertEqual(len(manifest_files), 1)
+        with open(os.path.join(self.temp_dir.name, manifest_files[0]), encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_disabled_by_default(self):
+        self.assertFalse(segmented_output.segmented_output_enabled())
+
+    async def test_gzip_csv_rotated_by_records(self):
+        crawler_type_var.set("search")
+        with mock.patch.object(config, "FILE_COMPRESSION", "gzip"), \
+                mock.patch.object(config, "FILE_ROTATE_MAX_RECORDS", 3), \
+                mock.patch.object(XhsCsvStoreImplement, "csv_store_path", self.temp_dir.name):
+            store = XhsCsvStoreImplement()
+            await store.store_batch("store_content", [make_note(index) for index in range(5)])
+            await store.store_content(make_note(5))
+            await store.store_content(make_note(6))
+            await segmented_output.close_outputs()
+        manifest = self.load_manifest("manifest.json")
+        self.assertEqual(manifest["records"], 7)
+        self.assertEqual([segment["records"] for segment in manifest["segments"]], [3, 3, 1])
+        note_ids = []
+        for segment in manifest["segments"]:
+            self.assertTrue(segment["file"].endswith(".csv.gz"))
+            with open(os.path.join(self.temp_dir.name, segment["file"]), "rb") as f:
+                data = f.read()
+            self.assertEqual(len(data), segment["bytes"])
+            # 每个分段都是带表头的完整 CSV
+            rows = list(csv.reader(io.StringIO(gzip.decompress(data).decode("utf-8-sig"))))
+            self.assertEqual(rows[0], ["note_id", "title"])
+            note_ids.extend(row[0] for row in rows[1:])
+        self.assertEqual(note_ids, [str(index) for index in range(7)])
+
+    async def test_zstd_jsonl_rotated_by_size(self):
+        file_name = os.path.join(self.temp_dir.name, "search_contents_2024-01-01.json")
+        with mock.patch.object(config, "FILE_COMPRESSION", "zstd"), \
+                mock.patch.object(config, "FILE_ROTATE_MAX_MB", 1 / 1024 / 1024):
+            for index in range(3):
+                self.assertIsNone(await write_json_rows(file_name, [make_note(index * 2), make_note(index * 2 + 1)]))
+            # 重新启动后接着 manifest 中的分段写
+            await segmented_output.close_outputs()
+            await write_json_rows(file_name, [make_note(6)])
+            await segmented_output.close_outputs()
+        manifest = self.load_manifest("manifest.json")
+        self.assertEqual(manifest["format"], "jsonl")
+        self.assertTrue(all(segment["closed"] for segment in manifest["segments"]))
+        self.assertEqual([segment["file"] for segment in manifest["segments"]],
+                         [f"search_contents_2024-01-01.{index:05d}.jsonl.zst" for index in range(4)])
+        items = []
+        for segment in manifest["segments"]:
+            with open(os.path.join(self.temp_dir.name, segment["file"]), "rb") as f:
+                with zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True) as reader:
+                    items.extend(json.loads(line) for line in reader.read().decode("utf-8").splitlines())
+        self.assertEqual([item["note_id"] for item in items], [str(index) for index in range(7)])
+        self.assertFalse(os.path.exists(file_name))
+
+    async def test_rotation_without_compression(self):
+        file_name = os.path.join(self.temp_dir.name, "search_comments_2024-01-01.json")
+        with mock.patch.object(config, "FILE_ROTATE_MAX_RECORDS", 10):
+            await write_json_rows(file_name, [make_note(0)])
+            await write_json_rows(file_name, [make_note(1)])
+            await segmented_output.close_outputs()
+            # 已关闭的分段不再写入，下次运行从新的分段开始
+            await write_json_rows(file_name, [make_note(2)])
+            await segmented_output.close_outputs()
+        manifest = self.load_manifest("manifest.json")
+        self.assertEqual([segment["records"] for segment in manifest["segments"]], [2, 1])
+        self.assertEqual(manifest["records"], 3)
+        with open(os.path.join(self.temp_dir.name, manifest["segments"][0]["file"]), encoding="utf-8") as f:
+            self.assertEqual([json.loads(line)["note_id"] for line in f], ["0", "1"])
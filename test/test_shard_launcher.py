@@ -0,0 +1,98 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import cmd_arg
+import config
+import shard_launcher
+from shard_launcher import WORKER_CONFIG_KEYS, get_shard_config_key, merge_worker_files, split_shards
+
+
+class TestShardLauncher(unittest.TestCase):
+
+    def test_split_shards(self):
+        self.assertEqual(split_shards(["a", "b", "c", "d", "e"], 2), [["a", "c", "e"], ["b", "d"]])
+        self.assertEqual(split_shards(["a"], 4), [["a"]])
+
+    def test_shard_config_key(self):
+        self.assertEqual(get_shard_config_key("xhs", "search"), "KEYWORDS")
+        self.assertEqual(get_shard_config_key("dy", "detail"), "DY_SPECIFIED_ID_LIST")
+        self.assertEqual(get_shard_config_key("bili", "creator"), "BILI_CREATOR_ID_LIST")
+
+    def test_worker_config_keys_follow_cmd_args(self):
+        # 命令行覆盖的配置项都要传给 spawn 模式下的工作进程
+        self.assertEqual(set(WORKER_CONFIG_KEYS), set(cmd_arg.CMD_ARG_CONFIG_KEYS.values()))
+        self.assertIn("ENABLE_PROFILE", WORKER_CONFIG_KEYS)
+        self.assertIn("ENABLE_METRICS", WORKER_CONFIG_KEYS)
+
+    def test_merge_worker_files(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            json_dir = os.path.join(data_dir, "xhs", "json")
+            os.makedirs(json_dir)
+            for worker_id in range(2):
+                with open(os.path.join(json_dir, f"search_contents_2024-01-01_worker{worker_id}.json"), "w") as f:
+                    json.dump([{"note_id": str(worker_id)}], f)
+                with open(os.path.join(data_dir, "xhs", f"{3 + worker_id}_search_contents_2024-01-01_worker{worker_id}.csv"), "w", encoding="utf-8-sig", newline="") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(["note_id"])
+                    writer.writerow([str(worker_id)])
+
+            merged_files = merge_worker_files(data_dir)
+
+            self.assertEqual(len(merged_files), 2)
+            with open(os.path.join(json_dir, "search_contents_2024-01-01.json")) as f:
+                self.assertEqual(json.load(f), [{"note_id": "0"}, {"note_id": "1"}])
+            with open(os.path.join(data_dir, "xhs", "3_search_contents_2024-01-01.csv"), encoding="utf-8-sig", newline="") as f:
+                self.assertEqual(list(csv.reader(f)), [["note_id"], ["0"], ["1"]])
+            self.assertEqual(sorted(os.listdir(json_dir)), ["search_contents_2024-01-01.json"])
+
+    def test_merge_only_files_of_this_launch(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            json_dir = os.path.join(data_dir, "xhs", "json")
+            os.makedirs(json_dir)
+            for worker_id in range(3):
+                with open(os.path.join(json_dir, f"search_contents_2024-01-01_worker{worker_id}.json"), "w") as f:
+                    json.dump([{"note_id": str(worker_id)}], f)
+            # 之前崩溃的运行留下的文件
+            stale_file = os.path.join(json_dir, "search_contents_2024-01-01_worker1.json")
+            os.utime(stale_file, (1000, 1000))
+
+            merge_worker_files(data_dir, worker_ids=range(2), since=2000)
+
+            with open(os.path.join(json_dir, "search_contents_2024-01-01.json")) as f:
+                self.assertEqual(json.load(f), [{"note_id": "0"}])
+            # 不属于本次启动的 worker 文件保持原样
+            self.assertEqual(sorted(os.listdir(json_dir)), [
+                "search_contents_2024-01-01.json",
+                "search_contents_2024-01-01_worker1.json",
+                "search_contents_2024-01-01_worker2.json",
+            ])
+
+    def test_worker_saves_metrics_summary(self):
+        class FakeCrawler:
+            async def start(self):
+                pass
+
+        with tempfile.TemporaryDirectory() as output_dir, \
+                mock.patch.object(shard_launcher.CrawlerFactory, "create_crawler", return_value=FakeCrawler()), \
+                mock.patch.multiple(config, ENABLE_METRICS=True, METRICS_PORT=0, METRICS_OUTPUT_DIR=output_dir,
+                                    CRAWLER_WORKER_ID=1, SAVE_DATA_OPTION="json"):
+            asyncio.run(shard_launcher.run_crawler())
+            file_names = os.listdir(output_dir)
+        self.assertEqual(len(file_names), 1)
+        self.assertIn("_worker1_", file_names[0])
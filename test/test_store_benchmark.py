@@ -0,0 +1,51 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import unittest
+
+from tools import utils
+from tools.store_benchmark import (generate_rows, load_row_templates,
+                                   percentile, run_store_benchmarks)
+
+
+class TestStoreBenchmark(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        utils.logger.disabled = True
+
+    async def asyncTearDown(self):
+        utils.logger.disabled = False
+
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3.0], 99), 3)
+        self.assertEqual(percentile([], 99), 0)
+
+    async def test_generate_rows(self):
+        rows = generate_rows(await load_row_templates(), contents=3, comments_per_content=2)
+        self.assertEqual([store_type for store_type, _ in rows[:4]], ["contents", "comments", "comments", "creator"])
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(len({item["comment_id"] for store_type, item in rows if store_type == "comments"}), 6)
+
+    async def test_run_all_backends(self):
+        results = await run_store_benchmarks(["csv", "json", "sqlite", "db", "parquet"], [1, 4], contents=5,
+                                             comments_per_content=3)
+        self.assertEqual([(result.backend, result.concurrency) for result in results], [
+            ("csv", 1), ("csv", 4), ("json", 1), ("json", 4),
+            ("sqlite", 1), ("sqlite", 4), ("db(sqlite)", 1), ("db(sqlite)", 4), ("parquet", 1), ("parquet", 4),
+        ])
+        for result in results:
+            self.assertEqual(result.rows, 25)
+            self.assertGreater(result.rows_per_sec, 0)
+            self.assertGreaterEqual(result.p99_ms, result.p50_ms)
+            self.assertGreater(result.file_size_bytes, 0)
@@ -0,0 +1,168 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import os
+import re
+import tempfile
+from unittest import IsolatedAsyncioTestCase, mock
+
+from async_sqlite_db import AsyncSqliteDB
+from store import store_util
+from store.store_util import calculate_number_of_files, compute_fingerprint, upsert_db_row
+from tools import words
+from var import media_crawler_db_var
+
+
+class TestStoreUtil(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        calculate_number_of_files.cache_clear()
+
+    def test_calculate_number_of_files_scans_once(self):
+        with tempfile.TemporaryDirectory() as store_path:
+            self.assertEqual(calculate_number_of_files(store_path), 1)
+            open(os.path.join(store_path, "3_search_contents_2024-01-01.csv"), "w").close()
+            # 同一次运行内目录只扫描一次，后续写入的文件不影响序号
+            self.assertEqual(calculate_number_of_files(store_path), 1)
+            calculate_number_of_files.cache_clear()
+            self.assertEqual(calculate_number_of_files(store_path), 4)
+
+    def test_store_import_is_lazy(self):
+        from store.xhs.xhs_store_impl import XhsJsonStoreImplement
+        self.assertIsInstance(XhsJsonStoreImplement.__dict__["WordCloud"], property)
+        self.assertIsInstance(XhsJsonStoreImplement.__dict__["file_count"], property)
+
+    async def test_shared_word_cloud_generator(self):
+        from store.douyin.douyin_store_impl import DouyinJsonStoreImplement
+        from store.xhs.xhs_store_impl import XhsJsonStoreImplement
+        self.assertIs(XhsJsonStoreImplement().WordCloud, DouyinJsonStoreImplement().WordCloud)
+        self.assertIs(XhsJsonStoreImplement().WordCloud, words.get_word_cloud_generator())
+
+
+class TestUpsertDbRow(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        store_util.clear_fingerprint_cache()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = AsyncSqliteDB(os.path.join(self.temp_dir.name, "upsert.db"))
+        with open("schema/sqlite_tables.sql", "r", encoding="utf-8") as f:
+            await self.db.executescript(f.read())
+        self.db_token = media_crawler_db_var.set(self.db)
+
+    async def asyncTearDown(self):
+        media_crawler_db_var.reset(self.db_token)
+        self.temp_dir.cleanup()
+        store_util.clear_fingerprint_cache()
+
+    @staticmethod
+    def make_comment(like_count: str, last_modify_ts: int):
+        return {"comment_id": "1", "parent_comment_id": "0", "create_time": 100, "video_id": "9",
+                "content": "hello", "user_id": "2", "nickname": "user", "sub_comment_count": "0",
+                "like_count": like_count, "last_modify_ts": last_modify_ts}
+
+    async def upsert(self, item, query=None, update=None):
+        from store.bilibili import bilibili_store_sql as sql
+        return await upsert_db_row("bilibili_video_comment", item["comment_id"], item,
+                                   query or sql.query_comment_by_comment_id, sql.add_new_comment,
+                                   update or sql.update_comment_by_comment_id)
+
+    def test_compute_fingerprint(self):
+        self.assertEqual(compute_fingerprint({"a": 1, "b": "x", "last_modify_ts": 1, "add_ts": 1}),
+                         compute_fingerprint({"b": "x", "a": 1, "last_modify_ts": 2}))
+        self.assertNotEqual(compute_fingerprint({"a": 1}), compute_fingerprint({"a": 2}))
+
+    async def test_skip_unchanged_and_update_changed_fields(self):
+        self.assertEqual(await self.upsert(self.make_comment("5", 1)), store_util.DB_WRITE_INSERTED)
+
+        # 只有修改时间不同，进程内指纹缓存命中，不查询数据库
+        query = mock.AsyncMock()
+        self.assertEqual(await self.upsert(self.make_comment("5", 2), query=query), store_util.DB_WRITE_SKIPPED)
+        query.assert_not_called()
+
+        # 缓存失效时与数据库中的指纹对比
+        store_util.clear_fingerprint_cache()
+        update = mock.AsyncMock()
+        self.assertEqual(await self.upsert(self.make_comment("5", 3), update=update), store_util.DB_WRITE_SKIPPED)
+        update.assert_not_called()
+
+        from store.bilibili import bilibili_store_sql as sql
+        updated_before = store_util.get_db_write_stats().get("bilibili_video_comment", {}).get("updated", 0)
+        update = mock.AsyncMock(side_effect=sql.update_comment_by_comment_id)
+        self.assertEqual(await self.upsert(self.make_comment("8", 4), update=update), store_util.DB_WRITE_UPDATED)
+        changed_fields = update.call_args.args[1]
+        self.assertEqual(set(changed_fields), {"like_count", "last_modify_ts", "fingerprint"})
+        row = await sql.query_comment_by_comment_id("1")
+        self.assertEqual((row["like_count"], row["last_modify_ts"]), ("8", 4))
+        self.assertEqual(row["fingerprint"], compute_fingerprint(self.make_comment("8", 4)))
+        self.assertEqual(store_util.get_db_write_stats()["bilibili_video_comment"]["updated"], updated_before + 1)
+
+    async def test_backfill_fingerprint_of_legacy_row(self):
+        from store.bilibili import bilibili_store_sql as sql
+        legacy_row = dict(self.make_comment("5", 1), add_ts=1)
+        await sql.add_new_comment(legacy_row)
+        self.assertEqual(await self.upsert(self.make_comment("5", 2)), store_util.DB_WRITE_SKIPPED)
+        row = await sql.query_comment_by_comment_id("1")
+        self.assertEqual(row["last_modify_ts"], 1)
+        self.assertEqual(row["fingerprint"], compute_fingerprint(legacy_row))
+
+    async def test_upsert_db_rows_one_query_and_executemany_per_batch(self):
+        from store.bilibili.bilibili_store_impl import BiliSqliteStoreImplement
+        from store.bilibili import bilibili_store_sql as sql
+        store = BiliSqliteStoreImplement()
+        first_batch = [dict(self.make_comment("5", 1), comment_id="1"), dict(self.make_comment("5", 1), comment_id="2")]
+        await store.store_batch("store_comment", first_batch)
+
+        store_util.clear_fingerprint_cache()
+        with mock.patch.object(self.db, "query", side_effect=self.db.query) as query, \
+                mock.patch.object(self.db, "executemany", side_effect=self.db.executemany) as executemany:
+            outcomes = await store_util.upsert_db_rows("bilibili_video_comment", "comment_id", [
+                dict(self.make_comment("5", 2), comment_id="1"),
+                dict(self.make_comment("8", 2), comment_id="2"),
+                dict(self.make_comment("1", 2), comment_id="3"),
+                # 同一批中的重复记录以最后一条为准
+                dict(self.make_comment("2", 2), comment_id="3"),
+            ], store_util.SQLITE_PLACEHOLDER)
+        self.assertEqual(outcomes, {store_util.DB_WRITE_INSERTED: 1, store_util.DB_WRITE_UPDATED: 1,
+                                    store_util.DB_WRITE_SKIPPED: 2})
+        self.assertEqual(query.call_count, 1)
+        self.assertEqual(executemany.call_count, 2)
+        self.assertEqual((await sql.query_comment_by_comment_id("1"))["last_modify_ts"], 1)
+        self.assertEqual((await sql.query_comment_by_comment_id("2"))["like_count"], "8")
+        self.assertEqual((await sql.query_comment_by_comment_id("3"))["like_count"], "2")
+
+        # 写入后的指纹进入缓存，同样的内容不再查询数据库
+        with mock.patch.object(self.db, "query") as query:
+            await store.store_batch("store_comment", [dict(self.make_comment("2", 3), comment_id="3")])
+        query.assert_not_called()
+
+    async def test_store_batch_insertable(self):
+        from store.douyin.douyin_store_impl import DouyinSqliteStoreImplement
+        from store.douyin import douyin_store_sql as sql
+        aweme = {"aweme_id": "1", "aweme_type": "0", "title": "", "desc": "", "create_time": 1, "last_modify_ts": 1}
+        await DouyinSqliteStoreImplement().store_batch("store_content", [aweme, dict(aweme, aweme_id="2", title="t")])
+        self.assertEqual(await sql.query_content_by_content_id("1"), {})
+        self.assertEqual((await sql.query_content_by_content_id("2"))["title"], "t")
+
+
+class TestMigrateSqliteDb(IsolatedAsyncioTestCase):
+
+    async def test_add_fingerprint_column_to_legacy_db(self):
+        import db
+        with open(db.SQLITE_SCHEMA_PATH, "r", encoding="utf-8") as f:
+            legacy_schema = re.sub(r",\s*fingerprint TEXT DEFAULT NULL", "", f.read())
+        with tempfile.TemporaryDirectory() as temp_dir:
+            legacy_db = AsyncSqliteDB(os.path.join(temp_dir, "legacy.db"))
+            await legacy_db.executescript(legacy_schema)
+            await db.migrate_sqlite_db(legacy_db)
+            columns = await legacy_db.query("PRAGMA table_info(xhs_note)")
+            self.assertIn("fingerprint", [column["name"] for column in columns])
+            # 字段已存在时不再修改
+            self.assertEqual(await legacy_db.add_missing_columns(db.load_sqlite_migrated_columns()), [])
@@ -0,0 +1,58 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import asyncio
+import unittest
+
+from tools.sub_comment_scheduler import SubCommentScheduler
+
+
+class TestSubCommentScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.running = 0
+        self.max_running = 0
+
+    def create_fetcher(self, thread_id: int, delay: float):
+        async def fetch():
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            await asyncio.sleep(delay)
+            self.running -= 1
+            return [{"thread_id": thread_id}]
+
+        return fetch
+
+    async def test_order_and_per_note_limit(self):
+        scheduler = SubCommentScheduler(per_note_limit=3, global_limit=10)
+        # 先发起的楼层耗时更长，结果仍按楼层顺序返回
+        fetchers = [self.create_fetcher(i, 0.05 - i * 0.005) for i in range(8)]
+        results = await scheduler.run(fetchers)
+        self.assertEqual([result[0]["thread_id"] for result in results], list(range(8)))
+        self.assertEqual(self.max_running, 3)
+
+    async def test_global_limit_across_notes(self):
+        scheduler = SubCommentScheduler(per_note_limit=4, global_limit=5)
+        await asyncio.gather(*[
+            scheduler.run([self.create_fetcher(i, 0.02) for i in range(4)]) for _ in range(3)
+        ])
+        self.assertEqual(self.max_running, 5)
+
+    async def test_failure_cancels_other_threads(self):
+        scheduler = SubCommentScheduler(per_note_limit=2, global_limit=2)
+
+        async def fail():
+            raise ValueError("blocked")
+
+        slow_fetcher = self.create_fetcher(0, 10)
+        with self.assertRaises(ValueError):
+            await scheduler.run([slow_fetcher, fail, self.create_fetcher(2, 0)])
+        self.assertEqual(scheduler.global_semaphore._value, 2)
@@ -0,0 +1,185 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import unittest
+from typing import Dict, List
+from unittest import mock
+
+import httpx
+from tenacity import stop_after_attempt
+
+import config
+import store.bilibili as bili_store
+import store.douyin as douyin_store
+import store.kuaishou as kuaishou_store
+import store.xhs as xhs_store
+from base.base_crawler import AbstractStore
+from replay.replay_benchmark import create_replay_crawler
+from replay.synthetic_server import SyntheticConfig, create_app, paginate
+from replay.transport import RedirectTransport
+from tools import utils
+
+# 平台 -> API 客户端所在模块
+CLIENT_MODULES = {
+    "xhs": "media_platform.xhs.client",
+    "bili": "media_platform.bilibili.client",
+    "dy": "media_platform.douyin.client",
+    "ks": "media_platform.kuaishou.client",
+}
+
+
+class MemoryStore(AbstractStore):
+
+    def __init__(self):
+        self.contents: List[Dict] = []
+        self.comments: List[Dict] = []
+
+    async def store_content(self, content_item: Dict):
+        self.contents.append(content_item)
+
+    async def store_comment(self, comment_item: Dict):
+        self.comments.append(comment_item)
+
+    async def store_creator(self, creator: Dict):
+        pass
+
+
+class TestPaginate(unittest.TestCase):
+
+    def test_paginate(self):
+        self.assertEqual(paginate(25, 0, 10), (range(0, 10), True))
+        self.assertEqual(paginate(25, 20, 10), (range(20, 25), False))
+        self.assertEqual(paginate(25, 30, 10), (range(30, 30), False))
+        self.assertEqual(paginate(25, -10, 10), (range(0, 10), True))
+
+
+class TestSyntheticServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.origin_config = {name: getattr(config, name) for name in [
+            "PLATFORM", "KEYWORDS", "CRAWLER_TYPE", "START_PAGE", "CRAWLER_MAX_NOTES_COUNT", "CRAWLER_MAX_SLEEP_SEC",
+            "ENABLE_GET_COMMENTS", "ENABLE_GET_SUB_COMMENTS", "ENABLE_GET_MEIDAS", "MAX_CONCURRENCY_NUM",
+        ]}
+        config.KEYWORDS = "编程"
+        config.START_PAGE = 1
+        config.CRAWLER_MAX_SLEEP_SEC = 0
+        config.ENABLE_GET_COMMENTS = True
+        config.ENABLE_GET_SUB_COMMENTS = True
+        config.ENABLE_GET_MEIDAS = False
+        config.MAX_CONCURRENCY_NUM = 4
+        self.memory_store = MemoryStore()
+        self.patchers = [
+            mock.patch.object(factory, "create_store", return_value=self.memory_store)
+            for factory in [xhs_store.XhsStoreFactory, bili_store.BiliStoreFactory,
+                            douyin_store.DouyinStoreFactory, kuaishou_store.KuaishouStoreFactory]
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        utils.logger.disabled = True
+
+    async def asyncTearDown(self):
+        utils.logger.disabled = False
+        for patcher in self.patchers:
+            patcher.stop()
+        for name, value in self.origin_config.items():
+            setattr(config, name, value)
+
+    def use_server(self, platform: str, synthetic_config: SyntheticConfig):
+        """让平台客户端的请求经由 RedirectTransport 发送到进程内的模拟平台服务"""
+        app = create_app(synthetic_config)
+
+        def create_synthetic_client(proxy=None, **kwargs):
+            transport = RedirectTransport("http://synthetic.local", httpx.ASGITransport(app=app))
+            return httpx.AsyncClient(transport=transport, **kwargs)
+
+        patcher = mock.patch(f"{CLIENT_MODULES[platform]}.create_async_client", create_synthetic_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return app.state.synthetic_server
+
+    async def crawl_search(self, platform: str, synthetic_config: SyntheticConfig, notes_count: int):
+        config.PLATFORM = platform
+        config.CRAWLER_TYPE = "search"
+        config.CRAWLER_MAX_NOTES_COUNT = notes_count
+        server = self.use_server(platform, synthetic_config)
+        crawler, crawl_func = create_replay_crawler(platform)
+        await crawl_func()
+        return server
+
+    async def test_search_with_comment_trees(self):
+        synthetic_config = SyntheticConfig(notes_per_keyword=60, comments_per_note=5, sub_comments_per_comment=3)
+        # 平台 -> (一页内容数, 二级评论接口)
+        cases = {
+            "xhs": (20, "xhs:/api/sns/web/v2/comment/sub/page"),
+            "bili": (20, "bili:/x/v2/reply/reply"),
+            "dy": (10, "dy:/aweme/v1/web/comment/list/reply/"),
+            "ks": (20, "ks:visionSubCommentList"),
+        }
+        for platform, (page_size, sub_comment_endpoint) in cases.items():
+            with self.subTest(platform=platform):
+                self.memory_store.contents.clear()
+                self.memory_store.comments.clear()
+                server = await self.crawl_search(platform, synthetic_config, page_size)
+                self.assertGreaterEqual(len(self.memory_store.contents), page_size)
+                self.assertGreater(len(self.memory_store.comments), len(self.memory_store.contents))
+                self.assertGreater(server.stats[sub_comment_endpoint], 0)
+
+    async def test_block_responses(self):
+        from media_platform.bilibili.exception import DataFetchError as BiliDataFetchError
+        from media_platform.douyin.exception import DataFetchError as DouyinDataFetchError
+        from media_platform.kuaishou.exception import DataFetchError as KuaishouDataFetchError
+        from media_platform.xhs.exception import IPBlockError
+
+        self.use_server("dy", SyntheticConfig(ip_block_rate=1))
+        crawler, _ = create_replay_crawler("dy")
+        with self.assertRaises(DouyinDataFetchError):
+            await crawler.dy_client.get_video_by_id("1")
+
+        self.use_server("bili", SyntheticConfig(ip_block_rate=1))
+        crawler, _ = create_replay_crawler("bili")
+        with self.assertRaises(BiliDataFetchError):
+            await crawler.bili_client.get_video_info(aid=1)
+
+        self.use_server("ks", SyntheticConfig(ip_block_rate=1))
+        crawler, _ = create_replay_crawler("ks")
+        with self.assertRaises(KuaishouDataFetchError):
+            await crawler.ks_client.get_video_info("1")
+
+        # 小红书的 request 带 tenacity 重试，测试时只请求一次避免重试等待
+        server = self.use_server("xhs", SyntheticConfig(captcha_rate=0.5, ip_block_rate=0.5))
+        crawler, _ = create_replay_crawler("xhs")
+        request = type(crawler.xhs_client).request.retry_with(stop=stop_after_attempt(1), reraise=True)
+        errors = set()
+        for _ in range(20):
+            try:
+                await request(crawler.xhs_client, "POST", "https://edith.xiaohongshu.com/api/sns/web/v1/feed", content="{}")
+            except IPBlockError:
+                errors.add("ip_block")
+            except Exception as e:
+                self.assertIn("Verifytype", str(e))
+                errors.add("captcha")
+        self.assertEqual(errors, {"ip_block", "captcha"})
+        self.assertEqual(server.stats["xhs:captcha"] + server.stats["xhs:ip_block"], 20)
+
+    async def test_iter_comments_fetches_lazily(self):
+        config.ENABLE_GET_SUB_COMMENTS = False
+        server = self.use_server("xhs", SyntheticConfig(comments_per_note=100))
+        crawler, _ = create_replay_crawler("xhs")
+        pages = []
+        async for comments in crawler.xhs_client.iter_comments("note", "synthetic", crawl_interval=0, max_count=100):
+            pages.append(comments)
+            if len(pages) == 2:
+                break
+        # 调用方停止迭代后不再请求后面的页
+        self.assertEqual(server.stats["xhs:/api/sns/web/v2/comment/page"], 2)
+        all_comments = await crawler.xhs_client.get_note_all_comments("note", "synthetic", crawl_interval=0,
+                                                                      max_count=100)
+        self.assertEqual(len(all_comments), 100)
@@ -0,0 +1,213 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+import unittest
+from unittest import IsolatedAsyncioTestCase, mock
+
+import config
+from task_queue.abs_task_queue import (TASK_TYPE_COMMENT_CURSOR,
+                                       TASK_TYPE_NOTE_DETAIL,
+                                       TASK_TYPE_SEARCH_PAGE, CrawlTask)
+from task_queue.task_queue_factory import TaskQueueFactory
+from task_queue.task_worker import (TaskWorker, build_seed_tasks,
+                                    handle_comment_cursor, task_to_job_request)
+
+
+class TestLocalTaskQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = TaskQueueFactory.create_task_queue("memory")
+
+    def test_idempotent_put(self):
+        task = CrawlTask(platform="xhs", task_type=TASK_TYPE_SEARCH_PAGE, payload={"keyword": "编程", "page": 1})
+        same_task = CrawlTask(platform="xhs", task_type=TASK_TYPE_SEARCH_PAGE, payload={"page": 1, "keyword": "编程"})
+        self.assertEqual(task.task_id, same_task.task_id)
+        self.assertTrue(self.queue.put(task))
+        self.assertFalse(self.queue.put(same_task))
+        self.assertEqual(self.queue.size(), 1)
+
+    def test_ack(self):
+        self.queue.put(CrawlTask(platform="dy", task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": "1"}))
+        task = self.queue.get(visibility_timeout=60, max_attempts=3)
+        self.assertEqual(self.queue.in_flight(), 1)
+        self.queue.ack(task)
+        self.assertEqual(self.queue.in_flight(), 0)
+        self.assertIsNone(self.queue.get(visibility_timeout=60, max_attempts=3))
+
+    def test_visibility_timeout(self):
+        self.queue.put(CrawlTask(platform="dy", task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": "1"}))
+        task = self.queue.get(visibility_timeout=0, max_attempts=3)
+        time.sleep(0.01)
+        self.assertEqual(self.queue.get(visibility_timeout=60, max_attempts=3).task_id, task.task_id)
+
+    def test_nack_max_attempts(self):
+        self.queue.put(CrawlTask(platform="dy", task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": "1"}))
+        for _ in range(3):
+            task = self.queue.get(visibility_timeout=60, max_attempts=3)
+            self.assertIsNotNone(task)
+            self.queue.nack(task, max_attempts=3)
+        self.assertIsNone(self.queue.get(visibility_timeout=60, max_attempts=3))
+        self.assertEqual(self.queue.in_flight(), 0)
+
+    def test_late_ack_after_visibility_timeout(self):
+        self.queue.put(CrawlTask(platform="dy", task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": "1"}))
+        task = self.queue.get(visibility_timeout=0, max_attempts=3)
+        time.sleep(0.01)
+        self.queue._requeue_expired(max_attempts=3)
+        # 超时后任务回到队列，但还没有被其他节点取出，原节点的确认仍然有效，同时从待处理队列中移除
+        self.assertEqual(self.queue.size(), 1)
+        self.assertTrue(self.queue.ack(task))
+        self.assertEqual(self.queue.size(), 0)
+        self.assertIsNone(self.queue.get(visibility_timeout=60, max_attempts=3))
+
+    def test_stale_lease_rejected(self):
+        self.queue.put(CrawlTask(platform="dy", task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": "1"}))
+        stale_task = self.queue.get(visibility_timeout=0, max_attempts=3)
+        time.sleep(0.01)
+        task = self.queue.get(visibility_timeout=60, max_attempts=3)
+        self.assertNotEqual(task.lease_id, stale_task.lease_id)
+        # 任务已经被其他节点取出，原节点的确认、重试和延长都会被拒绝
+        self.assertFalse(self.queue.ack(stale_task))
+        self.assertFalse(self.queue.nack(stale_task, max_attempts=3))
+        self.assertFalse(self.queue.extend(stale_task, visibility_timeout=60))
+        self.assertEqual(self.queue.in_flight(), 1)
+        self.assertTrue(self.queue.ack(task))
+        self.assertEqual(self.queue.in_flight(), 0)
+
+    def test_extend(self):
+        self.queue.put(CrawlTask(platform="dy", task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": "1"}))
+        task = self.queue.get(visibility_timeout=0, max_attempts=3)
+        self.assertTrue(self.queue.extend(task, visibility_timeout=60))
+        time.sleep(0.01)
+        self.assertIsNone(self.queue.get(visibility_timeout=60, max_attempts=3))
+        self.assertEqual(self.queue.in_flight(), 1)
+
+    def test_get_skips_orphan_ids(self):
+        orphan_task = CrawlTask(platform="dy", task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": "1"})
+        self.queue.put(orphan_task)
+        self.queue.put(CrawlTask(platform="dy", task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": "2"}))
+        # 模拟任务内容已被删除、ID仍留在待处理队列中的情况
+        del self.queue._tasks[orphan_task.task_id]
+        task = self.queue.get(visibility_timeout=60, max_attempts=3)
+        self.assertEqual(task.payload["specified_id"], "2")
+
+    def test_visibility_timeout_max_attempts(self):
+        self.queue.put(CrawlTask(platform="dy", task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": "1"}))
+        task = self.queue.get(visibility_timeout=0, max_attempts=2)
+        time.sleep(0.01)
+        # 超时也计入尝试次数
+        task = self.queue.get(visibility_timeout=0, max_attempts=2)
+        self.assertEqual(task.attempts, 1)
+        time.sleep(0.01)
+        self.assertIsNone(self.queue.get(visibility_timeout=0, max_attempts=2))
+        self.assertEqual(self.queue.in_flight(), 0)
+
+    def test_reset_seen(self):
+        done_task = CrawlTask(platform="dy", task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": "1"})
+        pending_task = CrawlTask(platform="dy", task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": "2"})
+        self.queue.put(done_task)
+        self.queue.put(pending_task)
+        self.queue.ack(self.queue.get(visibility_timeout=60, max_attempts=3))
+        self.queue.reset_seen()
+        # 已完成的任务可以重新提交，仍在队列中的任务继续去重
+        self.assertTrue(self.queue.put(done_task))
+        self.assertFalse(self.queue.put(pending_task))
+        self.assertEqual(self.queue.size(), 2)
+
+    def test_task_to_job_request(self):
+        task = CrawlTask(platform="xhs", task_type=TASK_TYPE_SEARCH_PAGE, payload={"keyword": "编程", "page": 3})
+        request = task_to_job_request(task)
+        self.assertEqual(request.crawler_type, "search")
+        self.assertEqual(request.keywords, "编程")
+        self.assertEqual(request.start_page, 3)
+
+    def test_comment_cursor_seed_tasks(self):
+        with mock.patch.object(config, "ENABLE_GET_COMMENTS", True), \
+                mock.patch.object(config, "DY_SPECIFIED_ID_LIST", ["7280854932641664319"]):
+            tasks = build_seed_tasks("dy", "detail")
+        self.assertEqual([task.task_type for task in tasks], [TASK_TYPE_NOTE_DETAIL, TASK_TYPE_COMMENT_CURSOR])
+        # 详情任务不再爬取评论，评论由评论游标任务逐页爬取
+        self.assertFalse(task_to_job_request(tasks[0]).get_comment)
+        self.assertEqual(tasks[1].payload, {"note_id": "7280854932641664319"})
+
+
+class FakeXhsClient:
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    async def get_note_comments(self, note_id: str, xsec_token: str, cursor: str = ""):
+        return self.pages[cursor]
+
+
+class FakeXhsCrawler:
+
+    def __init__(self, pages):
+        self.xhs_client = FakeXhsClient(pages)
+
+
+class TestCommentCursor(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.queue = TaskQueueFactory.create_task_queue("memory")
+        self.crawler = FakeXhsCrawler({
+            "": {"comments": [{"id": "c1"}, {"id": "c2"}], "cursor": "c2", "has_more": True},
+            "c2": {"comments": [{"id": "c3"}, {"id": "c4"}], "cursor": "c4", "has_more": True},
+        })
+        self.stored_comments = []
+
+    async def store_comments(self, note_id, comments):
+        self.stored_comments.extend(comment["id"] for comment in comments)
+
+    async def test_next_cursor_task(self):
+        task = CrawlTask(platform="xhs", task_type=TASK_TYPE_COMMENT_CURSOR, payload={"note_id": "n1", "xsec_token": "t"})
+        with mock.patch.object(config, "CRAWLER_MAX_COMMENTS_COUNT_SINGLENOTES", 3), \
+                mock.patch("store.xhs.batch_update_xhs_note_comments", self.store_comments):
+            await handle_comment_cursor(self.queue, self.crawler, task)
+            next_task = self.queue.get(visibility_timeout=60, max_attempts=3)
+            self.assertEqual(next_task.task_type, TASK_TYPE_COMMENT_CURSOR)
+            self.assertEqual(next_task.payload, {"note_id": "n1", "xsec_token": "t", "cursor": "c2", "fetched_count": 2})
+
+            await handle_comment_cursor(self.queue, self.crawler, next_task)
+        # 达到单帖评论数量上限后不再提交下一页
+        self.assertEqual(self.stored_comments, ["c1", "c2", "c3"])
+        self.assertEqual(self.queue.size(), 0)
+
+
+
+class SlowCrawlerService:
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.duplicated_tasks = []
+
+    async def run_job(self, job):
+        # 执行时间超过可见性超时，期间其他节点不应取到同一个任务
+        for _ in range(5):
+            await asyncio.sleep(0.02)
+            task = self.queue.get(visibility_timeout=0.03, max_attempts=3)
+            if task:
+                self.duplicated_tasks.append(task)
+        job.status = "finished"
+
+
+class TestTaskWorker(IsolatedAsyncioTestCase):
+
+    async def test_heartbeat_extends_visibility_timeout(self):
+        queue = TaskQueueFactory.create_task_queue("memory")
+        queue.put(CrawlTask(platform="dy", task_type=TASK_TYPE_NOTE_DETAIL, payload={"specified_id": "1"}))
+        service = SlowCrawlerService(queue)
+        worker = TaskWorker(queue, service, visibility_timeout=0.03, max_attempts=3, poll_interval=0)
+        self.assertEqual(await worker.run(exit_when_empty=True), 1)
+        self.assertEqual(service.duplicated_tasks, [])
+        self.assertEqual(queue.size() + queue.in_flight(), 0)
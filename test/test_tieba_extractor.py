@@ -0,0 +1,137 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import os
+import unittest
+from unittest import mock
+
+import config
+from media_platform.tieba.client import BaiduTieBaClient
+from media_platform.tieba.help import TieBaExtractor, parse_page
+from model.m_baidu_tieba import TiebaComment, TiebaNote
+
+TEST_DATA_DIR = "media_platform/tieba/test_data"
+
+
+def read_test_page(file_name: str) -> str:
+    with open(os.path.join(TEST_DATA_DIR, file_name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def make_parent_comment() -> TiebaComment:
+    return TiebaComment(comment_id="123456", content="content", user_link="user_link", user_nickname="user_nickname",
+                        user_avatar="user_avatar", publish_time="publish_time", parent_comment_id="parent_comment_id",
+                        note_id="note_id", note_url="note_url", tieba_id="tieba_id", tieba_name="tieba_name",
+                        tieba_link="tieba_link")
+
+
+class TestTieBaExtractor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.extractor = TieBaExtractor()
+
+    def test_extract_search_note_list(self):
+        notes = self.extractor.extract_search_note_list(read_test_page("search_keyword_notes.html"))
+        self.assertEqual(len(notes), 10)
+        self.assertEqual(notes[0].note_id, "9117888152")
+
+    def test_extract_note_detail(self):
+        note = self.extractor.extract_note_detail(read_test_page("note_detail.html"))
+        self.assertEqual(note.note_id, "9117905169")
+        self.assertEqual(note.title, "对于一个父亲来说，这个女儿14岁就死了")
+        self.assertEqual(note.tieba_name, "以太比特吧")
+        self.assertEqual(note.ip_location, "广东")
+        self.assertEqual(note.publish_time, "2024-08-05 16:56")
+        self.assertEqual((note.total_replay_num, note.total_replay_page), (786, 13))
+        self.assertEqual(note.user_nickname, "章景轩")
+
+    def test_extract_parment_comments(self):
+        comments = self.extractor.extract_tieba_note_parment_comments(read_test_page("note_comments.html"), "123456")
+        self.assertEqual(len(comments), 30)
+        self.assertEqual(comments[0].comment_id, "150726491368")
+        self.assertEqual(comments[0].ip_location, "福建")
+        self.assertEqual(comments[0].publish_time, "2024-08-06 22:09")
+        self.assertEqual(comments[0].tieba_name, "网球风云吧")
+
+    def test_extract_sub_comments(self):
+        comments = self.extractor.extract_tieba_note_sub_comments(read_test_page("note_sub_comments.html"),
+                                                                  make_parent_comment())
+        self.assertEqual(len(comments), 10)
+        self.assertEqual(comments[0].comment_id, "150726504693")
+        self.assertEqual(comments[0].parent_comment_id, "123456")
+
+    def test_extract_tieba_note_list(self):
+        notes = self.extractor.extract_tieba_note_list(read_test_page("tieba_note_list.html"))
+        self.assertEqual(len(notes), 48)
+        self.assertEqual(notes[0].note_id, "9079949995")
+
+    def test_shared_page(self):
+        # 帖子详情页同时包含第一页评论，解析一次即可提取两者
+        page = parse_page(read_test_page("note_detail.html"))
+        note = self.extractor.extract_note_detail(page)
+        comments = self.extractor.extract_tieba_note_parment_comments(page, note.note_id)
+        self.assertTrue(comments)
+        self.assertEqual(comments[0].note_id, note.note_id)
+
+    def test_extract_creator_page(self):
+        # 创作者主页解析一次，创作者信息和主页上的帖子列表共用同一个 Selector
+        page = parse_page(read_test_page("creator_page.html"))
+        creator = self.extractor.extract_creator_info(page)
+        self.assertEqual((creator.user_id, creator.user_name, creator.nickname), ("tb.1.abc", "tester", "章景轩"))
+        self.assertEqual(creator.avatar, "https://himg.bdimg.com/sys/portrait/item/tb.1.abc")
+        self.assertEqual((creator.gender, creator.ip_location, creator.registration_duration), ("男", "广东", "1.9年"))
+        self.assertEqual((creator.follows, creator.fans), (12, 34))
+        self.assertEqual(self.extractor.extract_tieba_thread_id_list_from_creator_page(page),
+                         ["9117888152", "9117905169"])
+
+
+class TestTieBaClientParsePool(unittest.IsolatedAsyncioTestCase):
+
+    async def test_extract_in_pool(self):
+        origin_process_num = config.TIEBA_PARSE_PROCESS_NUM
+        config.TIEBA_PARSE_PROCESS_NUM = 1
+        client = BaiduTieBaClient()
+        try:
+            comments = await client.extract_in_pool(
+                TieBaExtractor().extract_tieba_note_parment_comments, read_test_page("note_comments.html"), "123456"
+            )
+            self.assertEqual(len(comments), 30)
+            self.assertIsInstance(comments[0], TiebaComment)
+        finally:
+            config.TIEBA_PARSE_PROCESS_NUM = origin_process_num
+            client.close()
+        self.assertIsNone(client._parse_executor)
+
+
+class TestTieBaClientCommentPages(unittest.IsolatedAsyncioTestCase):
+
+    async def test_get_note_all_comments(self):
+        client = BaiduTieBaClient()
+        page_content = read_test_page("note_comments.html")
+        note = TiebaNote(note_id="123456", title="title", note_url="note_url", tieba_name="tieba_name",
+                         tieba_link="tieba_link", total_replay_page=5)
+        stored_pages = []
+
+        async def get(uri, params=None, return_ori_content=False):
+            return page_content
+
+        async def callback(note_id, comments):
+            stored_pages.append(comments)
+
+        with mock.patch.object(client, "get", side_effect=get) as mock_get, \
+                mock.patch.object(config, "ENABLE_GET_SUB_COMMENTS", False):
+            comments = await client.get_note_all_comments(note, crawl_interval=0, callback=callback, max_count=70)
+        self.assertEqual(len(comments), 70)
+        self.assertEqual([len(page) for page in stored_pages], [30, 30, 10])
+        requested_pages = [call.kwargs["params"]["pn"] for call in mock_get.call_args_list]
+        self.assertEqual(requested_pages[:3], [1, 2, 3])
+        self.assertLessEqual(len(requested_pages), 3 + config.TIEBA_COMMENT_PAGE_CONCURRENCY)
@@ -0,0 +1,143 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import asyncio
+import csv
+import os
+import tempfile
+from typing import Dict, List
+from unittest import IsolatedAsyncioTestCase, mock
+
+import aiofiles
+
+from base.base_crawler import AbstractStore
+from store import store_util
+from store.write_behind import WriteBehindPipeline
+from store.xhs.xhs_store_impl import XhsCsvStoreImplement
+from var import crawler_type_var
+
+
+class RecordingStore(AbstractStore):
+
+    def __init__(self, fail_method: str = ""):
+        self.rows: List[tuple] = []
+        self.batches: List[tuple] = []
+        self.fail_method = fail_method
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def store_batch(self, method_name: str, items: List[Dict]):
+        await self.release.wait()
+        self.batches.append((method_name, crawler_type_var.get(None), len(items)))
+        if method_name == self.fail_method:
+            raise RuntimeError("disk full")
+        await super().store_batch(method_name, items)
+
+    async def store_content(self, content_item: Dict):
+        self.rows.append(("content", content_item["id"]))
+
+    async def store_comment(self, comment_item: Dict):
+        self.rows.append(("comment", comment_item["id"]))
+
+    async def store_creator(self, creator: Dict):
+        self.rows.append(("creator", creator["id"]))
+
+
+class TestWriteBehindPipeline(IsolatedAsyncioTestCase):
+
+    async def test_enqueue_and_drain(self):
+        pipeline = WriteBehindPipeline(max_size=100, batch_size=10)
+        store = RecordingStore()
+        proxy = pipeline.wrap(store)
+        token = crawler_type_var.set("search")
+        try:
+            await proxy.store_content({"id": 1})
+            await proxy.store_comment(comment_item={"id": 2})
+            await proxy.store_content(content_item={"id": 3})
+        finally:
+            crawler_type_var.reset(token)
+        await pipeline.drain()
+        self.assertEqual(sorted(store.rows), [("comment", 2), ("content", 1), ("content", 3)])
+        self.assertTrue(all(crawler_type == "search" for _, crawler_type, _ in store.batches))
+        self.assertEqual(pipeline.pending_rows, 0)
+
+    async def test_non_store_attributes_pass_through(self):
+        pipeline = WriteBehindPipeline(max_size=10, batch_size=10)
+        store = RecordingStore()
+        self.assertIs(pipeline.wrap(store).rows, store.rows)
+
+    async def test_backpressure(self):
+        pipeline = WriteBehindPipeline(max_size=2, batch_size=1)
+        store = RecordingStore()
+        store.release.clear()
+        proxy = pipeline.wrap(store)
+        # 写入协程阻塞在第一条记录上，队列满后继续入队需要等待
+        for index in range(3):
+            await proxy.store_content({"id": index})
+        blocked = asyncio.ensure_future(proxy.store_content({"id": 3}))
+        await asyncio.sleep(0.01)
+        self.assertFalse(blocked.done())
+        store.release.set()
+        await asyncio.wait_for(blocked, 1)
+        await pipeline.join()
+        self.assertEqual(len(store.rows), 4)
+        await pipeline.drain()
+
+    async def test_batches_accumulated_rows(self):
+        pipeline = WriteBehindPipeline(max_size=100, batch_size=50)
+        store = RecordingStore()
+        store.release.clear()
+        proxy = pipeline.wrap(store)
+        for index in range(5):
+            await proxy.store_content({"id": index})
+        store.release.set()
+        await pipeline.drain()
+        # 入队期间写入协程还没有运行，积累的记录合并为一批写入
+        self.assertEqual([size for _, _, size in store.batches], [5])
+
+    async def test_failed_group_does_not_block_others(self):
+        pipeline = WriteBehindPipeline(max_size=100, batch_size=50)
+        store = RecordingStore(fail_method="store_comment")
+        store.release.clear()
+        proxy = pipeline.wrap(store)
+        await proxy.store_content({"id": 1})
+        await proxy.store_comment({"id": 2})
+        await proxy.store_comment({"id": 3})
+        await proxy.store_creator({"id": 4})
+        store.release.set()
+        await pipeline.drain()
+        self.assertEqual(store.rows, [("content", 1), ("creator", 4)])
+        self.assertEqual(pipeline.failed_rows, 2)
+
+
+class TestFileWriteBatch(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        store_util.calculate_number_of_files.cache_clear()
+
+    async def test_csv_batch_writes_file_once(self):
+        with tempfile.TemporaryDirectory() as store_path, \
+                mock.patch.object(XhsCsvStoreImplement, "csv_store_path", store_path):
+            store = XhsCsvStoreImplement()
+            token = crawler_type_var.set("search")
+            try:
+                with mock.patch("store.store_util.aiofiles.open", wraps=aiofiles.open) as mock_open:
+                    await store.store_batch("store_content", [{"note_id": str(i), "title": f"t{i}"} for i in range(3)])
+                    await store.store_content({"note_id": "3", "title": "t3"})
+            finally:
+                crawler_type_var.reset(token)
+            self.assertEqual(mock_open.call_count, 2)
+            file_names = os.listdir(store_path)
+            self.assertEqual(len(file_names), 1)
+            with open(os.path.join(store_path, file_names[0]), encoding="utf-8-sig", newline="") as f:
+                rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ["note_id", "title"])
+        self.assertEqual([row[0] for row in rows[1:]], ["0", "1", "2", "3"])
@@ -0,0 +1,46 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+import unittest
+
+from media_platform.xhs.extractor import XiaoHongShuExtractor, extract_initial_state
+
+NOTE_DETAIL_HTML_PATH = "media_platform/xhs/test_data/note_detail.html"
+NOTE_ID = "6650c2a4000000001e01d2f1"
+
+
+class TestXiaoHongShuExtractor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(NOTE_DETAIL_HTML_PATH, "r", encoding="utf-8") as f:
+            cls.html = f.read()
+        cls.extractor = XiaoHongShuExtractor()
+
+    def test_extract_note_detail(self):
+        note = self.extractor.extract_note_detail_from_html(NOTE_ID, self.html)
+        self.assertEqual(note["note_id"], NOTE_ID)
+        self.assertEqual(note["interact_info"]["liked_count"], "1024")
+        self.assertEqual(note["video"], "")
+        # 正文中的 undefined 不会被替换
+        self.assertIn("undefined 这个词", note["desc"])
+
+    def test_extract_note_detail_not_found(self):
+        self.assertIsNone(self.extractor.extract_note_detail_from_html("not_exist", self.html))
+        self.assertIsNone(self.extractor.extract_note_detail_from_html(NOTE_ID, "<html>captcha</html>"))
+
+    def test_extract_initial_state(self):
+        state = r'{"a":undefined,"b":[undefined],"c":"x\":undefined,","d":"\\","e":undefined,"f":"\\\":undefined]"}'
+        self.assertEqual(
+            extract_initial_state(f"<script>window.__INITIAL_STATE__={state}</script>"),
+            {"a": None, "b": [None], "c": 'x":undefined,', "d": "\\", "e": None, "f": '\\":undefined]'},
+        )
+        self.assertIsNone(extract_initial_state("<html></html>"))
@@ -0,0 +1,480 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 微基准测试工具，统计吞吐量和内存分配，并与保存的基线对比发现性能回退
+# 使用方式：
+#   python -m tools.benchmark                    运行各平台提取函数、store 字段映射函数和启动导入耗时的基准测试并与基线对比
+#   python -m tools.benchmark --filter tieba     只运行名称包含 tieba 的基准测试
+#   python -m tools.benchmark --update_baseline  用本次结果更新基线
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple
+from unittest import mock
+
+import humps
+from pydantic import BaseModel, Field
+
+import store.bilibili as bili_store
+import store.douyin as douyin_store
+import store.kuaishou as kuaishou_store
+import store.tieba as tieba_store
+import store.weibo as weibo_store
+import store.xhs as xhs_store
+import store.zhihu as zhihu_store
+from base.base_crawler import AbstractStore
+from media_platform.tieba.help import TieBaExtractor
+from media_platform.weibo.help import filter_search_result_card
+from media_platform.xhs.extractor import XiaoHongShuExtractor
+from media_platform.zhihu.help import ZhihuExtractor
+from model.m_baidu_tieba import TiebaComment
+from tools import utils
+
+BASELINE_PATH = "tools/benchmark_baseline.json"
+# store 映射函数的基准测试每轮重复处理同一条 payload 的次数
+ITEMS_PER_ROUND = 200
+# 只用于对比的参照实现，不写入基线
+REFERENCE_BENCHMARKS = {"xhs.legacy_extract_note_detail_from_html"}
+# 启动导入耗时基准测试：名称 -> (子进程中执行的代码, 统计累计导入耗时的模块)
+IMPORT_BENCHMARKS = {"startup.import_main": ("import main", "main")}
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class BenchmarkResult(BaseModel):
+    name: str = Field(title="基准测试名称")
+    items: int = Field(title="每轮处理的条目数")
+    rounds: int = Field(title="轮数")
+    seconds_per_round: float = Field(title="最快一轮的耗时（秒），比平均值更不容易受机器负载干扰")
+    items_per_sec: float = Field(title="每秒处理的条目数")
+    peak_bytes_per_item: float = Field(title="单轮内存分配峰值 / 条目数（字节）")
+
+    def summary(self) -> str:
+        return (f"{self.name}: {self.items_per_sec:,.0f} items/sec, "
+                f"{self.seconds_per_round * 1000:.2f}ms/round, {self.peak_bytes_per_item / 1024:.1f}KB/item")
+
+
+def calibrate(loops: int = 5000, rounds: int = 5) -> float:
+    """
+    执行固定的纯 Python 计算，用于把不同机器上的吞吐量换算到同一尺度
+    Args:
+        loops: 每轮循环次数
+        rounds: 轮数，取最快一轮
+
+    Returns: 耗时（秒）
+
+    """
+    payload = {"id": "1", "text": "calibrate" * 8, "tags": ["a", "b", "c"], "stat": {"like": 1, "share": 2}}
+    durations: List[float] = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for i in range(loops):
+            item = dict(payload, index=i)
+            json.loads(json.dumps(item))
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def run_benchmark(name: str, func: Callable[[], None], items: int, rounds: int = 10, warmup: int = 1) -> BenchmarkResult:
+    """
+    运行基准测试，func 每次调用处理 items 条数据
+    Args:
+        name: 基准测试名称
+        func: 处理一轮数据的函数
+        items: 每轮处理的条目数
+        rounds: 计时轮数，取最快一轮
+        warmup: 预热轮数
+
+    Returns:
+
+    """
+    for _ in range(warmup):
+        func()
+
+    durations: List[float] = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    seconds_per_round = min(durations)
+
+    # 内存统计单独跑一轮，避免 tracemalloc 的开销影响计时
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base_size, _ = tracemalloc.get_traced_memory()
+    func()
+    _, peak_size = tracemalloc.get_traced_memory()
+    if not tracing:
+        tracemalloc.stop()
+
+    return BenchmarkResult(
+        name=name,
+        items=items,
+        rounds=rounds,
+        seconds_per_round=seconds_per_round,
+        items_per_sec=items / seconds_per_round if seconds_per_round else 0,
+        peak_bytes_per_item=max(peak_size - base_size, 0) / items,
+    )
+
+
+def import_time(code: str) -> Dict[str, int]:
+    """
+    在子进程中执行代码并解析 -X importtime 输出
+    Args:
+        code: 要执行的 python 代码
+
+    Returns: 模块名 -> 累计导入耗时（微秒）
+
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, _, cumulative_us, module_name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        cumulative[module_name] = int(cumulative_us)
+    return cumulative
+
+
+def run_import_benchmark(name: str, code: str, module_name: str, rounds: int = 5) -> BenchmarkResult:
+    """
+    每轮在新的子进程中执行 code，统计 module_name 的累计导入耗时，取最快一轮；不统计内存分配
+    Args:
+        name: 基准测试名称
+        code: 要执行的 python 代码
+        module_name: 统计累计导入耗时的模块
+        rounds: 轮数
+
+    Returns:
+
+    """
+    seconds_per_round = min(import_time(code)[module_name] for _ in range(rounds)) / 1_000_000
+    return BenchmarkResult(
+        name=name,
+        items=1,
+        rounds=rounds,
+        seconds_per_round=seconds_per_round,
+        items_per_sec=1 / seconds_per_round if seconds_per_round else 0,
+        peak_bytes_per_item=0,
+    )
+
+
+def load_baseline(baseline_path: str) -> Dict:
+    if not os.path.exists(baseline_path):
+        return {}
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(baseline_path: str, results: List[BenchmarkResult], calibration_seconds: float):
+    baseline = {
+        "calibration_seconds": round(calibration_seconds, 6),
+        "results": {
+            result.name: {"items_per_sec": round(result.items_per_sec, 1),
+                          "peak_bytes_per_item": round(result.peak_bytes_per_item, 1)}
+            for result in results
+        },
+    }
+    with open(baseline_path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def find_regressions(
+    results: List[BenchmarkResult],
+    baseline: Dict,
+    calibration_seconds: float,
+    speed_tolerance: float = 0.5,
+    memory_tolerance: float = 0.25,
+) -> List[str]:
+    """
+    与基线对比，吞吐量按校准耗时换算到基线机器上再比较
+    Args:
+        results: 本次结果
+        baseline: 基线
+        calibration_seconds: 本机校准耗时
+        speed_tolerance: 允许的吞吐量下降比例
+        memory_tolerance: 允许的内存分配增长比例
+
+    Returns: 回退说明，为空表示没有回退
+
+    """
+    regressions: List[str] = []
+    baseline_results: Dict = baseline.get("results", {})
+    machine_factor = calibration_seconds / baseline.get("calibration_seconds", calibration_seconds)
+    for result in results:
+        expected = baseline_results.get(result.name)
+        if not expected:
+            continue
+        normalized_items_per_sec = result.items_per_sec * machine_factor
+        min_items_per_sec = expected["items_per_sec"] * (1 - speed_tolerance)
+        if normalized_items_per_sec < min_items_per_sec:
+            regressions.append(
+                f"{result.name}: {normalized_items_per_sec:,.0f} items/sec (normalized) < {min_items_per_sec:,.0f}"
+            )
+        max_peak_bytes = expected["peak_bytes_per_item"] * (1 + memory_tolerance)
+        # 分配量很小时忽略，避免解释器内部的小对象波动造成误报
+        if result.peak_bytes_per_item > max(max_peak_bytes, 1024):
+            regressions.append(
+                f"{result.name}: {result.peak_bytes_per_item:,.0f} bytes/item > {max_peak_bytes:,.0f}"
+            )
+    return regressions
+
+
+class BenchmarkCase(NamedTuple):
+    name: str
+    # 处理一轮数据，返回提取结果或写入的条目数，用于检查基准测试本身是否正确
+    func: Callable[[], Any]
+    items: int
+
+
+class MemoryStore(AbstractStore):
+    """只在内存中计数的 store，基准测试只统计字段映射的开销"""
+
+    def __init__(self):
+        self.count = 0
+
+    async def store_content(self, content_item: Dict):
+        self.count += 1
+
+    async def store_comment(self, comment_item: Dict):
+        self.count += 1
+
+    async def store_creator(self, creator: Dict):
+        self.count += 1
+
+
+def legacy_extract_note_detail_from_html(note_id: str, html: str) -> Dict:
+    """小红书提取函数优化前的实现：贪婪正则、全局替换 undefined、对整个 state 做 key 风格转换，仅作为对比参照"""
+    state = re.findall(r"window.__INITIAL_STATE__=({.*})</script>", html)[0].replace("undefined", '""')
+    return humps.decamelize(json.loads(state))["note"]["note_detail_map"][note_id]["note"]
+
+
+def load_payloads(platform_dir: str) -> Dict:
+    with open(f"media_platform/{platform_dir}/test_data/api_payloads.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_page(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@contextlib.contextmanager
+def patch_store_factories(memory_store: MemoryStore) -> Iterator[None]:
+    """
+    各平台 store 工厂都返回 memory_store，并关闭日志输出，避免上万条日志影响计时
+    Args:
+        memory_store: 内存 store
+
+    Returns:
+
+    """
+    factories = [xhs_store.XhsStoreFactory, douyin_store.DouyinStoreFactory, bili_store.BiliStoreFactory,
+                 kuaishou_store.KuaishouStoreFactory, weibo_store.WeibostoreFactory,
+                 tieba_store.TieBaStoreFactory, zhihu_store.ZhihuStoreFactory]
+    with contextlib.ExitStack() as stack:
+        for factory in factories:
+            stack.enter_context(mock.patch.object(factory, "create_store", return_value=memory_store))
+        utils.logger.disabled = True
+        try:
+            yield
+        finally:
+            utils.logger.disabled = False
+
+
+def build_benchmark_cases(memory_store: MemoryStore, loop: asyncio.AbstractEventLoop) -> List[BenchmarkCase]:
+    """
+    构造各平台提取函数和 store 字段映射函数的基准测试，store 函数需要在 patch_store_factories 中执行
+    Args:
+        memory_store: 内存 store
+        loop: 执行 store 函数的事件循环
+
+    Returns:
+
+    """
+
+    def store_case(name: str, store_func: Callable, *args) -> BenchmarkCase:
+        async def run_items():
+            for _ in range(ITEMS_PER_ROUND):
+                await store_func(*args)
+
+        def run_round() -> int:
+            memory_store.count = 0
+            loop.run_until_complete(run_items())
+            return memory_store.count
+
+        return BenchmarkCase(name, run_round, ITEMS_PER_ROUND)
+
+    cases: List[BenchmarkCase] = []
+
+    xhs_extractor = XiaoHongShuExtractor()
+    xhs_html = read_page("media_platform/xhs/test_data/note_detail.html")
+    # 优化前的实现会改坏字符串中的 undefined 导致 JSON 解析失败，对比用的页面去掉这些内容
+    xhs_legacy_html = xhs_html.replace(" undefined ", " ").replace('"undefined":', '"-":')
+    xhs_payloads = load_payloads("xhs")
+    cases += [
+        BenchmarkCase("xhs.extract_note_detail_from_html",
+                      lambda: xhs_extractor.extract_note_detail_from_html("6650c2a4000000001e01d2f1", xhs_html), 1),
+        BenchmarkCase("xhs.legacy_extract_note_detail_from_html",
+                      lambda: legacy_extract_note_detail_from_html("6650c2a4000000001e01d2f1", xhs_legacy_html), 1),
+        store_case("xhs.update_xhs_note", xhs_store.update_xhs_note, xhs_payloads["note"]),
+        store_case("xhs.update_xhs_note_comment", xhs_store.update_xhs_note_comment,
+                   xhs_payloads["note"]["note_id"], xhs_payloads["comment"]),
+    ]
+
+    douyin_payloads = load_payloads("douyin")
+    cases += [
+        store_case("douyin.update_douyin_aweme", douyin_store.update_douyin_aweme, douyin_payloads["aweme"]),
+        store_case("douyin.update_dy_aweme_comment", douyin_store.update_dy_aweme_comment,
+                   douyin_payloads["aweme"]["aweme_id"], douyin_payloads["comment"]),
+    ]
+
+    bili_payloads = load_payloads("bilibili")
+    cases += [
+        store_case("bilibili.update_bilibili_video", bili_store.update_bilibili_video, bili_payloads["video"]),
+        store_case("bilibili.update_up_info", bili_store.update_up_info, bili_payloads["video"]),
+        store_case("bilibili.update_bilibili_video_comment", bili_store.update_bilibili_video_comment,
+                   str(bili_payloads["video"]["View"]["aid"]), bili_payloads["comment"]),
+    ]
+
+    kuaishou_payloads = load_payloads("kuaishou")
+    cases += [
+        store_case("kuaishou.update_kuaishou_video", kuaishou_store.update_kuaishou_video, kuaishou_payloads["video"]),
+        store_case("kuaishou.update_ks_video_comment", kuaishou_store.update_ks_video_comment,
+                   kuaishou_payloads["video"]["photo"]["id"], kuaishou_payloads["comment"]),
+    ]
+
+    weibo_payloads = load_payloads("weibo")
+    weibo_cards = weibo_payloads["search_cards"] * ITEMS_PER_ROUND
+    weibo_note = filter_search_result_card(weibo_payloads["search_cards"])[0]
+    cases += [
+        BenchmarkCase("weibo.filter_search_result_card", lambda: filter_search_result_card(weibo_cards),
+                      len(weibo_cards)),
+        store_case("weibo.update_weibo_note", weibo_store.update_weibo_note, weibo_note),
+        store_case("weibo.update_weibo_note_comment", weibo_store.update_weibo_note_comment,
+                   weibo_note["mblog"]["id"], weibo_payloads["comment"]),
+    ]
+
+    zhihu_extractor = ZhihuExtractor()
+    zhihu_payloads = load_payloads("zhihu")
+    zhihu_search_res = dict(zhihu_payloads["search"], data=zhihu_payloads["search"]["data"] * ITEMS_PER_ROUND)
+    zhihu_contents = zhihu_extractor.extract_contents_from_search(zhihu_search_res)
+    zhihu_comments = zhihu_payloads["comments"] * ITEMS_PER_ROUND
+    zhihu_comment = zhihu_extractor.extract_comments(zhihu_contents[0], zhihu_payloads["comments"])[0]
+    cases += [
+        BenchmarkCase("zhihu.extract_contents_from_search",
+                      lambda: zhihu_extractor.extract_contents_from_search(zhihu_search_res), len(zhihu_contents)),
+        BenchmarkCase("zhihu.extract_comments",
+                      lambda: zhihu_extractor.extract_comments(zhihu_contents[0], zhihu_comments), len(zhihu_comments)),
+        store_case("zhihu.update_zhihu_content", zhihu_store.update_zhihu_content, zhihu_contents[0]),
+        store_case("zhihu.update_zhihu_content_comment", zhihu_store.update_zhihu_content_comment, zhihu_comment),
+    ]
+
+    tieba_extractor = TieBaExtractor()
+    tieba_data_dir = "media_platform/tieba/test_data"
+    note_detail_html = read_page(f"{tieba_data_dir}/note_detail.html")
+    note_comments_html = read_page(f"{tieba_data_dir}/note_comments.html")
+    note_sub_comments_html = read_page(f"{tieba_data_dir}/note_sub_comments.html")
+    note_list_html = read_page(f"{tieba_data_dir}/tieba_note_list.html")
+    search_html = read_page(f"{tieba_data_dir}/search_keyword_notes.html")
+    tieba_note = tieba_extractor.extract_note_detail(note_detail_html)
+    tieba_comments = tieba_extractor.extract_tieba_note_parment_comments(note_comments_html, tieba_note.note_id)
+    parent_comment = TiebaComment(**dict(tieba_comments[0].model_dump(), note_id=tieba_note.note_id))
+    cases += [
+        BenchmarkCase("tieba.extract_search_note_list", lambda: tieba_extractor.extract_search_note_list(search_html),
+                      len(tieba_extractor.extract_search_note_list(search_html))),
+        BenchmarkCase("tieba.extract_tieba_note_list", lambda: tieba_extractor.extract_tieba_note_list(note_list_html),
+                      len(tieba_extractor.extract_tieba_note_list(note_list_html))),
+        BenchmarkCase("tieba.extract_note_detail", lambda: tieba_extractor.extract_note_detail(note_detail_html), 1),
+        BenchmarkCase("tieba.extract_tieba_note_parment_comments",
+                      lambda: tieba_extractor.extract_tieba_note_parment_comments(note_comments_html,
+                                                                                  tieba_note.note_id),
+                      len(tieba_comments)),
+        BenchmarkCase("tieba.extract_tieba_note_sub_comments",
+                      lambda: tieba_extractor.extract_tieba_note_sub_comments(note_sub_comments_html, parent_comment),
+                      len(tieba_extractor.extract_tieba_note_sub_comments(note_sub_comments_html, parent_comment))),
+        store_case("tieba.update_tieba_note", tieba_store.update_tieba_note, tieba_note),
+        store_case("tieba.update_tieba_note_comment", tieba_store.update_tieba_note_comment,
+                   tieba_note.note_id, tieba_comments[0]),
+    ]
+    return cases
+
+
+def run_benchmark_suite(name_filter: str = "", rounds: int = 7) -> List[BenchmarkResult]:
+    """
+    运行名称包含 name_filter 的基准测试
+    Args:
+        name_filter: 名称过滤，为空时运行全部
+        rounds: 每个基准测试的计时轮数
+
+    Returns:
+
+    """
+    loop = asyncio.new_event_loop()
+    memory_store = MemoryStore()
+    try:
+        with patch_store_factories(memory_store):
+            results = [
+                run_benchmark(case.name, case.func, case.items, rounds=rounds)
+                for case in build_benchmark_cases(memory_store, loop) if name_filter in case.name
+            ]
+    finally:
+        loop.close()
+    return results + [
+        run_import_benchmark(name, code, module_name)
+        for name, (code, module_name) in IMPORT_BENCHMARKS.items() if name_filter in name
+    ]
+
+
+def parse_benchmark_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Extractor, store mapping and startup import microbenchmark. / 提取函数、store 字段映射和启动导入耗时微基准测试')
+    parser.add_argument('--filter', type=str, default="", help='Only run benchmarks whose name contains it / 只运行名称包含该字符串的基准测试')
+    parser.add_argument('--baseline', type=str, default=BASELINE_PATH, help='Baseline file / 基线文件')
+    parser.add_argument('--update_baseline', action='store_true', help='Save results as the new baseline / 用本次结果更新基线')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_benchmark_args()
+    if args.update_baseline and args.filter:
+        raise ValueError("--update_baseline runs all benchmarks, do not use it with --filter")
+    results = run_benchmark_suite(args.filter)
+    calibration_seconds = calibrate()
+    for result in results:
+        utils.logger.info(f"[benchmark] {result.summary()}")
+    if args.update_baseline:
+        save_baseline(args.baseline, [result for result in results if result.name not in REFERENCE_BENCHMARKS],
+                      calibration_seconds)
+        return
+    regressions = find_regressions(results, load_baseline(args.baseline), calibration_seconds)
+    for regression in regressions:
+        utils.logger.error(f"[benchmark] regression: {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 增量评论模式，记录帖子已入库的最新一级评论，按时间倒序翻页时遇到已入库的评论即停止
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+
+import config
+from tools import utils
+
+# 支持查询已入库评论的存储方式
+DELTA_STORE_OPTIONS = ("db", "sqlite")
+
+T = TypeVar("T")
+
+_unsupported_store_warned = False
+
+
+def delta_comments_enabled() -> bool:
+    """
+    是否使用增量评论模式，需要开启 ENABLE_DELTA_COMMENTS 并使用数据库存储；
+    使用文件存储时无法查询已入库的评论，打印一次警告后按全量模式爬取
+    Returns:
+
+    """
+    global _unsupported_store_warned
+    if not config.ENABLE_DELTA_COMMENTS:
+        return False
+    if config.SAVE_DATA_OPTION in DELTA_STORE_OPTIONS:
+        return True
+    if not _unsupported_store_warned:
+        _unsupported_store_warned = True
+        utils.logger.warning(
+            f"[comment_watermark.delta_comments_enabled] delta comments need SAVE_DATA_OPTION in {DELTA_STORE_OPTIONS}, "
+            f"current: {config.SAVE_DATA_OPTION}, fall back to full comment crawl"
+        )
+    return False
+
+
+class CommentWatermark:
+    """
+    帖子已入库的最新一级评论
+    """
+
+    def __init__(self, comment_id: str, create_time: int):
+        self.comment_id = str(comment_id)
+        self.create_time = int(create_time or 0)
+
+    @classmethod
+    def from_row(cls, row: Optional[dict], id_key: str, time_key: str) -> Optional["CommentWatermark"]:
+        """
+        由评论表查询结果创建，没有记录时返回 None
+        """
+        if not row:
+            return None
+        return cls(row[id_key], row[time_key])
+
+    def take_new(self, comments: List[T], get_id: Callable[[T], Any], get_time: Callable[[T], Any]) -> Tuple[List[T], bool]:
+        """
+        从按时间倒序的一页评论中取出比水位新的评论；
+        与水位同一秒发布的其他评论可能是新评论，保留下来交给存储层去重
+        Args:
+            comments: 一页一级评论，按发布时间倒序
+            get_id: 取评论ID
+            get_time: 取评论发布时间戳（秒）
+
+        Returns: (新评论, 是否已经到达已入库的评论)
+
+        """
+        for index, comment in enumerate(comments):
+            if str(get_id(comment)) == self.comment_id or int(get_time(comment) or 0) < self.create_time:
+                return comments[:index], True
+        return comments, False
+
+    def __repr__(self) -> str:
+        return f"CommentWatermark(comment_id={self.comment_id!r}, create_time={self.create_time})"
@@ -0,0 +1,399 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 把已保存的 CSV / JSON 数据文件批量导入 SQLite 或 MySQL，不需要重新爬取
+# 使用方式：
+#   python -m tools.data_importer --platform xhs --target sqlite
+#   python -m tools.data_importer --platform bili --target db --data_dir data/bilibili --workers 4
+#   读取 data/<平台>/*.csv 和 data/<平台>/json/*.json，以及开启压缩或分段后的 .csv.gz / .jsonl.zst 等分段文件；
+#   多个进程并行解析文件，按记录ID分批比对已入库的记录，新记录多行批量写入，内容变化的记录批量更新，未变化的跳过
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import config
+from store.parquet_store import coerce_column_value, load_table_columns
+from store.store_util import (DB_WRITE_INSERTED, DB_WRITE_SKIPPED, DB_WRITE_UPDATED, compute_fingerprint,
+                              group_by_columns)
+from tools import metrics, utils
+
+
+class ImportTable(NamedTuple):
+    table_name: str
+    # 记录ID所在的列，与数据库存储查询已有记录使用的列相同
+    key_columns: Tuple[str, ...]
+    # 表中是否有 fingerprint 列，没有时已入库的记录总是更新
+    has_fingerprint: bool = True
+
+
+# 平台 -> (数据目录, 文件名中的存储类型 -> 表)
+IMPORT_TABLES: Dict[str, Tuple[str, Dict[str, ImportTable]]] = {
+    "xhs": ("xhs", {
+        "contents": ImportTable("xhs_note", ("note_id",)),
+        "comments": ImportTable("xhs_note_comment", ("comment_id",)),
+        "creator": ImportTable("xhs_creator", ("user_id",)),
+    }),
+    "dy": ("douyin", {
+        "contents": ImportTable("douyin_aweme", ("aweme_id",)),
+        "comments": ImportTable("douyin_aweme_comment", ("comment_id",)),
+        "creator": ImportTable("dy_creator", ("user_id",)),
+    }),
+    "ks": ("kuaishou", {
+        "contents": ImportTable("kuaishou_video", ("video_id",)),
+        "comments": ImportTable("kuaishou_video_comment", ("comment_id",)),
+    }),
+    "bili": ("bilibili", {
+        "contents": ImportTable("bilibili_video", ("video_id",)),
+        "comments": ImportTable("bilibili_video_comment", ("comment_id",)),
+        "creators": ImportTable("bilibili_up_info", ("user_id",)),
+        "contacts": ImportTable("bilibili_contact_info", ("up_id", "fan_id"), has_fingerprint=False),
+        "dynamics": ImportTable("bilibili_up_dynamic", ("dynamic_id",)),
+    }),
+    "wb": ("weibo", {
+        "contents": ImportTable("weibo_note", ("note_id",)),
+        "comments": ImportTable("weibo_note_comment", ("comment_id",)),
+        "creators": ImportTable("weibo_creator", ("user_id",)),
+    }),
+    "tieba": ("tieba", {
+        "contents": ImportTable("tieba_note", ("note_id",)),
+        "comments": ImportTable("tieba_comment", ("comment_id",)),
+        "creator": ImportTable("tieba_creator", ("user_id",)),
+    }),
+    "zhihu": ("zhihu", {
+        "contents": ImportTable("zhihu_content", ("content_id",)),
+        "comments": ImportTable("zhihu_comment", ("comment_id",)),
+        "creator": ImportTable("zhihu_creator", ("user_id",)),
+    }),
+}
+
+TARGETS = ["sqlite", "db"]
+SQLITE_SCHEMA_PATH = "schema/sqlite_tables.sql"
+# eg: 1_search_comments_2024-01-14.csv, search_contents_2024-01-14_worker0.json, search_comments_2024-01-14.00003.jsonl.zst
+DATA_FILE_PATTERN = re.compile(
+    r"_(?P<store_type>[a-z]+)_\d{4}-\d{2}-\d{2}(?:_worker\d+)?(?:\.\d{5})?\.(?P<format>csv|json|jsonl)(?:\.gz|\.zst)?$"
+)
+# 按记录ID查询已入库记录时，每条 SQL 的 IN 参数个数上限（老版本 SQLite 限制 999 个变量）
+KEY_QUERY_CHUNK_SIZE = 500
+
+
+class DataFile(NamedTuple):
+    path: str
+    table: ImportTable
+
+
+def find_data_files(data_dir: str, platform: str) -> List[DataFile]:
+    """
+    查找平台数据目录（及其 json 子目录）下可导入的数据文件，按修改时间排序，同一记录以后写入的文件为准
+    Args:
+        data_dir: 平台数据目录，eg: data/xhs
+        platform: 平台
+
+    Returns:
+
+    """
+    store_tables = IMPORT_TABLES[platform][1]
+    data_files: List[DataFile] = []
+    for directory in (data_dir, os.path.join(data_dir, "json")):
+        if not os.path.isdir(directory):
+            continue
+        for file_name in os.listdir(directory):
+            match = DATA_FILE_PATTERN.search(file_name)
+            if not match:
+                continue
+            store_type = match.group("store_type")
+            if store_type not in store_tables:
+                utils.logger.warning(f"[data_importer.find_data_files] no table for {store_type} data, skip {file_name}")
+                continue
+            data_files.append(DataFile(os.path.join(directory, file_name), store_tables[store_type]))
+    data_files.sort(key=lambda data_file: (os.path.getmtime(data_file.path), data_file.path))
+    return data_files
+
+
+def read_text(path: str) -> str:
+    """读取数据文件文本，压缩分段可能没有写入压缩流结尾（程序被中断），已写入的部分照常解压"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".gz"):
+        data = zlib.decompressobj(31).decompress(data)
+    elif path.endswith(".zst"):
+        import zstandard
+
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    # CSV 文件开头有 BOM
+    return data.decode("utf-8-sig")
+
+
+def load_records(path: str) -> List[Dict]:
+    text = read_text(path)
+    file_format = DATA_FILE_PATTERN.search(os.path.basename(path)).group("format")
+    if file_format == "csv":
+        # CSV 中的长文本可能超过默认的字段长度上限，解析进程中各自设置
+        csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+        return list(csv.DictReader(io.StringIO(text, newline="")))
+    if file_format == "jsonl":
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return json.loads(text) if text.strip() else []
+
+
+def parse_data_file(data_file: DataFile) -> List[Dict]:
+    """
+    解析一个数据文件，在解析进程中执行：记录按表结构转换类型，丢弃表中没有的字段，有 fingerprint 列的表同时计算指纹
+    Args:
+        data_file: 数据文件
+
+    Returns: 可直接入库的记录
+
+    """
+    columns = dict(load_table_columns()[data_file.table.table_name])
+    rows = []
+    for record in load_records(data_file.path):
+        row = {
+            column_name: coerce_column_value(value, columns[column_name])
+            for column_name, value in record.items() if column_name in columns
+        }
+        if data_file.table.has_fingerprint:
+            # 与数据库存储计算方式相同，之后爬取到相同内容时可以直接跳过
+            row["fingerprint"] = compute_fingerprint(row)
+        rows.append(row)
+    return rows
+
+
+class ImportProgress:
+    def __init__(self, total_files: int):
+        self.total_files = total_files
+        self.files = 0
+        self.rows = 0
+        self.outcomes = {DB_WRITE_INSERTED: 0, DB_WRITE_UPDATED: 0, DB_WRITE_SKIPPED: 0}
+        self.start = time.perf_counter()
+
+    def summary(self) -> str:
+        seconds = time.perf_counter() - self.start
+        return (f"{self.files}/{self.total_files} files, {self.rows:,} rows "
+                f"(inserted {self.outcomes[DB_WRITE_INSERTED]:,} / updated {self.outcomes[DB_WRITE_UPDATED]:,} / "
+                f"skipped {self.outcomes[DB_WRITE_SKIPPED]:,}), {self.rows / seconds if seconds else 0:,.0f} rows/sec")
+
+
+class DataImporter:
+    """
+    把解析好的记录分批写入数据库：每批先按记录ID查出已入库的指纹，新记录和变化的记录分别用一条语句批量执行
+    """
+
+    def __init__(self, async_db_obj, placeholder: str, batch_size: int):
+        """
+        :param async_db_obj: AsyncSqliteDB 或 AsyncMysqlDB
+        :param placeholder: SQL 参数占位符，SQLite 为 ?，MySQL 为 %s
+        :param batch_size: 每批写入的记录数
+        """
+        self.db = async_db_obj
+        self.placeholder = placeholder
+        self.batch_size = batch_size
+
+    async def import_rows(self, table: ImportTable, rows: List[Dict]) -> Dict[str, int]:
+        """
+        导入一个文件的记录
+        Args:
+            table: 目标表
+            rows: parse_data_file 返回的记录
+
+        Returns: 新增、更新、跳过的条数
+
+        """
+        outcomes = {DB_WRITE_INSERTED: 0, DB_WRITE_UPDATED: 0, DB_WRITE_SKIPPED: 0}
+        for start in range(0, len(rows), self.batch_size):
+            for outcome, count in (await self.import_batch(table, rows[start:start + self.batch_size])).items():
+                outcomes[outcome] += count
+        for outcome, count in outcomes.items():
+            metrics.store_db_writes_total.inc(count, table=table.table_name, outcome=outcome)
+        return outcomes
+
+    async def import_batch(self, table: ImportTable, rows: List[Dict]) -> Dict[str, int]:
+        # 同一批中的重复记录以最后一条为准，缺少记录ID的记录无法与已入库记录对应，跳过
+        latest_rows: Dict[Tuple, Dict] = {}
+        for row in rows:
+            if all(row.get(column_name) not in (None, "") for column_name in table.key_columns):
+                latest_rows[tuple(str(row[column_name]) for column_name in table.key_columns)] = row
+        stored_fingerprints = await self.query_fingerprints(table, list(latest_rows))
+        new_rows, changed_rows = [], []
+        for key, row in latest_rows.items():
+            if key not in stored_fingerprints:
+                new_rows.append(row)
+            elif not table.has_fingerprint or stored_fingerprints[key] != row["fingerprint"]:
+                changed_rows.append(row)
+        now = utils.get_current_timestamp()
+        for row in new_rows:
+            row.setdefault("add_ts", now)
+            row.setdefault("last_modify_ts", now)
+        for columns, column_rows in group_by_columns(new_rows).items():
+            await self.db.executemany(self.insert_sql(table.table_name, columns),
+                                      [[row[column] for column in columns] for row in column_rows])
+        for columns, column_rows in group_by_columns(changed_rows).items():
+            update_columns = [column for column in columns if column not in table.key_columns and column != "add_ts"]
+            await self.db.executemany(
+                self.update_sql(table, update_columns),
+                [[row[column] for column in update_columns] + [row[column] for column in table.key_columns]
+                 for row in column_rows],
+            )
+        return {DB_WRITE_INSERTED: len(new_rows), DB_WRITE_UPDATED: len(changed_rows),
+                DB_WRITE_SKIPPED: len(rows) - len(new_rows) - len(changed_rows)}
+
+    async def query_fingerprints(self, table: ImportTable, keys: List[Tuple]) -> Dict[Tuple, Optional[str]]:
+        """
+        查询已入库记录的指纹
+        Args:
+            table: 目标表
+            keys: 记录ID，每个ID是 key_columns 对应值的字符串元组
+
+        Returns: 已入库的记录ID -> 指纹，表中没有 fingerprint 列时为 None
+
+        """
+        select_columns = ", ".join(f"`{column}`" for column in table.key_columns)
+        if table.has_fingerprint:
+            select_columns += ", `fingerprint`"
+        fingerprints = {}
+        # 多列ID只按第一列查询，再在结果中匹配完整的ID
+        first_values = sorted({key[0] for key in keys})
+        for start in range(0, len(first_values), KEY_QUERY_CHUNK_SIZE):
+            values = first_values[start:start + KEY_QUERY_CHUNK_SIZE]
+            sql = (f"SELECT {select_columns} FROM `{table.table_name}` "
+                   f"WHERE `{table.key_columns[0]}` IN ({', '.join([self.placeholder] * len(values))})")
+            for stored_row in await self.db.query(sql, *values):
+                key = tuple(str(stored_row[column]) for column in table.key_columns)
+                fingerprints[key] = stored_row.get("fingerprint")
+        return fingerprints
+
+    def insert_sql(self, table_name: str, columns: Tuple[str, ...]) -> str:
+        return (f"INSERT INTO `{table_name}` ({', '.join(f'`{column}`' for column in columns)}) "
+                f"VALUES ({', '.join([self.placeholder] * len(columns))})")
+
+    def update_sql(self, table: ImportTable, columns: List[str]) -> str:
+        updates = ", ".join(f"`{column}` = {self.placeholder}" for column in columns)
+        conditions = " AND ".join(f"`{column}` = {self.placeholder}" for column in table.key_columns)
+        return f"UPDATE `{table.table_name}` SET {updates} WHERE {conditions}"
+
+
+async def init_import_db(target: str, sqlite_path: str):
+    """
+    连接导入的目标数据库，SQLite 数据库文件不存在时按 schema/sqlite_tables.sql 建表，已存在时补上缺少的字段
+    Args:
+        target: sqlite | db
+        sqlite_path: SQLite 数据库文件
+
+    Returns: (数据库对象, SQL 参数占位符, 关闭数据库的函数)
+
+    """
+    if target == "db":
+        import db
+        from var import media_crawler_db_var
+
+        await db.init_mediacrawler_db()
+        return media_crawler_db_var.get(), "%s", db.close
+    import db
+    from async_sqlite_db import AsyncSqliteDB
+
+    async_db_obj = AsyncSqliteDB(sqlite_path)
+    if not os.path.exists(sqlite_path):
+        utils.logger.info(f"[data_importer.init_import_db] create sqlite db {sqlite_path}")
+        with open(SQLITE_SCHEMA_PATH, "r", encoding="utf-8") as f:
+            await async_db_obj.executescript(f.read())
+    else:
+        # 老版本创建的数据库文件没有 fingerprint 字段
+        await db.migrate_sqlite_db(async_db_obj)
+    return async_db_obj, "?", None
+
+
+async def import_data_files(data_files: List[DataFile], importer: DataImporter, workers: int) -> ImportProgress:
+    """
+    多个进程并行解析数据文件，按文件顺序依次写入数据库；同时解析的文件数有上限，避免解析结果堆积占用内存
+    Args:
+        data_files: find_data_files 返回的数据文件
+        importer: 写入数据库的导入器
+        workers: 解析进程数
+
+    Returns:
+
+    """
+    progress = ImportProgress(len(data_files))
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = [loop.run_in_executor(executor, parse_data_file, data_file) for data_file in data_files[:workers * 2]]
+        for index, data_file in enumerate(data_files):
+            rows = await pending[index]
+            if index + workers * 2 < len(data_files):
+                pending.append(loop.run_in_executor(executor, parse_data_file, data_files[index + workers * 2]))
+            pending[index] = None
+            outcomes = await importer.import_rows(data_file.table, rows)
+            progress.files += 1
+            progress.rows += len(rows)
+            for outcome, count in outcomes.items():
+                progress.outcomes[outcome] += count
+            utils.logger.info(f"[data_importer] {os.path.basename(data_file.path)} -> {data_file.table.table_name}: "
+                              f"{len(rows):,} rows, progress {progress.summary()}")
+    return progress
+
+
+async def run_import(platform: str, target: str, data_dir: str, sqlite_path: str, workers: int,
+                     batch_size: int) -> ImportProgress:
+    """
+    导入一个平台的全部数据文件
+    Args:
+        platform: 平台
+        target: sqlite | db
+        data_dir: 平台数据目录
+        sqlite_path: SQLite 数据库文件
+        workers: 解析进程数
+        batch_size: 每批写入的记录数
+
+    Returns:
+
+    """
+    data_files = find_data_files(data_dir, platform)
+    utils.logger.info(f"[data_importer] found {len(data_files)} data files in {data_dir}")
+    async_db_obj, placeholder, close_db = await init_import_db(target, sqlite_path)
+    try:
+        progress = await import_data_files(data_files, DataImporter(async_db_obj, placeholder, batch_size), workers)
+    finally:
+        if close_db:
+            await close_db()
+    utils.logger.info(f"[data_importer] import finished: {progress.summary()}")
+    return progress
+
+
+def parse_import_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Import saved CSV/JSON data into SQLite or MySQL. / 把已保存的 CSV/JSON 数据导入数据库')
+    parser.add_argument('--platform', type=str, required=True, choices=list(IMPORT_TABLES),
+                        help='Media platform / 媒体平台 (xhs | dy | ks | bili | wb | tieba | zhihu)')
+    parser.add_argument('--target', type=str, default="sqlite", choices=TARGETS,
+                        help='sqlite, or db for the MySQL in config/db_config.py / 导入 SQLite，或 db 导入配置的 MySQL')
+    parser.add_argument('--data_dir', type=str, default="",
+                        help='Platform data directory, default data/<platform> / 平台数据目录')
+    parser.add_argument('--sqlite_path', type=str, default=config.SQLITE_DB_PATH, help='SQLite db file / SQLite 数据库文件')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Parsing processes / 解析进程数')
+    parser.add_argument('--batch_size', type=int, default=5000, help='Rows per write batch / 每批写入的记录数')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_import_args()
+    data_dir = args.data_dir or os.path.join("data", IMPORT_TABLES[args.platform][0])
+    asyncio.run(run_import(args.platform, args.target, data_dir, args.sqlite_path, args.workers, args.batch_size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 登录态快照，启动时若会话近期已验证过则跳过 pong 探测和登录流程
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from playwright.async_api import BrowserContext, Page
+from pydantic import BaseModel, Field
+
+import config
+from tools import utils
+
+# 各平台用于判断登录态的关键 cookie，快照中的这些 cookie 必须与当前浏览器上下文一致
+LOGIN_COOKIE_NAMES: Dict[str, List[str]] = {
+    "xhs": ["web_session"],
+    "dy": ["LOGIN_STATUS"],
+    "ks": ["passToken"],
+    "bili": ["SESSDATA"],
+    "wb": ["SUB"],
+    "zhihu": ["z_c0"],
+}
+
+
+def get_snapshot_path(platform: str) -> str:
+    return os.path.join(os.getcwd(), config.LOGIN_STATE_SNAPSHOT_DIR, f"{platform}_login_state.json")
+
+
+def invalidate_login_state(platform: str, reason: str) -> None:
+    """
+    请求中发现会话已失效（未登录、出现验证码等）时删除该平台的登录态快照，
+    否则跳过 pong 恢复的失效会话在快照过期前每次启动都会被再次恢复
+    Args:
+        platform: 平台
+        reason: 失效原因，用于日志
+
+    Returns:
+
+    """
+    try:
+        os.remove(get_snapshot_path(platform))
+    except FileNotFoundError:
+        return
+    utils.logger.info(f"[login_state.invalidate_login_state] {platform} session lost ({reason}), login state snapshot removed")
+
+
+class LoginStateSnapshot(BaseModel):
+    """Serialized login state of a platform"""
+
+    platform: str = Field(title="平台")
+    cookies: List[Dict] = Field(default_factory=list, title="浏览器上下文中的cookies")
+    local_storage_keys: List[str] = Field(default_factory=list, title="localStorage中的key")
+    verified_ts: int = Field(default=0, title="最近一次验证登录态的时间戳(秒)")
+
+    def is_expired(self, ttl: int, now: Optional[int] = None) -> bool:
+        """
+        快照是否已超过有效期
+        Args:
+            ttl: 有效期(秒)
+            now: 当前时间戳，默认取当前时间
+
+        Returns:
+
+        """
+        now = now if now is not None else utils.get_unix_timestamp()
+        return now - self.verified_ts > ttl
+
+    def login_cookies(self) -> Dict[str, Dict]:
+        """
+        快照中与登录态相关的 cookie
+        Returns:
+
+        """
+        names = LOGIN_COOKIE_NAMES.get(self.platform, [])
+        return {cookie["name"]: cookie for cookie in self.cookies if cookie.get("name") in names}
+
+
+class LoginStateManager:
+    def __init__(self, platform: str, browser_context: BrowserContext, context_page: Page):
+        self.platform = platform
+        self.browser_context = browser_context
+        self.context_page = context_page
+        self.snapshot_path = get_snapshot_path(platform)
+
+    def load(self) -> Optional[LoginStateSnapshot]:
+        """
+        读取本地登录态快照
+        Returns:
+
+        """
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = LoginStateSnapshot(**json.load(f))
+        except (ValueError, TypeError) as e:
+            utils.logger.info(f"[LoginStateManager.load] invalid snapshot file {self.snapshot_path}, err: {e}")
+            return None
+        if snapshot.platform != self.platform:
+            return None
+        return snapshot
+
+    async def save(self) -> None:
+        """
+        登录态验证通过后保存快照
+        Returns:
+
+        """
+        if not config.ENABLE_LOGIN_STATE_SNAPSHOT:
+            return
+        local_storage: Dict = await self.context_page.evaluate("() => window.localStorage")
+        snapshot = LoginStateSnapshot(
+            platform=self.platform,
+            cookies=await self.browser_context.cookies(),
+            local_storage_keys=sorted(local_storage.keys()),
+            verified_ts=utils.get_unix_timestamp(),
+        )
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        with open(self.snapshot_path, "w", encoding="utf-8") as f:
+            f.write(snapshot.model_dump_json())
+        utils.logger.info(f"[LoginStateManager.save] login state snapshot saved to {self.snapshot_path}")
+
+    async def restore_if_fresh(self) -> bool:
+        """
+        快照在有效期内且关键 cookie 与当前浏览器上下文一致时返回 True，调用方可跳过 pong 和登录流程。
+        浏览器上下文中缺失关键 cookie 时（例如未保存登录状态），会先把快照中的 cookie 写回上下文。
+        Returns:
+
+        """
+        if not config.ENABLE_LOGIN_STATE_SNAPSHOT:
+            return False
+        snapshot = self.load()
+        if not snapshot or snapshot.is_expired(config.LOGIN_STATE_SNAPSHOT_TTL):
+            return False
+
+        expected_cookies = snapshot.login_cookies()
+        if not expected_cookies:
+            return False
+        now = time.time()
+        if any(0 < cookie.get("expires", -1) < now for cookie in expected_cookies.values()):
+            return False
+
+        current_cookies = {cookie["name"]: cookie["value"] for cookie in await self.browser_context.cookies()}
+        missing = [cookie for name, cookie in expected_cookies.items() if name not in current_cookies]
+        if any(current_cookies[name] != cookie["value"] for name, cookie in expected_cookies.items() if name in current_cookies):
+            # 会话已被替换（例如重新登录了其他账号），快照作废
+            return False
+        if missing:
+            await self.browser_context.add_cookies(snapshot.cookies)
+
+        local_storage: Dict = await self.context_page.evaluate("() => window.localStorage")
+        if not missing and not set(snapshot.local_storage_keys).issubset(local_storage.keys()):
+            return False
+
+        utils.logger.info(
+            f"[LoginStateManager.restore_if_fresh] login state of {self.platform} verified "
+            f"{utils.get_unix_timestamp() - snapshot.verified_ts}s ago, skip pong and login"
+        )
+        return True
@@ -0,0 +1,155 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 事件循环延迟监控，找出阻塞事件循环的同步调用（execjs 签名、jieba 分词、同步 Redis、大 JSON 序列化……）
+# 事件循环内定时执行心跳回调，心跳实际执行时间比预期晚多少就是事件循环的延迟；
+# 后台看门狗线程发现心跳超时未执行时，抓取事件循环线程当前的调用栈，即正在阻塞事件循环的代码
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Dict, List, Optional, Tuple
+
+from tools import utils
+from tools.profiler import get_frame_path, get_thread_frames
+
+# 看门狗没来得及抓到调用栈的阻塞（阻塞时长接近阈值）
+UNKNOWN_OFFENDER: Tuple[str, ...] = ("<not captured>",)
+# 每个阻塞点保留的最内层帧数
+OFFENDER_STACK_DEPTH = 8
+
+
+def format_stack(frame: Optional[FrameType], depth: int = OFFENDER_STACK_DEPTH) -> Tuple[str, ...]:
+    """
+    格式化调用栈最内层的 depth 帧，由外到内
+    Args:
+        frame: 最内层的帧
+        depth: 保留的帧数
+
+    Returns:
+
+    """
+    frames = get_thread_frames(frame)[-depth:]
+    return tuple(f"{get_frame_path(frame.f_code)}:{frame.f_lineno} {frame.f_code.co_name}" for frame in frames)
+
+
+class LoopLagMonitor:
+    """
+    事件循环延迟监控，在事件循环所在线程中创建和启动
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, threshold_ms: float = 100, interval_ms: float = 50):
+        """
+        :param loop: 被监控的事件循环
+        :param threshold_ms: 延迟超过该值视为阻塞（毫秒）
+        :param interval_ms: 心跳间隔（毫秒）
+        """
+        self.loop = loop
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.loop_thread_id = threading.get_ident()
+        self.beats = 0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        # 阻塞点调用栈 -> 阻塞次数 / 阻塞总时长（秒）
+        self.offender_counts: Counter = Counter()
+        self.offender_seconds: Dict[Tuple[str, ...], float] = {}
+        self._last_beat = 0.0
+        self._expected_beat = 0.0
+        # 看门狗抓到的调用栈：(心跳时间, 调用栈)，心跳时间用来确认对应的是哪一次阻塞
+        self._captured: Optional[Tuple[float, Tuple[str, ...]]] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._expected_beat = self._last_beat + self.interval
+        # 使用回调而不是任务，停止时事件循环可能已经结束，取消回调不会留下未完成的任务
+        self._handle = self.loop.call_later(self.interval, self._beat)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, name="LoopLagMonitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    def _beat(self):
+        now = time.perf_counter()
+        lag = max(now - self._expected_beat, 0.0)
+        self.beats += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.threshold:
+            self.record_block(lag)
+        self._last_beat = now
+        self._expected_beat = now + self.interval
+        self._handle = self.loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        # 检查间隔取阈值的一半，保证阻塞时间超过阈值时至少能检查到一次
+        while not self._stop_event.wait(self.threshold / 2):
+            last_beat = self._last_beat
+            if time.perf_counter() - last_beat < self.interval + self.threshold:
+                continue
+            if self._captured and self._captured[0] == last_beat:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            self._captured = (last_beat, format_stack(frame))
+
+    def record_block(self, lag: float):
+        """
+        记录一次阻塞，归到看门狗抓到的调用栈上
+        Args:
+            lag: 心跳延迟（秒）
+
+        Returns:
+
+        """
+        captured = self._captured
+        stack = captured[1] if captured and captured[0] == self._last_beat else UNKNOWN_OFFENDER
+        self._captured = None
+        if stack not in self.offender_counts:
+            # 每个阻塞点第一次出现时立即告警，不用等到运行结束
+            utils.logger.warning(f"[LoopLagMonitor.record_block] event loop blocked for {lag * 1000:.0f}ms at "
+                                 f"{stack[-1]}\n    " + "\n    ".join(stack))
+        self.offender_counts[stack] += 1
+        self.offender_seconds[stack] = self.offender_seconds.get(stack, 0.0) + lag
+
+    def offenders(self) -> List[Tuple[Tuple[str, ...], int, float]]:
+        """
+        按阻塞总时长从多到少排序的阻塞点
+        Returns: [(调用栈, 阻塞次数, 阻塞总时长), ...]
+
+        """
+        return sorted(((stack, count, self.offender_seconds[stack]) for stack, count in self.offender_counts.items()),
+                      key=lambda offender: offender[2], reverse=True)
+
+    def format_report(self) -> str:
+        average_lag = self.total_lag / self.beats if self.beats else 0
+        lines = [f"beats: {self.beats}, avg lag: {average_lag * 1000:.1f}ms, max lag: {self.max_lag * 1000:.0f}ms, "
+                 f"blocked > {self.threshold * 1000:.0f}ms: {sum(self.offender_counts.values())} times"]
+        for stack, count, seconds in self.offenders():
+            lines.append(f"{count:>6}x {seconds * 1000:>8.0f}ms  {stack[-1]}")
+            lines += [f"{'':>18}{frame_name}" for frame_name in reversed(stack[:-1])]
+        return "\n".join(lines)
+
+    def report(self):
+        utils.logger.info(f"[LoopLagMonitor.report] event loop lag report:\n{self.format_report()}")
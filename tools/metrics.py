@@ -0,0 +1,529 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 运行指标（计数器、直方图），记录各平台接口请求、数据写入、媒体下载和代理IP提取
+# 指标始终在内存中记录，开销只有一次加锁和字典更新；ENABLE_METRICS 开启后通过 HTTP 暴露 Prometheus 文本格式，
+# 退出时保存 JSON 汇总
+import bisect
+import functools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from tools import utils
+
+# 直方图默认分桶（秒），覆盖从本地回放的毫秒级到慢接口的数十秒
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+# 平台返回风控（IP 封禁、账号封禁、频率限制）
+OUTCOME_BLOCKED = "blocked"
+OUTCOME_CAPTCHA = "captcha"
+
+# 路径中的数字ID、长的字母数字混合ID替换为占位符，避免接口标签随帖子数量无限增长
+ID_SEGMENT_PATTERN = re.compile(r"^\d+$|^(?=.*\d)[0-9a-zA-Z_\-]{16,}$")
+
+
+def normalize_endpoint(url: str) -> str:
+    """
+    把请求地址转换成接口标签：去掉域名和 query，路径中的ID替换为 {id}
+    Args:
+        url: 请求地址
+
+    Returns: eg: /api/v4/answers/{id}/root_comments
+
+    """
+    path = url.split("?", 1)[0]
+    if "://" in path:
+        path = "/" + path.split("://", 1)[1].partition("/")[2]
+    segments = ["{id}" if ID_SEGMENT_PATTERN.match(segment) else segment for segment in path.split("/")]
+    return "/".join(segments) or "/"
+
+
+class Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str], lock: threading.Lock):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = lock
+
+    def label_key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def format_labels(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.label_names, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        escaped = [f'{name}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                   for name, value in pairs]
+        return "{" + ",".join(escaped) + "}"
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str], lock: threading.Lock):
+        super().__init__(name, documentation, label_names, lock)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        self.inc_key(self.label_key(labels), amount)
+
+    def inc_key(self, key: Tuple[str, ...], amount: float = 1):
+        """按预先计算好的 label_key 计数，用于调用频繁的位置"""
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self.values.get(self.label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{self.format_labels(key)} {value:g}" for key, value in sorted(self.values.items())]
+
+    def dump(self) -> List[Dict]:
+        return [dict(zip(self.label_names, key), value=value) for key, value in sorted(self.values.items())]
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str], lock: threading.Lock,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names, lock)
+        self.buckets = tuple(buckets)
+        # 标签 -> [每个分桶的计数（最后一个是 +Inf）, 总和]
+        self.values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        self.observe_key(self.label_key(labels), value)
+
+    def observe_key(self, key: Tuple[str, ...], value: float):
+        """按预先计算好的 label_key 记录，用于调用频繁的位置"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            bucket_counts, total = self.values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            bucket_counts[index] += 1
+            total[0] += value
+
+    def count(self, **labels: str) -> int:
+        values = self.values.get(self.label_key(labels))
+        return sum(values[0]) if values else 0
+
+    def quantile(self, q: float, **labels: str) -> float:
+        values = self.values.get(self.label_key(labels))
+        return self.bucket_quantile(values[0], q) if values else 0.0
+
+    def bucket_quantile(self, bucket_counts: List[int], q: float) -> float:
+        """
+        与 Prometheus histogram_quantile 相同，在所在分桶内线性插值估算分位数
+        Args:
+            bucket_counts: 每个分桶的计数
+            q: 分位，0 ~ 1
+
+        Returns:
+
+        """
+        total = sum(bucket_counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for index, bucket_count in enumerate(bucket_counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    # 落在 +Inf 分桶，只能返回最大的有限上界
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        for key, (bucket_counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for upper, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if upper == float("inf") else f"{upper:g}"
+                lines.append(f"{self.name}_bucket{self.format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self.format_labels(key)} {total[0]:g}")
+            lines.append(f"{self.name}_count{self.format_labels(key)} {cumulative}")
+        return lines
+
+    def dump(self) -> List[Dict]:
+        return [
+            dict(zip(self.label_names, key), count=sum(bucket_counts), sum=round(total[0], 6),
+                 p50=round(self.bucket_quantile(bucket_counts, 0.5), 6),
+                 p99=round(self.bucket_quantile(bucket_counts, 0.99), 6))
+            for key, (bucket_counts, total) in sorted(self.values.items())
+        ]
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.metrics: Dict[str, Metric] = {}
+        self.started_at = time.time()
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        if name not in self.metrics:
+            self.metrics[name] = Counter(name, documentation, label_names, self._lock)
+        return self.metrics[name]
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        if name not in self.metrics:
+            self.metrics[name] = Histogram(name, documentation, label_names, self._lock, buckets)
+        return self.metrics[name]
+
+    def reset(self):
+        with self._lock:
+            for metric in self.metrics.values():
+                metric.values.clear()
+        self.started_at = time.time()
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        lines: List[str] = []
+        with self._lock:
+            for metric in self.metrics.values():
+                lines.append(f"# HELP {metric.name} {metric.documentation}")
+                lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+                lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    def dump(self) -> Dict:
+        with self._lock:
+            return {
+                "uptime_sec": round(time.time() - self.started_at, 3),
+                "metrics": {name: metric.dump() for name, metric in self.metrics.items()},
+            }
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "mediacrawler_http_requests_total", "Platform API requests by outcome", ["platform", "endpoint", "outcome"])
+http_request_duration_seconds = registry.histogram(
+    "mediacrawler_http_request_duration_seconds", "Platform API request latency", ["platform", "endpoint"])
+store_rows_total = registry.counter(
+    "mediacrawler_store_rows_total", "Rows written by store backends", ["platform", "backend", "item_type"])
+store_write_duration_seconds = registry.histogram(
+    "mediacrawler_store_write_duration_seconds", "Store write latency", ["platform", "backend", "item_type"])
+store_errors_total = registry.counter(
+    "mediacrawler_store_errors_total", "Failed store writes", ["platform", "backend", "item_type"])
+store_db_writes_total = registry.counter(
+    "mediacrawler_store_db_writes_total", "DB and SQLite store writes by outcome (inserted, updated, skipped)",
+    ["table", "outcome"])
+media_downloads_total = registry.counter(
+    "mediacrawler_media_downloads_total", "Image and video downloads by outcome", ["platform", "outcome"])
+media_download_bytes_total = registry.counter(
+    "mediacrawler_media_download_bytes_total", "Downloaded media bytes", ["platform"])
+media_download_duration_seconds = registry.histogram(
+    "mediacrawler_media_download_duration_seconds", "Media download latency", ["platform"])
+proxy_fetch_total = registry.counter(
+    "mediacrawler_proxy_fetch_total", "Proxy IP fetches from providers by outcome", ["provider", "outcome"])
+proxy_fetched_ips_total = registry.counter(
+    "mediacrawler_proxy_fetched_ips_total", "Proxy IPs returned by providers", ["provider"])
+proxy_fetch_duration_seconds = registry.histogram(
+    "mediacrawler_proxy_fetch_duration_seconds", "Proxy IP fetch latency", ["provider"])
+
+
+class RequestTracker:
+    """track_request 返回的对象，请求被平台风控时设置 outcome"""
+
+    def __init__(self):
+        self.outcome: Optional[str] = None
+
+
+@contextmanager
+def track_request(platform: str, url: str) -> Iterator[RequestTracker]:
+    """
+    统计一次平台接口请求的耗时和结果，with 块内抛出异常记为 error，除非已经设置了 tracker.outcome
+    Args:
+        platform: 平台
+        url: 请求地址
+
+    Returns:
+
+    """
+    endpoint = normalize_endpoint(url)
+    tracker = RequestTracker()
+    start = time.perf_counter()
+    try:
+        yield tracker
+    except BaseException:
+        tracker.outcome = tracker.outcome or OUTCOME_ERROR
+        raise
+    finally:
+        http_request_duration_seconds.observe(time.perf_counter() - start, platform=platform, endpoint=endpoint)
+        http_requests_total.inc(platform=platform, endpoint=endpoint, outcome=tracker.outcome or OUTCOME_OK)
+
+
+@contextmanager
+def track_store_write(platform: str, backend: str, item_type: str) -> Iterator[None]:
+    """
+    统计一次数据写入
+    Args:
+        platform: 平台
+        backend: 存储后端，csv | db | json | sqlite | parquet
+        item_type: contents | comments | creator ...
+
+    Returns:
+
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        store_errors_total.inc(platform=platform, backend=backend, item_type=item_type)
+        raise
+    store_write_duration_seconds.observe(time.perf_counter() - start, platform=platform, backend=backend,
+                                         item_type=item_type)
+    store_rows_total.inc(platform=platform, backend=backend, item_type=item_type)
+
+
+# AbstractStore 子类中自动统计的写入方法 -> 记录类型
+STORE_METHOD_ITEM_TYPES = {
+    "store_content": "contents",
+    "store_comment": "comments",
+    "store_creator": "creator",
+    "store_contact": "contact",
+    "store_dynamic": "dynamic",
+}
+STORE_BACKEND_PATTERN = re.compile(r"(Csv|Db|Json|Sqlite|Parquet)StoreImplement$")
+
+
+def get_store_labels(store_class: type) -> Tuple[str, str]:
+    """
+    从存储实现类的模块和类名得到平台和存储后端
+    Args:
+        store_class: 存储实现类
+
+    Returns: eg: ("xhs", "csv")
+
+    """
+    module_parts = store_class.__module__.split(".")
+    platform = module_parts[1] if len(module_parts) > 2 and module_parts[0] == "store" else "other"
+    match = STORE_BACKEND_PATTERN.search(store_class.__name__)
+    return platform, match.group(1).lower() if match else store_class.__name__
+
+
+def metered_store_method(method: Callable, platform: str, backend: str, item_type: str) -> Callable:
+    """
+    包装存储实现类的写入方法，统计写入条数和耗时
+    Args:
+        method: store_content 等写入方法
+        platform: 平台
+        backend: 存储后端
+        item_type: 记录类型
+
+    Returns:
+
+    """
+    if getattr(method, "__metered__", False):
+        return method
+    # 每条数据都会经过这里，标签在包装时计算一次，不使用 track_store_write 以减少每次写入的开销
+    labels = {"platform": platform, "backend": backend, "item_type": item_type}
+    rows_key = store_rows_total.label_key(labels)
+    duration_key = store_write_duration_seconds.label_key(labels)
+    errors_key = store_errors_total.label_key(labels)
+
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await method(*args, **kwargs)
+        except BaseException:
+            store_errors_total.inc_key(errors_key)
+            raise
+        store_write_duration_seconds.observe_key(duration_key, time.perf_counter() - start)
+        store_rows_total.inc_key(rows_key)
+        return result
+
+    wrapper.__metered__ = True
+    return wrapper
+
+
+def record_media_download(platform: str, seconds: float, content: Optional[bytes]):
+    """
+    记录一次媒体下载，content 为空表示下载失败
+    Args:
+        platform: 平台
+        seconds: 耗时
+        content: 下载的内容
+
+    Returns:
+
+    """
+    media_download_duration_seconds.observe(seconds, platform=platform)
+    media_downloads_total.inc(platform=platform, outcome=OUTCOME_OK if content else OUTCOME_ERROR)
+    if content:
+        media_download_bytes_total.inc(len(content), platform=platform)
+
+
+def metered_media_download(platform: str) -> Callable:
+    """
+    装饰平台客户端的媒体下载方法，方法返回 None 记为下载失败
+    Args:
+        platform: 平台
+
+    Returns:
+
+    """
+
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            content = None
+            try:
+                content = await method(*args, **kwargs)
+                return content
+            finally:
+                record_media_download(platform, time.perf_counter() - start, content)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def track_proxy_fetch(provider: str) -> Iterator[List]:
+    """
+    统计一次代理IP提取，with 块内把提取到的IP追加到返回的列表中
+    Args:
+        provider: 代理IP服务商
+
+    Returns:
+
+    """
+    fetched: List = []
+    start = time.perf_counter()
+    try:
+        yield fetched
+    except BaseException:
+        proxy_fetch_total.inc(provider=provider, outcome=OUTCOME_ERROR)
+        raise
+    finally:
+        proxy_fetch_duration_seconds.observe(time.perf_counter() - start, provider=provider)
+    proxy_fetch_total.inc(provider=provider, outcome=OUTCOME_OK)
+    proxy_fetched_ips_total.inc(len(fetched), provider=provider)
+
+
+def summarize(dump: Dict) -> Dict[str, Dict]:
+    """
+    按平台汇总：请求数、每秒请求数、p50/p99 延迟、风控比例、写入条数
+    Args:
+        dump: MetricsRegistry.dump() 的返回值
+
+    Returns:
+
+    """
+    uptime = dump["uptime_sec"] or 1
+    metrics = dump["metrics"]
+    summary: Dict[str, Dict] = {}
+    for item in metrics.get(http_requests_total.name, []):
+        platform_summary = summary.setdefault(item["platform"], {"requests": 0, "blocked": 0, "errors": 0})
+        platform_summary["requests"] += item["value"]
+        if item["outcome"] in (OUTCOME_BLOCKED, OUTCOME_CAPTCHA):
+            platform_summary["blocked"] += item["value"]
+        elif item["outcome"] == OUTCOME_ERROR:
+            platform_summary["errors"] += item["value"]
+    for platform, platform_summary in summary.items():
+        requests = platform_summary["requests"] or 1
+        platform_summary["requests_per_sec"] = round(platform_summary["requests"] / uptime, 3)
+        platform_summary["block_rate"] = round(platform_summary["blocked"] / requests, 4)
+        platform_summary["error_rate"] = round(platform_summary["errors"] / requests, 4)
+        # 各接口延迟按请求数加权，只作为总体参考，分接口的数据见 metrics
+        latencies = [item for item in metrics.get(http_request_duration_seconds.name, [])
+                     if item["platform"] == platform]
+        total_count = sum(item["count"] for item in latencies) or 1
+        platform_summary["p50_sec"] = round(sum(item["p50"] * item["count"] for item in latencies) / total_count, 6)
+        platform_summary["p99_sec"] = max((item["p99"] for item in latencies), default=0.0)
+    for item in metrics.get(store_rows_total.name, []):
+        platform_summary = summary.setdefault(item["platform"], {})
+        platform_summary["rows_stored"] = platform_summary.get("rows_stored", 0) + item["value"]
+    return summary
+
+
+def save_json_summary(output_dir: str, name: str) -> str:
+    """
+    保存指标的 JSON 汇总
+    Args:
+        output_dir: 保存目录
+        name: 文件名（不含扩展名）
+
+    Returns: 文件路径
+
+    """
+    dump = registry.dump()
+    dump["summary"] = summarize(dump)
+    os.makedirs(output_dir, exist_ok=True)
+    file_path = os.path.join(output_dir, f"{name}.json")
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(dump, f, ensure_ascii=False, indent=2)
+    utils.logger.info(f"[metrics.save_json_summary] metrics saved to {file_path}, summary: {dump['summary']}")
+    return file_path
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] == "/metrics":
+            body = registry.render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.split("?", 1)[0] == "/metrics.json":
+            dump = registry.dump()
+            dump["summary"] = summarize(dump)
+            body = json.dumps(dump, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取指标的请求很频繁，不输出访问日志
+        pass
+
+
+def start_metrics_server(host: str, port: int) -> ThreadingHTTPServer:
+    """
+    在后台线程启动指标 HTTP 服务，不占用爬虫的事件循环
+    Args:
+        host: 监听地址
+        port: 监听端口，0 表示随机端口
+
+    Returns:
+
+    """
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+    utils.logger.info(f"[metrics.start_metrics_server] serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,127 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 页码分页接口的并发翻页，总页数或总条数已知时同时请求后面的若干页，按页码顺序返回
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Iterable, Optional, Tuple
+
+# 请求一页，参数为页码
+PageFetcher = Callable[[int], Awaitable[Any]]
+
+
+class RequestPacer:
+    """
+    控制请求发起的间隔：并发请求时相邻两次请求至少间隔 crawl_interval / concurrency，
+    每个 crawl_interval 内最多发起 concurrency 次请求，与逐页请求并休眠 crawl_interval 时的每个并发单位频率相同
+    """
+
+    def __init__(self, crawl_interval: float, concurrency: int):
+        self.spacing = crawl_interval / max(concurrency, 1)
+        self._next_start = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + self.spacing
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+async def iter_pages_in_order(
+    pages: Iterable[int],
+    fetch_page: PageFetcher,
+    concurrency: int,
+    crawl_interval: float = 1.0,
+    pacer: Optional[RequestPacer] = None,
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    并发请求 pages 中的页，按页码顺序逐页产出，每一页在它之前的页都产出后立即产出，不等待整批完成；
+    同时在途的页数不超过 concurrency。调用方提前结束迭代时需要调用 aclose() 取消已经发起的请求
+    Args:
+        pages: 要请求的页码，按顺序
+        fetch_page: 请求一页的函数
+        concurrency: 同时在途的页数
+        crawl_interval: 单个并发单位的请求间隔（秒）
+        pacer: 与其他请求共用的请求间隔控制，为空时按 crawl_interval 和 concurrency 新建
+
+    Returns: (页码, fetch_page 的返回值)
+
+    """
+    pacer = pacer or RequestPacer(crawl_interval, concurrency)
+
+    async def fetch(page: int) -> Any:
+        await pacer.wait()
+        return await fetch_page(page)
+
+    page_iter = iter(pages)
+    pending: Deque[Tuple[int, asyncio.Task]] = deque()
+
+    def schedule_next() -> None:
+        for page in page_iter:
+            pending.append((page, asyncio.create_task(fetch(page))))
+            return
+
+    try:
+        for _ in range(max(concurrency, 1)):
+            schedule_next()
+        while pending:
+            page, task = pending[0]
+            result = await task
+            pending.popleft()
+            schedule_next()
+            yield page, result
+    finally:
+        for _, task in pending:
+            task.cancel()
+        await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+
+async def iter_known_total_pages(
+    fetch_page: PageFetcher,
+    get_total: Callable[[Any], int],
+    page_size: int,
+    first_page: int = 1,
+    concurrency: int = 1,
+    crawl_interval: float = 1.0,
+    max_items: Optional[int] = None,
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    响应中带有总条数的分页接口：先请求第一页拿到总条数，再并发请求剩余的页，按页码顺序逐页产出。
+    调用方提前结束迭代时需要调用 aclose() 取消已经发起的请求
+    Args:
+        fetch_page: 请求一页的函数
+        get_total: 从一页的响应中取出总条数
+        page_size: 每页条数
+        first_page: 开始页码，页码从 1 开始计数
+        concurrency: 同时在途的页数
+        crawl_interval: 单个并发单位的请求间隔（秒）
+        max_items: 从 first_page 开始最多需要的条数，用来减少多请求的页，为空时请求到最后一页
+
+    Returns: (页码, fetch_page 的返回值)
+
+    """
+    pacer = RequestPacer(crawl_interval, concurrency)
+    await pacer.wait()
+    first_result = await fetch_page(first_page)
+    yield first_page, first_result
+
+    last_page = math.ceil(get_total(first_result) / page_size)
+    if max_items is not None:
+        last_page = min(last_page, first_page + math.ceil(max_items / page_size) - 1)
+    remaining_pages = iter_pages_in_order(range(first_page + 1, last_page + 1), fetch_page, concurrency, pacer=pacer)
+    try:
+        async for page, result in remaining_pages:
+            yield page, result
+    finally:
+        await remaining_pages.aclose()
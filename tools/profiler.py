@@ -0,0 +1,320 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 协程感知的采样分析器（python main.py --profile），找出一次爬取的时间花在哪个阶段
+# 定时采样两类调用栈：
+#   1. 事件循环线程正在执行的调用栈，反映 CPU 时间，事件循环空闲时记为 idle
+#   2. 所有挂起中的协程各自的 await 链，反映每个任务在等什么（HTTP、sleep、存储……）
+# 支持 setitimer 的系统用 SIGALRM 在事件循环线程内采样；后台线程只能在 GIL 释放时（大多是事件循环空闲时）
+# 采到样本，会严重低估 CPU 密集的阶段，只作为 Windows 等系统上的退化方案
+# 退出时输出 flamegraph.pl / speedscope 可直接读取的折叠栈文件和按阶段、函数汇总的报告
+import asyncio
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Dict, List, Optional, Tuple
+
+from tools import utils
+
+STAGE_SIGNING = "signing"
+STAGE_HTTP = "http"
+STAGE_PARSING = "parsing"
+STAGE_STORAGE = "storage"
+STAGE_SLEEP = "sleep"
+STAGE_BROWSER = "browser"
+STAGE_OTHER = "other"
+STAGE_IDLE = "idle"
+
+# 阶段 -> (文件路径片段, 函数名片段)，按顺序匹配，调用栈中任意一帧命中即归入该阶段
+# 例如 store 里的 json.dumps 归入存储而不是解析，签名时调用的 playwright 归入签名而不是浏览器
+STAGE_RULES: List[Tuple[str, Tuple[str, ...], Tuple[str, ...]]] = [
+    (STAGE_SLEEP, (), ("sleep",)),
+    (STAGE_SIGNING, ("execjs",), ("sign", "bogus", "_pre_headers", "pre_request_data", "__process_req_params")),
+    (STAGE_STORAGE, ("store/", "aiofiles", "aiosqlite", "aiomysql", "async_db.py", "async_sqlite_db.py"), ()),
+    (STAGE_PARSING, ("extractor.py", "help.py", "json/", "parsel", "lxml"), ()),
+    (STAGE_HTTP, ("httpx", "httpcore", "h11", "anyio", "ssl.py"), ()),
+    (STAGE_BROWSER, ("playwright",), ()),
+]
+# 事件循环线程阻塞在这些函数里时表示没有可执行的回调
+IDLE_FUNCTIONS = {"select", "poll", "epoll", "_poll", "wait"}
+
+
+def get_frame_path(code: CodeType) -> str:
+    """
+    缩短代码文件路径：项目内的文件使用相对路径，第三方库从包名开始
+    Args:
+        code: 代码对象
+
+    Returns:
+
+    """
+    file_path = code.co_filename.replace("\\", "/")
+    cwd = os.getcwd().replace("\\", "/") + "/"
+    if file_path.startswith(cwd):
+        return file_path[len(cwd):]
+    for marker in ("site-packages/", "dist-packages/"):
+        if marker in file_path:
+            return file_path.split(marker, 1)[1]
+    parts = file_path.rsplit("/", 2)
+    return "/".join(parts[-2:])
+
+
+def get_coroutine_frames(coro) -> List[FrameType]:
+    """
+    沿 await 链展开挂起中的协程，返回由外到内的帧，遇到 Future 时结束
+    Args:
+        coro: 协程、异步生成器或生成器对象
+
+    Returns:
+
+    """
+    frames: List[FrameType] = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "ag_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+def get_thread_frames(frame: Optional[FrameType]) -> List[FrameType]:
+    """线程调用栈，由外到内"""
+    frames: List[FrameType] = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+class CoroutineProfiler:
+    """
+    采样分析器，在事件循环所在线程中创建，不需要修改被分析的代码
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval_ms: float = 5):
+        """
+        :param loop: 被分析的事件循环
+        :param interval_ms: 采样间隔（毫秒）
+        """
+        self.loop = loop
+        self.interval = interval_ms / 1000
+        self.loop_thread_id = threading.get_ident()
+        # 栈（由外到内的帧名称） -> 采样次数
+        self.loop_stacks: Counter = Counter()
+        self.task_stacks: Counter = Counter()
+        self.loop_stages: Counter = Counter()
+        self.task_stages: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+        self._frame_names: Dict[CodeType, str] = {}
+        self._stage_cache: Dict[Tuple[str, ...], str] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._previous_handler = None
+        self._sampling = False
+
+    @property
+    def duration(self) -> float:
+        return (self.stopped_at or time.perf_counter()) - self.started_at
+
+    @property
+    def use_signal(self) -> bool:
+        return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.stopped_at = 0.0
+        if self.use_signal:
+            self._previous_handler = signal.signal(signal.SIGALRM, self._on_signal)
+            signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="CoroutineProfiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self.stopped_at:
+            return
+        self.stopped_at = time.perf_counter()
+        if self._thread is None:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self._previous_handler or signal.SIG_DFL)
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _on_signal(self, signum: int, frame: Optional[FrameType]):
+        # 采样本身耗时超过采样间隔时，信号处理函数可能嵌套执行，跳过嵌套的采样
+        if self._sampling:
+            return
+        self._sampling = True
+        try:
+            self.sample(frame)
+        finally:
+            self._sampling = False
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sample(sys._current_frames().get(self.loop_thread_id))
+            except RuntimeError:
+                # 采样时任务集合被事件循环线程修改，丢弃这次采样
+                continue
+
+    def frame_name(self, frame: FrameType) -> str:
+        code = frame.f_code
+        name = self._frame_names.get(code)
+        if name is None:
+            name = f"{get_frame_path(code)}:{code.co_name}"
+            self._frame_names[code] = name
+        return name
+
+    def classify(self, stack: Tuple[str, ...]) -> str:
+        """
+        按 STAGE_RULES 判断调用栈所处的阶段
+        Args:
+            stack: 由外到内的帧名称
+
+        Returns:
+
+        """
+        stage = self._stage_cache.get(stack)
+        if stage is not None:
+            return stage
+        stage = STAGE_OTHER
+        for rule_stage, path_parts, function_parts in STAGE_RULES:
+            if any(self.match_frame(frame_name, path_parts, function_parts) for frame_name in stack):
+                stage = rule_stage
+                break
+        self._stage_cache[stack] = stage
+        return stage
+
+    @staticmethod
+    def match_frame(frame_name: str, path_parts: Tuple[str, ...], function_parts: Tuple[str, ...]) -> bool:
+        path, _, function = frame_name.rpartition(":")
+        if any(part in path for part in path_parts):
+            return True
+        if function == "sleep":
+            # 只有 asyncio.sleep 算主动等待，time.sleep 之类的同步阻塞仍按所在阶段统计
+            return "sleep" in function_parts and path.endswith("asyncio/tasks.py")
+        return any(part in function for part in function_parts)
+
+    def sample(self, thread_frame: Optional[FrameType]):
+        """
+        采样一次：事件循环线程的调用栈和所有未完成任务的 await 链
+        Args:
+            thread_frame: 事件循环线程当前执行的帧
+
+        Returns:
+
+        """
+        running_task = asyncio.current_task(self.loop) if self.loop.is_running() else None
+        tasks = asyncio.all_tasks(self.loop) if self.loop.is_running() else set()
+
+        thread_frames = get_thread_frames(thread_frame)
+        if thread_frames and thread_frames[-1].f_code.co_name in IDLE_FUNCTIONS and running_task is None:
+            self.loop_stages[STAGE_IDLE] += 1
+        elif thread_frames:
+            loop_stack = tuple(self.frame_name(frame) for frame in thread_frames)
+            self.loop_stacks[loop_stack] += 1
+            self.loop_stages[self.classify(loop_stack)] += 1
+
+        for task in tasks:
+            coro_frames = get_coroutine_frames(task.get_coro())
+            if not coro_frames:
+                continue
+            if task is running_task and coro_frames[0] in thread_frames:
+                # 正在执行的任务使用线程调用栈，能看到协程里同步调用的函数
+                frames = thread_frames[thread_frames.index(coro_frames[0]):]
+            else:
+                frames = coro_frames
+            task_stack = tuple(self.frame_name(frame) for frame in frames)
+            stage = self.classify(task_stack)
+            self.task_stacks[(stage,) + task_stack] += 1
+            self.task_stages[stage] += 1
+        self.samples += 1
+
+    def function_summary(self, top: int = 30) -> List[Tuple[str, int, int]]:
+        """
+        事件循环线程上每个函数的自身采样数和累计采样数
+        Args:
+            top: 返回累计采样数最多的前 top 个函数
+
+        Returns: [(函数, 自身采样数, 累计采样数), ...]
+
+        """
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.loop_stacks.items():
+            self_counts[stack[-1]] += count
+            for frame_name in set(stack):
+                total_counts[frame_name] += count
+        return [(frame_name, self_counts[frame_name], total)
+                for frame_name, total in total_counts.most_common(top)]
+
+    def format_summary(self) -> str:
+        seconds_per_sample = self.duration / self.samples if self.samples else 0
+        lines = [f"duration: {self.duration:.2f}s, samples: {self.samples}, "
+                 f"interval: {self.interval * 1000:.1f}ms", ""]
+
+        lines.append("== event loop thread (wall time) ==")
+        loop_total = sum(self.loop_stages.values()) or 1
+        for stage, count in self.loop_stages.most_common():
+            lines.append(f"{stage:<10}{count * seconds_per_sample:>10.2f}s{count * 100 / loop_total:>8.1f}%")
+
+        lines += ["", "== coroutines (time summed over all tasks) =="]
+        task_total = sum(self.task_stages.values()) or 1
+        for stage, count in self.task_stages.most_common():
+            lines.append(f"{stage:<10}{count * seconds_per_sample:>10.2f}s{count * 100 / task_total:>8.1f}%")
+
+        lines += ["", "== functions on the event loop thread ==", f"{'self':>8}{'total':>8}  function"]
+        for frame_name, self_count, total_count in self.function_summary():
+            lines.append(f"{self_count * 100 / loop_total:>7.1f}%{total_count * 100 / loop_total:>7.1f}%  {frame_name}")
+        return "\n".join(lines) + "\n"
+
+    def format_folded(self) -> str:
+        """
+        折叠栈格式，每行 "阶段;帧;帧... 采样数"，可用 flamegraph.pl 或 speedscope 生成火焰图
+        Returns:
+
+        """
+        lines = [f"{';'.join(stack)} {count}" for stack, count in self.task_stacks.items()]
+        lines += [f"loop;{';'.join(stack)} {count}" for stack, count in self.loop_stacks.items()]
+        lines.append(f"loop;{STAGE_IDLE} {self.loop_stages[STAGE_IDLE]}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, output_dir: str, name: str) -> Tuple[str, str]:
+        """
+        保存折叠栈文件和汇总报告
+        Args:
+            output_dir: 保存目录
+            name: 文件名前缀
+
+        Returns: (折叠栈文件路径, 汇总报告路径)
+
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        folded_path = os.path.join(output_dir, f"{name}.folded")
+        summary_path = os.path.join(output_dir, f"{name}_summary.txt")
+        with open(folded_path, "w", encoding="utf-8") as f:
+            f.write(self.format_folded())
+        with open(summary_path, "w", encoding="utf-8") as f:
+            f.write(self.format_summary())
+        utils.logger.info(f"[CoroutineProfiler.save] profile saved to {folded_path} and {summary_path}")
+        return folded_path, summary_path
@@ -0,0 +1,350 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 存储后端吞吐量基准测试，对比 SAVE_DATA_OPTION 各选项的写入速度、延迟、内存和文件大小
+# 使用方式：
+#   python -m tools.store_benchmark --backends csv,json,sqlite,db,parquet --contents 200 --concurrency 1,8,32
+#   db 默认写入临时 SQLite 文件作为 MySQL 的替身（两者执行相同的查询/写入流程），
+#   加 --mysql 时写入 config/db_config.py 配置的 MySQL，请使用单独的测试库并提前建表
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from unittest import mock
+
+from pydantic import BaseModel, Field
+
+import config
+from async_sqlite_db import AsyncSqliteDB
+from base.base_crawler import AbstractStore
+from store import parquet_store, segmented_output
+from store.store_util import clear_fingerprint_cache
+from tools import utils
+from var import crawler_type_var, media_crawler_db_var
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BACKENDS = ["csv", "json", "sqlite", "db", "parquet"]
+SQLITE_SCHEMA_PATH = "schema/sqlite_tables.sql"
+XHS_PAYLOADS_PATH = "media_platform/xhs/test_data/api_payloads.json"
+# 内存采样间隔（秒）
+RSS_SAMPLE_INTERVAL = 0.01
+
+
+class StoreBenchmarkResult(BaseModel):
+    backend: str = Field(title="存储后端")
+    concurrency: int = Field(title="并发写入数")
+    rows: int = Field(title="写入的记录数")
+    seconds: float = Field(title="总耗时（秒）")
+    rows_per_sec: float = Field(title="每秒写入的记录数")
+    p50_ms: float = Field(title="单条写入延迟中位数（毫秒）")
+    p99_ms: float = Field(title="单条写入延迟 p99（毫秒）")
+    peak_rss_mb: float = Field(title="写入期间进程常驻内存峰值（MB）")
+    file_size_bytes: Optional[int] = Field(default=None, title="写入的文件总大小，写入 MySQL 时为空")
+
+    def summary(self) -> str:
+        file_size = "-" if self.file_size_bytes is None else f"{self.file_size_bytes / 1024:,.0f}KB"
+        return (f"{self.backend:<10} x{self.concurrency:<3} {self.rows_per_sec:>10,.0f} rows/sec  "
+                f"p50 {self.p50_ms:>8.2f}ms  p99 {self.p99_ms:>8.2f}ms  "
+                f"rss {self.peak_rss_mb:>7.1f}MB  file {file_size}")
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    最近秩法计算百分位数
+    Args:
+        values: 样本
+        percent: 百分位，0 ~ 100
+
+    Returns:
+
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(int(len(ordered) * percent / 100 + 0.5) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def get_rss_bytes() -> int:
+    """
+    当前进程的常驻内存，Linux 读取 /proc，其他系统退化为进程启动以来的峰值
+    Returns:
+
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 的单位是字节，Linux 是 KB
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def get_dir_size(path: str) -> int:
+    total = 0
+    for root, _, file_names in os.walk(path):
+        for file_name in file_names:
+            total += os.path.getsize(os.path.join(root, file_name))
+    return total
+
+
+class CaptureStore(AbstractStore):
+    """收集 store 映射函数的输出，作为生成测试数据的模板"""
+
+    def __init__(self):
+        self.items: Dict[str, Dict] = {}
+
+    async def store_content(self, content_item: Dict):
+        self.items["contents"] = content_item
+
+    async def store_comment(self, comment_item: Dict):
+        self.items["comments"] = comment_item
+
+    async def store_creator(self, creator: Dict):
+        self.items["creator"] = creator
+
+
+async def load_row_templates() -> Dict[str, Dict]:
+    """
+    用小红书的样例接口数据经过真实的字段映射，得到内容、评论、创作者三种记录的模板
+    Returns:
+
+    """
+    import store.xhs as xhs_store
+
+    with open(XHS_PAYLOADS_PATH, "r", encoding="utf-8") as f:
+        payloads = json.load(f)
+    note = payloads["note"]
+    creator = {
+        "basicInfo": {"nickname": note["user"]["nickname"], "gender": 1, "images": note["user"]["avatar"],
+                      "desc": note["desc"], "ipLocation": note.get("ip_location")},
+        "interactions": [{"type": "follows", "count": "10"}, {"type": "fans", "count": "1000"},
+                         {"type": "interaction", "count": "5000"}],
+        "tags": [{"tagType": "location", "name": "上海"}],
+    }
+    capture_store = CaptureStore()
+    with mock.patch.object(xhs_store.XhsStoreFactory, "create_store", return_value=capture_store):
+        await xhs_store.update_xhs_note(note)
+        await xhs_store.update_xhs_note_comment(note["note_id"], payloads["comment"])
+        await xhs_store.save_creator(note["user"]["user_id"], creator)
+    return capture_store.items
+
+
+def generate_rows(templates: Dict[str, Dict], contents: int, comments_per_content: int) -> List[Tuple[str, Dict]]:
+    """
+    生成测试数据：每条内容带 comments_per_content 条评论和一个创作者，主键各不相同
+    Args:
+        templates: load_row_templates 的返回值
+        contents: 内容条数
+        comments_per_content: 每条内容的评论数
+
+    Returns: [(记录类型, 记录), ...]
+
+    """
+    rows: List[Tuple[str, Dict]] = []
+    for i in range(contents):
+        note_id = f"bench_note_{i}"
+        user_id = f"bench_user_{i}"
+        rows.append(("contents", dict(templates["contents"], note_id=note_id, user_id=user_id)))
+        for j in range(comments_per_content):
+            rows.append(("comments", dict(templates["comments"], comment_id=f"bench_comment_{i}_{j}",
+                                          note_id=note_id)))
+        rows.append(("creator", dict(templates["creator"], user_id=user_id)))
+    return rows
+
+
+def create_benchmark_store(backend: str, output_dir: str) -> AbstractStore:
+    """
+    通过存储工厂创建存储对象，文件类存储的保存目录指向 output_dir
+    Args:
+        backend: csv | json | sqlite | db | parquet
+        output_dir: 测试数据目录
+
+    Returns:
+
+    """
+    from store.xhs import XhsStoreFactory
+
+    # 直接测试存储实现本身的写入速度，不经过写入队列
+    with mock.patch.object(config, "SAVE_DATA_OPTION", backend), \
+            mock.patch.object(config, "ENABLE_WRITE_BEHIND", False):
+        store = XhsStoreFactory.create_store()
+    if backend == "csv":
+        store.csv_store_path = os.path.join(output_dir, "xhs")
+    elif backend == "json":
+        store.json_store_path = os.path.join(output_dir, "xhs", "json")
+        store.words_store_path = os.path.join(output_dir, "xhs", "words")
+    elif backend == "parquet":
+        store.parquet_store_path = os.path.join(output_dir, "xhs", "parquet")
+    return store
+
+
+async def init_benchmark_db(backend: str, output_dir: str, use_mysql: bool) -> Optional[Callable]:
+    """
+    初始化数据库类后端，返回关闭数据库的函数
+    Args:
+        backend: 存储后端
+        output_dir: 测试数据目录
+        use_mysql: db 后端是否写入真实的 MySQL
+
+    Returns:
+
+    """
+    # 指纹缓存对应上一个测试库，换库后不能再据此跳过写入
+    clear_fingerprint_cache()
+    if backend == "db" and use_mysql:
+        import db
+        await db.init_mediacrawler_db()
+        return db.close
+    if backend in ("sqlite", "db"):
+        async_db_obj = AsyncSqliteDB(os.path.join(output_dir, "benchmark.db"))
+        with open(SQLITE_SCHEMA_PATH, "r", encoding="utf-8") as f:
+            await async_db_obj.executescript(f.read())
+        media_crawler_db_var.set(async_db_obj)
+    return None
+
+
+async def run_store_benchmark(backend: str, rows: List[Tuple[str, Dict]], concurrency: int,
+                              use_mysql: bool = False) -> StoreBenchmarkResult:
+    """
+    用 concurrency 个协程并发写入 rows，统计吞吐量、单条延迟、内存峰值和文件大小
+    Args:
+        backend: csv | json | sqlite | db | parquet
+        rows: generate_rows 生成的数据
+        concurrency: 并发写入数，对应爬虫里同时保存数据的协程数
+        use_mysql: db 后端是否写入真实的 MySQL
+
+    Returns:
+
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        crawler_type_var.set("search")
+        close_db = await init_benchmark_db(backend, output_dir, use_mysql)
+        store = create_benchmark_store(backend, output_dir)
+        store_funcs = {"contents": store.store_content, "comments": store.store_comment,
+                       "creator": store.store_creator}
+        # 数据库存储会修改传入的记录（add_ts），每次测试使用副本
+        pending = iter([(store_type, dict(item)) for store_type, item in rows])
+        latencies: List[float] = []
+
+        async def write_worker():
+            for store_type, item in pending:
+                start = time.perf_counter()
+                await store_funcs[store_type](item)
+                latencies.append(time.perf_counter() - start)
+
+        peak_rss = get_rss_bytes()
+        running = True
+
+        async def sample_rss():
+            nonlocal peak_rss
+            while running:
+                peak_rss = max(peak_rss, get_rss_bytes())
+                await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+        sampler = asyncio.create_task(sample_rss())
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*[write_worker() for _ in range(concurrency)])
+            if backend == "parquet":
+                # 缓存中的记录写出并写入文件尾，计入写入耗时
+                await parquet_store.close_writers()
+            elif backend in ("csv", "json"):
+                await segmented_output.close_outputs()
+        finally:
+            seconds = time.perf_counter() - start
+            running = False
+            await sampler
+            if close_db:
+                await close_db()
+        peak_rss = max(peak_rss, get_rss_bytes())
+        file_size = None if backend == "db" and use_mysql else get_dir_size(output_dir)
+
+    return StoreBenchmarkResult(
+        backend=backend if backend != "db" or use_mysql else "db(sqlite)",
+        concurrency=concurrency,
+        rows=len(latencies),
+        seconds=seconds,
+        rows_per_sec=len(latencies) / seconds if seconds else 0,
+        p50_ms=percentile(latencies, 50) * 1000,
+        p99_ms=percentile(latencies, 99) * 1000,
+        peak_rss_mb=peak_rss / 1024 / 1024,
+        file_size_bytes=file_size,
+    )
+
+
+async def run_store_benchmarks(backends: List[str], concurrency_levels: List[int], contents: int,
+                               comments_per_content: int, use_mysql: bool = False) -> List[StoreBenchmarkResult]:
+    """
+    依次测试每个后端在每个并发数下的表现
+    Args:
+        backends: 存储后端列表
+        concurrency_levels: 并发数列表
+        contents: 内容条数
+        comments_per_content: 每条内容的评论数
+        use_mysql: db 后端是否写入真实的 MySQL
+
+    Returns:
+
+    """
+    rows = generate_rows(await load_row_templates(), contents, comments_per_content)
+    results: List[StoreBenchmarkResult] = []
+    # 测试期间关闭词云，只统计存储本身的开销
+    with mock.patch.object(config, "ENABLE_GET_WORDCLOUD", False):
+        for backend in backends:
+            for concurrency in concurrency_levels:
+                result = await run_store_benchmark(backend, rows, concurrency, use_mysql)
+                utils.logger.info(f"[store_benchmark] {result.summary()}")
+                results.append(result)
+    return results
+
+
+def parse_benchmark_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Storage backend throughput benchmark. / 存储后端吞吐量基准测试')
+    parser.add_argument('--backends', type=str, default=",".join(BACKENDS),
+                        help='Comma separated backends / 逗号分隔的存储后端: csv,json,sqlite,db,parquet')
+    parser.add_argument('--concurrency', type=str, default="1,8,32",
+                        help='Comma separated concurrency levels / 逗号分隔的并发写入数')
+    parser.add_argument('--contents', type=int, default=200, help='Number of contents / 内容条数')
+    parser.add_argument('--comments_per_content', type=int, default=10, help='Comments per content / 每条内容的评论数')
+    parser.add_argument('--mysql', action='store_true',
+                        help='Write the db backend to the configured MySQL / db 后端写入配置的 MySQL')
+    parser.add_argument('--output', type=str, default="", help='Save results as JSON / 结果保存为 JSON 文件')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_benchmark_args()
+    backends = [backend.strip() for backend in args.backends.split(",") if backend.strip()]
+    unknown_backends = set(backends) - set(BACKENDS)
+    if unknown_backends:
+        raise ValueError(f"Unsupported store benchmark backends: {','.join(sorted(unknown_backends))}")
+    concurrency_levels = [int(value) for value in args.concurrency.split(",") if value.strip()]
+    results = asyncio.run(run_store_benchmarks(backends, concurrency_levels, args.contents,
+                                               args.comments_per_content, args.mysql))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump([result.model_dump() for result in results], f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
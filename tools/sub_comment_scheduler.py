@@ -0,0 +1,69 @@
+# 声明：本代码仅供学习和研究目的使用。使用者应遵守以下原则：
+# 1. 不得用于任何商业用途。
+# 2. 使用时应遵守目标平台的使用条款和robots.txt规则。
+# 3. 不得进行大规模爬取或对平台造成运营干扰。
+# 4. 应合理控制请求频率，避免给目标平台带来不必要的负担。
+# 5. 不得用于任何非法或不当的用途。
+#
+# 详细许可条款请参阅项目根目录下的LICENSE文件。
+# 使用本代码即表示您同意遵守上述原则和LICENSE中的所有条款。
+
+# -*- coding: utf-8 -*-
+# @Desc    : 二级评论并发调度，一页一级评论下的多个回复楼层并发翻页
+# 每个楼层内部仍然逐页请求并在页间休眠 crawl_interval，并发数受单个帖子和全局两级上限约束，
+# 总请求频率不超过 全局上限 / crawl_interval
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# 抓取一个回复楼层的所有二级评论，返回该楼层的二级评论列表
+ThreadFetcher = Callable[[], Awaitable[List[Dict]]]
+
+
+class SubCommentScheduler:
+    """
+    二级评论调度器，每个平台客户端持有一个，全局并发上限在该客户端的所有帖子间共享
+    """
+
+    def __init__(self, per_note_limit: int, global_limit: int):
+        """
+        :param per_note_limit: 单个帖子同时翻页的回复楼层数
+        :param global_limit: 所有帖子合计同时翻页的回复楼层数
+        """
+        self.per_note_limit = max(per_note_limit, 1)
+        self.global_limit = max(global_limit, 1)
+        # 延迟到第一次调度时创建，保证绑定的是实际运行的事件循环
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def global_semaphore(self) -> asyncio.Semaphore:
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.global_limit)
+        return self._global_semaphore
+
+    async def run(self, fetchers: List[ThreadFetcher]) -> List[List[Dict]]:
+        """
+        并发抓取一组回复楼层，返回结果与 fetchers 顺序一致，保证入库顺序可以按一级评论顺序还原；
+        任一楼层抓取失败时取消其余楼层并抛出该异常，与逐个抓取时的行为一致
+        Args:
+            fetchers: 每个回复楼层的抓取函数
+
+        Returns: 每个楼层的二级评论列表
+
+        """
+        if not fetchers:
+            return []
+        note_semaphore = asyncio.Semaphore(self.per_note_limit)
+        global_semaphore = self.global_semaphore
+
+        async def run_thread(fetcher: ThreadFetcher) -> List[Dict]:
+            async with note_semaphore, global_semaphore:
+                return await fetcher()
+
+        tasks = [asyncio.create_task(run_thread(fetcher)) for fetcher in fetchers]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
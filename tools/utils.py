@@ -13,7 +13,6 @@ import argparse
 import logging
 
 from .crawler_util import *
-from .slider_util import *
 from .time_util import *
 
 
@@ -40,3 +39,11 @@ def str2bool(v):
         return False
     else:
         raise argparse.ArgumentTypeError('Boolean value expected.')
+
+
+def __getattr__(name: str):
+    # 滑块工具依赖 cv2/numpy，只有抖音滑块验证时才会用到，首次访问时再导入
+    if name in ("Slide", "get_track_simple", "get_tracks"):
+        from . import slider_util
+        return getattr(slider_util, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -15,20 +15,19 @@ import logging
 from collections import Counter
 
 import aiofiles
-import jieba
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
 
 import config
 from tools import utils
 
-plot_lock = asyncio.Lock()
-
 class AsyncWordCloudGenerator:
     def __init__(self):
+        # jieba/matplotlib/wordcloud 导入开销较大，延迟到真正生成词云时再导入
+        import jieba
+
         logging.getLogger('jieba').setLevel(logging.WARNING)
         self.stop_words_file = config.STOP_WORDS_FILE
         self.lock = asyncio.Lock()
+        self.plot_lock = asyncio.Lock()
         self.stop_words = self.load_stop_words()
         self.custom_words = config.CUSTOM_WORDS
         for word, group in self.custom_words.items():
@@ -39,6 +38,8 @@ class AsyncWordCloudGenerator:
             return set(f.read().strip().split('\n'))
 
     async def generate_word_frequency_and_cloud(self, data, save_words_prefix):
+        import jieba
+
         all_text = ' '.join(item['content'] for item in data)
         words = [word for word in jieba.lcut(all_text) if word not in self.stop_words and len(word.strip()) > 0]
         word_freq = Counter(words)
@@ -49,14 +50,17 @@ class AsyncWordCloudGenerator:
             await file.write(json.dumps(word_freq, ensure_ascii=False, indent=4))
 
         # Try to acquire the plot lock without waiting
-        if plot_lock.locked():
+        if self.plot_lock.locked():
             utils.logger.info("Skipping word cloud generation as the lock is held.")
             return
 
         await self.generate_word_cloud(word_freq, save_words_prefix)
 
     async def generate_word_cloud(self, word_freq, save_words_prefix):
-        await plot_lock.acquire()
+        import matplotlib.pyplot as plt
+        from wordcloud import WordCloud
+
+        await self.plot_lock.acquire()
         top_20_word_freq = {word: freq for word, freq in
                             sorted(word_freq.items(), key=lambda item: item[1], reverse=True)[:20]}
         wordcloud = WordCloud(
@@ -80,4 +84,19 @@ class AsyncWordCloudGenerator:
         plt.savefig(f"{save_words_prefix}_word_cloud.png", format='png', dpi=300)
         plt.close()
 
-        plot_lock.release()
\ No newline at end of file
+        self.plot_lock.release()
+
+
+_word_cloud_generator = None
+
+
+def get_word_cloud_generator() -> AsyncWordCloudGenerator:
+    """
+    获取进程内共享的词云生成器，首次使用时才加载停用词并注册自定义词
+    Returns:
+
+    """
+    global _word_cloud_generator
+    if not _word_cloud_generator:
+        _word_cloud_generator = AsyncWordCloudGenerator()
+    return _word_cloud_generator